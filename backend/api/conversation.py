@@ -1,11 +1,42 @@
 """REST adapter for the conversation turn (slice 2). Drains the same
 ConversationService.run_turn generator the WS path streams, returning the
 assembled reply (the stream:false path). Mirrors backend/api/integrations.py:
-a self-contained APIRouter behind require_api_key, mounted by the app."""
+a self-contained APIRouter behind require_api_key, mounted by the app.
+
+With `"stream": true` the turn events are forwarded as server-sent events
+while they are produced — `event: reply_started|reply_delta|reply_done|...`
+with the event payload as JSON `data:` — so clients see the first words at
+first-token latency instead of after the whole generation. The turn runs on
+a worker thread; a client that disconnects cancels it (the LLM stream is
+closed and nothing is written to history). A turn that fails (e.g. the LLM
+is unreachable) ends the stream with `event: error` and {"persona_id",
+"error"}, so clients can tell a failure from a truncated stream.
+
+POST .../messages/batch replays many independent messages (persona tuning):
+each runs as a stateless turn — on its own optional history, never touching
+the stored chat history, speech, skills or HA — at most `concurrency` at a
+time. Results stream back as `event: result` frames in completion order,
+then one `event: summary` with the throughput. Batch turns queue at the LLM
+scheduler as "api" work with its queue-wait deadline, so the pool is capped
+at the scheduler's concurrency (`app.state.llm_concurrency`, LLM_PARALLEL):
+more workers would only wait in the queue until they time out."""
+import asyncio
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Literal, Optional
+
 from fastapi import APIRouter, Depends, HTTPException, Request
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 
 from backend.api.deps import require_api_key
+from backend.clients.llm_scheduler import llm_priority
+from backend.services.cancellation import CancelToken
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/api/v1",
@@ -13,25 +44,164 @@ router = APIRouter(
     dependencies=[Depends(require_api_key)],
 )
 
+_SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+MAX_BATCH_MESSAGES = 1000
+MAX_BATCH_CONCURRENCY = 16
+
 
 class MessageIn(BaseModel):
     text: str
+    stream: bool = False
 
 
 class MessageOut(BaseModel):
     reply: str
 
 
+class HistoryMessage(BaseModel):
+    role: Literal["user", "assistant"]
+    content: str
+
+
+class BatchMessage(BaseModel):
+    text: str
+    id: Optional[str] = None
+    history: List[HistoryMessage] = []
+
+
+class BatchIn(BaseModel):
+    messages: List[BatchMessage] = Field(min_length=1, max_length=MAX_BATCH_MESSAGES)
+    concurrency: int = Field(4, ge=1, le=MAX_BATCH_CONCURRENCY)
+
+
+def _sse(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+async def _sse_events(conv, persona_id: str, text: str, cancel: CancelToken):
+    """run_turn on a worker thread, its events as SSE frames. Closing the
+    generator early (client gone) cancels the turn."""
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    end = object()
+
+    def pump() -> None:
+        try:
+            # REST callers queue behind voice turns at the LLM scheduler.
+            with llm_priority("api", flow=persona_id):
+                for ev in conv.run_turn(persona_id, text, channel="api", cancel=cancel):
+                    loop.call_soon_threadsafe(events.put_nowait, ev)
+        except Exception as e:
+            logger.exception("streamed REST turn for %s failed", persona_id)
+            frame = _sse("error", {"persona_id": persona_id, "error": str(e)})
+            loop.call_soon_threadsafe(events.put_nowait, frame)
+        finally:
+            loop.call_soon_threadsafe(events.put_nowait, end)
+
+    threading.Thread(target=pump, name=f"rest-turn-{persona_id}", daemon=True).start()
+    finished = False
+    try:
+        while True:
+            ev = await events.get()
+            if ev is end:
+                finished = True
+                return
+            yield ev if isinstance(ev, str) else _sse(ev.type, ev.payload)
+    finally:
+        if not finished:
+            cancel.cancel("client disconnected")
+
+
+def _batch_turn(conv, persona_id: str, index: int, item: BatchMessage,
+                cancel: CancelToken) -> dict:
+    result = {"index": index, "id": item.id}
+    t0 = time.monotonic()
+    try:
+        # Batch turns share the REST class but queue as their own flow, so a
+        # replay does not crowd out interactive REST callers of the persona.
+        with llm_priority("api", flow=f"batch:{persona_id}"):
+            for ev in conv.run_turn(persona_id, item.text, channel="batch", cancel=cancel,
+                                    history=[m.model_dump() for m in item.history]):
+                if ev.type == "reply_done":
+                    result.update({k: v for k, v in ev.payload.items() if k != "persona_id"})
+                    result["reply"] = result.pop("text", "")
+                    result["ok"] = True
+                elif ev.type == "reply_cancelled":
+                    result.update(ok=False, error=f"cancelled: {ev.payload.get('reason')}")
+    except Exception as e:
+        logger.exception("batch turn %d for %s failed", index, persona_id)
+        result.update(ok=False, error=str(e))
+    result.setdefault("ok", False)
+    result["elapsed_s"] = round(time.monotonic() - t0, 3)
+    return result
+
+
+async def _batch_events(conv, persona_id: str, body: BatchIn, cancel: CancelToken,
+                        llm_concurrency: Optional[int] = None):
+    """Run the batch on a bounded pool; yield result frames as turns finish,
+    then the summary. Closing the generator early cancels what is left."""
+    loop = asyncio.get_running_loop()
+    results: asyncio.Queue = asyncio.Queue()
+    workers = min(body.concurrency, llm_concurrency or body.concurrency)
+    if workers < body.concurrency:
+        logger.info("Batch for %s: concurrency %d capped at the LLM's %d",
+                    persona_id, body.concurrency, workers)
+    pool = ThreadPoolExecutor(max_workers=workers,
+                              thread_name_prefix=f"batch-{persona_id}")
+    t0 = time.monotonic()
+
+    def done(future) -> None:
+        if not future.cancelled():
+            loop.call_soon_threadsafe(results.put_nowait, future.result())
+
+    for i, item in enumerate(body.messages):
+        pool.submit(_batch_turn, conv, persona_id, i, item, cancel).add_done_callback(done)
+    pool.shutdown(wait=False)
+    ok = received = 0
+    try:
+        while received < len(body.messages):
+            result = await results.get()
+            received += 1
+            ok += result["ok"]
+            yield _sse("result", result)
+    finally:
+        if received < len(body.messages):
+            cancel.cancel("client disconnected")
+            pool.shutdown(wait=False, cancel_futures=True)
+    elapsed = time.monotonic() - t0
+    summary = {"count": len(body.messages), "ok": ok, "errors": len(body.messages) - ok,
+               "concurrency": workers, "elapsed_s": round(elapsed, 3),
+               "turns_per_s": round(len(body.messages) / elapsed, 3) if elapsed else None}
+    logger.info("Batch for %s: %d turns (%d ok) in %.1fs, %.2f turns/s",
+                persona_id, summary["count"], ok, elapsed, summary["turns_per_s"] or 0)
+    yield _sse("summary", summary)
+
+
 @router.post("/personas/{persona_id}/messages", response_model=MessageOut)
-def post_message(persona_id: str, body: MessageIn, request: Request) -> MessageOut:
+def post_message(persona_id: str, body: MessageIn, request: Request):
     # Sync handler: FastAPI runs it in its threadpool, so a slow LLM turn occupies
-    # a worker but does not block the event loop. Explicit thread/streaming handling
-    # for turns is a documented slice-2 open item.
+    # a worker but does not block the event loop.
     conv = getattr(request.app.state, "conversation_service", None)
     if conv is None:
         raise HTTPException(status_code=503, detail="conversation service unavailable")
+    if body.stream:
+        return StreamingResponse(_sse_events(conv, persona_id, body.text, CancelToken()),
+                                 media_type="text/event-stream", headers=_SSE_HEADERS)
     reply = ""
-    for ev in conv.run_turn(persona_id, body.text):
-        if ev.type == "reply_done":
-            reply = ev.payload.get("text", "")
+    # REST callers queue behind voice turns at the LLM scheduler.
+    with llm_priority("api", flow=persona_id):
+        for ev in conv.run_turn(persona_id, body.text, channel="api"):
+            if ev.type == "reply_done":
+                reply = ev.payload.get("text", "")
     return MessageOut(reply=reply)
+
+
+@router.post("/personas/{persona_id}/messages/batch")
+def post_message_batch(persona_id: str, body: BatchIn, request: Request):
+    conv = getattr(request.app.state, "conversation_service", None)
+    if conv is None:
+        raise HTTPException(status_code=503, detail="conversation service unavailable")
+    llm_concurrency = getattr(request.app.state, "llm_concurrency", None)
+    return StreamingResponse(_batch_events(conv, persona_id, body, CancelToken(),
+                                           llm_concurrency),
+                             media_type="text/event-stream", headers=_SSE_HEADERS)
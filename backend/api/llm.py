@@ -0,0 +1,25 @@
+"""REST surface for LLM-layer telemetry: warm-keeper cold starts, router
+endpoint state, and whatever else the LLM stack reports.
+
+Mirrors backend/api/conversation.py: a self-contained APIRouter behind
+require_api_key. The app owner installs `app.state.llm_stats`, a callable
+returning a JSON-able dict (503 when absent) — the api layer does not know
+which wrappers the LLM is built from.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Request
+
+from backend.api.deps import require_api_key
+
+router = APIRouter(
+    prefix="/api/v1",
+    tags=["llm"],
+    dependencies=[Depends(require_api_key)],
+)
+
+
+@router.get("/llm/stats")
+def llm_stats(request: Request) -> dict:
+    stats = getattr(request.app.state, "llm_stats", None)
+    if stats is None:
+        raise HTTPException(status_code=503, detail="llm stats unavailable")
+    return stats()
@@ -2,19 +2,29 @@
 
 Mirrors backend/api/conversation.py: a self-contained APIRouter behind
 require_api_key, reaching its service via request.app.state (503 when absent).
-History gets NO REST surface this slice — rehydration stays on the WS
-history_loaded frame at activation.
+Rehydration at activation stays on the WS history_loaded frame; GET
+/personas/{id}/history pages read-only through the whole persisted history
+(compressed archive segments, then the live journal). GET /history/search
+ranks messages across personas by full-text relevance, with snippets.
+POST /personas/{id}/memories embeds more memory entries into the persona's
+vector memory (`app.state.persona_memory`; 503 without it).
 
 Status mapping (spec table): PersonaNotFound → 404; PersonaExists → 409;
 PersonaActive → 409; pydantic ValidationError → 422; store ValueError
 (path-traversal guard) → 404 without leaking guard details. NOTE:
 ValidationError subclasses ValueError, so it MUST be caught first.
+
+GET /personas takes search/filter/paging query params (q, trait, gender,
+language, offset, limit), answered from the in-memory persona catalog.
 """
-from fastapi import APIRouter, Body, Depends, HTTPException, Request, Response
+from typing import List, Optional
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
 from pydantic import BaseModel, ValidationError
 
 from backend.api.deps import require_api_key
 from backend.services.persona import PersonaActive, PersonaExists, PersonaNotFound
+from model_interfaces import LLMError
 
 router = APIRouter(
     prefix="/api/v1",
@@ -22,6 +32,8 @@ router = APIRouter(
     dependencies=[Depends(require_api_key)],
 )
 
+MAX_PAGE = 500
+
 
 class PersonaCreateIn(BaseModel):
     name: str
@@ -40,8 +52,18 @@ def _not_found(persona_id: str) -> HTTPException:
 
 
 @router.get("/personas")
-def list_personas(request: Request) -> list:
-    return _service(request).list()
+def list_personas(request: Request, response: Response,
+                  q: Optional[str] = None, trait: Optional[str] = None,
+                  gender: Optional[str] = None, language: Optional[str] = None,
+                  offset: int = Query(0, ge=0),
+                  limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE)) -> list:
+    """The library, or one page of a search: `q` matches names and traits,
+    `trait`/`gender`/`language` filter. X-Total-Count carries the number of
+    matches across all pages."""
+    total, page = _service(request).query(q, trait=trait, gender=gender,
+                                          language=language, offset=offset, limit=limit)
+    response.headers["X-Total-Count"] = str(total)
+    return page
 
 
 @router.post("/personas", status_code=201)
@@ -92,6 +114,52 @@ def delete_persona(persona_id: str, request: Request) -> Response:
     return Response(status_code=204)
 
 
+@router.get("/personas/{persona_id}/history")
+def get_history(persona_id: str, request: Request, response: Response,
+                offset: int = Query(0, ge=0),
+                limit: int = Query(100, ge=1, le=MAX_PAGE)) -> list:
+    """One page of the persona's messages, oldest first. X-Total-Count
+    carries the total, so the latest page is offset=total-limit."""
+    try:
+        total, page = _service(request).history_page(persona_id, offset, limit)
+    except (PersonaNotFound, ValueError):
+        raise _not_found(persona_id)
+    response.headers["X-Total-Count"] = str(total)
+    return page
+
+
+@router.get("/history/search")
+def search_history(request: Request, q: str = Query(..., min_length=1),
+                   persona_id: Optional[str] = None,
+                   limit: int = Query(10, ge=1, le=100)) -> list:
+    """Best matches first: {id, persona_id, role, content, snippet, score},
+    with the matched words in the snippet bracketed."""
+    try:
+        return _service(request).search_history(q, persona_id, limit)
+    except (PersonaNotFound, ValueError):
+        raise _not_found(persona_id)
+
+
+@router.post("/personas/{persona_id}/memories")
+def add_memories(persona_id: str, request: Request,
+                 memories: List[str] = Body(...)) -> dict:
+    """Embed and store more memory entries; turns retrieve them alongside
+    the persona's memories string. Returns the entry count."""
+    memory = getattr(request.app.state, "persona_memory", None)
+    if memory is None or not memory.enabled:
+        raise HTTPException(status_code=503, detail="persona memory unavailable")
+    try:
+        _service(request).get(persona_id)
+    except (PersonaNotFound, ValueError):
+        raise _not_found(persona_id)
+    try:
+        return {"count": memory.add(persona_id, memories)}
+    except LLMError as e:
+        raise HTTPException(status_code=502, detail=f"embedding failed: {e}")
+    except ValueError as e:                # embedding size changed
+        raise HTTPException(status_code=409, detail=str(e))
+
+
 @router.get("/personas/{persona_id}/triggers")
 def get_triggers(persona_id: str, request: Request) -> list:
     try:
@@ -0,0 +1,82 @@
+"""Client for an OpenAI-compatible `/v1/embeddings` endpoint (Ollama,
+llama-server --embeddings, vLLM, ...).
+
+    client = EmbeddingClient()          # EMBEDDING_URL / EMBEDDING_MODEL env
+    vectors = client.embed(["likes tea", "hates mornings"])
+
+EMBEDDING_MODEL defaults to nomic-embed-text. EMBEDDING_URL falls back to
+LLM_URL only when EMBEDDING_MODEL is the chat model (LLM_MODEL) itself: an
+embedding request for another model on the chat server (e.g. behind
+llama-swap) could swap models out mid-conversation. Without a URL
+`available` is False.
+
+Inputs are sent in batches of EMBEDDING_BATCH (default 64); vectors come
+back in input order. embed_query() — the one embedding a turn waits on —
+uses the short EMBEDDING_QUERY_TIMEOUT_S (default 0.75 s). Transport and
+protocol errors raise LLMError, like OpenAICompatLLM.
+"""
+from __future__ import annotations
+
+import logging
+import os
+from typing import List, Optional
+
+import requests
+
+from model_interfaces import LLMError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "nomic-embed-text"
+DEFAULT_BATCH = 64
+DEFAULT_QUERY_TIMEOUT_S = 0.75
+
+
+class EmbeddingClient:
+    def __init__(self, base_url: Optional[str] = None, model: Optional[str] = None,
+                 timeout: float = 30.0, batch: Optional[int] = None,
+                 query_timeout: Optional[float] = None):
+        self.model = model or os.environ.get("EMBEDDING_MODEL", DEFAULT_MODEL)
+        base_url = base_url or os.environ.get("EMBEDDING_URL")
+        if not base_url and self.model == os.environ.get("LLM_MODEL", "gemma3:4b"):
+            base_url = os.environ.get("LLM_URL", "http://localhost:11434/v1")
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self.timeout = timeout
+        self.query_timeout = float(query_timeout if query_timeout is not None
+                                   else os.environ.get("EMBEDDING_QUERY_TIMEOUT_S",
+                                                       DEFAULT_QUERY_TIMEOUT_S))
+        self.batch = int(batch if batch is not None
+                         else os.environ.get("EMBEDDING_BATCH", DEFAULT_BATCH))
+
+    @property
+    def available(self) -> bool:
+        return self.base_url is not None
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        out: List[List[float]] = []
+        for i in range(0, len(texts), max(1, self.batch)):
+            out.extend(self._embed_batch(texts[i:i + self.batch], self.timeout))
+        return out
+
+    def embed_query(self, text: str) -> List[float]:
+        """One text, under the short query timeout (a turn is waiting)."""
+        return self._embed_batch([text], self.query_timeout)[0]
+
+    def _embed_batch(self, texts: List[str], timeout: float) -> List[List[float]]:
+        if self.base_url is None:
+            raise LLMError("no embedding endpoint configured (EMBEDDING_URL)")
+        url = f"{self.base_url}/embeddings"
+        try:
+            r = requests.post(url, json={"model": self.model, "input": texts},
+                              timeout=timeout)
+            r.raise_for_status()
+            data = r.json().get("data") or []
+        except requests.RequestException as e:
+            logger.error("Error communicating with the embedding endpoint at %s: %s", url, e)
+            raise LLMError(f"embedding request failed: {e}") from e
+        except (ValueError, AttributeError) as e:
+            raise LLMError(f"embedding endpoint returned a malformed response: {e}") from e
+        if len(data) != len(texts):
+            raise LLMError(f"embedding endpoint returned {len(data)} vectors "
+                           f"for {len(texts)} inputs")
+        return [d["embedding"] for d in sorted(data, key=lambda d: d.get("index", 0))]
@@ -0,0 +1,193 @@
+"""Exact-match LLM response cache — opt-in per call site.
+
+Some calls repeat verbatim: the rephrase_ha_response path sends "You are X.
+Rephrase this in your voice…: Lights are off." for the same handful of HA
+confirmations every day. Those deserve a cache; a conversation turn (whose
+messages never repeat) does not, so nothing is cached unless a call site asks:
+
+    cache = ResponseCache()                       # LLM_CACHE_* env
+    rephrase_llm = cache.wrap(llm, site="ha_rephrase")
+    rephrase_llm.chat(messages)                   # an LLMInterface, cached
+
+The key is a hash of (model, system prompt, messages, sampling params), so a
+model or prompt change is a miss, never a stale hit. Entries are LRU-bounded
+(LLM_CACHE_MAX) and expire after LLM_CACHE_TTL_S; the table persists to
+LLM_CACHE_PATH (atomic JSON write, like config_store) on every store and is
+reloaded on first use after a restart. Empty replies, errors and cancelled
+streams are never stored. stats() reports hits/misses/hit-rate per site.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, List, Optional
+
+from model_interfaces import LLMInterface
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = "config/llm_cache.json"
+
+
+class ResponseCache:
+    def __init__(self, path: Optional[str] = None, *,
+                 max_entries: Optional[int] = None,
+                 ttl_s: Optional[float] = None,
+                 clock: Callable[[], float] = time.time):
+        self.path = path if path is not None else os.environ.get("LLM_CACHE_PATH", DEFAULT_PATH)
+        self.max_entries = int(max_entries if max_entries is not None
+                               else os.environ.get("LLM_CACHE_MAX", "512"))
+        self.ttl_s = float(ttl_s if ttl_s is not None
+                           else os.environ.get("LLM_CACHE_TTL_S", str(7 * 24 * 3600)))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._loaded = False
+        self._sites: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def key(model: Optional[str], system_prompt: Optional[str],
+            messages: List[Dict[str, str]], params: Optional[dict] = None) -> str:
+        blob = json.dumps([model, system_prompt, messages, params or {}],
+                          sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(blob.encode()).hexdigest()
+
+    def wrap(self, llm: LLMInterface, site: str, params: Optional[dict] = None) -> "CachedLLM":
+        return CachedLLM(llm, self, site, params)
+
+    # ── table ────────────────────────────────────────────────────────────
+    def get(self, key: str, site: str = "default") -> Optional[str]:
+        with self._lock:
+            self._load_locked()
+            counters = self._sites.setdefault(site, {"hits": 0, "misses": 0})
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self._clock():
+                self._entries.move_to_end(key)
+                counters["hits"] += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]          # expired
+            counters["misses"] += 1
+            return None
+
+    def put(self, key: str, value: str) -> None:
+        if not value:
+            return
+        with self._lock:
+            self._load_locked()
+            self._entries[key] = (self._clock() + self.ttl_s, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            snapshot = list(self._entries.items())
+        self._save(snapshot)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._loaded = True
+        self._save([])
+
+    def stats(self) -> dict:
+        with self._lock:
+            sites = {}
+            for site, c in self._sites.items():
+                total = c["hits"] + c["misses"]
+                sites[site] = {**c, "hit_rate": round(c["hits"] / total, 3) if total else None}
+            return {"entries": len(self._entries), "sites": sites}
+
+    # ── persistence ──────────────────────────────────────────────────────
+    def _load_locked(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path:
+            return
+        try:
+            with open(self.path) as f:
+                rows = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable LLM cache %s: %s", self.path, e)
+            return
+        now = self._clock()
+        for key, expires, value in rows[-self.max_entries:]:
+            if expires > now:
+                self._entries[key] = (expires, value)
+
+    def _save(self, snapshot) -> None:
+        if not self.path:
+            return
+        rows = [[k, expires, value] for k, (expires, value) in snapshot]
+        directory = os.path.dirname(self.path) or "."
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(rows, f, ensure_ascii=False)
+                os.replace(tmp, self.path)
+            except Exception:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+                raise
+        except OSError as e:
+            # A cache that cannot persist still works in memory.
+            logger.warning("Could not persist LLM cache to %s: %s", self.path, e)
+
+
+class CachedLLM(LLMInterface):
+    """An LLMInterface view of *llm* whose replies go through *cache*."""
+
+    def __init__(self, llm: LLMInterface, cache: ResponseCache, site: str,
+                 params: Optional[dict] = None):
+        self._llm = llm
+        self._cache = cache
+        self.site = site
+        self._params = params
+
+    @property
+    def model(self) -> Optional[str]:
+        return getattr(self._llm, "model", None)
+
+    def _key(self, messages, system_prompt, limits=None) -> str:
+        params = {**(self._params or {}), **limits} if limits else self._params
+        return self._cache.key(self.model, system_prompt, messages, params)
+
+    def chat(self, messages: List[Dict[str, str]], system_prompt: Optional[str] = None) -> str:
+        key = self._key(messages, system_prompt)
+        hit = self._cache.get(key, self.site)
+        if hit is not None:
+            return hit
+        reply = self._llm.chat(messages, system_prompt=system_prompt)
+        self._cache.put(key, reply)
+        return reply
+
+    def chat_stream(self, messages: List[Dict[str, str]],
+                    system_prompt: Optional[str] = None,
+                    cancel=None, limits: Optional[dict] = None) -> Iterator[str]:
+        if cancel is not None and cancel.cancelled:
+            return
+        key = self._key(messages, system_prompt, limits)
+        hit = self._cache.get(key, self.site)
+        if hit is not None:
+            yield hit
+            return
+        chunks: List[str] = []
+        kwargs = {"cancel": cancel} if cancel is not None else {}
+        if limits:
+            kwargs["limits"] = limits
+        for chunk in self._llm.chat_stream(messages, system_prompt=system_prompt, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        if cancel is None or not cancel.cancelled:
+            self._cache.put(key, "".join(chunks))
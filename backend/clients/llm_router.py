@@ -0,0 +1,320 @@
+"""Multi-endpoint LLM router — an LLMInterface over several OpenAI-compatible
+base URLs (e.g. two llama-swap boxes, or llama.cpp + Ollama serving the same
+model).
+
+Selection is latency-aware: each endpoint keeps an EWMA of its observed
+time-to-first-token (TTFT) and its in-flight count; the lowest
+`ewma * (1 + in_flight)` wins, and endpoints with no samples yet are tried
+first so the router learns every box. A connection error or timeout marks the
+endpoint down for `cooldown_s` and the request fails over to the next one.
+
+Hedging (opt-in, `hedge=True` / LLM_HEDGE=1): if the chosen endpoint has not
+streamed its first token by its own TTFT percentile (`hedge_percentile` of
+its recent samples; `hedge_default_s` until it has enough), a second request
+is fired at the next endpoint. Whichever streams first is kept; the other is
+cancelled through its CancelToken, which closes its upstream socket. Only
+chat_stream hedges — chat() just fails over.
+
+Attempts run on their own threads in a copy of the caller's context, so
+llm_slot (KV slot pinning) and the scheduler's priority follow them. The
+endpoint that streams a persona's llm_slot turn holds that persona's KV:
+later slotted turns prefer it while it is up, and save_context /
+restore_context go to it.
+
+Configured by env like OpenAICompatLLM: LLM_URLS is a comma-separated list
+of /v1 base URLs, LLM_MODEL the model served by all of them.
+"""
+from __future__ import annotations
+
+import contextvars
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional
+
+import requests
+
+from backend.services.cancellation import CancelToken
+from model_interfaces import LLMError, LLMInterface, OpenAICompatLLM, llm_slot_owner
+
+logger = logging.getLogger(__name__)
+
+# Samples needed before an endpoint's own TTFT percentile is trusted as the
+# hedge threshold.
+MIN_HEDGE_SAMPLES = 5
+
+
+def _is_connection_error(e: BaseException) -> bool:
+    """True for failures that say nothing about the prompt — the box is down,
+    unreachable, or timed out — so retrying elsewhere is safe."""
+    cause = e.__cause__
+    return isinstance(cause, (requests.ConnectionError, requests.Timeout))
+
+
+class _Endpoint:
+    def __init__(self, llm: LLMInterface, alpha: float):
+        self.llm = llm
+        self.alpha = alpha
+        self.ewma_ttft: Optional[float] = None
+        self.samples: deque = deque(maxlen=64)
+        self.in_flight = 0
+        self.down_until = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.hedges_won = 0
+
+    @property
+    def name(self) -> str:
+        return getattr(self.llm, "base_url", repr(self.llm))
+
+    def record_ttft(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.ewma_ttft = (seconds if self.ewma_ttft is None
+                          else self.alpha * seconds + (1 - self.alpha) * self.ewma_ttft)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if len(self.samples) < MIN_HEDGE_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(pct * len(ordered)))]
+
+    def score(self) -> float:
+        # Unmeasured endpoints score 0 so each one gets explored.
+        return (self.ewma_ttft or 0.0) * (1 + self.in_flight)
+
+
+class RouterLLM(LLMInterface):
+    def __init__(self, base_urls: Optional[List[str]] = None,
+                 model: Optional[str] = None, timeout: float = 120.0, *,
+                 backends: Optional[List[LLMInterface]] = None,
+                 hedge: Optional[bool] = None,
+                 hedge_percentile: float = 0.95,
+                 hedge_min_s: float = 0.25,
+                 hedge_default_s: float = 2.0,
+                 ewma_alpha: float = 0.3,
+                 cooldown_s: float = 10.0):
+        if backends is None:
+            urls = base_urls or [
+                u.strip() for u in os.environ.get("LLM_URLS", "").split(",") if u.strip()
+            ]
+            if not urls:
+                raise ValueError("RouterLLM needs at least one base URL (LLM_URLS)")
+            backends = [OpenAICompatLLM(base_url=u, model=model, timeout=timeout) for u in urls]
+        # Every endpoint serves the same model; callers (budgets, the
+        # cascade, turn telemetry) read it off the LLM like any backend.
+        self.model = model if model is not None else getattr(backends[0], "model", None)
+        self._endpoints = [_Endpoint(b, ewma_alpha) for b in backends]
+        self.hedge = (hedge if hedge is not None
+                      else os.environ.get("LLM_HEDGE", "").lower() in {"1", "true", "yes"})
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_s = hedge_min_s
+        self.hedge_default_s = hedge_default_s
+        self.cooldown_s = cooldown_s
+        # persona_id -> the endpoint whose KV slot holds its conversation.
+        self._slot_home: Dict[str, _Endpoint] = {}
+        self._lock = threading.Lock()
+
+    # ── selection / bookkeeping ──────────────────────────────────────────
+    def _ranked(self) -> List[_Endpoint]:
+        """Healthy endpoints by score, then the down ones (a last resort
+        beats failing outright when every box has blipped). A slotted
+        persona's home endpoint goes first while it is up."""
+        now = time.monotonic()
+        persona = llm_slot_owner()
+        with self._lock:
+            up = [e for e in self._endpoints if e.down_until <= now]
+            down = [e for e in self._endpoints if e.down_until > now]
+            ranked = sorted(up, key=_Endpoint.score) + sorted(down, key=lambda e: e.down_until)
+            home = self._slot_home.get(persona) if persona is not None else None
+            if home is not None and home in up:
+                ranked.remove(home)
+                ranked.insert(0, home)
+            return ranked
+
+    def _mark_down(self, ep: _Endpoint, e: BaseException) -> None:
+        with self._lock:
+            ep.failures += 1
+            ep.down_until = time.monotonic() + self.cooldown_s
+        logger.warning("LLM endpoint %s down for %.0fs: %s", ep.name, self.cooldown_s, e)
+
+    def _hedge_after(self, ep: _Endpoint) -> float:
+        pct = ep.percentile(self.hedge_percentile)
+        return max(self.hedge_min_s, pct if pct is not None else self.hedge_default_s)
+
+    @property
+    def base_urls(self) -> List[str]:
+        return [e.name for e in self._endpoints]
+
+    def stats(self) -> Dict[str, dict]:
+        """Per-endpoint routing state, keyed by base URL."""
+        now = time.monotonic()
+        with self._lock:
+            return {e.name: {
+                "ewma_ttft_s": e.ewma_ttft,
+                "in_flight": e.in_flight,
+                "requests": e.requests,
+                "failures": e.failures,
+                "hedges_won": e.hedges_won,
+                "down": e.down_until > now,
+            } for e in self._endpoints}
+
+    # ── LLMInterface ─────────────────────────────────────────────────────
+    def chat(self, messages: List[Dict[str, str]], system_prompt: Optional[str] = None) -> str:
+        last: Optional[LLMError] = None
+        for ep in self._ranked():
+            with self._lock:
+                ep.requests += 1
+                ep.in_flight += 1
+            try:
+                return ep.llm.chat(messages, system_prompt=system_prompt)
+            except LLMError as e:
+                if not _is_connection_error(e):
+                    raise
+                self._mark_down(ep, e)
+                last = e
+            finally:
+                with self._lock:
+                    ep.in_flight -= 1
+        raise LLMError(f"all LLM endpoints failed: {last}")
+
+    def chat_stream(self, messages: List[Dict[str, str]],
+                    system_prompt: Optional[str] = None,
+                    cancel=None, limits: Optional[dict] = None) -> Iterator[str]:
+        if cancel is not None and cancel.cancelled:
+            return
+        candidates = self._ranked()
+        events: queue.Queue = queue.Queue()
+        attempts: Dict[int, tuple] = {}          # id -> (endpoint, token)
+        attempts_lock = threading.Lock()         # cancel callbacks run on other threads
+        live: set = set()
+
+        def tokens() -> List[CancelToken]:
+            with attempts_lock:
+                return [tok for _, tok in attempts.values()]
+
+        def launch(ep: _Endpoint) -> None:
+            token = CancelToken()
+            with attempts_lock:
+                aid = len(attempts)
+                attempts[aid] = (ep, token)
+            if cancel is not None and cancel.cancelled:
+                token.cancel("cancelled")        # the caller gave up meanwhile
+            live.add(aid)
+            with self._lock:
+                ep.requests += 1
+                ep.in_flight += 1
+            # The caller's context (llm_slot, priority) follows the attempt.
+            threading.Thread(target=contextvars.copy_context().run, name=f"llm-router-{aid}",
+                             args=(self._pump, aid, ep, token, messages, system_prompt,
+                                   limits, events),
+                             daemon=True).start()
+
+        untried = list(candidates)
+        launch(untried.pop(0))
+        unregister = cancel.on_cancel(
+            lambda: [tok.cancel("cancelled") for tok in tokens()]
+        ) if cancel is not None else None
+        winner: Optional[int] = None
+        started = time.monotonic()
+        last_error: Optional[BaseException] = None
+        try:
+            while live:
+                timeout = None
+                if self.hedge and winner is None and untried and len(attempts) == 1:
+                    timeout = max(0.0, self._hedge_after(attempts[0][0])
+                                  - (time.monotonic() - started))
+                try:
+                    kind, aid, value = events.get(timeout=timeout)
+                except queue.Empty:
+                    ep = untried.pop(0)
+                    logger.info("LLM hedge: %s slow to first token, also asking %s",
+                                attempts[0][0].name, ep.name)
+                    launch(ep)
+                    continue
+                if winner is not None and aid != winner:
+                    if kind != "chunk":
+                        live.discard(aid)
+                    continue
+                if kind == "chunk":
+                    if winner is None:
+                        winner = aid
+                        persona = llm_slot_owner()
+                        with self._lock:
+                            if len(attempts) > 1:
+                                attempts[aid][0].hedges_won += 1
+                            if persona is not None:
+                                self._slot_home[persona] = attempts[aid][0]
+                        for other, (_, tok) in attempts.items():
+                            if other != aid:
+                                tok.cancel("hedge lost")
+                    yield value
+                elif kind == "done":
+                    live.discard(aid)
+                    if winner is None and (cancel is None or not cancel.cancelled) \
+                            and attempts[aid][1].cancelled:
+                        continue                 # a cancelled loser, keep waiting
+                    return
+                else:                            # error
+                    live.discard(aid)
+                    ep, _ = attempts[aid]
+                    if winner == aid or not _is_connection_error(value):
+                        raise value
+                    self._mark_down(ep, value)
+                    last_error = value
+                    if not live and untried:
+                        launch(untried.pop(0))
+            if winner is None and last_error is not None:
+                raise LLMError(f"all LLM endpoints failed: {last_error}")
+        finally:
+            for tok in tokens():
+                tok.cancel("stream closed")
+            if unregister is not None:
+                unregister()
+
+    def save_context(self, name: str) -> bool:
+        """Park *name*'s KV on the endpoint that served its slotted turns."""
+        with self._lock:
+            home = self._slot_home.get(name)
+        return home.llm.save_context(name) if home is not None else False
+
+    def restore_context(self, name: str) -> bool:
+        """Restore *name*'s KV where it was saved; False if no endpoint has
+        served it yet (the turn then prefills on whichever is chosen)."""
+        with self._lock:
+            home = self._slot_home.get(name)
+        return home.llm.restore_context(name) if home is not None else False
+
+    def _pump(self, aid: int, ep: _Endpoint, token: CancelToken, messages,
+              system_prompt, limits, events: queue.Queue) -> None:
+        """Run one attempt's stream on its own thread, forwarding chunks."""
+        t0 = time.monotonic()
+        first = True
+        kwargs = {"limits": limits} if limits else {}
+        try:
+            for chunk in ep.llm.chat_stream(messages, system_prompt=system_prompt,
+                                            cancel=token, **kwargs):
+                if first:
+                    first = False
+                    with self._lock:
+                        ep.record_ttft(time.monotonic() - t0)
+                events.put(("chunk", aid, chunk))
+            if first and token.cancelled:
+                # A hedge loser never reached its first token: what it took
+                # is only a lower bound on its TTFT. Learn it only when it
+                # already says the endpoint is slower than believed —
+                # otherwise it would pull the slow box's estimate down.
+                elapsed = time.monotonic() - t0
+                with self._lock:
+                    if ep.ewma_ttft is None or elapsed > ep.ewma_ttft:
+                        ep.record_ttft(elapsed)
+            events.put(("done", aid, None))
+        except LLMError as e:
+            events.put(("error", aid, e))
+        except Exception as e:  # never strand the consumer
+            events.put(("error", aid, LLMError(f"LLM stream failed: {e}")))
+        finally:
+            with self._lock:
+                ep.in_flight -= 1
@@ -0,0 +1,312 @@
+"""Priority-aware admission to the LLM backend.
+
+Voice turns, REST /messages calls, HA rephrases and background work
+(warm-ups, later summarization) all share one llama-server with a few
+parallel slots. Uncoordinated, a batch of API requests puts the person
+standing in front of the TV at the back of the line. LLMScheduler sits in
+front of the LLMInterface and admits at most `concurrency` calls at once
+(LLM_PARALLEL — match the server's -np, summed over LLM_URLS); the rest
+queue:
+
+- priority classes, strict: interactive > api > background.
+- fair queuing inside a class: waiters are grouped by flow (the persona
+  id) and flows are served round-robin, so one persona's burst cannot
+  starve another's single request.
+- queue-wait deadlines per class (LLM_QUEUE_DEADLINES, e.g.
+  "interactive=30,api=60,background=20"): a request that waits longer
+  raises LLMQueueTimeout instead of answering a user who has given up.
+  A cancelled turn leaves the queue immediately (its stream just ends).
+
+Callers tag work with `llm_priority("api", flow=persona_id)` (a contextvar,
+so the tag follows the turn through ConversationService into nested calls
+like the HA rephrase) or hold a view pinned to a class, `bind("background")`.
+Untagged calls are interactive. stats() reports queue depth and per-class
+wait-time histograms (cumulative, Prometheus-style `le` buckets).
+
+A second model on the same server (the cascade's small tier) must not get
+its own `concurrency`: `admit(backend)` is a view that calls that backend
+through this scheduler's slots and priorities.
+"""
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Iterator, List, Optional
+
+from model_interfaces import LLMError, LLMInterface
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = ("interactive", "api", "background")
+DEFAULT_DEADLINES = {"interactive": 30.0, "api": 60.0, "background": 20.0}
+WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_priority: contextvars.ContextVar[str] = contextvars.ContextVar("llm_priority", default="interactive")
+_flow: contextvars.ContextVar[str] = contextvars.ContextVar("llm_flow", default="")
+
+
+class LLMQueueTimeout(LLMError):
+    """The request waited in the scheduler queue past its class deadline."""
+
+
+@contextlib.contextmanager
+def llm_priority(priority: str, flow: Optional[str] = None):
+    """Tag LLM calls made inside the block (this thread/context)."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"unknown LLM priority {priority!r}")
+    tokens = [_priority.set(priority)]
+    if flow is not None:
+        tokens.append(_flow.set(flow))
+    try:
+        yield
+    finally:
+        for var, tok in zip((_priority, _flow), tokens):
+            var.reset(tok)
+
+
+def _parse_deadlines(spec: str) -> Dict[str, float]:
+    out = dict(DEFAULT_DEADLINES)
+    for item in (spec or "").split(","):
+        name, sep, seconds = item.strip().partition("=")
+        if sep and name in out:
+            try:
+                out[name] = float(seconds)
+            except ValueError:
+                logger.warning("Ignoring malformed LLM_QUEUE_DEADLINES entry %r", item)
+    return out
+
+
+class _Waiter:
+    __slots__ = ("granted", "enqueued")
+
+    def __init__(self) -> None:
+        self.granted = threading.Event()
+        self.enqueued = time.monotonic()
+
+
+class _Histogram:
+    def __init__(self) -> None:
+        self.counts = [0] * (len(WAIT_BUCKETS) + 1)
+        self.total = 0.0
+        self.n = 0
+
+    def observe(self, seconds: float) -> None:
+        self.n += 1
+        self.total += seconds
+        for i, bound in enumerate(WAIT_BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def snapshot(self) -> dict:
+        buckets, running = {}, 0
+        for bound, c in zip([*map(str, WAIT_BUCKETS), "+Inf"], self.counts):
+            running += c
+            buckets[bound] = running
+        return {"count": self.n, "sum": round(self.total, 6), "buckets": buckets}
+
+
+class LLMScheduler(LLMInterface):
+    def __init__(self, backend: LLMInterface, *, concurrency: Optional[int] = None,
+                 deadlines: Optional[Dict[str, float]] = None):
+        self.backend = backend
+        self.concurrency = max(1, int(concurrency if concurrency is not None
+                                      else os.environ.get("LLM_PARALLEL", "1")))
+        self.deadlines = (dict(DEFAULT_DEADLINES, **deadlines) if deadlines is not None
+                          else _parse_deadlines(os.environ.get("LLM_QUEUE_DEADLINES", "")))
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        # priority → flow → waiters; OrderedDict order is the round-robin.
+        self._queues: Dict[str, "OrderedDict[str, deque]"] = {p: OrderedDict() for p in PRIORITIES}
+        self._depth = {p: 0 for p in PRIORITIES}
+        self._max_depth = {p: 0 for p in PRIORITIES}
+        self._timeouts = {p: 0 for p in PRIORITIES}
+        self._admitted = {p: 0 for p in PRIORITIES}
+        self._waits = {p: _Histogram() for p in PRIORITIES}
+
+    @property
+    def model(self) -> Optional[str]:
+        return getattr(self.backend, "model", None)
+
+    def bind(self, priority: str) -> "ScheduledLLM":
+        """A view whose calls are always *priority* (e.g. the warm-keeper)."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"unknown LLM priority {priority!r}")
+        return ScheduledLLM(self, priority)
+
+    def admit(self, backend: LLMInterface) -> "AdmittedLLM":
+        """A view calling *backend* (another model on the same server)
+        through this scheduler's slots."""
+        return AdmittedLLM(self, backend)
+
+    # ── admission ────────────────────────────────────────────────────────
+    @contextlib.contextmanager
+    def slot(self, priority: Optional[str] = None, flow: Optional[str] = None, cancel=None):
+        """Hold one backend slot for the duration of the block. Yields False
+        (holding nothing) if *cancel* fired while queued."""
+        admitted = self._acquire(priority or _priority.get(),
+                                 _flow.get() if flow is None else flow, cancel)
+        try:
+            yield admitted
+        finally:
+            if admitted:
+                self._release()
+
+    def _acquire(self, priority: str, flow: str, cancel) -> bool:
+        waiter = _Waiter()
+        with self._lock:
+            if self._in_flight < self.concurrency and not any(self._depth.values()):
+                self._in_flight += 1
+                self._admitted[priority] += 1
+                self._waits[priority].observe(0.0)
+                return True
+            self._queues[priority].setdefault(flow, deque()).append(waiter)
+            self._depth[priority] += 1
+            self._max_depth[priority] = max(self._max_depth[priority], self._depth[priority])
+        unregister = cancel.on_cancel(waiter.granted.set) if cancel is not None else None
+        try:
+            waiter.granted.wait(self.deadlines[priority])
+        finally:
+            if unregister is not None:
+                unregister()
+        with self._lock:
+            if self._dequeue(priority, flow, waiter):
+                # Still queued: the turn was cancelled, or the deadline passed.
+                if cancel is not None and cancel.cancelled:
+                    return False
+                self._timeouts[priority] += 1
+                logger.warning("LLM %s request for %r waited over %.0fs; dropped",
+                               priority, flow, self.deadlines[priority])
+                raise LLMQueueTimeout(
+                    f"waited over {self.deadlines[priority]:.0f}s for an LLM slot")
+        if cancel is not None and cancel.cancelled:
+            self._release()
+            return False
+        return True
+
+    def _dequeue(self, priority: str, flow: str, waiter: _Waiter) -> bool:
+        q = self._queues[priority].get(flow)
+        if q is None or waiter not in q:
+            return False
+        q.remove(waiter)
+        if not q:
+            del self._queues[priority][flow]
+        self._depth[priority] -= 1
+        return True
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            while self._in_flight < self.concurrency:
+                nxt = self._next_waiter()
+                if nxt is None:
+                    break
+                priority, waiter = nxt
+                self._in_flight += 1
+                self._admitted[priority] += 1
+                self._waits[priority].observe(time.monotonic() - waiter.enqueued)
+                waiter.granted.set()
+
+    def _next_waiter(self):
+        for priority in PRIORITIES:
+            flows = self._queues[priority]
+            if not flows:
+                continue
+            flow, q = next(iter(flows.items()))
+            waiter = q.popleft()
+            del flows[flow]
+            if q:
+                flows[flow] = q            # back of the round-robin
+            self._depth[priority] -= 1
+            return priority, waiter
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "concurrency": self.concurrency,
+                "in_flight": self._in_flight,
+                "queued": dict(self._depth),
+                "max_queued": dict(self._max_depth),
+                "admitted": dict(self._admitted),
+                "timeouts": dict(self._timeouts),
+                "wait_s": {p: h.snapshot() for p, h in self._waits.items()},
+            }
+
+    # ── LLMInterface ─────────────────────────────────────────────────────
+    def chat(self, messages: List[Dict[str, str]], system_prompt: Optional[str] = None,
+             *, priority: Optional[str] = None,
+             backend: Optional[LLMInterface] = None) -> str:
+        with self.slot(priority):
+            return (backend or self.backend).chat(messages, system_prompt=system_prompt)
+
+    def chat_stream(self, messages: List[Dict[str, str]],
+                    system_prompt: Optional[str] = None,
+                    cancel=None, limits: Optional[dict] = None, *,
+                    priority: Optional[str] = None,
+                    backend: Optional[LLMInterface] = None) -> Iterator[str]:
+        if cancel is not None and cancel.cancelled:
+            return
+        kwargs = {"cancel": cancel} if cancel is not None else {}
+        if limits:
+            kwargs["limits"] = limits
+        # The slot is held until the stream ends or the consumer drops it.
+        with self.slot(priority, cancel=cancel) as admitted:
+            if admitted:
+                yield from (backend or self.backend).chat_stream(
+                    messages, system_prompt=system_prompt, **kwargs)
+
+    def save_context(self, name: str) -> bool:
+        with self.slot("interactive"):
+            return self.backend.save_context(name)
+
+    def restore_context(self, name: str) -> bool:
+        with self.slot("interactive"):
+            return self.backend.restore_context(name)
+
+
+class ScheduledLLM(LLMInterface):
+    """LLMScheduler view pinned to one priority class."""
+
+    def __init__(self, scheduler: LLMScheduler, priority: str):
+        self._scheduler = scheduler
+        self.priority = priority
+
+    @property
+    def model(self) -> Optional[str]:
+        return self._scheduler.model
+
+    def chat(self, messages, system_prompt=None) -> str:
+        return self._scheduler.chat(messages, system_prompt,
+                                    priority=self.priority)
+
+    def chat_stream(self, messages, system_prompt=None, cancel=None,
+                    limits=None) -> Iterator[str]:
+        return self._scheduler.chat_stream(messages, system_prompt, cancel, limits,
+                                           priority=self.priority)
+
+
+class AdmittedLLM(LLMInterface):
+    """Another backend sharing an LLMScheduler's slots (LLMScheduler.admit)."""
+
+    def __init__(self, scheduler: LLMScheduler, backend: LLMInterface):
+        self._scheduler = scheduler
+        self.backend = backend
+
+    @property
+    def model(self) -> Optional[str]:
+        return getattr(self.backend, "model", None)
+
+    def chat(self, messages, system_prompt=None) -> str:
+        return self._scheduler.chat(messages, system_prompt, backend=self.backend)
+
+    def chat_stream(self, messages, system_prompt=None, cancel=None,
+                    limits=None) -> Iterator[str]:
+        return self._scheduler.chat_stream(messages, system_prompt, cancel, limits,
+                                           backend=self.backend)
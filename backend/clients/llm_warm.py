@@ -0,0 +1,246 @@
+"""LLM warm-keeper — keeps the model resident so a turn does not pay the
+llama-swap cold start (~25-30 s for Q4 models, see OpenAICompatLLM).
+
+Every warm-up is a one-token completion: the stream is cancelled as soon as
+its first chunk arrives, so the backend loads the model and prefills the
+prompt, nothing more.
+
+- keep-alive: a background loop pings whenever the model has been idle for
+  `keepalive_s` (LLM_KEEPALIVE_S, 0 = off) inside the active hours
+  (LLM_ACTIVE_HOURS, e.g. "7-23"; wraps past midnight; empty = always).
+- triggered: warm(reason) on the signals that a turn is coming —
+  set_active_persona, the viewer's `status: ready` handshake and its
+  wake-word hit — so the model loads while the user is still talking.
+  Skipped when the model was used within `fresh_s`.
+- prefill: warm(reason, prompt=(messages, system_prompt)) sends the prefix of
+  the persona's next turn instead of the ping, so the backend's prompt cache
+  (llama.cpp cache_prompt, vLLM prefix caching) already holds it. Never
+  skipped: a different persona's prefix is cold however warm the model is.
+
+With a `prompt_provider` (the active persona's prefix), keep-alives and
+plain warm-ups send that instead of the stock ping: on a single-slot
+llama-server a foreign prompt would overwrite the persona's cached context,
+and a later slot save would park the ping instead of the conversation.
+
+A real turn calls preempt() first: a plain warm-up still waiting on its
+first token (the model loading) is cancelled rather than left holding the
+scheduler slot the turn needs; the turn's own request loads the model just
+the same. Prefills are left alone, as they carry the turn's own prefix.
+
+Cold starts are counted two ways: warm-ups whose first token took longer
+than `cold_start_s` (LLM_COLD_START_S; the keeper absorbed one) and real
+turns that did (observe_ttft; the user paid for one). stats() exposes both.
+
+Nothing runs until start(): constructing PlayAIdes in tests sends no pings.
+"""
+from __future__ import annotations
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+from backend.services.cancellation import CancelToken
+from model_interfaces import LLMInterface
+
+logger = logging.getLogger(__name__)
+
+_PING = [{"role": "user", "content": "Say ok."}]
+_PREEMPTED = "preempted by a turn"
+
+
+def parse_active_hours(spec: str) -> Optional[Tuple[int, int]]:
+    """'7-23' → (7, 23): active from 07:00 up to 23:00. '' → None (always)."""
+    spec = (spec or "").strip()
+    if not spec:
+        return None
+    start, _, end = spec.partition("-")
+    try:
+        hours = (int(start), int(end))
+    except ValueError:
+        raise ValueError(f"active hours must look like '7-23', got {spec!r}") from None
+    if not all(0 <= h <= 24 for h in hours):
+        raise ValueError(f"active hours out of range: {spec!r}")
+    return hours
+
+
+class LLMWarmKeeper:
+    def __init__(self, llm: LLMInterface, *,
+                 keepalive_s: Optional[float] = None,
+                 active_hours: Optional[str] = None,
+                 cold_start_s: Optional[float] = None,
+                 fresh_s: float = 60.0,
+                 prompt_provider: Optional[Callable[[], Optional[Tuple[list, Optional[str]]]]] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 now: Callable[[], datetime] = datetime.now):
+        self._llm = llm
+        self.keepalive_s = float(keepalive_s if keepalive_s is not None
+                                 else os.environ.get("LLM_KEEPALIVE_S", "240"))
+        self.active_hours = parse_active_hours(
+            active_hours if active_hours is not None
+            else os.environ.get("LLM_ACTIVE_HOURS", ""))
+        self.cold_start_s = float(cold_start_s if cold_start_s is not None
+                                  else os.environ.get("LLM_COLD_START_S", "5"))
+        self.fresh_s = fresh_s
+        self._prompt_provider = prompt_provider
+        self._clock = clock
+        self._now = now
+        self._lock = threading.Lock()
+        self._last_used: Optional[float] = None
+        self._warming = False
+        self._ping_token: Optional[CancelToken] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats: Dict[str, object] = {
+            "warmups": 0, "keepalives": 0, "failures": 0, "skipped": 0, "preempted": 0,
+            "cold_starts_absorbed": 0, "cold_starts_hit": 0,
+            "last_warm_s": None, "by_reason": {},
+        }
+
+    # ── lifecycle ────────────────────────────────────────────────────────
+    def start(self) -> "LLMWarmKeeper":
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="llm-warm",
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    # ── signals ──────────────────────────────────────────────────────────
+    def note_activity(self) -> None:
+        """The model just served real traffic: it is warm, and the idle
+        clock restarts."""
+        with self._lock:
+            self._last_used = self._clock()
+
+    def observe_ttft(self, seconds: float) -> None:
+        """Record a real turn's time-to-first-token."""
+        with self._lock:
+            self._last_used = self._clock()
+            if seconds >= self.cold_start_s:
+                self._stats["cold_starts_hit"] += 1
+        if seconds >= self.cold_start_s:
+            logger.warning("LLM cold start hit a user turn (%.1fs to first token)", seconds)
+
+    def warm(self, reason: str, prompt: Optional[Tuple[list, Optional[str]]] = None) -> bool:
+        """Start a warm-up in the background unless one is running or the
+        model was used recently (a `prompt` prefill always starts). Returns
+        True if one was started. A no-op until start()."""
+        if not self.running:
+            return False
+        if prompt is not None:
+            # The caller's context (e.g. llm_slot) follows the prefill.
+            threading.Thread(target=contextvars.copy_context().run,
+                             args=(self._ping, reason, prompt, False),
+                             name="llm-prefill", daemon=True).start()
+            return True
+        with self._lock:
+            fresh = (self._last_used is not None
+                     and self._clock() - self._last_used < self.fresh_s)
+            if self._warming or fresh:
+                self._stats["skipped"] += 1
+                return False
+            self._warming = True
+        threading.Thread(target=self._ping, args=(reason,), name="llm-warm-ping",
+                         daemon=True).start()
+        return True
+
+    def preempt(self) -> bool:
+        """A real turn is starting: cancel an in-flight plain warm-up so the
+        turn does not queue behind it. Returns True if one was cancelled."""
+        with self._lock:
+            token = self._ping_token
+        return token is not None and token.cancel(_PREEMPTED)
+
+    def in_active_hours(self) -> bool:
+        if self.active_hours is None:
+            return True
+        start, end = self.active_hours
+        hour = self._now().hour
+        return start <= hour < end if start <= end else (hour >= start or hour < end)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out["by_reason"] = dict(self._stats["by_reason"])
+            out["idle_s"] = (None if self._last_used is None
+                             else round(self._clock() - self._last_used, 3))
+        return out
+
+    # ── internals ────────────────────────────────────────────────────────
+    def _loop(self) -> None:
+        if self.keepalive_s <= 0:
+            return
+        tick = min(self.keepalive_s, 30.0)
+        while not self._stop.wait(tick):
+            if not self.in_active_hours():
+                continue
+            with self._lock:
+                idle = (self._last_used is None
+                        or self._clock() - self._last_used >= self.keepalive_s)
+                if not idle or self._warming:
+                    continue
+                self._warming = True
+            self._ping("keepalive")
+
+    def _ping(self, reason: str, prompt: Optional[Tuple[list, Optional[str]]] = None,
+              guarded: bool = True) -> None:
+        """One-token completion: cancel the stream at its first chunk.
+        `guarded` pings own the single in-flight slot."""
+        if prompt is None and self._prompt_provider is not None:
+            try:
+                prompt = self._prompt_provider()
+            except Exception:
+                logger.exception("warm-up prompt provider failed")
+        messages, system_prompt = prompt if prompt is not None else (_PING, None)
+        if not messages:
+            # A system-only prompt; the trailing empty turn keeps backends
+            # that require a user message happy without touching the prefix.
+            messages = [{"role": "user", "content": ""}]
+        token = CancelToken()
+        if guarded:
+            with self._lock:
+                self._ping_token = token
+        t0 = time.monotonic()
+        ok = True
+        try:
+            for _ in self._llm.chat_stream(messages, system_prompt=system_prompt,
+                                           cancel=token):
+                break
+        except Exception as e:
+            ok = False
+            logger.info("LLM warm-up (%s) failed: %s", reason, e)
+        finally:
+            token.cancel("warm-up done")
+        elapsed = time.monotonic() - t0
+        with self._lock:
+            if guarded:
+                self._warming = False
+                self._ping_token = None
+            stats = self._stats
+            if token.reason == _PREEMPTED:
+                stats["preempted"] += 1
+                return
+            if not ok:
+                stats["failures"] += 1
+                return
+            self._last_used = self._clock()
+            stats["keepalives" if reason == "keepalive" else "warmups"] += 1
+            stats["by_reason"][reason] = stats["by_reason"].get(reason, 0) + 1
+            stats["last_warm_s"] = round(elapsed, 3)
+            if elapsed >= self.cold_start_s:
+                stats["cold_starts_absorbed"] += 1
+        logger.info("LLM warm-up (%s) took %.2fs", reason, elapsed)
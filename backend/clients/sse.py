@@ -0,0 +1,170 @@
+"""Incremental SSE parser for OpenAI-compatible chat streams.
+
+OpenAICompatLLM.chat_stream used to go through requests' iter_lines
+(decode_unicode) and a full json.loads per `data:` line: several str
+allocations and a dict tree per token, on a thread that shares the GIL with
+the WS loop. DeltaParser works on the raw response bytes instead:
+
+- feed(bytes) appends to one bytearray buffer and walks it with
+  `find(b"\n", pos)`: each complete line is parsed in place by its offsets
+  and the consumed bytes are dropped once per read (a line cut across
+  network reads waits for its end). Comments, `event:`/`id:` fields and
+  blank lines are skipped without decoding or copying.
+- the fast path pulls `choices[0].delta.content` straight out of the line:
+  find `"delta":`, then its `"content":` string, and decode only that slice
+  (utf-8, or a JSON string decode when it holds escapes). Ollama and
+  llama-server both emit flat, single-choice chunks, so this is the common
+  case.
+- anything the fast path is not sure about (no delta, a nested object before
+  content, n > 1 choices) falls back to a full decode of a memoryview over
+  the line — with orjson when it is installed (`pip install .[speed]`),
+  stdlib json (which needs bytes) otherwise.
+
+`data: [DONE]` sets `done`; the caller stops reading. A stream that ends
+without one may leave its last `data:` line unterminated; close() parses it.
+"""
+from __future__ import annotations
+
+import json
+import logging
+from typing import List, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+_DATA = b"data:"
+_DONE = b"[DONE]"
+_DELTA = b'"delta":'
+_CONTENT = b'"content":'
+
+
+_SPACE = (0x20, 0x09, 0x0D, 0x0A)     # space, tab, CR, LF
+
+
+def _loads_view(view):
+    if _loads is json.loads:
+        return json.loads(bytes(view))
+    return _loads(view)
+
+
+def _string_at(line, start: int, end: int) -> Optional[tuple]:
+    """(value, end) of the JSON string literal opening at line[start]."""
+    i = start + 1
+    while True:
+        j = line.find(b'"', i, end)
+        if j == -1:
+            return None
+        # An odd run of backslashes before the quote escapes it.
+        k = j - 1
+        while line[k] == 0x5C:          # backslash
+            k -= 1
+        if (j - 1 - k) % 2 == 0:
+            break
+        i = j + 1
+    if line.find(b"\\", start + 1, j) == -1:
+        with memoryview(line) as view:
+            return str(view[start + 1:j], "utf-8"), j + 1
+    return json.loads(bytes(line[start:j + 1])), j + 1
+
+
+def delta_content(payload, start: int = 0, end: Optional[int] = None) -> Optional[str]:
+    """choices[0].delta.content of one `data:` payload, or None.
+
+    *payload* is bytes or a bytearray; *start*/*end* bound the payload
+    inside it, so a line is parsed where it sits in the read buffer.
+    """
+    if end is None:
+        end = len(payload)
+    d = payload.find(_DELTA, start, end)
+    if d != -1 and payload.find(_DELTA, d + len(_DELTA), end) == -1:
+        body = payload.find(b"{", d + len(_DELTA), end) + 1
+        c = payload.find(_CONTENT, body, end)
+        if c == -1:
+            if body and payload.find(b"}", body, end) != -1:
+                return None                 # role-only / empty delta
+        # content must belong to the delta object itself: no nested object
+        # opens or closes between them.
+        elif body and payload.find(b"{", body, c) == -1 and payload.find(b"}", body, c) == -1:
+            v = c + len(_CONTENT)
+            while v < end and payload[v] in (0x20, 0x09):
+                v += 1
+            if v < end and payload[v] == 0x22:      # opening quote
+                found = _string_at(payload, v, end)
+                if found is not None:
+                    return found[0] or None
+            elif payload.startswith(b"null", v, end):
+                return None
+    view = memoryview(payload)[start:end]
+    try:
+        chunk = _loads_view(view)
+    except ValueError:
+        return None
+    finally:
+        view.release()              # the read buffer is resized after the line
+    if not isinstance(chunk, dict):
+        return None
+    choices = chunk.get("choices") or [{}]
+    delta = (choices[0] if isinstance(choices[0], dict) else {}).get("delta") or {}
+    content = delta.get("content")
+    return content if isinstance(content, str) and content else None
+
+
+class DeltaParser:
+    def __init__(self) -> None:
+        self._buf = bytearray()
+        self._scanned = 0               # no newline in _buf[:_scanned]
+        self.done = False
+        self.events = 0
+
+    def feed(self, data: bytes) -> List[str]:
+        """Content deltas completed by *data*, in order."""
+        out: List[str] = []
+        if self.done:
+            return out
+        buf = self._buf
+        buf += data
+        pos = 0
+        nl = buf.find(b"\n", self._scanned)
+        while nl != -1:
+            self._line(pos, nl, out)
+            pos = nl + 1
+            if self.done:
+                break
+            nl = buf.find(b"\n", pos)
+        # Complete lines only; a line cut across reads stays buffered.
+        if pos:
+            del buf[:pos]
+        self._scanned = len(buf)
+        return out
+
+    def close(self) -> List[str]:
+        """Deltas of a final `data:` line the stream ended without a newline on."""
+        out: List[str] = []
+        if not self.done and self._buf:
+            self._line(0, len(self._buf), out)
+        self._buf.clear()
+        self._scanned = 0
+        return out
+
+    def _line(self, start: int, end: int, out: List[str]) -> None:
+        buf = self._buf
+        if not buf.startswith(_DATA, start, end):
+            return
+        start += len(_DATA)
+        while start < end and buf[start] in _SPACE:
+            start += 1
+        while end > start and buf[end - 1] in _SPACE:
+            end -= 1
+        if end - start == len(_DONE) and buf.startswith(_DONE, start, end):
+            self.done = True
+            return
+        self.events += 1
+        content = delta_content(buf, start, end)
+        if content:
+            out.append(content)
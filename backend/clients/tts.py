@@ -6,6 +6,11 @@ registry (voice catalog + ref audio), a synth rig per engine
 (POST /v1/audio/speech), and a design rig (qwen3, POST /v1/audio/voice_design).
 Each is a separate base URL.
 
+PhraseAudioCache holds whole WAVs of short stock phrases (the latency
+budget's filler) per voice: the persona prewarm synthesizes them once, and
+/api/tts/proxy serves a hit without a round-trip to the rig — the filler is
+said exactly when the turn is already late.
+
 httpx (not requests) because the streaming consumer — incarnation_server's
 /api/tts/proxy — is an async FastAPI route; a blocking requests stream would
 stall the event loop. Sync methods use httpx's module-level client; the
@@ -15,6 +20,8 @@ from __future__ import annotations
 
 import logging
 import os
+import threading
+from collections import OrderedDict
 from contextlib import asynccontextmanager
 from typing import AsyncIterator, Optional, Protocol, Tuple, runtime_checkable
 
@@ -23,6 +30,7 @@ import httpx
 logger = logging.getLogger(__name__)
 
 DEFAULT_SAMPLE_RATE = 24000
+PHRASE_CACHE_ENTRIES = 64
 
 
 class TTSError(RuntimeError):
@@ -40,6 +48,32 @@ class PersonaTTS(Protocol):
                      gender: str, language: str) -> str: ...
 
 
+class PhraseAudioCache:
+    """(voice, text) → WAV bytes, least recently used dropped past
+    max_entries. Written from the prewarm thread, read on the proxy's loop."""
+
+    def __init__(self, max_entries: int = PHRASE_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._audio: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, voice: str, text: str) -> Optional[bytes]:
+        with self._lock:
+            wav = self._audio.get((voice, text))
+            if wav is not None:
+                self._audio.move_to_end((voice, text))
+            return wav
+
+    def put(self, voice: str, text: str, wav: bytes) -> None:
+        if not wav:
+            return
+        with self._lock:
+            self._audio[(voice, text)] = wav
+            self._audio.move_to_end((voice, text))
+            while len(self._audio) > self.max_entries:
+                self._audio.popitem(last=False)
+
+
 def _parse_sample_rate(content_type: str, default: int = DEFAULT_SAMPLE_RATE) -> int:
     """Extract <sr> from 'audio/l16; rate=<sr>; channels=1'. The contract says
     trust the header (VOICEBOX_HTTP_API §3.1); fall back if absent/garbled."""
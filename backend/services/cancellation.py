@@ -0,0 +1,68 @@
+"""Per-turn cancellation (barge-in).
+
+A CancelToken is created for each live conversation turn and fired when the
+turn is superseded (a new user_input for the same persona), dismissed, or
+explicitly cancelled (the cancel_turn WS frame). Whoever holds an upstream
+resource — the LLM stream, the speech job, a running skill — registers an
+abort callback with on_cancel; cancel() runs them once, from the cancelling
+thread, so a turn blocked on a socket read is torn down without polling.
+
+Transport-free and dependency-free: model_interfaces and skills duck-type it
+(`cancelled`, `on_cancel`), so test doubles need nothing from here.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CancelToken:
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: list[Callable[[], None]] = []
+        self.reason: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """Fire the token. Idempotent: returns False if it had already fired.
+        Callbacks run outside the lock; one failing does not stop the rest."""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for cb in callbacks:
+            try:
+                cb()
+            except Exception:
+                logger.exception("cancel callback failed")
+        return True
+
+    def on_cancel(self, cb: Callable[[], None]) -> Callable[[], None]:
+        """Register *cb* to run on cancel (immediately if already cancelled).
+        Returns an unregister function — call it once the guarded resource is
+        released so a late cancel does not touch a finished job."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(cb)
+
+                def _remove() -> None:
+                    with self._lock:
+                        try:
+                            self._callbacks.remove(cb)
+                        except ValueError:
+                            pass
+                return _remove
+        cb()
+        return lambda: None
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._event.wait(timeout)
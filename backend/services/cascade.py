@@ -0,0 +1,166 @@
+"""Small/large model cascade for conversation turns.
+
+Most of what is said to a persona is small talk — "thanks!", "good night",
+"what's up" — that a 1-4B model answers as well as the 26B daily driver, in a
+fraction of the time and GPU. ModelCascade scores each turn with a cheap local
+heuristic and sends it to the small or the large model; each tier is its own
+LLMInterface (separately configured OpenAICompatLLM, see LLM_SMALL_* in
+.env.example):
+
+- length: long utterances carry more to reason about.
+- question shape: why / how / explain / compare / plan… and several
+  questions in one utterance lean large; greetings and thanks lean small.
+- history depth: a long-running conversation needs the model that keeps
+  track of it.
+- persona setting: Persona.model_tier "small" / "large" pins the tier.
+
+A score at or above `threshold` (LLM_CASCADE_THRESHOLD) goes large.
+Escalation: a small-tier stream that fails or ends empty before its first
+token is retried on the large model, so a routing mistake costs latency,
+never an answer. Tokens already streamed to TTS cannot be taken back, so
+escalation stops at the first chunk.
+
+stats() reports turns, escalations, mean TTFT and total generation seconds
+per tier (the GPU-time proxy) and which heuristic signals fired.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+from model_interfaces import LLMInterface
+
+logger = logging.getLogger(__name__)
+
+TIERS = ("small", "large")
+
+_HARD_WORDS = re.compile(
+    r"\b(why|how (do|does|did|can|could|would|should|to|much|many|long)|explain|compare|difference|plan|analy[sz]e|summari[sz]e|"
+    r"calculate|recommend|should i|what if|step by step|pros and cons)\b", re.I)
+_EASY_TURN = re.compile(
+    r"^\s*(hi|hey|hello|thanks|thank you|ok(ay)?|cool|nice|great|good "
+    r"(morning|night|evening)|bye|goodbye|yes|no|sure|lol)\b[\s!.?]*$", re.I)
+
+
+@dataclass
+class TurnRoute:
+    tier: str                                  # small | large (the one that answered)
+    score: int
+    reasons: List[str] = field(default_factory=list)
+    escalated: bool = False
+
+
+class _TierStats:
+    __slots__ = ("turns", "answered", "ttft_s", "gen_s")
+
+    def __init__(self) -> None:
+        self.turns = 0
+        self.answered = 0
+        self.ttft_s = 0.0
+        self.gen_s = 0.0
+
+
+class ModelCascade:
+    def __init__(self, small: LLMInterface, large: LLMInterface, *,
+                 threshold: Optional[int] = None,
+                 long_words: int = 25, deep_history: int = 30):
+        self.small = small
+        self.large = large
+        self.threshold = int(threshold if threshold is not None
+                             else os.environ.get("LLM_CASCADE_THRESHOLD", "2"))
+        self.long_words = long_words
+        self.deep_history = deep_history
+        self._lock = threading.Lock()
+        self._tiers = {t: _TierStats() for t in TIERS}
+        self._escalations = 0
+        self._reasons: Dict[str, int] = {}
+
+    def llm_for(self, route: TurnRoute) -> LLMInterface:
+        return self.small if route.tier == "small" else self.large
+
+    def classify(self, text: str, history: list, persona=None) -> TurnRoute:
+        pinned = getattr(persona, "model_tier", None)
+        if pinned in TIERS:
+            return TurnRoute(pinned, 0, [f"persona:{pinned}"])
+        score, reasons = 0, []
+        words = len(text.split())
+        if words >= self.long_words:
+            score, reasons = score + 2, reasons + ["long"]
+        elif words >= self.long_words // 2:
+            score, reasons = score + 1, reasons + ["medium"]
+        if _HARD_WORDS.search(text):
+            score, reasons = score + 2, reasons + ["hard_question"]
+        if text.count("?") > 1:
+            score, reasons = score + 1, reasons + ["multi_question"]
+        if len(history) >= self.deep_history:
+            score, reasons = score + 1, reasons + ["deep_history"]
+        if _EASY_TURN.match(text):
+            score, reasons = score - 2, reasons + ["small_talk"]
+        return TurnRoute("large" if score >= self.threshold else "small", score, reasons)
+
+    def stream(self, route: TurnRoute, messages: List[Dict[str, str]],
+               system_prompt: Optional[str] = None, cancel=None,
+               limits: Optional[dict] = None) -> Iterator[str]:
+        """Stream *route*'s tier, escalating a small turn that fails or
+        comes back empty before its first token."""
+        kwargs = {"cancel": cancel} if cancel is not None else {}
+        if limits:
+            kwargs["limits"] = limits
+        tier = route.tier
+        t0 = time.monotonic()
+        first: Optional[float] = None
+        try:
+            if tier == "small":
+                try:
+                    for chunk in self.small.chat_stream(messages, system_prompt=system_prompt,
+                                                        **kwargs):
+                        if first is None:
+                            if not chunk:
+                                continue
+                            first = time.monotonic()
+                        yield chunk
+                except Exception:
+                    if first is not None:
+                        raise
+                    logger.warning("Small model failed; escalating turn", exc_info=True)
+                if first is not None or (cancel is not None and cancel.cancelled):
+                    return
+                with self._lock:
+                    self._escalations += 1
+                self._record("small", t0, None)
+                tier, t0 = "large", time.monotonic()
+                route.tier, route.escalated = "large", True
+            for chunk in self.large.chat_stream(messages, system_prompt=system_prompt, **kwargs):
+                if first is None:
+                    first = time.monotonic()
+                yield chunk
+        finally:
+            self._record(tier, t0, first, route.reasons)
+
+    def _record(self, tier: str, t0: float, first: Optional[float],
+                reasons: Optional[List[str]] = None) -> None:
+        with self._lock:
+            s = self._tiers[tier]
+            s.turns += 1
+            s.gen_s += time.monotonic() - t0
+            if first is not None:
+                s.answered += 1
+                s.ttft_s += first - t0
+            for r in reasons or ():
+                self._reasons[r] = self._reasons.get(r, 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            tiers = {
+                t: {"turns": s.turns,
+                    "mean_ttft_s": round(s.ttft_s / s.answered, 4) if s.answered else None,
+                    "gen_s": round(s.gen_s, 3)}
+                for t, s in self._tiers.items()
+            }
+            return {"threshold": self.threshold, "tiers": tiers,
+                    "escalations": self._escalations, "reasons": dict(self._reasons)}
@@ -0,0 +1,204 @@
+"""PersonaCatalog — the persona library, indexed in memory.
+
+PersonaService.list() used to iterdir the personas dir, stat every entry and
+parse every persona.json on each GET /api/v1/personas and each get_personas
+WS frame: linear in the library, on every call. The catalog keeps one parsed
+doc per id, stamped with its (mtime_ns, size), and answers list / filter /
+search queries from memory:
+
+    total, page = catalog.query(q="sil", trait="wry", offset=0, limit=20)
+
+`q` matches names and psyche traits (every word of it, case-insensitive,
+as a substring); `trait`, `gender` and `language` are exact filters. Results
+are ordered by id and returned as copies with "id" injected.
+
+The catalog is kept current three ways:
+
+- the service's own writes call put()/remove() right after the store;
+- start() watches the personas dir — with watchfiles when it is installed
+  (the dev extra), else by polling every PERSONA_CATALOG_POLL_S (default 2)
+  seconds; a re-scan stats every doc but re-parses only changed stamps;
+- without a running watcher (tests, tools, a poll interval of 0) every query
+  re-scans first, so a hand edit is never missed.
+
+Corrupt docs are logged once per stamp and left out, as list() always did.
+"""
+from __future__ import annotations
+
+import copy
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import watchfiles
+except ImportError:                      # the dev extra; polling otherwise
+    watchfiles = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_S = 2.0
+
+
+class _Entry:
+    __slots__ = ("stamp", "doc", "name", "traits", "gender", "language")
+
+    def __init__(self, stamp: Tuple[int, int], doc: Optional[dict]) -> None:
+        self.stamp = stamp
+        self.doc = doc                   # None: unreadable at this stamp
+        doc = doc or {}
+        self.name = str(doc.get("name") or "").lower()
+        psyche = doc.get("psyche") or {}
+        self.traits = [str(t).lower() for t in (psyche.get("traits") or [])]
+        self.gender = str(doc.get("gender") or "").lower()
+        self.language = str(doc.get("language") or "").lower()
+
+    def matches(self, words: List[str], trait: Optional[str],
+                gender: Optional[str], language: Optional[str]) -> bool:
+        if trait is not None and trait not in self.traits:
+            return False
+        if gender is not None and gender != self.gender:
+            return False
+        if language is not None and language != self.language:
+            return False
+        return all(w in self.name or any(w in t for t in self.traits) for w in words)
+
+
+class PersonaCatalog:
+    def __init__(self, persona_store, poll_s: Optional[float] = None) -> None:
+        self._store = persona_store
+        self.poll_s = float(poll_s if poll_s is not None
+                            else os.environ.get("PERSONA_CATALOG_POLL_S", DEFAULT_POLL_S))
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self._built = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.mode = "on_demand"
+        self._scans = 0
+        self._parses = 0
+        self._queries = 0
+
+    # ── lifecycle ────────────────────────────────────────────────────────
+    def start(self) -> "PersonaCatalog":
+        """Build the index and keep it current in the background."""
+        if self._thread is None and self.poll_s > 0:
+            self.refresh()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name="persona-catalog",
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        self.mode = "on_demand"
+
+    @property
+    def watching(self) -> bool:
+        return self._thread is not None
+
+    # ── index maintenance ────────────────────────────────────────────────
+    def refresh(self) -> None:
+        """Re-scan the store: stat every doc, parse the changed ones, drop
+        the removed ones."""
+        ids = self._store.list_ids()
+        for pid in ids:
+            self._reload(pid)
+        with self._lock:
+            for pid in set(self._entries) - set(ids):
+                del self._entries[pid]
+            self._built = True
+            self._scans += 1
+
+    def put(self, persona_id: str) -> None:
+        """The service just wrote *persona_id*."""
+        self._reload(persona_id)
+
+    def remove(self, persona_id: str) -> None:
+        with self._lock:
+            self._entries.pop(persona_id, None)
+
+    def _reload(self, persona_id: str) -> None:
+        try:
+            stamp = self._store.stat(persona_id)
+        except ValueError:                 # not a persona id (path guard)
+            return
+        if stamp is None:
+            self.remove(persona_id)
+            return
+        with self._lock:
+            entry = self._entries.get(persona_id)
+            if entry is not None and entry.stamp == stamp:
+                return
+        try:
+            doc = self._store.read(persona_id)
+        except KeyError:
+            self.remove(persona_id)
+            return
+        except Exception as e:
+            logger.error("Error reading persona %s: %s", persona_id, e)
+            doc = None
+        with self._lock:
+            self._entries[persona_id] = _Entry(stamp, doc)
+            self._parses += 1
+
+    def _watch(self) -> None:
+        if watchfiles is not None:
+            self.mode = "watch"
+            try:
+                self._watch_events()
+                return
+            except Exception as e:         # e.g. out of inotify watches
+                logger.warning("Persona dir watch failed (%s); polling every %.1fs",
+                               e, self.poll_s)
+        self.mode = "poll"
+        while not self._stop.wait(self.poll_s):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("persona catalog refresh failed")
+
+    def _watch_events(self) -> None:
+        base = Path(self._store.base_dir).resolve()
+        for changes in watchfiles.watch(base, stop_event=self._stop,
+                                        rust_timeout=int(self.poll_s * 1000)):
+            pids = set()
+            for _, path in changes:
+                rel = Path(path).resolve().relative_to(base).parts
+                if rel:
+                    pids.add(rel[0])
+            for pid in sorted(pids):
+                self._reload(pid)
+
+    # ── queries ──────────────────────────────────────────────────────────
+    def query(self, q: Optional[str] = None, *, trait: Optional[str] = None,
+              gender: Optional[str] = None, language: Optional[str] = None,
+              offset: int = 0, limit: Optional[int] = None) -> Tuple[int, List[dict]]:
+        """(total matches, the requested page of docs)."""
+        if not self.watching or not self._built:
+            self.refresh()
+        words = (q or "").lower().split()
+        trait, gender, language = (v.lower() if v else None for v in (trait, gender, language))
+        with self._lock:
+            self._queries += 1
+            hits = [(pid, e.doc) for pid, e in sorted(self._entries.items())
+                    if e.doc is not None and e.matches(words, trait, gender, language)]
+        end = None if limit is None else offset + limit
+        page = []
+        for pid, doc in hits[offset:end]:
+            doc = copy.deepcopy(doc)
+            doc["id"] = pid
+            page.append(doc)
+        return len(hits), page
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "mode": self.mode,
+                    "scans": self._scans, "parses": self._parses,
+                    "queries": self._queries}
@@ -0,0 +1,169 @@
+"""Token-budgeted prompt context for the conversation turn.
+
+Replaces "the last CHAT_HISTORY_CAP messages" as the rule for what the LLM
+sees. A message count bounds nothing useful: a few long replies overflow a
+small model's window (llama-server and Ollama truncate silently, usually
+eating the system prompt), while a run of short exchanges leaves most of it
+unused. The builder measures the system prompt and each message in tokens
+and fills the model's budget from the newest message backward.
+
+Token counts come from a local tokenizer when one is injected (anything with
+`str -> list[int]` semantics), otherwise from a calibrated estimator: a
+word/punctuation split tuned against Gemma/Llama SentencePiece counts on
+English chat (within ~10%), plus a per-message chat-template overhead. The
+estimate is deliberately a little high — overshooting the budget costs a
+message of context, undershooting costs the system prompt. Counts are
+cached per message text, so a turn re-measures only what is new.
+
+Budgets are per model: LLM_CONTEXT_TOKENS is the default window,
+LLM_CONTEXT_BUDGETS overrides it per model ("gemma3:4b=8192,qwen3=32768").
+`reply_tokens` of the window is held back for the reply.
+
+Prefix stability: llama.cpp and vLLM reuse their KV cache only up to the
+first byte that differs from the previous prompt. A window that slides by
+one exchange per turn changes the very first history message every turn and
+re-prefills everything. So the window start is sticky (the caller passes
+back the previous `start`) and only moves when the window overflows — and
+then in one block, down to `refill_ratio` of the budget, leaving room for
+many turns of appends before the next trim.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Role markers + separators a chat template wraps around each message
+# (<start_of_turn>user\n … <end_of_turn>\n for Gemma).
+MESSAGE_OVERHEAD_TOKENS = 4
+DEFAULT_CONTEXT_TOKENS = 8192
+DEFAULT_REPLY_TOKENS = 1024
+
+_PIECES = re.compile(r"[A-Za-z]+|\d|[^\sA-Za-z\d]")
+
+
+def estimate_tokens(text: str) -> int:
+    """SentencePiece-like estimate: common words are one piece, long words
+    split roughly every 6 letters, digits and punctuation are one each."""
+    n = 0
+    for m in _PIECES.finditer(text):
+        piece = m.group()
+        n += 1 + (len(piece) - 1) // 6 if piece[0].isalpha() else 1
+    return n
+
+
+class TokenCounter:
+    def __init__(self, tokenize: Optional[Callable[[str], Sequence]] = None,
+                 cache_size: int = 4096):
+        self._count = (lambda s: len(tokenize(s))) if tokenize else estimate_tokens
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def count(self, text: str) -> int:
+        with self._lock:
+            n = self._cache.get(text)
+            if n is not None:
+                self._cache.move_to_end(text)
+                self.hits += 1
+                return n
+        n = self._count(text)
+        with self._lock:
+            self.misses += 1
+            self._cache[text] = n
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return n
+
+    def message(self, msg: Dict[str, str]) -> int:
+        return self.count(msg.get("content") or "") + MESSAGE_OVERHEAD_TOKENS
+
+
+def _parse_budgets(spec: str) -> Dict[str, int]:
+    out: Dict[str, int] = {}
+    for item in (spec or "").split(","):
+        model, sep, tokens = item.strip().rpartition("=")
+        if not sep or not model:
+            continue
+        try:
+            out[model.strip()] = int(tokens)
+        except ValueError:
+            logger.warning("Ignoring malformed LLM_CONTEXT_BUDGETS entry %r", item)
+    return out
+
+
+@dataclass
+class BuiltContext:
+    messages: List[Dict[str, str]]
+    prompt_tokens: int                   # system prompt + messages, as sent
+    budget_tokens: int
+    dropped: int = 0                     # history messages left out
+    history_tokens: List[int] = field(default_factory=list)
+    start: int = 0                       # pass back as build(start=) next turn
+    trimmed: bool = False                # the window start moved this turn
+
+
+class ContextBuilder:
+    def __init__(self, *, context_tokens: Optional[int] = None,
+                 budgets: Optional[Dict[str, int]] = None,
+                 reply_tokens: int = DEFAULT_REPLY_TOKENS,
+                 refill_ratio: float = 0.6,
+                 counter: Optional[TokenCounter] = None):
+        self.context_tokens = int(context_tokens if context_tokens is not None
+                                  else os.environ.get("LLM_CONTEXT_TOKENS", DEFAULT_CONTEXT_TOKENS))
+        self.budgets = (budgets if budgets is not None
+                        else _parse_budgets(os.environ.get("LLM_CONTEXT_BUDGETS", "")))
+        self.reply_tokens = reply_tokens
+        self.refill_ratio = refill_ratio
+        self.counter = counter or TokenCounter()
+
+    def budget_for(self, model: Optional[str]) -> int:
+        """Prompt tokens available for *model*: its window minus the reply."""
+        window = self.budgets.get(model or "", self.context_tokens)
+        return max(0, window - self.reply_tokens)
+
+    def build(self, system_prompt: Optional[str], history: List[Dict[str, str]],
+              user_msg: Dict[str, str], model: Optional[str] = None,
+              start: Optional[int] = None) -> BuiltContext:
+        """The history window that fits alongside the system prompt and the
+        new user message. Those two are always sent, even over budget — a
+        turn without them is not a turn.
+
+        `start` is the previous turn's window start: kept while the window
+        still fits, so the prompt prefix stays byte-identical. Without one
+        (or once it overflows) the window is re-cut newest-first: to the
+        whole budget if all of history fits, else to `refill_ratio` of it."""
+        budget = self.budget_for(model)
+        fixed = self.counter.message(user_msg)
+        if system_prompt:
+            fixed += self.counter.count(system_prompt) + MESSAGE_OVERHEAD_TOKENS
+        sizes = [self.counter.message(m) for m in history]
+        trimmed = True
+        if start is not None and 0 <= start <= len(history) \
+                and fixed + sum(sizes[start:]) <= budget:
+            trimmed = False
+        elif fixed + sum(sizes) <= budget:
+            start = 0
+        else:
+            fill = budget * self.refill_ratio
+            used, start = fixed, len(history)
+            while start > 0 and used + sizes[start - 1] <= fill:
+                start -= 1
+                used += sizes[start]
+        return BuiltContext(
+            messages=[*history[start:], user_msg],
+            prompt_tokens=fixed + sum(sizes[start:]),
+            budget_tokens=budget,
+            dropped=start,
+            history_tokens=sizes[start:],
+            start=start,
+            trimmed=trimmed and start > 0,
+        )
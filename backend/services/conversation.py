@@ -3,19 +3,44 @@
 Transport-free: no FastAPI, no requests, no voicebox_client. Collaborators are
 injected, so this module is unit-testable without the not-yet-migrated voicebox
 package. run_turn yields the turn-event stream; the WS adapter forwards events as
-frames, the REST adapter drains them to a full reply."""
+frames, the REST adapter drains them to a full reply.
+
+Barge-in: start_turn() hands out a CancelToken per persona and fires the
+previous one, so a new utterance (or dismiss / cancel_turn) aborts the live
+turn — the LLM stream is closed, speech is stopped, and the aborted exchange
+is never written to history.
+
+With `get_runtime` (PersonaService.get_runtime) a turn reads the persona's
+prebuilt PersonaRuntime — system prompt, compiled phrase triggers — instead
+of deriving them from the model on every turn. With `history_pin`
+(PersonaService.pin_history) the history a turn appends to stays in the
+bounded history cache until the turn has saved it. With `summaries`
+(HistorySummarizer) the block the history cap trims off is folded into the
+persona's running summary, which rides along in its system prompt. With
+`recall` (RecallSkill.context) a persona that enables the "recall" skill
+gets earlier messages matching the utterance sent with the user's message.
+With `memory` (PersonaMemory) a turn sends only the persona's memory entries
+relevant to the utterance, with the user's message, and the system prompt
+leaves the memories string out."""
 from __future__ import annotations
 
 import logging
+import threading
+import time
+from contextlib import nullcontext
 from dataclasses import dataclass, field
-from typing import Callable, Iterator, Optional
+from typing import Callable, ContextManager, Iterator, Optional
+
+from backend.services.cancellation import CancelToken
+from backend.services.latency import BudgetedStream
+from backend.services.runtime import PersonaRuntime
 
 logger = logging.getLogger(__name__)
 
 
 @dataclass
 class TurnEvent:
-    type: str                                  # reply_started | reply_delta | reply_done
+    type: str                                  # reply_started | reply_delta | reply_done | reply_cancelled
     payload: dict = field(default_factory=dict)
 
 
@@ -23,10 +48,20 @@ class ConversationService:
     def __init__(self, *, get_persona: Callable, history_load: Callable,
                  history_save: Callable, dispatch: Callable, llm,
                  speak: Callable, ha=None, ha_default_agent_id: Optional[str] = None,
-                 history_cap: int = 80):
+                 history_cap: int = 80, stop_speech: Optional[Callable] = None,
+                 on_ttft: Optional[Callable[[str, float], None]] = None,
+                 context=None, response_cache=None, cascade=None, budgets=None,
+                 speech_sanitizer: Optional[Callable] = None,
+                 get_runtime: Optional[Callable[[str], Optional[PersonaRuntime]]] = None,
+                 history_pin: Optional[Callable[[str], ContextManager]] = None,
+                 summaries=None,
+                 recall: Optional[Callable[[str, str, list], Optional[str]]] = None,
+                 memory=None):
         self._get_persona = get_persona
+        self._get_runtime = get_runtime
         self._history_load = history_load
         self._history_save = history_save
+        self._history_pin = history_pin
         self._dispatch = dispatch
         self._llm = llm
         self._speak = speak
@@ -34,26 +69,95 @@ class ConversationService:
         self._ha_default_agent_id = ha_default_agent_id
         self._history_cap = history_cap
         self._ha_conversation_ids: dict[str, str] = {}
+        self._stop_speech = stop_speech
+        # Observer for each LLM turn's time-to-first-token (persona_id,
+        # seconds) — the warm-keeper's cold-start metric.
+        self._on_ttft = on_ttft
+        # ContextBuilder (backend/services/context.py): fits the prompt to the
+        # model's token budget. None = send the whole (count-capped) history.
+        self._context = context
+        # Per-persona window start, fed back to the builder so the prompt
+        # prefix stays byte-identical between block trims.
+        self._context_starts: dict[str, int] = {}
+        # ResponseCache (backend/clients/llm_cache.py). Opt-in per call site:
+        # only the HA rephrase — the same few confirmations, daily — uses it.
+        self._rephrase_llm = (response_cache.wrap(llm, site="ha_rephrase")
+                              if response_cache is not None else llm)
+        # ModelCascade (backend/services/cascade.py): sends each LLM turn to a
+        # small or large model. None = every turn goes to `llm`.
+        self._cascade = cascade
+        # LatencyBudgets (backend/services/latency.py): per-channel/persona
+        # generation limits, sentence cutoff and the first-token filler.
+        self._budgets = budgets
+        # SpeechSanitizer factory (backend/services/speech_text.py): what is
+        # spoken is the reply minus markdown/emoji/URLs; the subtitle keeps
+        # the raw text. None = speak the reply as written.
+        self._speech_sanitizer = speech_sanitizer
+        # HistorySummarizer (backend/services/summary.py): what the cap trims
+        # is summarized in the background. None = trimmed history is dropped.
+        self._summaries = summaries
+        # (persona_id, text, window) -> note of recalled messages, or None.
+        self._recall = recall
+        # PersonaMemory (backend/services/memory.py): retrieved memory entries
+        # instead of the whole memories string. None = the string is sent.
+        self._memory = memory
+        self._turns: dict[str, CancelToken] = {}
+        self._turns_lock = threading.Lock()
+
+    # ── Barge-in ─────────────────────────────────────────────────────────
+    def start_turn(self, persona_id: str) -> CancelToken:
+        """Register a fresh token as *persona_id*'s live turn, cancelling the
+        one it replaces (still generating, or finished but still speaking)."""
+        token = CancelToken()
+        with self._turns_lock:
+            previous = self._turns.get(persona_id)
+            self._turns[persona_id] = token
+        if previous is not None:
+            previous.cancel("superseded")
+        return token
+
+    def cancel_turn(self, persona_id: str, reason: str = "cancelled") -> bool:
+        """Fire *persona_id*'s live turn token. False if there was none."""
+        with self._turns_lock:
+            token = self._turns.pop(persona_id, None)
+        return token.cancel(reason) if token is not None else False
 
     def clear_ha_context(self, persona_id: str) -> None:
         """Drop the cached HA conversation id for *persona_id* (e.g. on persona
         swap), so HA multi-turn context does not leak across personas."""
         self._ha_conversation_ids.pop(persona_id, None)
 
-    def _system_prompt(self, persona) -> str:
-        sp = (f"You are impersonating a this character named"
-              f"{persona.name}. "
-              f"Your background is: {persona.back_ground}. ")
-        if persona.psyche and persona.psyche.traits:
-            sp += (f"Your Psyche contains the following traits"
-                   f"{', '.join(persona.psyche.traits)}. ")
-        if persona.memories and persona.memories.memories:
-            sp += (f"your memories are: {persona.memories.memories}.")
-        sp += "be a helpful assistant to the user. with yor responses in character"
-        if persona.persona_voice and persona.persona_voice.is_voice_valid():
-            sp += (f"your response will be sent to a TTS service to be spoken."
-                   f"please make sure your response does not contain things not spoken. no emojis")
-        return sp
+    def _runtime(self, persona_id: str) -> Optional[PersonaRuntime]:
+        if self._get_runtime is not None:
+            return self._get_runtime(persona_id)
+        persona = self._get_persona(persona_id)
+        return PersonaRuntime.build(persona, persona_id) if persona is not None else None
+
+    def _system_prompt(self, runtime: PersonaRuntime, persona_id: str,
+                       memoryless: bool = False) -> str:
+        base = runtime.memoryless_prompt if memoryless else runtime.system_prompt
+        if self._summaries is None:
+            return base
+        return self._summaries.system_prompt(persona_id, base)
+
+    def prefill_prompt(self, persona_id: str) -> Optional[tuple[list, str]]:
+        """(messages, system_prompt) that *persona_id*'s next turn will start
+        with — a one-token request on it at activation leaves the backend's
+        prompt cache warm for the first real turn. None for an unknown id."""
+        runtime = self._runtime(persona_id)
+        if runtime is None:
+            return None
+        history = self._history_load(persona_id)
+        memoryless = (self._memory is not None
+                      and self._memory.ready(persona_id, runtime.persona))
+        system_prompt = self._system_prompt(runtime, persona_id, memoryless)
+        if self._context is None:
+            return list(history), system_prompt
+        built = self._context.build(system_prompt, history, {"role": "user", "content": ""},
+                                    model=getattr(self._llm, "model", None),
+                                    start=self._context_starts.get(persona_id))
+        self._context_starts[persona_id] = built.start
+        return built.messages[:-1], system_prompt
 
     def _ha_turn(self, persona, target_id: str, residual: str) -> str:
         assert self._ha is not None, "_ha_turn called without an HA client"
@@ -71,7 +175,7 @@ class ConversationService:
                 f"the meaning intact: {ha_resp.speech_text}"
             )
             try:
-                response = self._llm.chat(
+                response = self._rephrase_llm.chat(
                     [{"role": "user", "content": rephrase_prompt}], system_prompt=None,
                 )
             except Exception as e:
@@ -79,8 +183,56 @@ class ConversationService:
                 response = ha_resp.speech_text
         return response
 
-    def run_turn(self, persona_id: str, text: str) -> Iterator[TurnEvent]:
-        persona = self._get_persona(persona_id)
+    def _cancelled(self, target_id: str, cancel: CancelToken, partial: str) -> TurnEvent:
+        logger.info("Turn for %s cancelled (%s)", target_id, cancel.reason)
+        return TurnEvent("reply_cancelled", {
+            "persona_id": target_id, "text": partial, "reason": cancel.reason,
+        })
+
+    def _finish_turn(self, target_id: str, response: str, history: list, user_msg: dict,
+                     cancel: Optional[CancelToken], sanitizer, spoken_parts: list) -> None:
+        """Speak the completed reply and persist the exchange."""
+        spoken = None
+        if sanitizer is not None:
+            spoken_parts.append(sanitizer.flush())
+            spoken = "".join(spoken_parts)
+        if spoken is not None and spoken != response:
+            self._speak(target_id, response, spoken_text=spoken)
+        else:
+            self._speak(target_id, response)
+        if cancel is not None and self._stop_speech is not None:
+            # Barge-in after the reply is out still has to silence the speech.
+            cancel.on_cancel(lambda: self._stop_speech(target_id))
+        history.append(user_msg)
+        history.append({"role": "assistant", "content": response})
+        if len(history) > self._history_cap:
+            # One block (a quarter of the cap) at a time rather than a
+            # message per turn, so the stored list — and the prompt window
+            # indexed into it — shifts rarely.
+            drop = len(history) - self._history_cap + self._history_cap // 4
+            if self._summaries is not None:
+                self._summaries.fold(target_id, history[:drop])
+            del history[:drop]
+            if target_id in self._context_starts:
+                self._context_starts[target_id] = max(0, self._context_starts[target_id] - drop)
+        self._history_save(target_id)
+
+    def run_turn(self, persona_id: str, text: str,
+                 cancel: Optional[CancelToken] = None,
+                 channel: str = "voice",
+                 history: Optional[list] = None) -> Iterator[TurnEvent]:
+        """Yield the turn's events. With a `cancel` token (see start_turn) the
+        turn may end in reply_cancelled instead of reply_done; nothing from
+        the aborted exchange is spoken or persisted. `channel` ("voice" for
+        the WS path, "api" for REST) selects the latency budget.
+
+        A given `history` makes the turn stateless (the batch API): the
+        prompt is built on it instead of the stored history, and the turn
+        only generates — nothing is spoken, persisted, dispatched to a skill
+        (a matched phrase trigger is reported in reply_done) or sent to HA."""
+        stateless = history is not None
+        runtime = self._runtime(persona_id)
+        persona = runtime.persona if runtime is not None else None
         # target_id is this turn's routing id (history/display/dispatch). The
         # caller resolves the active persona before calling run_turn, so it
         # always equals persona_id here; kept as a named concept to mirror chat().
@@ -93,35 +245,143 @@ class ConversationService:
             return
 
         # Deterministic phrase trigger (precedence: phrase → house_words → LLM).
-        from skills.router import match_phrase_trigger
-        matched = match_phrase_trigger(text, persona.triggers, persona.skills)
+        matched = runtime.match_trigger(text)
+        if matched is not None and stateless:
+            yield TurnEvent("reply_done", {"persona_id": target_id, "text": "",
+                                           "skill": matched[0]})
+            return
         if matched is not None:
             skill_name, params = matched
-            self._dispatch(target_id, skill_name, params)
+            if cancel is not None:
+                if cancel.cancelled:
+                    yield self._cancelled(target_id, cancel, "")
+                    return
+                self._dispatch(target_id, skill_name, params, cancel=cancel)
+            else:
+                self._dispatch(target_id, skill_name, params)
             yield TurnEvent("reply_delta", {"persona_id": target_id, "text": ""})
             yield TurnEvent("reply_done", {"persona_id": target_id, "text": ""})
             return
 
-        history = self._history_load(target_id)
-        system_prompt = self._system_prompt(persona)
-        history.append({"role": "user", "content": text})
+        # A stored-history turn pins its history in the persona cache from
+        # load to save, so the list it appends to is never evicted mid-turn.
+        pin = (self._history_pin(target_id)
+               if self._history_pin is not None and not stateless else nullcontext())
+        with pin:
+            history = list(history) if stateless else self._history_load(target_id)
+            # House-word / HA delegation answers without the LLM; only LLM turns
+            # are classified (and counted) by the cascade.
+            from match_keywords import match_keyword_prefix
+            hw_matched, residual = match_keyword_prefix(text, persona.house_words or [])
+            ha_turn = bool(hw_matched and self._ha and not stateless)
+            # None = no retrieval this turn: the prompt keeps the memories string.
+            memories = (self._memory.relevant(target_id, persona, text)
+                        if self._memory is not None and not stateless and not ha_turn
+                        else None)
+            system_prompt = (runtime.system_prompt if stateless
+                             else self._system_prompt(runtime, target_id,
+                                                      memoryless=memories is not None))
+            user_msg = {"role": "user", "content": text}
+            route = (self._cascade.classify(text, history, persona)
+                     if self._cascade is not None and not ha_turn else None)
+            turn_llm = self._cascade.llm_for(route) if route is not None else self._llm
 
-        # House-word / HA delegation.
-        from match_keywords import match_keyword_prefix
-        hw_matched, residual = match_keyword_prefix(text, persona.house_words or [])
-        if hw_matched and self._ha:
-            response = self._ha_turn(persona, target_id, residual)
-            yield TurnEvent("reply_delta", {"persona_id": target_id, "text": response})
-        else:
-            chunks: list[str] = []
-            for chunk in self._llm.chat_stream(history, system_prompt=system_prompt):
-                chunks.append(chunk)
-                yield TurnEvent("reply_delta", {"persona_id": target_id, "text": chunk})
-            response = "".join(chunks)
+            # Retrieved memories and recalled messages ride with the user
+            # message of this request only; the history keeps user_msg. They
+            # are built into the token budget like the rest of the prompt.
+            notes = [self._memory.note(memories)] if memories else []
 
-        self._speak(target_id, response)
-        history.append({"role": "assistant", "content": response})
-        if len(history) > self._history_cap:
-            history[:] = history[-self._history_cap:]
-        self._history_save(target_id)
-        yield TurnEvent("reply_done", {"persona_id": target_id, "text": response})
+            def sent() -> dict:
+                if not notes:
+                    return user_msg
+                return {"role": "user", "content": "\n\n".join([*notes, text])}
+
+            model = getattr(turn_llm, "model", None)
+            built = None
+            if self._context is not None:
+                built = self._context.build(system_prompt, history, sent(), model=model,
+                                            start=None if stateless else self._context_starts.get(target_id))
+            if (self._recall is not None and not stateless and not ha_turn
+                    and "recall" in (getattr(persona, "skills", None) or ())):
+                # Recall skips what is still in the prompt window.
+                note = self._recall(target_id, text,
+                                    built.messages[:-1] if built is not None else history)
+                if note:
+                    notes.append(note)
+                    if built is not None:
+                        built = self._context.build(system_prompt, history, sent(),
+                                                    model=model, start=built.start)
+            # The user message joins the persisted history only once the turn
+            # completes, so a cancelled turn leaves no half-exchange behind.
+            messages = [*history, sent()]
+            prompt_tokens: Optional[int] = None
+            if built is not None:
+                if not stateless:
+                    self._context_starts[target_id] = built.start
+                messages, prompt_tokens = built.messages, built.prompt_tokens
+                logger.info("Turn for %s: %d prompt tokens (budget %d, %d history messages dropped)",
+                            target_id, prompt_tokens, built.budget_tokens, built.dropped)
+
+            budgeted: Optional[BudgetedStream] = None
+            sanitizer = (self._speech_sanitizer()
+                         if self._speech_sanitizer is not None and not stateless else None)
+            spoken_parts: list[str] = []
+            if ha_turn:
+                response = self._ha_turn(persona, target_id, residual)
+                if cancel is not None and cancel.cancelled:
+                    yield self._cancelled(target_id, cancel, "")
+                    return
+                if sanitizer is not None:
+                    spoken_parts.append(sanitizer.feed(response))
+                yield TurnEvent("reply_delta", {"persona_id": target_id, "text": response})
+            else:
+                chunks: list[str] = []
+                budget = (self._budgets.budget_for(persona, channel)
+                          if self._budgets is not None else None)
+
+                def start(token: Optional[CancelToken], limits: Optional[dict] = None):
+                    kwargs = {"cancel": token} if token is not None else {}
+                    if limits:
+                        kwargs["limits"] = limits
+                    if route is not None:
+                        return self._cascade.stream(route, messages, system_prompt, **kwargs)
+                    return self._llm.chat_stream(messages, system_prompt=system_prompt, **kwargs)
+
+                t0 = time.monotonic()
+                if budget is not None:
+                    budgeted = BudgetedStream(budget, lambda tok: start(tok, budget.limits), cancel)
+                    stream = iter(budgeted)
+                else:
+                    stream = (("chunk", c) for c in start(cancel))
+                for kind, chunk in stream:
+                    if cancel is not None and cancel.cancelled:
+                        break
+                    if kind == "filler":
+                        # First token is late: acknowledge the wait out loud.
+                        if not stateless:
+                            self._speak(target_id, chunk)
+                        yield TurnEvent("reply_filler", {"persona_id": target_id, "text": chunk})
+                        continue
+                    if not chunks and self._on_ttft is not None:
+                        self._on_ttft(target_id, time.monotonic() - t0)
+                    chunks.append(chunk)
+                    if sanitizer is not None:
+                        spoken_parts.append(sanitizer.feed(chunk))
+                    yield TurnEvent("reply_delta", {"persona_id": target_id, "text": chunk})
+                response = "".join(chunks)
+                if cancel is not None and cancel.cancelled:
+                    yield self._cancelled(target_id, cancel, response)
+                    return
+
+            if not stateless:
+                self._finish_turn(target_id, response, history, user_msg, cancel,
+                                  sanitizer, spoken_parts)
+            done = {"persona_id": target_id, "text": response}
+            if prompt_tokens is not None:
+                done["prompt_tokens"] = prompt_tokens
+            if route is not None:
+                done["model_tier"] = route.tier
+            if budgeted is not None:
+                done["budget"] = budgeted.report
+                self._budgets.record(channel, budgeted.report["met"])
+            yield TurnEvent("reply_done", done)
@@ -0,0 +1,162 @@
+"""Cross-device utterance deduplication.
+
+A room with both the browser mic (audioCapture.js → user_input) and an
+ESP32 on /api/voice hears every command twice: two transcripts, a few
+hundred ms apart, each starting a full LLM + TTS turn — and the second one
+barges in on the first. UtteranceDedup sits in front of the turn:
+
+    turn = dedup.attach(persona_id, text, lambda: run_the_turn())
+    for ev in turn:          # leader: runs the turn; follower: replays it
+        ...
+
+The first arrival leads: its turn runs and every event is recorded. A
+second arrival for the same persona within UTTERANCE_DEDUP_WINDOW_S
+(default 2 s after the leader arrived) whose normalized transcript is within
+UTTERANCE_DEDUP_DISTANCE (edit distance / length, default 0.2) of the
+leader's follows instead: it starts nothing and iterates the leader's event
+stream — recorded events first, then live ones until the turn ends. Whisper
+on two mics rarely agrees to the letter ("Turn on the lights." vs "turn on
+the light"), hence the fuzzy match. A window of 0 turns dedup off.
+
+stats() reports leaders and deduplicated arrivals, overall and per persona.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_S = 2.0
+DEFAULT_MAX_DISTANCE = 0.2
+MAX_COMPARE_CHARS = 256
+_NOT_WORD = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_utterance(text: str) -> str:
+    """Lower-case, punctuation-free, single-spaced transcript."""
+    return _SPACES.sub(" ", _NOT_WORD.sub(" ", text.lower())).strip()
+
+
+def utterance_distance(a: str, b: str) -> float:
+    """Levenshtein distance between *a* and *b* over the longer length
+    (0.0 identical, 1.0 nothing in common)."""
+    a, b = a[:MAX_COMPARE_CHARS], b[:MAX_COMPARE_CHARS]
+    if a == b:
+        return 0.0
+    if not a or not b:
+        return 1.0
+    if len(a) < len(b):
+        a, b = b, a
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1] / len(a)
+
+
+class _SharedTurn:
+    """One turn's event stream, replayable by late joiners."""
+
+    def __init__(self, text: str, arrived: float) -> None:
+        self.text = text
+        self.arrived = arrived
+        self._events: list = []
+        self._done = False
+        self._cond = threading.Condition()
+
+    def publish(self, event) -> None:
+        with self._cond:
+            self._events.append(event)
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        with self._cond:
+            self._done = True
+            self._cond.notify_all()
+
+    def replay(self) -> Iterator:
+        i = 0
+        while True:
+            with self._cond:
+                while i >= len(self._events) and not self._done:
+                    self._cond.wait()
+                if i >= len(self._events):
+                    return
+                event = self._events[i]
+            i += 1
+            yield event
+
+
+class AttachedTurn:
+    """An arrival's view of its turn. `leader` is False for a duplicate."""
+
+    def __init__(self, shared: _SharedTurn, start: Optional[Callable[[], Iterable]]) -> None:
+        self._shared = shared
+        self._start = start
+        self.leader = start is not None
+
+    def __iter__(self) -> Iterator:
+        if not self.leader:
+            return self._shared.replay()
+        return self._lead()
+
+    def _lead(self) -> Iterator:
+        try:
+            for event in self._start():
+                self._shared.publish(event)
+                yield event
+        finally:
+            self._shared.close()
+
+
+class UtteranceDedup:
+    def __init__(self, window_s: Optional[float] = None,
+                 max_distance: Optional[float] = None) -> None:
+        self.window_s = (window_s if window_s is not None
+                         else float(os.environ.get("UTTERANCE_DEDUP_WINDOW_S", DEFAULT_WINDOW_S)))
+        self.max_distance = (max_distance if max_distance is not None
+                             else float(os.environ.get("UTTERANCE_DEDUP_DISTANCE",
+                                                       DEFAULT_MAX_DISTANCE)))
+        self._recent: Dict[str, List[_SharedTurn]] = {}
+        self._lock = threading.Lock()
+        self._leaders = 0
+        self._deduplicated: Dict[str, int] = {}
+
+    def attach(self, persona_id: str, text: str,
+               start: Callable[[], Iterable]) -> AttachedTurn:
+        """Lead a new turn (run *start*) or follow a matching recent one."""
+        norm = normalize_utterance(text)
+        now = time.monotonic()
+        with self._lock:
+            recent = [t for t in self._recent.get(persona_id, ())
+                      if now - t.arrived <= self.window_s]
+            for turn in recent:
+                if utterance_distance(norm, turn.text) <= self.max_distance:
+                    self._deduplicated[persona_id] = self._deduplicated.get(persona_id, 0) + 1
+                    logger.info("Duplicate utterance for %s %.2fs after the first (%r); "
+                                "attaching to its turn", persona_id, now - turn.arrived, text)
+                    return AttachedTurn(turn, None)
+            turn = _SharedTurn(norm, now)
+            if self.window_s > 0:
+                recent.append(turn)
+            if recent:
+                self._recent[persona_id] = recent
+            else:
+                self._recent.pop(persona_id, None)
+            self._leaders += 1
+        return AttachedTurn(turn, start)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"window_s": self.window_s, "max_distance": self.max_distance,
+                    "turns": self._leaders,
+                    "deduplicated": sum(self._deduplicated.values()),
+                    "by_persona": dict(self._deduplicated)}
@@ -0,0 +1,213 @@
+"""HistoryCache — PersonaService's chat histories, bounded.
+
+PersonaService kept every history it had ever loaded, for the life of the
+process: a hub with many personas and REST traffic only grew. HistoryCache
+is the same persona_id → list mapping (PlayAIdes.chat_histories and the
+tests still use it as a dict), kept in least-recently-used order under two
+budgets:
+
+- HISTORY_CACHE_MAX_ENTRIES (default 64) histories, and
+- HISTORY_CACHE_MAX_BYTES (default 64 MiB) of message text, estimated as
+  content length plus a fixed per-message overhead.
+
+0 lifts either budget. Past a budget the least recently used histories are
+evicted, except:
+
+- pinned ones: pin(persona_id) is held for the whole of a turn (load → LLM
+  → append → save), so a turn never appends to a list the cache dropped;
+- the most recently used one, which its caller is holding right now.
+
+A history that changed since it was read or last written (its length or
+last message differ) is flushed through `flush` — HistoryStore.write —
+before it goes; a failed flush keeps it cached. Clean ones are just dropped
+and re-read on the next load. stats() reports hits, misses, evictions and
+flushes.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 64
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+MESSAGE_OVERHEAD_BYTES = 200            # dict + two str objects, roughly
+
+
+def history_bytes(history: List[dict]) -> int:
+    """Approximate in-memory size of a history."""
+    return sum(len(m.get("content") or "") for m in history) + \
+        MESSAGE_OVERHEAD_BYTES * len(history)
+
+
+def _fingerprint(history: List[dict]) -> Tuple[int, Optional[int]]:
+    return len(history), id(history[-1]) if history else None
+
+
+class _Entry:
+    __slots__ = ("history", "bytes", "clean")
+
+    def __init__(self, history: List[dict], clean: bool) -> None:
+        self.history = history
+        self.bytes = history_bytes(history)
+        # Fingerprint as of the last read/write; None = never persisted.
+        self.clean = _fingerprint(history) if clean else None
+
+    @property
+    def dirty(self) -> bool:
+        return self.clean != _fingerprint(self.history)
+
+
+class HistoryCache(MutableMapping):
+    def __init__(self, flush: Callable[[str, List[dict]], None], *,
+                 max_entries: Optional[int] = None,
+                 max_bytes: Optional[int] = None) -> None:
+        self._flush = flush
+        self.max_entries = int(max_entries if max_entries is not None
+                               else os.environ.get("HISTORY_CACHE_MAX_ENTRIES",
+                                                   DEFAULT_MAX_ENTRIES))
+        self.max_bytes = int(max_bytes if max_bytes is not None
+                             else os.environ.get("HISTORY_CACHE_MAX_BYTES",
+                                                 DEFAULT_MAX_BYTES))
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._pins: Dict[str, int] = {}
+        self._bytes = 0
+        # Re-entrant: flush callbacks may look at the cache.
+        self._lock = threading.RLock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._flushes = 0
+
+    # ── mapping (dict-compatible) ────────────────────────────────────────
+    def __getitem__(self, persona_id: str) -> List[dict]:
+        with self._lock:
+            entry = self._entries[persona_id]
+            self._entries.move_to_end(persona_id)
+            return entry.history
+
+    def __setitem__(self, persona_id: str, history: List[dict]) -> None:
+        with self._lock:
+            self._put(persona_id, _Entry(history, clean=False))
+
+    def __delitem__(self, persona_id: str) -> None:
+        """Drop without flushing (the history is being deleted)."""
+        with self._lock:
+            entry = self._entries.pop(persona_id)
+            self._bytes -= entry.bytes
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, persona_id: object) -> bool:
+        return persona_id in self._entries
+
+    # ── loading / saving ─────────────────────────────────────────────────
+    def get_or_load(self, persona_id: str,
+                    load: Callable[[str], List[dict]]) -> List[dict]:
+        """The cached history, or load(persona_id) cached as read. Two
+        concurrent misses both read, and both get the first list cached."""
+        with self._lock:
+            entry = self._entries.get(persona_id)
+            if entry is not None:
+                self._hits += 1
+                self._entries.move_to_end(persona_id)
+                return entry.history
+            self._misses += 1
+        history = load(persona_id)
+        with self._lock:
+            entry = self._entries.get(persona_id)
+            if entry is not None:
+                return entry.history
+            self._put(persona_id, _Entry(history, clean=True))
+            return history
+
+    def saved(self, persona_id: str) -> None:
+        """The history was just written: it is clean, and it may have grown."""
+        with self._lock:
+            entry = self._entries.get(persona_id)
+            if entry is None:
+                return
+            entry.clean = _fingerprint(entry.history)
+            self._resize(entry)
+            self._evict()
+
+    @contextmanager
+    def pin(self, persona_id: str):
+        """Keep *persona_id*'s history cached for the block (a turn). May be
+        taken before the history is loaded."""
+        with self._lock:
+            self._pins[persona_id] = self._pins.get(persona_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                left = self._pins[persona_id] - 1
+                if left:
+                    self._pins[persona_id] = left
+                else:
+                    del self._pins[persona_id]
+                entry = self._entries.get(persona_id)
+                if entry is not None:
+                    self._resize(entry)
+                self._evict()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {"size": len(self._entries), "bytes": self._bytes,
+                    "max_entries": self.max_entries, "max_bytes": self.max_bytes,
+                    "pinned": len(self._pins), "hits": self._hits,
+                    "misses": self._misses, "evictions": self._evictions,
+                    "flushes": self._flushes,
+                    "hit_rate": round(self._hits / lookups, 3) if lookups else None}
+
+    # ── internals (lock held) ────────────────────────────────────────────
+    def _put(self, persona_id: str, entry: _Entry) -> None:
+        old = self._entries.pop(persona_id, None)
+        if old is not None:
+            self._bytes -= old.bytes
+        self._entries[persona_id] = entry
+        self._bytes += entry.bytes
+        self._evict()
+
+    def _resize(self, entry: _Entry) -> None:
+        size = history_bytes(entry.history)
+        self._bytes += size - entry.bytes
+        entry.bytes = size
+
+    def _over(self) -> bool:
+        return ((self.max_entries > 0 and len(self._entries) > self.max_entries)
+                or (self.max_bytes > 0 and self._bytes > self.max_bytes))
+
+    def _evict(self) -> None:
+        if not self._over():
+            return
+        mru = next(reversed(self._entries), None)
+        for persona_id in list(self._entries):
+            if not self._over():
+                return
+            if persona_id == mru or persona_id in self._pins:
+                continue
+            entry = self._entries[persona_id]
+            if entry.dirty:
+                try:
+                    self._flush(persona_id, entry.history)
+                except Exception:
+                    logger.exception("History flush of %s failed; keeping it cached",
+                                     persona_id)
+                    continue
+                self._flushes += 1
+            del self._entries[persona_id]
+            self._bytes -= entry.bytes
+            self._evictions += 1
@@ -0,0 +1,201 @@
+"""Per-turn latency budgets for spoken replies.
+
+A voice reply that runs for paragraphs holds the LLM for its whole
+generation and then the TTS rig for tens of seconds more, while the person
+at the TV has long stopped listening. A LatencyBudget bounds a turn:
+
+- max_tokens / stop: generation limits sent with the request, so the server
+  stops early instead of the client throwing tokens away.
+- max_sentences: the reply is cut after N complete sentences (and the
+  upstream stream aborted) — spoken answers want a few sentences, not a list.
+- ttft_s: if the first token has not arrived by then, the persona says the
+  filler phrase ("One moment.") right away and the reply is shortened to a
+  single sentence, so the wait is acknowledged and not compounded. The
+  persona prewarm synthesizes each voice's filler ahead of time and the TTS
+  proxy plays it from that cache, so saying it adds no rig round-trip.
+
+Budgets come per channel — LLM_BUDGET_VOICE for WS turns, LLM_BUDGET_API for
+REST (unset = unbounded), spec "ttft=3,max_tokens=200,sentences=4" — and a
+persona can override fields with `latency_budget` ({"max_sentences": 2,
+"filler": "Hmm, let me think."}). Each turn reports whether it met its
+budget in reply_done; stats() counts met/missed per channel.
+"""
+from __future__ import annotations
+
+import contextvars
+import dataclasses
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional, Tuple
+
+from backend.services.cancellation import CancelToken
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FILLER = "One moment."
+DEFAULT_SPECS = {"voice": "ttft=4,max_tokens=256,sentences=4", "api": ""}
+_SPEC_KEYS = {"ttft": "ttft_s", "max_tokens": "max_tokens", "sentences": "max_sentences"}
+# A sentence ends at . ! ? … (plus closing quotes/brackets) followed by space.
+_SENTENCE_END = re.compile(r"[.!?…]+[\"')\]]*(?=\s)")
+
+
+@dataclass(frozen=True)
+class LatencyBudget:
+    ttft_s: Optional[float] = None
+    max_tokens: Optional[int] = None
+    max_sentences: Optional[int] = None
+    stop: Tuple[str, ...] = ()
+    filler: str = DEFAULT_FILLER
+
+    @property
+    def limits(self) -> Optional[dict]:
+        limits = {}
+        if self.max_tokens:
+            limits["max_tokens"] = self.max_tokens
+        if self.stop:
+            limits["stop"] = list(self.stop)
+        return limits or None
+
+
+def parse_budget(spec: str) -> Optional[LatencyBudget]:
+    """"ttft=3,max_tokens=200,sentences=4" → LatencyBudget; empty → None."""
+    fields: Dict[str, object] = {}
+    for item in (spec or "").split(","):
+        name, sep, value = item.strip().partition("=")
+        if not sep or name not in _SPEC_KEYS:
+            if item.strip():
+                logger.warning("Ignoring malformed latency budget entry %r", item)
+            continue
+        try:
+            fields[_SPEC_KEYS[name]] = float(value) if name == "ttft" else int(value)
+        except ValueError:
+            logger.warning("Ignoring malformed latency budget entry %r", item)
+    return LatencyBudget(**fields) if fields else None
+
+
+def cut_sentences(text: str, n: int) -> Optional[str]:
+    """*text* up to the end of its n-th complete sentence, or None if it
+    does not hold n complete sentences yet."""
+    for i, m in enumerate(_SENTENCE_END.finditer(text), 1):
+        if i == n:
+            return text[:m.end()]
+    return None
+
+
+class LatencyBudgets:
+    def __init__(self, channels: Optional[Dict[str, Optional[LatencyBudget]]] = None):
+        if channels is None:
+            channels = {name: parse_budget(os.environ.get(f"LLM_BUDGET_{name.upper()}", spec))
+                        for name, spec in DEFAULT_SPECS.items()}
+        self._channels = dict(channels)
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def budget_for(self, persona, channel: str) -> Optional[LatencyBudget]:
+        budget = self._channels.get(channel)
+        override = getattr(persona, "latency_budget", None)
+        if not override:
+            return budget
+        known = {f.name for f in dataclasses.fields(LatencyBudget)}
+        fields = {k: (tuple(v) if k == "stop" else v)
+                  for k, v in override.items() if k in known}
+        return dataclasses.replace(budget or LatencyBudget(), **fields)
+
+    def record(self, channel: str, met: bool) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(channel, {"met": 0, "missed": 0})
+            counts["met" if met else "missed"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {ch: dict(c) for ch, c in self._counts.items()}
+
+
+class BudgetedStream:
+    """Iterate an LLM stream under a LatencyBudget.
+
+    The stream runs on a pump thread (in a copy of the caller's context, so
+    scheduler priority tags follow it) so the first-token deadline can be
+    watched without blocking on the socket. `start(cancel)` receives the
+    CancelToken the stream must honour; cutting the reply fires it, which
+    closes the upstream request. Iterating yields ("filler", text) once if
+    the deadline passes, then ("chunk", text) deltas; `report` describes the
+    outcome once exhausted."""
+
+    def __init__(self, budget: LatencyBudget, start, cancel: Optional[CancelToken] = None):
+        self.budget = budget
+        self._start = start
+        self._turn_cancel = cancel
+        self.text = ""
+        self.report: dict = {}
+
+    def __iter__(self) -> Iterator[tuple]:
+        budget = self.budget
+        inner = CancelToken()
+        unregister = (self._turn_cancel.on_cancel(lambda: inner.cancel(self._turn_cancel.reason))
+                      if self._turn_cancel is not None else None)
+        events: queue.Queue = queue.Queue()
+        ctx = contextvars.copy_context()
+
+        def pump() -> None:
+            try:
+                for chunk in self._start(inner):
+                    events.put(("chunk", chunk))
+                events.put(("done", None))
+            except BaseException as e:      # surfaced on the turn's thread
+                events.put(("error", e))
+
+        threading.Thread(target=ctx.run, args=(pump,), name="llm-budget", daemon=True).start()
+        t0 = time.monotonic()
+        ttft: Optional[float] = None
+        filler = False
+        sentences = budget.max_sentences
+        cut = None
+        try:
+            while True:
+                timeout = None
+                if ttft is None and budget.ttft_s is not None and not filler:
+                    timeout = max(0.0, budget.ttft_s - (time.monotonic() - t0))
+                try:
+                    kind, value = events.get(timeout=timeout)
+                except queue.Empty:
+                    filler = True
+                    sentences = 1           # late already: keep the answer short
+                    logger.info("LLM first token over %.1fs budget; saying filler", budget.ttft_s)
+                    yield "filler", budget.filler
+                    continue
+                if kind == "error":
+                    raise value
+                if kind == "done":
+                    break
+                if ttft is None:
+                    ttft = time.monotonic() - t0
+                self.text += value
+                if sentences:
+                    kept = cut_sentences(self.text, sentences)
+                    if kept is not None:
+                        value = value[:len(value) - (len(self.text) - len(kept))]
+                        self.text = kept
+                        cut = "sentences"
+                        inner.cancel("latency budget")
+                        if value:
+                            yield "chunk", value
+                        break
+                yield "chunk", value
+        finally:
+            inner.cancel("stream closed")           # no-op if already cut
+            if unregister is not None:
+                unregister()
+            met = not filler and (budget.ttft_s is None or (ttft is not None and ttft <= budget.ttft_s))
+            self.report = {
+                "met": met,
+                "ttft_s": round(ttft, 3) if ttft is not None else None,
+                "ttft_budget_s": budget.ttft_s,
+                "filler": filler,
+                "cut": cut,
+            }
@@ -0,0 +1,222 @@
+"""PersonaMemory — retrieve the memories a turn needs instead of sending all.
+
+`persona.memories.memories` is one string pasted whole into every system
+prompt. With PersonaMemory each persona's memories are entries in a vector
+store (backend/stores/memory.py), embedded through the OpenAI-compatible
+/v1/embeddings endpoint (backend/clients/embeddings.py). A turn embeds the
+user's utterance and sends only the top PERSONA_MEMORY_TOP_K (default 5;
+0 = off) entries by cosine similarity, while the system prompt drops the
+memories sentence.
+
+- The persona's memories string is imported (one entry per line, or per
+  sentence for a single paragraph) by the persona prewarm or, failing that,
+  in the background after its first turn — a turn never waits on it — and
+  re-imported when it changes (its hash is kept as the store's `source`).
+  add() appends more entries, which survive a re-import.
+- The only embedding a turn waits on is the utterance's, under the
+  embedder's short query timeout.
+- The recalled entries ride with the user's message, like the recall
+  skill's, so the system prompt — and the backend's cached prefix of it —
+  stays the same from turn to turn.
+- Anything that goes wrong (no numpy, embedding endpoint down) falls back
+  to the old behavior: the whole string in the system prompt. After a
+  failure the persona is not retried for RETRY_S seconds, so turns do not
+  each wait on an endpoint that is down.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOP_K = 5
+RETRY_S = 60.0
+MEMORY_HEADER = "Things you remember that may matter here:\n"
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+
+def split_memories(text: str) -> List[str]:
+    """A memories string as entries: its lines, or its sentences if it is
+    a single paragraph."""
+    lines = [ln.strip(" -*\t") for ln in text.splitlines()]
+    lines = [ln for ln in lines if ln]
+    if len(lines) == 1:
+        lines = [s.strip() for s in _SENTENCE.split(lines[0]) if s.strip()]
+    return lines
+
+
+def _p50(samples: List[float]) -> Optional[float]:
+    return round(sorted(samples)[len(samples) // 2], 3) if samples else None
+
+
+def _memories_text(persona) -> str:
+    memories = getattr(persona, "memories", None)
+    return (getattr(memories, "memories", None) or "").strip()
+
+
+def _source_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class PersonaMemory:
+    def __init__(self, embedder, store, *, top_k: Optional[int] = None,
+                 retry_s: float = RETRY_S) -> None:
+        self._embedder = embedder
+        self._store = store
+        self.top_k = int(top_k if top_k is not None
+                         else os.environ.get("PERSONA_MEMORY_TOP_K", DEFAULT_TOP_K))
+        # persona_id → the memories string imported (or found imported).
+        self._synced: Dict[str, Optional[str]] = {}
+        self.retry_s = retry_s
+        self._failed_at: Dict[str, float] = {}      # persona_id → monotonic
+        self._importing: set = set()
+        self._sync_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._retrievals = 0
+        self._failures = 0
+        self._search_ms: List[float] = []
+        self._embed_ms: List[float] = []
+
+    @property
+    def enabled(self) -> bool:
+        return (self.top_k > 0 and self._store.available
+                and getattr(self._embedder, "available", True))
+
+    # ── entries ──────────────────────────────────────────────────────────
+    def add(self, persona_id: str, texts: List[str]) -> int:
+        """Embed and store more memory entries. Returns the entry count."""
+        texts = [t.strip() for t in texts if t and t.strip()]
+        if not texts:
+            return self._store.count(persona_id)
+        vectors = self._embedder.embed(texts)
+        return self._store.add(persona_id, texts, vectors,
+                               model=getattr(self._embedder, "model", None))
+
+    def forget(self, persona_id: str) -> None:
+        """Drop the persona's entries (persona deleted)."""
+        with self._sync_lock:
+            self._synced.pop(persona_id, None)
+            self._store.delete(persona_id)
+
+    def sync(self, persona_id: str, persona) -> bool:
+        """Import *persona*'s memories string into the store if it is not
+        there yet (or changed). True if the persona has entries to retrieve."""
+        if not self.enabled:
+            return False
+        text = _memories_text(persona)
+        source = _source_hash(text) if text else None
+        with self._sync_lock:
+            count = self._store.count(persona_id)
+            # A persona whose string was imported but whose store is now
+            # empty (directory removed with the persona) is imported again.
+            if (persona_id in self._synced and self._synced[persona_id] == source
+                    and (count or source is None)):
+                return count > 0
+            meta = self._store.meta(persona_id)
+            model = getattr(self._embedder, "model", None)
+            if meta.get("source") != source or (count and meta.get("model") != model):
+                # Rebuilt: the string's entries first, then the ones add()ed
+                # (re-embedded too, in case the embedding model changed).
+                added = self._store.texts(persona_id)[int(meta.get("imported") or 0):]
+                entries = split_memories(text)
+                # Embedded before the old entries go, so a failure keeps them.
+                vectors = self._embedder.embed(entries + added) if entries + added else []
+                self._store.delete(persona_id)
+                if entries + added:
+                    self._store.add(persona_id, entries + added, vectors, source=source,
+                                    imported=len(entries), model=model)
+                logger.info("Imported %d memory entries for %s", len(entries), persona_id)
+            self._synced[persona_id] = source
+            return self._store.count(persona_id) > 0
+
+    def active(self, persona_id: str, persona) -> bool:
+        """Whether turns retrieve memories (and drop the memories string from
+        the system prompt) for this persona. Never raises."""
+        with self._lock:
+            failed_at = self._failed_at.get(persona_id)
+        if failed_at is not None and time.monotonic() - failed_at < self.retry_s:
+            return False
+        try:
+            return self.sync(persona_id, persona)
+        except Exception:
+            logger.exception("Memory import for %s failed; using the whole string",
+                             persona_id)
+            self._failed(persona_id)
+            return False
+
+    def ready(self, persona_id: str, persona) -> bool:
+        """active() without waiting: True if the persona's memories are
+        imported and retrievable now. Otherwise an import that is due runs
+        in the background, and this turn keeps the whole string."""
+        if not self.enabled:
+            return False
+        text = _memories_text(persona)
+        source = _source_hash(text) if text else None
+        if self._synced.get(persona_id, "") == source:
+            count = self._store.count(persona_id)
+            if count or source is None:
+                return count > 0
+        with self._lock:
+            if persona_id in self._importing:
+                return False
+            self._importing.add(persona_id)
+
+        def run() -> None:
+            try:
+                self.active(persona_id, persona)
+            finally:
+                with self._lock:
+                    self._importing.discard(persona_id)
+        threading.Thread(target=run, name=f"memory-import-{persona_id}", daemon=True).start()
+        return False
+
+    def _failed(self, persona_id: str) -> None:
+        with self._lock:
+            self._failures += 1
+            self._failed_at[persona_id] = time.monotonic()
+
+    # ── retrieval ────────────────────────────────────────────────────────
+    def relevant(self, persona_id: str, persona, text: str) -> Optional[List[str]]:
+        """The top-k entries for *text*, or None when retrieval is off, not
+        imported yet or failed — the caller then keeps the whole memories
+        string."""
+        if not self.ready(persona_id, persona):
+            return None
+        with self._lock:
+            failed_at = self._failed_at.get(persona_id)
+        if failed_at is not None and time.monotonic() - failed_at < self.retry_s:
+            return None
+        try:
+            t0 = time.perf_counter()
+            query = self._embedder.embed_query(text)
+            t1 = time.perf_counter()
+            hits = self._store.search(persona_id, query, self.top_k)
+            t2 = time.perf_counter()
+        except Exception:
+            logger.exception("Memory retrieval for %s failed; using the whole string",
+                             persona_id)
+            self._failed(persona_id)
+            return None
+        with self._lock:
+            self._retrievals += 1
+            self._embed_ms = (self._embed_ms + [(t1 - t0) * 1000])[-200:]
+            self._search_ms = (self._search_ms + [(t2 - t1) * 1000])[-200:]
+        return [entry for _, entry in hits]
+
+    def note(self, entries: List[str]) -> Optional[str]:
+        if not entries:
+            return None
+        return MEMORY_HEADER + "\n".join(f"- {e}" for e in entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"enabled": self.enabled, "top_k": self.top_k,
+                    "retrievals": self._retrievals, "failures": self._failures,
+                    "embed_ms_p50": _p50(self._embed_ms),
+                    "search_ms_p50": _p50(self._search_ms)}
@@ -5,12 +5,41 @@ Persona/Trigger Pydantic models (D3), so an invalid document can never reach
 disk; pydantic ValidationError propagates as itself (the router maps it to
 422). The history cache + cap live here — single owner; PlayAIdes reads the
 cache through its chat_histories property for the history_loaded WS frame.
+
+get_model() runs on every conversation turn and activation, so validated
+Persona models are cached by id. An entry is dropped by this service's own
+writes (update / replace_triggers / delete) and revalidated when the doc's
+(mtime, size) stamp no longer matches — an edit made outside the service,
+e.g. by hand or by the legacy voice-design write. Cached models are shared:
+callers must treat them as read-only. model_cache_stats() counts hits,
+misses and invalidations. get_runtime() pairs each cached model with its
+PersonaRuntime (prompt, compiled triggers, …), rebuilt only with the model.
+
+list() and query() are answered by a PersonaCatalog (backend/services/
+catalog.py): the parsed library in memory, updated by this service's writes
+and a watcher on the personas dir, instead of a parse of every doc per call.
+
+Loaded histories live in a bounded LRU HistoryCache (backend/services/
+history_cache.py); a turn holds pin_history() so its list stays cached until
+it has been saved. history_page() pages through everything persisted,
+archive included.
+
+With a `search_index` (backend/stores/search_index.py) every history write
+also indexes the messages it appended — found, like the journal does, by
+identity after the last message this service read or wrote — and each
+persona's persisted history is backfilled into the index on first load.
+search_history() queries it.
 """
 from __future__ import annotations
 
 import logging
-from typing import Callable, Dict, List, Optional
+import sys
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
 
+from backend.services.catalog import PersonaCatalog
+from backend.services.history_cache import HistoryCache
+from backend.services.runtime import PersonaRuntime, slug
 from persona import Persona
 
 logger = logging.getLogger(__name__)
@@ -28,35 +57,47 @@ class PersonaActive(Exception):
     """delete() refused: the persona is currently active (D7: 409)."""
 
 
-def slug(name: str) -> str:
-    """The persona-id slug rule (single home, moved from create_persona)."""
-    return name.strip().lower().replace(" ", "_")
-
-
 class PersonaService:
     def __init__(self, persona_store, history_store,
                  active_persona_id: Callable[[], Optional[str]],
-                 history_cap: int = 80):
+                 history_cap: int = 80,
+                 catalog: Optional[PersonaCatalog] = None,
+                 history_cache: Optional[HistoryCache] = None,
+                 search_index=None,
+                 on_delete: Optional[Callable[[str], None]] = None):
         self._personas = persona_store
+        self.catalog = catalog if catalog is not None else PersonaCatalog(persona_store)
         self._history_store = history_store
         self._active_persona_id = active_persona_id
         self._history_cap = history_cap
-        self._histories: Dict[str, List[dict]] = {}
+        self._search = search_index
+        # Called with the id after a delete (REST or internal), so state
+        # kept outside the persona dir (summaries, memory) goes with it.
+        self._on_delete = on_delete
+        # Last message indexed per persona: where the next write's new ones start.
+        self._indexed: Dict[str, dict] = {}
+        self._histories = (history_cache if history_cache is not None
+                           else HistoryCache(flush=self._write_history))
+        self._models: Dict[str, Tuple[Tuple[int, int], Persona]] = {}
+        self._runtimes: Dict[str, PersonaRuntime] = {}
+        self._models_lock = threading.Lock()
+        self._model_hits = 0
+        self._model_misses = 0
+        self._model_invalidations = 0
 
     # ── CRUD ──────────────────────────────────────────────────────────────
     def list(self) -> List[dict]:
         """Every readable persona doc with "id" injected. Corrupt files are
         logged and skipped — one bad file must not take down the list."""
-        out = []
-        for pid in self._personas.list_ids():
-            try:
-                doc = self._personas.read(pid)
-            except Exception as e:
-                logger.error("Error reading persona %s: %s", pid, e)
-                continue
-            doc["id"] = pid
-            out.append(doc)
-        return out
+        return self.catalog.query()[1]
+
+    def query(self, q: Optional[str] = None, *, trait: Optional[str] = None,
+              gender: Optional[str] = None, language: Optional[str] = None,
+              offset: int = 0, limit: Optional[int] = None) -> Tuple[int, List[dict]]:
+        """(total, page): search by name/trait, filter, page. See
+        PersonaCatalog.query."""
+        return self.catalog.query(q, trait=trait, gender=gender, language=language,
+                                  offset=offset, limit=limit)
 
     def get(self, persona_id: str) -> dict:
         try:
@@ -67,12 +108,57 @@ class PersonaService:
         return doc
 
     def get_model(self, persona_id: str) -> Persona:
-        """Typed by-id load for internal consumers (ConversationService, D6)."""
+        """Typed by-id load for internal consumers (ConversationService, D6).
+        Served from the model cache while the doc's stamp is unchanged."""
+        stamp = self._personas.stat(persona_id)
+        with self._models_lock:
+            cached = self._models.get(persona_id)
+            if cached is not None and stamp is not None and cached[0] == stamp:
+                self._model_hits += 1
+                return cached[1]
+            if cached is not None:
+                del self._models[persona_id]
+                self._model_invalidations += 1
+            self._model_misses += 1
+        if stamp is None:
+            raise PersonaNotFound(persona_id)
         try:
             data = self._personas.read(persona_id)
         except KeyError:
             raise PersonaNotFound(persona_id)
-        return Persona(**data)
+        model = Persona(**data)
+        # A write racing the read leaves a newer stamp: that entry just
+        # misses next time.
+        with self._models_lock:
+            self._models[persona_id] = (stamp, model)
+        return model
+
+    def get_runtime(self, persona_id: str) -> PersonaRuntime:
+        """The PersonaRuntime of the current model (get_model), built once
+        per validated model."""
+        model = self.get_model(persona_id)
+        with self._models_lock:
+            runtime = self._runtimes.get(persona_id)
+        if runtime is not None and runtime.persona is model:
+            return runtime
+        runtime = PersonaRuntime.build(model, persona_id)
+        with self._models_lock:
+            self._runtimes[persona_id] = runtime
+        return runtime
+
+    def _invalidate_model(self, persona_id: str) -> None:
+        with self._models_lock:
+            self._runtimes.pop(persona_id, None)
+            if self._models.pop(persona_id, None) is not None:
+                self._model_invalidations += 1
+
+    def model_cache_stats(self) -> dict:
+        with self._models_lock:
+            lookups = self._model_hits + self._model_misses
+            return {"size": len(self._models), "hits": self._model_hits,
+                    "misses": self._model_misses,
+                    "invalidations": self._model_invalidations,
+                    "hit_rate": round(self._model_hits / lookups, 3) if lookups else None}
 
     def create(self, name: str, description: str) -> dict:
         persona_id = slug(name)
@@ -87,6 +173,7 @@ class PersonaService:
         )
         doc = model.model_dump()
         self._personas.write(persona_id, doc)
+        self.catalog.put(persona_id)
         doc["id"] = persona_id
         return doc
 
@@ -97,6 +184,8 @@ class PersonaService:
         data.pop("id", None)
         doc = Persona(**data).model_dump()   # ValidationError propagates (422)
         self._personas.write(persona_id, doc)
+        self._invalidate_model(persona_id)
+        self.catalog.put(persona_id)
         doc["id"] = persona_id
         return doc
 
@@ -106,36 +195,108 @@ class PersonaService:
         if self._active_persona_id() == persona_id:
             raise PersonaActive(persona_id)
         self._personas.delete(persona_id)      # rmtree removes chat history too
+        self._invalidate_model(persona_id)
+        self.catalog.remove(persona_id)
         self._histories.pop(persona_id, None)  # no resurrection on re-create
+        self._forget_indexed(persona_id)
+        if self._on_delete is not None:
+            self._on_delete(persona_id)
 
     # ── History (cache + cap, moved from PlayAIdes — single owner) ──
     @property
-    def histories(self) -> Dict[str, List[dict]]:
-        """The in-memory cache. PlayAIdes' chat_histories property returns
-        this same dict; the history_loaded activation frame reads it."""
+    def histories(self) -> HistoryCache:
+        """The in-memory cache (a dict-like LRU). PlayAIdes' chat_histories
+        property returns this same mapping; the history_loaded activation
+        frame reads it."""
         return self._histories
 
     def load_history(self, persona_id: str) -> List[dict]:
-        if persona_id in self._histories:
-            return self._histories[persona_id]
-        history = self._history_store.read(persona_id)
-        if len(history) > self._history_cap:
-            history = history[-self._history_cap:]
-        self._histories[persona_id] = history
+        # A concurrent load (the swap prewarm) gets the same list back, never
+        # a replacement for the one a turn is already appending to.
+        return self._histories.get_or_load(persona_id, self._read_history)
+
+    def _read_history(self, persona_id: str) -> List[dict]:
+        # Only the tail is parsed (the store seeks back from the end).
+        history = self._history_store.read(persona_id, limit=self._history_cap)
+        if self._search is not None:
+            self._search.backfill(
+                persona_id, lambda: self._history_store.page(persona_id, 0, sys.maxsize)[1])
+            self._mark_indexed(persona_id, history)
         return history
 
+    def _write_history(self, persona_id: str, history: List[dict]) -> None:
+        self._history_store.write(persona_id, history)
+        if self._search is None:
+            return
+        tail = self._indexed.get(persona_id)
+        start = 0
+        for i in range(len(history) - 1, -1, -1):
+            if history[i] is tail:
+                start = i + 1
+                break
+        try:
+            self._search.add(persona_id, history[start:])
+        except Exception:
+            # Search is derived data; never fail the save over it.
+            logger.exception("Indexing %s's history for search failed", persona_id)
+        self._mark_indexed(persona_id, history)
+
+    def _mark_indexed(self, persona_id: str, history: List[dict]) -> None:
+        if history:
+            self._indexed[persona_id] = history[-1]
+        else:
+            self._indexed.pop(persona_id, None)
+
+    def pin_history(self, persona_id: str):
+        """Context manager: keep *persona_id*'s history cached (not evicted)
+        for the block — a turn, from load to save."""
+        return self._histories.pin(persona_id)
+
+    def history_cache_stats(self) -> dict:
+        return self._histories.stats()
+
     def save_history(self, persona_id: str) -> None:
         """Persist the cached list (atomic via the store).
 
-        No-op if the history was never loaded this process — writing the
-        cache-miss default ([]) would clobber real on-disk history."""
-        if persona_id not in self._histories:
+        No-op if the history is not cached (never loaded this process, or
+        evicted — flushed first if it had changed): writing the cache-miss
+        default ([]) would clobber real on-disk history."""
+        history = self._histories.get(persona_id)
+        if history is None:
             return
-        self._history_store.write(persona_id, self._histories[persona_id])
+        self._write_history(persona_id, history)
+        self._histories.saved(persona_id)
 
     def delete_history(self, persona_id: str) -> None:
         self._histories.pop(persona_id, None)
         self._history_store.delete(persona_id)
+        self._forget_indexed(persona_id)
+
+    def _forget_indexed(self, persona_id: str) -> None:
+        self._indexed.pop(persona_id, None)
+        if self._search is not None:
+            self._search.delete(persona_id)
+
+    def search_history(self, q: str, persona_id: Optional[str] = None,
+                       limit: int = 10) -> List[dict]:
+        """Ranked full-text matches across histories (one persona's with
+        *persona_id*). Empty without a search index."""
+        if self._search is None:
+            return []
+        if persona_id is not None and not self._personas.exists(persona_id):
+            raise PersonaNotFound(persona_id)
+        return self._search.search(q, persona_id, limit)
+
+    def search_stats(self) -> Optional[dict]:
+        return self._search.stats() if self._search is not None else None
+
+    def history_page(self, persona_id: str, offset: int = 0,
+                     limit: int = 100) -> Tuple[int, List[dict]]:
+        """(total, page) of the persona's full persisted history, oldest
+        first — archived segments, then the live journal."""
+        if not self._personas.exists(persona_id):
+            raise PersonaNotFound(persona_id)
+        return self._history_store.page(persona_id, offset, limit)
 
     # ── Triggers (D2: whole-list replace, no row ids) ────────────────────
     def get_triggers(self, persona_id: str) -> List[dict]:
@@ -153,4 +314,6 @@ class PersonaService:
         doc["triggers"] = triggers
         validated = Persona(**doc).model_dump()  # ValidationError propagates
         self._personas.write(persona_id, validated)
+        self._invalidate_model(persona_id)
+        self.catalog.put(persona_id)
         return validated["triggers"]
@@ -0,0 +1,177 @@
+"""Speculative persona prewarm on a cross-persona wake.
+
+Saying another persona's wake word swaps the active persona, and the swap
+ran serially on the WS loop: parse + validate persona.json, read its chat
+history, then (in the background) prefill its prompt on the LLM — while the
+TTS rig met the new voice cold on the first reply sentence. The viewer now
+reports the wake match (`prewarm_persona`) just before it confirms the swap
+(`set_active_persona`), and PersonaPrewarmer starts every step at once, each
+on its own worker:
+
+    prewarmer = PersonaPrewarmer({"runtime": ..., "history": ...,
+                                  "llm_prefix": ..., "tts_voice": ...})
+    prewarmer.prewarm("nova")        # returns at once
+
+A step is a callable taking the persona id; what it warms is whatever cache
+the swap reads next (PersonaService's model/runtime cache, its history cache,
+the backend prompt cache, the rig's voice prompt). A failing step is logged
+and counted, never raised: the swap just does that part itself.
+
+- fresh(persona_id, step): the step finished for this persona within
+  PERSONA_PREWARM_TTL_S (default 10) seconds, so the swap can skip its own
+  copy of it (the LLM prefill). One-shot: the next swap warms again.
+- A prewarm for a persona whose previous one is still running is skipped.
+- PERSONA_PREWARM_TTL_S=0 turns prewarming off (prewarm() is a no-op).
+
+Swap-to-first-word is measured here too: swap_started() at the wake (or the
+swap, without one), first_word() at the first reply text of that persona's
+next turn. A start with no turn within FIRST_WORD_WINDOW_S is dropped (a
+wake word said on its own). stats() reports both.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_S = 10.0
+FIRST_WORD_WINDOW_S = 60.0
+_MAX_SAMPLES = 256
+
+
+class _Run:
+    __slots__ = ("futures", "finished")
+
+    def __init__(self) -> None:
+        self.futures: Dict[str, Future] = {}
+        self.finished: Dict[str, float] = {}    # step → finished at, OK only
+
+
+class PersonaPrewarmer:
+    def __init__(self, steps: Dict[str, Callable[[str], object]], *,
+                 ttl_s: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self._steps = dict(steps)
+        self.ttl_s = float(ttl_s if ttl_s is not None
+                           else os.environ.get("PERSONA_PREWARM_TTL_S", DEFAULT_TTL_S))
+        self._clock = clock
+        self._pool = ThreadPoolExecutor(max_workers=max(1, len(self._steps)),
+                                        thread_name_prefix="persona-prewarm")
+        self._lock = threading.Lock()
+        self._runs: Dict[str, _Run] = {}
+        self._swaps: Dict[str, float] = {}
+        self._first_word: List[float] = []
+        self._stats = {"prewarms": 0, "skipped": 0, "failed": {}, "step_ms": {},
+                       "claimed": 0, "swaps": 0, "swaps_abandoned": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_s > 0 and bool(self._steps)
+
+    def prewarm(self, persona_id: str) -> bool:
+        """Start every step for *persona_id* in the background. Returns True
+        if a prewarm was started."""
+        if not persona_id or not self.enabled:
+            return False
+        with self._lock:
+            run = self._runs.get(persona_id)
+            if run is not None and not all(f.done() for f in run.futures.values()):
+                self._stats["skipped"] += 1
+                return False
+            run = self._runs[persona_id] = _Run()
+            self._stats["prewarms"] += 1
+            for name, step in self._steps.items():
+                run.futures[name] = self._pool.submit(self._run_step, run, persona_id,
+                                                      name, step)
+        return True
+
+    def wait(self, persona_id: str, timeout: Optional[float] = None) -> bool:
+        """Block until *persona_id*'s prewarm has finished (True), or the
+        timeout ran out. No prewarm → True."""
+        with self._lock:
+            run = self._runs.get(persona_id)
+            futures = list(run.futures.values()) if run is not None else []
+        deadline = None if timeout is None else self._clock() + timeout
+        for f in futures:
+            left = None if deadline is None else max(0.0, deadline - self._clock())
+            try:
+                f.result(timeout=left)
+            except Exception:               # a timeout; step errors are caught
+                return False
+        return True
+
+    def fresh(self, persona_id: str, step: str) -> bool:
+        """True, once, if *step* finished OK for *persona_id* within ttl_s."""
+        with self._lock:
+            run = self._runs.get(persona_id)
+            finished = run.finished.pop(step, None) if run is not None else None
+            if finished is None or self._clock() - finished > self.ttl_s:
+                return False
+            self._stats["claimed"] += 1
+            return True
+
+    # ── swap-to-first-word ───────────────────────────────────────────────
+    def swap_started(self, persona_id: str) -> None:
+        """The user asked for *persona_id* (its wake match, or the swap
+        itself): the clock starts, unless it already did for this wake."""
+        now = self._clock()
+        with self._lock:
+            started = self._swaps.get(persona_id)
+            if started is None or now - started > FIRST_WORD_WINDOW_S:
+                if started is not None:
+                    self._stats["swaps_abandoned"] += 1
+                self._swaps[persona_id] = now
+
+    def first_word(self, persona_id: str) -> Optional[float]:
+        """The first reply text of *persona_id*'s turn: returns (and records)
+        seconds since its swap started, or None if no swap is pending."""
+        now = self._clock()
+        with self._lock:
+            started = self._swaps.pop(persona_id, None)
+            if started is None:
+                return None
+            elapsed = now - started
+            if elapsed > FIRST_WORD_WINDOW_S:
+                self._stats["swaps_abandoned"] += 1
+                return None
+            self._stats["swaps"] += 1
+            self._first_word.append(elapsed)
+            del self._first_word[:-_MAX_SAMPLES]
+        return elapsed
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out["failed"] = dict(self._stats["failed"])
+            out["step_ms"] = dict(self._stats["step_ms"])
+            samples = sorted(self._first_word)
+            last = self._first_word[-1] if samples else None
+        out["enabled"] = self.enabled
+        out["swap_to_first_word_ms"] = ({
+            "p50": round(samples[len(samples) // 2] * 1000, 1),
+            "max": round(samples[-1] * 1000, 1),
+            "last": round(last * 1000, 1),
+        } if samples else None)
+        return out
+
+    # ── internals ────────────────────────────────────────────────────────
+    def _run_step(self, run: _Run, persona_id: str, name: str,
+                  step: Callable[[str], object]) -> None:
+        t0 = self._clock()
+        try:
+            step(persona_id)
+        except Exception as e:
+            logger.info("Prewarm %s of %s failed: %s", name, persona_id, e)
+            with self._lock:
+                failed = self._stats["failed"]
+                failed[name] = failed.get(name, 0) + 1
+            return
+        now = self._clock()
+        with self._lock:
+            run.finished[name] = now
+            self._stats["step_ms"][name] = round((now - t0) * 1000, 1)
@@ -0,0 +1,131 @@
+"""PersonaRuntime — what the hot paths need from a persona, derived once.
+
+Each turn and each status frame used to re-derive the same things from the
+Persona model: the system prompt string, the `name → id` slug, a scan of
+every trigger (re-lowering the utterance per trigger and checking the skill
+enable-list), the voice id, the intro/idle clip names. PersonaRuntime.build()
+does that once per activation or edit; the result is immutable and shared.
+
+- ConversationService reads the prompt and the compiled phrase matcher from
+  it (PersonaService.get_runtime caches one per validated model, so an edit
+  rebuilds it with the model).
+- PlayAIdes keeps one for the active persona (`runtime`, `active_id`) for
+  routing ids, wake/dismiss words, the TTS voice and the animation plan.
+
+The phrase matcher keeps match_phrase_trigger's semantics exactly:
+case-insensitive, prefix-only, word-boundary, first enabled trigger wins.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
+
+from persona import Persona
+
+
+def slug(name: str) -> str:
+    """The persona-id slug rule (single home, moved from create_persona)."""
+    return name.strip().lower().replace(" ", "_")
+
+
+def build_system_prompt(persona: Persona, memories: bool = True) -> str:
+    # Byte-for-byte the prompt ConversationService always sent: the backend
+    # prompt caches are keyed on it. getattr throughout: PlayAIdes also builds
+    # runtimes for duck-typed personas that carry only a few fields.
+    # memories=False leaves out the memories sentence (PersonaMemory sends
+    # the relevant entries with the user's message instead).
+    include_memories = memories
+    psyche = getattr(persona, "psyche", None)
+    memories = getattr(persona, "memories", None)
+    voice = getattr(persona, "persona_voice", None)
+    sp = (f"You are impersonating a this character named"
+          f"{persona.name}. "
+          f"Your background is: {getattr(persona, 'back_ground', '')}. ")
+    if psyche and psyche.traits:
+        sp += (f"Your Psyche contains the following traits"
+               f"{', '.join(psyche.traits)}. ")
+    if include_memories and memories and memories.memories:
+        sp += (f"your memories are: {memories.memories}.")
+    sp += "be a helpful assistant to the user. with yor responses in character"
+    if voice and voice.voice is not None:      # Voice.is_voice_valid()
+        sp += (f"your response will be sent to a TTS service to be spoken."
+               f"please make sure your response does not contain things not spoken. no emojis")
+    return sp
+
+
+@dataclass(frozen=True)
+class AnimationPlan:
+    model_url: Optional[str] = None
+    background_url: Optional[str] = None
+    intro: Optional[str] = None
+    idle: Optional[str] = None
+    spawn_point: Tuple[float, ...] = ()
+    camera_target: Tuple[float, ...] = ()
+
+    @property
+    def is_vrm(self) -> bool:
+        return bool(self.model_url) and self.model_url.lower().endswith(".vrm")
+
+
+@dataclass(frozen=True)
+class PhraseTrigger:
+    phrase: str                            # lower-cased
+    skill: str
+    params: Tuple[Tuple[str, object], ...]
+
+
+@dataclass(frozen=True)
+class PersonaRuntime:
+    persona_id: str
+    name: str
+    system_prompt: str
+    memoryless_prompt: str                 # system_prompt minus the memories
+    voice_id: Optional[str]
+    wake_words: Tuple[str, ...]
+    dismiss_words: Tuple[str, ...]
+    triggers: Tuple[PhraseTrigger, ...]
+    animation: AnimationPlan
+    # The model it was built from: a cache holding both checks identity.
+    persona: Persona = field(repr=False, compare=False)
+
+    @classmethod
+    def build(cls, persona: Persona, persona_id: Optional[str] = None) -> "PersonaRuntime":
+        enabled = set(getattr(persona, "skills", None) or ())
+        triggers = tuple(
+            PhraseTrigger(t.on.phrase.lower(), t.do.skill, tuple(t.do.params.items()))
+            for t in getattr(persona, "triggers", None) or ()
+            if t.on.phrase and t.do.skill in enabled)
+        avatar = getattr(persona, "avatar", None)
+        voice = getattr(persona, "persona_voice", None)
+        return cls(
+            persona_id=persona_id or slug(persona.name),
+            name=persona.name,
+            system_prompt=build_system_prompt(persona),
+            memoryless_prompt=build_system_prompt(persona, memories=False),
+            voice_id=voice.voice if voice and voice.voice else None,
+            wake_words=tuple(getattr(persona, "wake_words", None) or ()),
+            dismiss_words=tuple(getattr(persona, "dismiss_words", None) or ()),
+            triggers=triggers,
+            animation=AnimationPlan(
+                model_url=avatar.model_url,
+                background_url=avatar.background_url,
+                intro=avatar.intro_animation,
+                idle=avatar.idle_animation,
+                spawn_point=tuple(avatar.spawn_point or ()),
+                camera_target=tuple(avatar.camera_target or ()),
+            ) if avatar else AnimationPlan(),
+            persona=persona,
+        )
+
+    def match_trigger(self, text: str) -> Optional[Tuple[str, dict]]:
+        """(skill_name, params) of the first enabled phrase trigger whose
+        phrase prefixes *text* on a word boundary, else None."""
+        if not self.triggers:
+            return None
+        lowered = text.strip().lower()
+        for trig in self.triggers:
+            end = len(trig.phrase)
+            if lowered.startswith(trig.phrase) and (end == len(lowered)
+                                                    or not lowered[end].isalnum()):
+                return trig.skill, dict(trig.params)
+        return None
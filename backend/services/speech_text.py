@@ -0,0 +1,135 @@
+"""TTS-safe text: what the persona should *say* for what it wrote.
+
+The system prompt asks for no emojis, but replies still arrive with
+markdown, asterisked stage directions (*smiles warmly*), emoji and URLs. The
+subtitle should keep them; the voice rig should not spend synthesis time on
+them or read "asterisk" and "h t t p s" aloud. sanitize_for_speech() maps a
+complete text; SpeechSanitizer does the same incrementally on the reply
+stream:
+
+    s = SpeechSanitizer()
+    for chunk in llm.chat_stream(...):
+        spoken += s.feed(chunk)      # only text that can no longer change
+    spoken += s.flush()
+
+Chunk-boundary safety: feed() only releases text up to the last whitespace
+and holds back while a construct is still open — an odd `*` or backtick, an
+unclosed `[link](`, a code fence — so "*lau" + "ghs*" is dropped as one
+stage direction, never half-spoken. A hold-back longer than MAX_HOLD_CHARS is
+released anyway (an unpaired asterisk must not swallow the reply).
+
+Rules: code blocks are dropped; `*stage directions*` are dropped while
+`**bold**` / `_em_` keep their words; headings, bullets and quote markers
+lose their markup; [text](url) keeps the text; bare URLs become their
+domain; emoji (incl. ZWJ sequences, skin tones, variation selectors) are
+removed; whitespace is collapsed.
+"""
+from __future__ import annotations
+
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+MAX_HOLD_CHARS = 400
+
+_FENCE = re.compile(r"```.*?(```|$)", re.S)
+_IMAGE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+_LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_URL = re.compile(r"\b(?:https?://|www\.)(?:www\.)?([^/\s:?#]+)[^\s]*", re.I)
+_BOLD = re.compile(r"(\*\*|__)(.+?)\1", re.S)
+_STAGE = re.compile(r"(?<![\w*])\*(?!\s)[^*\n]+?(?<!\s)\*(?![\w*])")
+_EM = re.compile(r"(?<!\w)_(?!\s)([^_\n]+?)(?<!\s)_(?!\w)")
+_CODE = re.compile(r"`([^`\n]*)`")
+_LINE_MARKUP = re.compile(r"(?m)^[ \t]*(?:#{1,6}[ \t]+|>[ \t]?|[-*+•][ \t]+)")
+_EMOJI = re.compile(
+    "[\U0001F000-\U0001FAFF\U00002600-\U000027BF\U0001F1E6-\U0001F1FF"
+    "\U0000FE0F\U0000200D\U00002B00-\U00002BFF\U0001F3FB-\U0001F3FF\U000E0020-\U000E007F]+")
+_SPACES = re.compile(r"\s+")
+_SPACE_BEFORE_PUNCT = re.compile(r" +([,.!?;:])")
+
+
+def _strip_line_markup(text: str, line_start: bool) -> str:
+    if line_start:
+        return _LINE_MARKUP.sub("", text)
+    # Mid-line piece: its first line cannot carry heading/bullet markup.
+    first, nl, rest = text.partition("\n")
+    return first + nl + _LINE_MARKUP.sub("", rest)
+
+
+def sanitize_for_speech(text: str, line_start: bool = True) -> str:
+    """Speakable form of a complete text (see module docstring)."""
+    text = _FENCE.sub(" ", text)
+    text = _IMAGE.sub(" ", text)
+    text = _LINK.sub(r"\1", text)
+    text = _URL.sub(r"\1", text)
+    text = _strip_line_markup(text, line_start)
+    text = _BOLD.sub(r"\2", text)
+    text = _STAGE.sub(" ", text)
+    text = _EM.sub(r"\1", text)
+    text = _CODE.sub(r"\1", text)
+    text = _EMOJI.sub("", text)
+    text = _SPACES.sub(" ", text)
+    return _SPACE_BEFORE_PUNCT.sub(r"\1", text)
+
+
+def _open_construct(text: str, line_start: bool) -> bool:
+    """True while *text* ends inside something a later chunk may close."""
+    if text.count("```") % 2:
+        return True
+    text = _strip_line_markup(_FENCE.sub("", text), line_start)
+    if text.count("**") % 2 or text.count("__") % 2:
+        return True
+    # A lone " * " (arithmetic) never opens a stage direction.
+    if len(re.findall(r"(?<!\s)\*|\*(?!\s)", text.replace("**", ""))) % 2:
+        return True
+    if text.count("`") % 2:
+        return True
+    rest = _LINK.sub("", _IMAGE.sub("", text))
+    i = rest.rfind("[")
+    return i != -1 and ("]" not in rest[i:] or re.search(r"\]\([^)]*$", rest[i:]) is not None)
+
+
+class SpeechSanitizer:
+    """Incremental sanitize_for_speech over a chunk stream."""
+
+    def __init__(self) -> None:
+        self._buf = ""
+        self._line_start = True      # the held text begins a line
+        self._started = False        # anything spoken yet
+        self._pending_space = False  # a space owed before the next word
+        self.raw_chars = 0
+        self.spoken_chars = 0
+
+    def feed(self, chunk: str) -> str:
+        self.raw_chars += len(chunk)
+        self._buf += chunk
+        cut = max(self._buf.rfind(" "), self._buf.rfind("\n"), self._buf.rfind("\t")) + 1
+        if cut <= 0:
+            return ""
+        head = self._buf[:cut]
+        if _open_construct(head, self._line_start) and len(self._buf) <= MAX_HOLD_CHARS:
+            return ""
+        self._buf = self._buf[cut:]
+        return self._release(head)
+
+    def flush(self) -> str:
+        head, self._buf = self._buf, ""
+        return self._release(head)
+
+    def _release(self, head: str) -> str:
+        text = sanitize_for_speech(head, self._line_start)
+        self._line_start = head.endswith("\n")
+        body = text.strip()
+        if not body:
+            self._pending_space |= bool(text)
+            return ""
+        # Spaces are emitted lazily so a piece starting with punctuation
+        # (after a dropped emoji or stage direction) attaches to the word.
+        space = (self._pending_space or text[0] == " ") and self._started \
+            and body[0] not in ",.!?;:"
+        self._started = True
+        self._pending_space = text[-1] == " "
+        out = (" " if space else "") + body
+        self.spoken_chars += len(out)
+        return out
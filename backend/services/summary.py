@@ -0,0 +1,191 @@
+"""HistorySummarizer — a running summary of what the history cap trimmed off.
+
+ConversationService keeps at most CHAT_HISTORY_CAP messages per persona and
+drops the oldest block (a quarter of the cap) when a turn overflows it: that
+conversation used to vanish from the model's view, and raising the cap costs
+prompt tokens on every turn. Now the dropped block is handed to fold(), and a
+single background worker asks the LLM — through the scheduler's "background"
+class, so it never delays a voice or REST turn — to merge it into the
+persona's running summary, capped at HISTORY_SUMMARY_WORDS (default 150;
+0 = off) words. The summary is appended to the persona's system prompt, so
+long-term context costs a fixed number of tokens however long the
+relationship runs.
+
+- Off the turn path: fold() only queues. Blocks that arrive while a fold is
+  queued are merged into the same call.
+- A failed call keeps its messages queued (at most MAX_PENDING, newest
+  kept) for the next fold; the summary on disk is left as it was.
+- Summaries persist per persona (backend/stores/summary.py). forget() drops
+  one with its history; a fold already in flight for it is discarded.
+- The system prompt changes only when a fold lands (every ~cap/8 turns), so
+  the backend's prompt cache stays warm in between.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORDS = 150
+MAX_PENDING = 400
+MESSAGE_CHARS = 600                      # per message, in the fold prompt
+SUMMARY_HEADER = "Summary of your earlier conversation with the user: "
+SUMMARY_SYSTEM = (
+    "You maintain a running summary of a long conversation between a user "
+    "and a character. Keep facts the character should remember: names, "
+    "preferences, plans, promises, open questions and how the user feels. "
+    "Drop small talk. Write plain prose in the third person, no lists.")
+
+
+def _clip(text: str, max_words: int) -> str:
+    words = text.split()
+    return " ".join(words[:max_words])
+
+
+class HistorySummarizer:
+    def __init__(self, llm, store, *, max_words: Optional[int] = None,
+                 clock: Callable[[], float] = time.time) -> None:
+        # `llm` is expected to be bound to background priority
+        # (LLMScheduler.bind("background")).
+        self._llm = llm
+        self._store = store
+        self._clock = clock
+        self.max_words = int(max_words if max_words is not None
+                             else os.environ.get("HISTORY_SUMMARY_WORDS", DEFAULT_MAX_WORDS))
+        # persona_id → (text, messages covered); loaded lazily from the store.
+        self._summaries: Dict[str, Tuple[Optional[str], int]] = {}
+        self._pending: Dict[str, List[dict]] = {}
+        self._scheduled: set = set()
+        # Bumped by forget(): a fold started before it must not write.
+        self._epochs: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._worker = ThreadPoolExecutor(max_workers=1,
+                                          thread_name_prefix="history-summary")
+        self._folds = 0
+        self._failed = 0
+        self._messages = 0
+        self._dropped = 0
+        self._last_ms: Optional[float] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_words > 0
+
+    # ── reads ────────────────────────────────────────────────────────────
+    def _entry(self, persona_id: str) -> Tuple[Optional[str], int]:
+        with self._lock:
+            entry = self._summaries.get(persona_id)
+        if entry is not None:
+            return entry
+        doc = self._store.read(persona_id) or {}
+        entry = (doc.get("text") or None, int(doc.get("messages") or 0))
+        with self._lock:
+            return self._summaries.setdefault(persona_id, entry)
+
+    def get(self, persona_id: str) -> Optional[str]:
+        """The persona's running summary, or None."""
+        return self._entry(persona_id)[0]
+
+    def system_prompt(self, persona_id: str, base: str) -> str:
+        """*base* with the persona's summary appended, if it has one."""
+        summary = self.get(persona_id)
+        return f"{base} {SUMMARY_HEADER}{summary}" if summary else base
+
+    # ── folding ──────────────────────────────────────────────────────────
+    def fold(self, persona_id: str, messages: List[dict]) -> None:
+        """Queue *messages* (just trimmed off the history) to be merged into
+        the summary in the background."""
+        if not self.enabled or not messages:
+            return
+        with self._lock:
+            pending = self._pending.setdefault(persona_id, [])
+            pending.extend(messages)
+            self._trim_pending(persona_id)
+            if persona_id in self._scheduled:
+                return
+            self._scheduled.add(persona_id)
+        self._worker.submit(self._run, persona_id)
+
+    def _trim_pending(self, persona_id: str) -> None:
+        pending = self._pending[persona_id]
+        if len(pending) > MAX_PENDING:
+            self._dropped += len(pending) - MAX_PENDING
+            del pending[:len(pending) - MAX_PENDING]
+
+    def _run(self, persona_id: str) -> None:
+        with self._lock:
+            self._scheduled.discard(persona_id)
+            messages = self._pending.pop(persona_id, [])
+            epoch = self._epochs.get(persona_id, 0)
+        if not messages:
+            return
+        previous, covered = self._entry(persona_id)
+        t0 = time.monotonic()
+        try:
+            text = self._summarize(previous, messages)
+        except Exception:
+            logger.exception("History summary for %s failed; %d messages kept queued",
+                             persona_id, len(messages))
+            with self._lock:
+                self._failed += 1
+                if self._epochs.get(persona_id, 0) == epoch:
+                    self._pending[persona_id] = messages + self._pending.get(persona_id, [])
+                    self._trim_pending(persona_id)
+            return
+        elapsed_ms = round((time.monotonic() - t0) * 1000, 1)
+        with self._lock:
+            if self._epochs.get(persona_id, 0) != epoch:
+                return                          # forgotten meanwhile
+            entry = (text, covered + len(messages))
+            try:
+                self._store.write(persona_id, {"text": text, "messages": entry[1],
+                                               "updated": self._clock()})
+            except OSError:
+                logger.exception("Failed to persist the history summary of %s", persona_id)
+            self._summaries[persona_id] = entry
+            self._folds += 1
+            self._messages += len(messages)
+            self._last_ms = elapsed_ms
+        logger.info("Folded %d messages into %s's summary (%.0f ms)",
+                    len(messages), persona_id, elapsed_ms)
+
+    def _summarize(self, previous: Optional[str], messages: List[dict]) -> str:
+        transcript = "\n".join(
+            f"{m.get('role', 'user')}: {(m.get('content') or '')[:MESSAGE_CHARS]}"
+            for m in messages)
+        prompt = (f"Current summary:\n{previous or '(none yet)'}\n\n"
+                  f"Conversation that followed:\n{transcript}\n\n"
+                  f"Rewrite the summary to include the conversation above, "
+                  f"in at most {self.max_words} words. Reply with the summary only.")
+        text = _clip((self._llm.chat([{"role": "user", "content": prompt}],
+                                     system_prompt=SUMMARY_SYSTEM) or "").strip(),
+                     self.max_words)
+        if not text:
+            raise ValueError("the LLM returned an empty summary")
+        return text
+
+    def forget(self, persona_id: str) -> None:
+        """Drop the persona's summary and anything queued for it."""
+        with self._lock:
+            self._epochs[persona_id] = self._epochs.get(persona_id, 0) + 1
+            self._pending.pop(persona_id, None)
+            self._summaries[persona_id] = (None, 0)
+            self._store.delete(persona_id)
+
+    def drain(self, timeout: Optional[float] = None) -> None:
+        """Block until the folds queued so far have run."""
+        self._worker.submit(lambda: None).result(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"enabled": self.enabled, "max_words": self.max_words,
+                    "folds": self._folds, "failed": self._failed,
+                    "messages_folded": self._messages,
+                    "messages_dropped": self._dropped,
+                    "pending": sum(len(v) for v in self._pending.values()),
+                    "last_fold_ms": self._last_ms}
@@ -0,0 +1,166 @@
+"""Pure file I/O for archived chat history (personas/<id>/archive/).
+
+The history journal (backend/stores/history.py) is compacted down to its
+last HISTORY_JOURNAL_KEEP messages; what compaction cuts used to be gone.
+With a HistoryArchive the cut messages are written, oldest first, as one
+immutable gzip segment per compaction:
+
+    archive/<bucket>-<seq>.jsonl.gz    one JSON message per line
+    archive/index.json                 [{"segment", "bucket", "first", "count",
+                                         "bytes", "archived_at"}, ...]
+
+`bucket` is the UTC month the segment was archived in (messages carry no
+timestamps of their own), `first` the segment's first message number in
+the persona's whole archived history. A page read bisects the index and
+decompresses only the segments it touches.
+
+Crash safety: a segment and then the index are each written to a sibling
+tempfile and renamed into place. A segment the index does not list (crash
+between the two) is ignored and its name is not reused. Archiving is
+at-least-once: if the journal rewrite that follows fails, the next
+compaction archives the same messages again.
+"""
+from __future__ import annotations
+
+import bisect
+import gzip
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+from backend.stores.personas import _check_id
+
+logger = logging.getLogger(__name__)
+
+DIRNAME = "archive"
+INDEX = "index.json"
+COMPRESSLEVEL = 6
+
+
+def pack(messages: List[dict]) -> bytes:
+    """A segment's bytes: gzip'd JSONL. CPU-bound; callers may run it
+    outside their locks and hand the result to add_segment()."""
+    data = b"".join((json.dumps(m, ensure_ascii=False) + "\n").encode("utf-8")
+                    for m in messages)
+    return gzip.compress(data, compresslevel=COMPRESSLEVEL, mtime=0)
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    with tempfile.NamedTemporaryFile(
+        mode="wb", dir=str(path.parent), delete=False,
+        prefix=f".{path.name}.", suffix=".tmp",
+    ) as tf:
+        tf.write(data)
+        tf.flush()
+        os.fsync(tf.fileno())
+        tmp_path = tf.name
+    try:
+        os.replace(tmp_path, str(path))
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class HistoryArchive:
+    def __init__(self, base_dir: Union[str, Path] = "personas"):
+        self.base_dir = Path(base_dir)
+        self._lock = threading.Lock()
+
+    def _dir(self, persona_id: str) -> Path:
+        _check_id(persona_id)
+        return self.base_dir / persona_id / DIRNAME
+
+    # ── index ────────────────────────────────────────────────────────────
+    def segments(self, persona_id: str) -> List[dict]:
+        """The persona's index, oldest segment first ([] if none)."""
+        path = self._dir(persona_id) / INDEX
+        try:
+            index = json.loads(path.read_text())
+        except FileNotFoundError:
+            return []
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning("Failed to read %s: %s — archive unreadable", path, e)
+            return []
+        return index if isinstance(index, list) else []
+
+    def count(self, persona_id: str) -> int:
+        index = self.segments(persona_id)
+        return index[-1]["first"] + index[-1]["count"] if index else 0
+
+    # ── writes ───────────────────────────────────────────────────────────
+    def append(self, persona_id: str, messages: List[dict]) -> Optional[dict]:
+        """Archive *messages* (oldest first) as a new segment."""
+        if not messages:
+            return None
+        return self.add_segment(persona_id, pack(messages), len(messages))
+
+    def add_segment(self, persona_id: str, blob: bytes, count: int,
+                    now: Optional[float] = None) -> dict:
+        """Store a pack()ed segment of *count* messages and index it."""
+        d = self._dir(persona_id)
+        now = time.time() if now is None else now
+        bucket = time.strftime("%Y-%m", time.gmtime(now))
+        with self._lock:
+            d.mkdir(parents=True, exist_ok=True)
+            index = self.segments(persona_id)
+            seq = len(index)
+            while (d / f"{bucket}-{seq:05d}.jsonl.gz").exists():
+                seq += 1                    # orphan from a crashed append
+            name = f"{bucket}-{seq:05d}.jsonl.gz"
+            _atomic_write(d / name, blob)
+            entry = {"segment": name, "bucket": bucket,
+                     "first": index[-1]["first"] + index[-1]["count"] if index else 0,
+                     "count": count, "bytes": len(blob), "archived_at": now}
+            index.append(entry)
+            _atomic_write(d / INDEX, json.dumps(index, indent=2).encode("utf-8"))
+        return entry
+
+    def delete(self, persona_id: str) -> None:
+        d = self._dir(persona_id)
+        with self._lock:
+            if d.exists():
+                shutil.rmtree(d)
+
+    # ── reads ────────────────────────────────────────────────────────────
+    def read_segment(self, persona_id: str, segment: str) -> List[dict]:
+        path = self._dir(persona_id) / segment
+        out = []
+        with gzip.open(path, "rb") as f:
+            for raw in f:
+                if raw.strip():
+                    out.append(json.loads(raw))
+        return out
+
+    def page(self, persona_id: str, offset: int = 0,
+             limit: int = 100) -> Tuple[int, List[dict]]:
+        """(total archived, messages[offset:offset + limit]), oldest first."""
+        index = self.segments(persona_id)
+        total = index[-1]["first"] + index[-1]["count"] if index else 0
+        if offset >= total or limit <= 0:
+            return total, []
+        i = bisect.bisect_right([e["first"] for e in index], offset) - 1
+        out: List[dict] = []
+        end = min(total, offset + limit)
+        for entry in index[i:]:
+            if entry["first"] >= end:
+                break
+            messages = self.read_segment(persona_id, entry["segment"])
+            lo = max(0, offset - entry["first"])
+            out.extend(messages[lo:end - entry["first"]])
+        return total, out
+
+    def stats(self, persona_id: str) -> dict:
+        index = self.segments(persona_id)
+        return {"segments": len(index),
+                "messages": index[-1]["first"] + index[-1]["count"] if index else 0,
+                "bytes": sum(e["bytes"] for e in index),
+                "buckets": sorted({e["bucket"] for e in index})}
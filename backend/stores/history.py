@@ -1,9 +1,32 @@
-"""Pure file I/O for per-persona chat history (personas/<id>/chat_history.json).
+"""Pure file I/O for per-persona chat history (personas/<id>/chat_history.jsonl).
 
-Atomic writes (sibling tempfile + os.replace, unlink-on-failure) ported
-verbatim from PlayAIdes._save_history so a mid-write crash never corrupts the
-file. Corrupt/unreadable history degrades to empty with a warning (ported from
-PlayAIdes._load_history).
+An append-only journal, one JSON message per line. The old store
+re-serialized the whole history (indent=2) to a tempfile and renamed it over
+chat_history.json after every turn, and read parsed all of it to keep the
+last CHAT_HISTORY_CAP messages. Now:
+
+- write(persona_id, history) appends only the messages after the last one
+  this store read or wrote for that persona (found by identity from the end
+  of `history`), in one write + one fsync: a turn's two messages. A list it
+  cannot place (replaced wholesale, or first write in this process) is
+  rewritten whole, atomically, as before.
+- read(persona_id, limit=N) seeks back from the end of the file and parses
+  only the last N messages.
+- Past HISTORY_COMPACT_BYTES (default 4 MiB) a background job rewrites the
+  journal down to its last HISTORY_JOURNAL_KEEP (default 1000) messages.
+  With an `archive` (backend/stores/archive.py) the messages it cuts are
+  kept as a compressed archive segment first; without one they are gone.
+
+Crash safety: a whole-file rewrite is still a sibling tempfile, fsync and
+os.replace (unlink-on-failure), so the old file survives a failed write. An
+append torn by a crash leaves at most a partial last line: readers skip
+lines that do not parse, and the next append starts on a fresh line. The
+compaction swaps in its rewrite under the persona's lock, copying any
+appends that raced it.
+
+A legacy chat_history.json is migrated on first touch (rewritten as the
+journal, then removed). Corrupt/unreadable history degrades to empty with a
+warning (ported from PlayAIdes._load_history).
 """
 from __future__ import annotations
 
@@ -11,41 +34,180 @@ import json
 import logging
 import os
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Union
+from typing import Dict, List, Optional, Tuple, Union
 
+from backend.stores.archive import pack as archive_pack
 from backend.stores.personas import _check_id
 
 logger = logging.getLogger(__name__)
 
+JOURNAL = "chat_history.jsonl"
+LEGACY = "chat_history.json"
+DEFAULT_COMPACT_BYTES = 4 * 1024 * 1024
+DEFAULT_KEEP = 1000
+_BLOCK = 64 * 1024
+
+
+def _line(message: dict) -> bytes:
+    return (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _parse_lines(data: bytes, path: Path) -> List[dict]:
+    out = []
+    for raw in data.split(b"\n"):
+        if not raw.strip():
+            continue
+        try:
+            out.append(json.loads(raw))
+        except ValueError:
+            # A torn append (crash mid-write) or a hand edit gone wrong.
+            logger.warning("Skipping unreadable line in %s", path)
+    return out
+
 
 class HistoryStore:
-    def __init__(self, base_dir: Union[str, Path] = "personas"):
+    def __init__(self, base_dir: Union[str, Path] = "personas", *,
+                 compact_bytes: Optional[int] = None,
+                 keep: Optional[int] = None,
+                 archive=None):
         self.base_dir = Path(base_dir)
+        self.archive = archive
+        self.compact_bytes = int(compact_bytes if compact_bytes is not None
+                                 else os.environ.get("HISTORY_COMPACT_BYTES",
+                                                     DEFAULT_COMPACT_BYTES))
+        self.keep = int(keep if keep is not None
+                        else os.environ.get("HISTORY_JOURNAL_KEEP", DEFAULT_KEEP))
+        # Last message object read or written per persona: where the next
+        # write's new messages start.
+        self._tails: Dict[str, dict] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+        self._compacting: set = set()
+        self._compactor = ThreadPoolExecutor(max_workers=1,
+                                             thread_name_prefix="history-compact")
 
     def _path(self, persona_id: str) -> Path:
         _check_id(persona_id)
-        return self.base_dir / persona_id / "chat_history.json"
+        return self.base_dir / persona_id / JOURNAL
 
-    def read(self, persona_id: str) -> list:
+    def _lock(self, persona_id: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(persona_id, threading.Lock())
+
+    # ── reads ────────────────────────────────────────────────────────────
+    def read(self, persona_id: str, limit: Optional[int] = None) -> list:
+        """The persisted history, or only its last *limit* messages."""
         path = self._path(persona_id)
-        if not path.exists():
-            return []
-        try:
-            return json.loads(path.read_text())
-        except (json.JSONDecodeError, OSError) as e:
-            logger.warning("Failed to read %s: %s — starting empty", path, e)
+        with self._lock(persona_id):
+            if not self._migrate(persona_id, path):
+                return []
+            try:
+                history = (self._read_tail(path, limit) if limit is not None
+                           else _parse_lines(path.read_bytes(), path))
+            except FileNotFoundError:
+                return []
+            except OSError as e:
+                logger.warning("Failed to read %s: %s — starting empty", path, e)
+                return []
+            if history:
+                self._tails[persona_id] = history[-1]
+            else:
+                self._tails.pop(persona_id, None)
+            return history
+
+    def _read_tail(self, path: Path, limit: int) -> List[dict]:
+        if limit <= 0:
             return []
+        with open(path, "rb") as f:
+            end = f.seek(0, os.SEEK_END)
+            pos, data = end, b""
+            while True:
+                step = min(_BLOCK, pos)
+                pos -= step
+                f.seek(pos)
+                data = f.read(step) + data
+                # Before BOF the first line may be cut: parse whole lines only.
+                body = data if pos == 0 else data[data.find(b"\n") + 1:]
+                messages = _parse_lines(body, path) if (
+                    pos == 0 or body.count(b"\n") >= limit) else []
+                if pos == 0 or len(messages) >= limit:
+                    return messages[-limit:]
+
+    def page(self, persona_id: str, offset: int = 0,
+             limit: int = 100) -> Tuple[int, List[dict]]:
+        """(total, messages[offset:offset + limit]) of the persona's whole
+        history, oldest first: the archive, then the journal."""
+        path = self._path(persona_id)
+        with self._lock(persona_id):
+            # Under the lock, so no compaction moves messages in between.
+            archived = self.archive.count(persona_id) if self.archive is not None else 0
+            journal: List[dict] = []
+            if self._migrate(persona_id, path):
+                try:
+                    journal = _parse_lines(path.read_bytes(), path)
+                except FileNotFoundError:
+                    pass
+        total = archived + len(journal)
+        out: List[dict] = []
+        if offset < archived:
+            out = self.archive.page(persona_id, offset, min(limit, archived - offset))[1]
+        start = max(0, offset - archived)
+        out.extend(journal[start:start + limit - len(out)])
+        return total, out
 
+    # ── writes ───────────────────────────────────────────────────────────
     def write(self, persona_id: str, history: list) -> None:
+        """Persist *history*: append what is new since the last read/write,
+        else rewrite the journal as exactly *history*."""
         path = self._path(persona_id)
         path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock(persona_id):
+            new = self._new_messages(persona_id, history)
+            if new is None:
+                self._rewrite(path, b"".join(_line(m) for m in history))
+                self._drop_legacy(path)
+            elif new:
+                self._append(path, new)
+            if history:
+                self._tails[persona_id] = history[-1]
+            else:
+                self._tails.pop(persona_id, None)
+        self._maybe_compact(persona_id, path)
+
+    def _new_messages(self, persona_id: str, history: list) -> Optional[list]:
+        """Messages after the persisted tail, or None if it is not in
+        *history* (the journal has to be rewritten)."""
+        tail = self._tails.get(persona_id)
+        if tail is None or not self._path(persona_id).exists():
+            return None
+        for i in range(len(history) - 1, -1, -1):
+            if history[i] is tail:
+                return history[i + 1:]
+        return None
+
+    def _append(self, path: Path, messages: list) -> None:
+        data = b"".join(_line(m) for m in messages)
+        with open(path, "ab+") as f:
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    data = b"\n" + data          # after a torn append
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _rewrite(self, path: Path, data: bytes) -> None:
         # Write to a sibling tempfile, then atomically rename over the target.
         with tempfile.NamedTemporaryFile(
-            mode="w", dir=str(path.parent), delete=False,
-            prefix=".chat_history.", suffix=".json.tmp",
+            mode="wb", dir=str(path.parent), delete=False,
+            prefix=".chat_history.", suffix=".jsonl.tmp",
         ) as tf:
-            json.dump(history, tf, ensure_ascii=False, indent=2)
+            tf.write(data)
+            tf.flush()
+            os.fsync(tf.fileno())
             tmp_path = tf.name
         try:
             os.replace(tmp_path, str(path))
@@ -58,5 +220,94 @@ class HistoryStore:
 
     def delete(self, persona_id: str) -> None:
         path = self._path(persona_id)
+        with self._lock(persona_id):
+            self._tails.pop(persona_id, None)
+            for p in (path, path.with_name(LEGACY)):
+                if p.exists():
+                    p.unlink()
+        if self.archive is not None:
+            self.archive.delete(persona_id)
+
+    # ── migration ────────────────────────────────────────────────────────
+    def _migrate(self, persona_id: str, path: Path) -> bool:
+        """Turn a legacy chat_history.json into the journal. False if there
+        is nothing readable to return (no journal, corrupt legacy file)."""
         if path.exists():
-            path.unlink()
+            return True
+        legacy = path.with_name(LEGACY)
+        if not legacy.exists():
+            return False
+        try:
+            history = json.loads(legacy.read_text())
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning("Failed to read %s: %s — starting empty", legacy, e)
+            return False
+        self._rewrite(path, b"".join(_line(m) for m in history))
+        self._drop_legacy(path)
+        logger.info("Migrated %s to %s (%d messages)", legacy, path.name, len(history))
+        return True
+
+    @staticmethod
+    def _drop_legacy(path: Path) -> None:
+        try:
+            path.with_name(LEGACY).unlink()
+        except FileNotFoundError:
+            pass
+
+    # ── compaction ───────────────────────────────────────────────────────
+    def _maybe_compact(self, persona_id: str, path: Path) -> None:
+        if self.compact_bytes <= 0:
+            return
+        try:
+            if path.stat().st_size <= self.compact_bytes:
+                return
+        except FileNotFoundError:
+            return
+        with self._locks_lock:
+            if persona_id in self._compacting:
+                return
+            self._compacting.add(persona_id)
+        self._compactor.submit(self._compact_job, persona_id)
+
+    def _compact_job(self, persona_id: str) -> None:
+        try:
+            self.compact(persona_id)
+        except Exception:
+            logger.exception("History compaction of %s failed", persona_id)
+        finally:
+            with self._locks_lock:
+                self._compacting.discard(persona_id)
+
+    def compact(self, persona_id: str) -> int:
+        """Rewrite the journal down to its last `keep` messages, archiving
+        the rest. Appends that land meanwhile are carried over. Returns the
+        messages dropped."""
+        path = self._path(persona_id)
+        try:
+            with open(path, "rb") as f:
+                inode = os.fstat(f.fileno()).st_ino
+                data = f.read()
+        except FileNotFoundError:
+            return 0
+        cut = len(data)
+        messages = _parse_lines(data, path)
+        dropped = max(0, len(messages) - self.keep)
+        if not dropped:
+            return 0
+        kept = b"".join(_line(m) for m in messages[dropped:])
+        segment = (archive_pack(messages[:dropped])
+                   if self.archive is not None else None)
+        with self._lock(persona_id):
+            try:
+                with open(path, "rb") as f:
+                    if os.fstat(f.fileno()).st_ino != inode:
+                        return 0             # rewritten meanwhile; next time
+                    f.seek(cut)
+                    raced = f.read()
+            except FileNotFoundError:
+                return 0
+            if segment is not None:
+                self.archive.add_segment(persona_id, segment, dropped)
+            self._rewrite(path, kept + raced)
+        logger.info("Compacted %s: dropped %d messages", path, dropped)
+        return dropped
@@ -0,0 +1,201 @@
+"""File I/O for per-persona vector memory (personas/<id>/memory/).
+
+    memory/entries.jsonl   one {"text": ...} per memory entry, in row order
+    memory/vectors.f32     the entries' unit-length embeddings, float32,
+                           row-major, one row per entry (append-only)
+    memory/meta.json       {"dim", "model", "source", "imported"}
+
+The vector file is opened as a read-only numpy.memmap: the OS page cache
+holds the matrix, so an idle persona costs no process memory and a search
+is one matrix-vector product over pages that are already resident. Rows
+are appended (one write + fsync per file), then the map is reopened at the
+new length. The entry count is the smaller of the two files' row counts,
+so a crash between the two appends leaves at most an unlisted tail row,
+which the next append overwrites. A cached map is checked against
+entries.jsonl's stat on each use, so one removed with the persona's
+directory is not served afterwards.
+
+numpy is an optional dependency (the `memory` extra): without it `available`
+is False and PersonaMemory keeps the whole memories string in the prompt.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from backend.stores.personas import _check_id
+
+try:
+    import numpy as np
+except ImportError:                     # optional: pip install .[memory]
+    np = None
+
+logger = logging.getLogger(__name__)
+
+DIRNAME = "memory"
+ENTRIES = "entries.jsonl"
+VECTORS = "vectors.f32"
+META = "meta.json"
+
+
+def _stamp(path: Path):
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size)
+
+
+class _Matrix:
+    __slots__ = ("texts", "vectors", "dim", "stamp")
+
+    def __init__(self, texts: List[str], vectors, dim: int, stamp) -> None:
+        self.texts = texts
+        self.vectors = vectors          # np.memmap (count, dim), or None if empty
+        self.dim = dim
+        self.stamp = stamp              # entries.jsonl (inode, size), None if absent
+
+
+class VectorMemoryStore:
+    available = np is not None
+
+    def __init__(self, base_dir: Union[str, Path] = "personas"):
+        self.base_dir = Path(base_dir)
+        self._open: Dict[str, _Matrix] = {}
+        self._lock = threading.Lock()
+
+    def _dir(self, persona_id: str) -> Path:
+        _check_id(persona_id)
+        return self.base_dir / persona_id / DIRNAME
+
+    # ── reads ────────────────────────────────────────────────────────────
+    def meta(self, persona_id: str) -> dict:
+        try:
+            return json.loads((self._dir(persona_id) / META).read_text())
+        except FileNotFoundError:
+            return {}
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning("Failed to read memory meta of %s: %s", persona_id, e)
+            return {}
+
+    def count(self, persona_id: str) -> int:
+        return len(self._matrix(persona_id).texts)
+
+    def texts(self, persona_id: str) -> List[str]:
+        return list(self._matrix(persona_id).texts)
+
+    def _matrix(self, persona_id: str) -> _Matrix:
+        stamp = _stamp(self._dir(persona_id) / ENTRIES)
+        with self._lock:
+            m = self._open.get(persona_id)
+            if m is None or m.stamp != stamp:
+                m = self._open[persona_id] = self._load(persona_id)
+            return m
+
+    def _load(self, persona_id: str) -> _Matrix:
+        d = self._dir(persona_id)
+        stamp = _stamp(d / ENTRIES)
+        dim = int(self.meta(persona_id).get("dim") or 0)
+        texts: List[str] = []
+        try:
+            with open(d / ENTRIES, encoding="utf-8") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break                   # torn append
+                    texts.append(json.loads(line)["text"])
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, OSError) as e:
+            logger.warning("Failed to read memory entries of %s: %s", persona_id, e)
+            texts = []
+        rows = 0
+        if dim and (d / VECTORS).exists():
+            rows = (d / VECTORS).stat().st_size // (4 * dim)
+        count = min(rows, len(texts))
+        vectors = (np.memmap(d / VECTORS, dtype=np.float32, mode="r", shape=(count, dim))
+                   if count and np is not None else None)
+        return _Matrix(texts[:count], vectors, dim, stamp)
+
+    def search(self, persona_id: str, query, k: int) -> List[Tuple[float, str]]:
+        """The *k* entries most similar to *query* (cosine), best first."""
+        m = self._matrix(persona_id)
+        if m.vectors is None or k <= 0:
+            return []
+        q = np.asarray(query, dtype=np.float32)
+        norm = float(np.linalg.norm(q))
+        if q.shape != (m.dim,) or norm == 0.0:
+            return []
+        scores = m.vectors @ (q / norm)
+        k = min(k, len(scores))
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(float(scores[i]), m.texts[i]) for i in top]
+
+    # ── writes ───────────────────────────────────────────────────────────
+    def add(self, persona_id: str, texts: List[str], vectors, *,
+            model: Optional[str] = None, source: Optional[str] = None,
+            imported: Optional[int] = None) -> int:
+        """Append entries with their embeddings (normalized here). Returns
+        the new entry count."""
+        vecs = np.asarray(vectors, dtype=np.float32)
+        if vecs.ndim != 2 or len(vecs) != len(texts):
+            raise ValueError("need one embedding row per text")
+        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+        vecs = vecs / np.where(norms == 0, 1, norms)
+        d = self._dir(persona_id)
+        with self._lock:
+            m = self._open.pop(persona_id, None) or self._load(persona_id)
+            if m.dim and m.dim != vecs.shape[1]:
+                raise ValueError(f"embedding size changed ({m.dim} → {vecs.shape[1]}); "
+                                 f"clear the persona's memory first")
+            d.mkdir(parents=True, exist_ok=True)
+            meta = self.meta(persona_id)
+            meta.update({"dim": int(vecs.shape[1])})
+            if model is not None:
+                meta["model"] = model
+            if source is not None:
+                meta["source"] = source
+            if imported is not None:
+                meta["imported"] = imported
+            (d / META).write_text(json.dumps(meta))
+            count = len(m.texts)
+            with open(d / VECTORS, "r+b" if (d / VECTORS).exists() else "wb") as f:
+                f.seek(count * 4 * vecs.shape[1])   # past the last listed row
+                f.write(vecs.tobytes())
+                f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+            self._truncate_entries(d / ENTRIES, count)
+            with open(d / ENTRIES, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps({"text": t}, ensure_ascii=False) + "\n" for t in texts)
+                f.flush()
+                os.fsync(f.fileno())
+            self._open[persona_id] = matrix = self._load(persona_id)
+            return len(matrix.texts)
+
+    @staticmethod
+    def _truncate_entries(path: Path, count: int) -> None:
+        """Cut entries.jsonl back to its first *count* lines (drops a torn or
+        unmatched tail before appending)."""
+        if not path.exists():
+            return
+        with open(path, "r+b") as f:
+            pos = 0
+            for _ in range(count):
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    break
+                pos += len(line)
+            f.truncate(pos)
+
+    def delete(self, persona_id: str) -> None:
+        d = self._dir(persona_id)
+        with self._lock:
+            self._open.pop(persona_id, None)
+            if d.exists():
+                shutil.rmtree(d)
@@ -11,7 +11,7 @@ import json
 import os
 import shutil
 from pathlib import Path
-from typing import Union
+from typing import Optional, Tuple, Union
 
 
 def _check_id(persona_id: str) -> None:
@@ -42,6 +42,14 @@ class PersonaStore:
     def exists(self, persona_id: str) -> bool:
         return (self._dir(persona_id) / "persona.json").exists()
 
+    def stat(self, persona_id: str) -> Optional[Tuple[int, int]]:
+        """(mtime_ns, size) of the persona doc, None if there is none."""
+        try:
+            st = (self._dir(persona_id) / "persona.json").stat()
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
     def read(self, persona_id: str) -> dict:
         path = self._dir(persona_id) / "persona.json"
         if not path.exists():
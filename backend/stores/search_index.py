@@ -0,0 +1,164 @@
+"""Full-text index over every persona's chat history (SQLite FTS5).
+
+"What did I tell Silver about the dentist" used to mean reading every
+persona's history. HistorySearchIndex keeps one FTS5 table of all persisted
+messages (porter-stemmed, unicode61 tokens) in HISTORY_INDEX_PATH (default
+config/history_index.db):
+
+- add(persona_id, messages) indexes new messages; PersonaService calls it
+  wherever it persists a history (save_history, flush-on-evict), with just
+  the messages the write appended.
+- backfill(persona_id, load) indexes a persona's whole persisted history
+  (archive included) once, the first time this index sees it, so an
+  existing install needs no migration step.
+- search(q, persona_id=None) ranks by bm25 and returns highlighted snippets.
+  The query is free text: its words are OR'ed (stop words dropped), so no
+  FTS5 syntax reaches the parser.
+
+The index is derived data: a lost or corrupt file is rebuilt by backfill.
+One connection, in WAL mode with synchronous=NORMAL, behind a lock; a
+turn's add() is one small transaction. The database is opened on first use,
+so constructing an index (as PlayAIdes always does) creates no file.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = "config/history_index.db"
+SNIPPET_TOKENS = 16
+STOPWORDS = frozenset("""
+    a about an and are as at be but by did do does for from had has have he her
+    him his how i if in is it its me my of on or our she so that the their them
+    then there they this to told tell was we were what when where which who why
+    will with you your
+""".split())
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages USING fts5(
+    content, persona_id UNINDEXED, role UNINDEXED,
+    tokenize = 'porter unicode61');
+CREATE TABLE IF NOT EXISTS backfilled (persona_id TEXT PRIMARY KEY);
+"""
+
+
+def match_query(text: str) -> Optional[str]:
+    """An FTS5 MATCH expression for free text, or None if it has no
+    searchable words."""
+    words = [w.lower() for w in _WORD.findall(text)]
+    terms = list(dict.fromkeys(w for w in words if w not in STOPWORDS))
+    if not terms:
+        return None
+    return " OR ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+
+class HistorySearchIndex:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path if path is not None else os.environ.get("HISTORY_INDEX_PATH",
+                                                                 DEFAULT_PATH)
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._searches = 0
+        self._added = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        """The connection, opened on first use. Call with the lock held."""
+        if self._db is None:
+            if self.path != ":memory:":
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(_SCHEMA)
+            self._db = db
+        return self._db
+
+    # ── writes ───────────────────────────────────────────────────────────
+    def add(self, persona_id: str, messages: Iterable[dict]) -> int:
+        rows = [(m.get("content") or "", persona_id, m.get("role") or "")
+                for m in messages if m.get("content")]
+        if not rows:
+            return 0
+        with self._lock:
+            db = self._conn()
+            with db:
+                db.executemany(
+                    "INSERT INTO messages (content, persona_id, role) VALUES (?, ?, ?)", rows)
+            self._added += len(rows)
+        return len(rows)
+
+    def backfill(self, persona_id: str, load: Callable[[], List[dict]]) -> int:
+        """Index *persona_id*'s persisted history (load()) unless this index
+        already has. Returns the messages indexed."""
+        with self._lock:
+            if self._conn().execute("SELECT 1 FROM backfilled WHERE persona_id = ?",
+                                    (persona_id,)).fetchone():
+                return 0
+        messages = load()
+        with self._lock:
+            db = self._conn()
+            with db:
+                if db.execute("SELECT 1 FROM backfilled WHERE persona_id = ?",
+                              (persona_id,)).fetchone():
+                    return 0
+                db.execute("DELETE FROM messages WHERE persona_id = ?", (persona_id,))
+                db.executemany(
+                    "INSERT INTO messages (content, persona_id, role) VALUES (?, ?, ?)",
+                    [(m.get("content") or "", persona_id, m.get("role") or "")
+                     for m in messages if m.get("content")])
+                db.execute("INSERT INTO backfilled (persona_id) VALUES (?)", (persona_id,))
+        if messages:
+            logger.info("Indexed %d messages of %s for search", len(messages), persona_id)
+        return len(messages)
+
+    def delete(self, persona_id: str) -> None:
+        """Forget *persona_id*'s messages (its history was deleted)."""
+        with self._lock:
+            db = self._conn()
+            with db:
+                db.execute("DELETE FROM messages WHERE persona_id = ?", (persona_id,))
+                db.execute("INSERT OR IGNORE INTO backfilled (persona_id) VALUES (?)",
+                           (persona_id,))
+
+    # ── reads ────────────────────────────────────────────────────────────
+    def search(self, q: str, persona_id: Optional[str] = None,
+               limit: int = 10) -> List[dict]:
+        """Best matches first: {"id", "persona_id", "role", "content",
+        "snippet", "score"}; the snippet marks matches with [ ]."""
+        expr = match_query(q)
+        if expr is None or limit <= 0:
+            return []
+        sql = ("SELECT rowid, persona_id, role, content, "
+               f"snippet(messages, 0, '[', ']', '…', {SNIPPET_TOKENS}), bm25(messages) "
+               "FROM messages WHERE messages MATCH ?")
+        args: list = [expr]
+        if persona_id is not None:
+            sql += " AND persona_id = ?"
+            args.append(persona_id)
+        sql += " ORDER BY bm25(messages) LIMIT ?"
+        args.append(limit)
+        with self._lock:
+            self._searches += 1
+            rows = self._conn().execute(sql, args).fetchall()
+        return [{"id": r[0], "persona_id": r[1], "role": r[2], "content": r[3],
+                 "snippet": r[4], "score": round(-r[5], 3)} for r in rows]
+
+    def stats(self) -> dict:
+        with self._lock:
+            (messages,) = self._conn().execute("SELECT count(*) FROM messages").fetchone()
+            return {"messages": messages, "added": self._added,
+                    "searches": self._searches, "path": self.path}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
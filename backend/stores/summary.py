@@ -0,0 +1,67 @@
+"""Pure file I/O for per-persona history summaries (personas/<id>/history_summary.json).
+
+One small JSON document per persona: {"text", "messages", "updated"} — the
+running summary of the conversation trimmed off the history cap, how many
+messages it covers, and when it last changed. Written atomically (sibling
+tempfile + fsync + os.replace), like the history journal's rewrites. A
+corrupt file reads as no summary, with a warning.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional, Union
+
+from backend.stores.personas import _check_id
+
+logger = logging.getLogger(__name__)
+
+FILENAME = "history_summary.json"
+
+
+class SummaryStore:
+    def __init__(self, base_dir: Union[str, Path] = "personas"):
+        self.base_dir = Path(base_dir)
+
+    def _path(self, persona_id: str) -> Path:
+        _check_id(persona_id)
+        return self.base_dir / persona_id / FILENAME
+
+    def read(self, persona_id: str) -> Optional[dict]:
+        path = self._path(persona_id)
+        try:
+            doc = json.loads(path.read_text())
+        except FileNotFoundError:
+            return None
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning("Failed to read %s: %s — no summary", path, e)
+            return None
+        return doc if isinstance(doc, dict) else None
+
+    def write(self, persona_id: str, doc: dict) -> None:
+        path = self._path(persona_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            mode="w", dir=str(path.parent), delete=False,
+            prefix=".history_summary.", suffix=".json.tmp",
+        ) as tf:
+            json.dump(doc, tf, ensure_ascii=False)
+            tf.flush()
+            os.fsync(tf.fileno())
+            tmp_path = tf.name
+        try:
+            os.replace(tmp_path, str(path))
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def delete(self, persona_id: str) -> None:
+        path = self._path(persona_id)
+        if path.exists():
+            path.unlink()
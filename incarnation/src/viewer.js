@@ -404,7 +404,11 @@ connection.addEventListener('start_lip_sync', (e) => {
 
 connection.addEventListener('stop_lip_sync', () => {
     incarnation.handleCommand('stop_lip_sync', {});
-    safeTransition(State.AMBIENT);
+    // Barge-in also sends this while the user's next turn is THINKING; only
+    // a reply that is actually being spoken returns to AMBIENT.
+    if (stateMachine.current === State.SPEAKING) {
+        safeTransition(State.AMBIENT);
+    }
 });
 
 connection.addEventListener('show_pip', (e) => {
@@ -514,6 +518,11 @@ audioCapture.addEventListener('voicestart', () => {
     // on voiceend. The voiceend handler then checks for the wake word
     // before re-summoning the persona.
     console.log('[viewer] voicestart in state:', stateMachine.current);
+    // Let the server start loading the LLM while the user is still talking:
+    // the utterance's user_input is the rest of the sentence + STT away.
+    // Any speech counts — a wake word could be anywhere in it — and the
+    // server skips the warm-up when the model is already warm.
+    connection.send('wake_word', { persona_id: getActivePersonaId() });
     if (stateMachine.current === State.AMBIENT) {
         safeTransition(State.LISTENING);
     }
@@ -611,6 +620,10 @@ audioCapture.addEventListener('voiceend', async (e) => {
             // off unload→load via the existing handlers (Task 10).
             const matchedId = hit.persona.id;
             if (matchedId !== activeId) {
+                // Report the match first: the server starts loading the
+                // persona (model, history, LLM prefix, voice) in parallel
+                // while it handles the swap below.
+                connection.send('prewarm_persona', { persona_id: matchedId });
                 connection.send('set_active_persona', { id: matchedId });
                 // The user_input below will route to the new persona; tag it
                 // explicitly with the matched id so the server doesn't
@@ -17,6 +17,7 @@ try:
     from backend.api.integrations import router as integrations_router
     from backend.api.conversation import router as conversation_router
     from backend.api.personas import router as personas_router
+    from backend.api.llm import router as llm_router
     from fastapi.staticfiles import StaticFiles
     from fastapi.responses import StreamingResponse
     import uvicorn
@@ -27,9 +28,9 @@ except ImportError:
     FastAPI = None
 
 if FastAPI is not None:
-    from backend.clients.tts import TTSClient, TTSError
+    from backend.clients.tts import PhraseAudioCache, TTSClient, TTSError
 else:
-    TTSClient = TTSError = None
+    PhraseAudioCache = TTSClient = TTSError = None
 
 import os
 import shutil
@@ -100,6 +101,9 @@ class IncarnationServer:
         # production, TestClient portal in tests).
         self._ws_loop = None
         self.message_queue: list = []
+        # Pre-synthesized stock phrases (the filler) the TTS proxy serves
+        # without asking the rig; filled by the persona prewarm.
+        self.phrase_audio = PhraseAudioCache() if FastAPI is not None else None
 
         if FastAPI is None:
             logger.error("FastAPI is not installed. Cannot start Incarnation Server.")
@@ -171,6 +175,7 @@ class IncarnationServer:
         self.app.include_router(integrations_router)
         self.app.include_router(conversation_router)
         self.app.include_router(personas_router)
+        self.app.include_router(llm_router)
 
         self.thread = threading.Thread(target=self._run_server, daemon=True)
         self.thread.start()
@@ -192,6 +197,9 @@ class IncarnationServer:
             self._bindings.clear()
             self.broadcast_to_all("unload_model", {})
             logger.info("HA-driven dismiss: cleared bindings, broadcast unload_model")
+            if self.on_message_callback:
+                # Same path as a viewer dismiss: aborts the live turn.
+                self.on_message_callback({"type": "dismiss_persona", "payload": {}})
             return {"ok": True}
 
         class EventBody(BaseModel):
@@ -309,7 +317,16 @@ class IncarnationServer:
 
                     logger.info(f"Incarnation message: {msg}")
                     if self.on_message_callback:
-                        self.on_message_callback(msg)
+                        if msg_type == "user_input":
+                            # A turn is blocking (LLM + TTS). Run it off the loop
+                            # WITHOUT awaiting, so this socket keeps reading —
+                            # a follow-up user_input / cancel_turn / dismiss must
+                            # reach the handler to barge in on the live turn.
+                            asyncio.get_running_loop().run_in_executor(
+                                None, self.on_message_callback, msg,
+                            )
+                        else:
+                            self.on_message_callback(msg)
             except WebSocketDisconnect:
                 logger.info("Incarnation client disconnected")
             finally:
@@ -391,7 +408,16 @@ class IncarnationServer:
         async def proxy_tts_stream(text: str, voice: str):
             """Proxy a browser GET → voicebox POST /v1/audio/speech (pcm), wrapping
             the raw L16 PCM in a WAV header (sample rate from the rig's response)
-            so the browser can play it."""
+            so the browser can play it. A phrase the prewarm already
+            synthesized in this voice is served from memory."""
+            cached = self.phrase_audio.get(voice, text)
+            if cached is not None:
+                return StreamingResponse(
+                    iter([cached]),
+                    media_type="audio/wav",
+                    headers={"Accept-Ranges": "none", "Cache-Control": "no-cache"},
+                )
+
             async def pcm_to_wav_stream():
                 try:
                     async with TTSClient().open_speech_stream(text, voice) as (sample_rate, chunks):
@@ -14,6 +14,8 @@ def main(services_args:PlayAIdesArgs):
     # We can default to Ollama, but user might want to configure this later.
     # For now, hardcoded to Ollama as per plan.
     ai = PlayAIdes(services_args)
+    ai.llm_warm.start()  # LLM keep-alive + warm-up on activation / wake word
+    ai.personas.catalog.start()  # persona library index + personas dir watcher
     
     # Load Persona
     # only handles 1 person for now
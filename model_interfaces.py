@@ -1,11 +1,36 @@
 from abc import ABC, abstractmethod
-import json
+from contextlib import contextmanager
+import contextvars
 import logging
+import socket
+import threading
 import requests
 from typing import List, Dict, Optional, Iterator
 
+from backend.clients.sse import DeltaParser
+
 logger = logging.getLogger(__name__)
 
+# Whose conversation the LLM streams in this context belong to (llm_slot).
+_slot_persona: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "llm_slot_persona", default=None)
+
+
+@contextmanager
+def llm_slot(persona_id: str):
+    """Mark LLM streams started inside the block as *persona_id*'s voice turn
+    or prefill. Only these are pinned to a KV slot (OpenAICompatLLM)."""
+    token = _slot_persona.set(persona_id)
+    try:
+        yield
+    finally:
+        _slot_persona.reset(token)
+
+
+def llm_slot_owner() -> Optional[str]:
+    """The persona whose llm_slot block the caller is in, if any."""
+    return _slot_persona.get()
+
 
 class LLMError(RuntimeError):
     """Raised when an LLM backend call fails (network error, bad status, bad JSON)."""
@@ -27,11 +52,52 @@ class LLMInterface(ABC):
         pass
 
     def chat_stream(self, messages: List[Dict[str, str]],
-                    system_prompt: Optional[str] = None) -> "Iterator[str]":
+                    system_prompt: Optional[str] = None,
+                    cancel=None, limits: Optional[dict] = None) -> "Iterator[str]":
         """Yield reply chunks. Default: one chunk wrapping chat() (non-streaming
-        backends). Streaming backends override to yield token deltas."""
+        backends). Streaming backends override to yield token deltas.
+
+        `cancel` is an optional CancelToken (backend/services/cancellation.py);
+        once it fires the stream stops yielding and releases its upstream.
+        `limits` is optional generation limits ({"max_tokens", "stop"}) for
+        backends that support them; others ignore it."""
+        if cancel is not None and cancel.cancelled:
+            return
         yield self.chat(messages, system_prompt=system_prompt)
 
+    def save_context(self, name: str) -> bool:
+        """Park the backend's cached context (KV) for the conversation it is
+        serving under *name*, e.g. llama.cpp slot save. False = unsupported
+        or failed; callers treat it as best-effort."""
+        return False
+
+    def restore_context(self, name: str) -> bool:
+        """Bring back a context parked by save_context(*name*). False =
+        unsupported, nothing saved, or failed: the next turn re-prefills."""
+        return False
+
+
+def _abort_response(r) -> None:
+    """Tear down a streaming requests.Response from ANOTHER thread.
+
+    Response.close() blocks on the reader's buffer lock until the next chunk
+    arrives, so it cannot interrupt a stalled stream. shutdown() on the raw
+    socket wakes the blocked recv immediately (the server sees the FIN).
+    Falls back to close() when the socket is unreachable (e.g. a mocked
+    response)."""
+    sock = getattr(getattr(getattr(getattr(r.raw, "_fp", None), "fp", None),
+                           "raw", None), "_sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+            return
+        except OSError:
+            pass
+    try:
+        r.close()
+    except Exception:
+        pass
+
 
 class OpenAICompatLLM(LLMInterface):
     """OpenAI-compatible chat completions client.
@@ -44,17 +110,43 @@ class OpenAICompatLLM(LLMInterface):
     Default timeout is 120s to cover llamacpp-wrapper cold-start
     (~25-30s for Q4 models when llama-swap spawns the llama-server
     child). Harmless slack for warm Ollama.
+
+    KV slots (llama-server only): with LLM_SLOT_ID set, streams started
+    under llm_slot(persona_id) — the active persona's voice turns and its
+    prefill — are pinned to that slot (`id_slot`); everything else (REST,
+    batch, HA rephrase, warm pings) is left to the server's slot choice.
+    save_context/restore_context map to POST /slots/{id}?action=save|restore,
+    one file per name under the server's --slot-save-path. The slot's owner
+    is tracked: a save under a name whose turn was not the last to use the
+    slot is skipped, and any unpinned request may have landed on the slot,
+    so it clears the owner. Unset (the default, and the only option for
+    Ollama) leaves both as no-ops.
     """
 
     def __init__(self, base_url: Optional[str] = None,
                  model: Optional[str] = None,
-                 timeout: float = 120.0):
+                 timeout: float = 120.0,
+                 slot_id: Optional[int] = None):
         import os
         self.base_url = (
             base_url or os.environ.get("LLM_URL", "http://localhost:11434/v1")
         ).rstrip("/")
         self.model = model or os.environ.get("LLM_MODEL", "gemma3:4b")
         self.timeout = timeout
+        if slot_id is None and os.environ.get("LLM_SLOT_ID", "").strip():
+            slot_id = int(os.environ["LLM_SLOT_ID"])
+        self.slot_id = slot_id
+        self._slot_owner: Optional[str] = None
+        self._slot_lock = threading.Lock()
+
+    def _pin_slot(self, payload: dict, stream: bool) -> None:
+        if self.slot_id is None:
+            return
+        persona = _slot_persona.get() if stream else None
+        with self._slot_lock:
+            if persona is not None:
+                payload["id_slot"] = self.slot_id
+            self._slot_owner = persona
 
     def chat(self, messages: List[Dict[str, str]], system_prompt: Optional[str] = None) -> str:
         url = f"{self.base_url}/chat/completions"
@@ -63,6 +155,7 @@ class OpenAICompatLLM(LLMInterface):
             msgs.append({"role": "system", "content": system_prompt})
         msgs.extend(messages)
         payload = {"model": self.model, "messages": msgs, "stream": False}
+        self._pin_slot(payload, stream=False)
 
         try:
             r = requests.post(url, json=payload, timeout=self.timeout)
@@ -92,36 +185,94 @@ class OpenAICompatLLM(LLMInterface):
         return ""
 
     def chat_stream(self, messages: List[Dict[str, str]],
-                    system_prompt: Optional[str] = None) -> Iterator[str]:
+                    system_prompt: Optional[str] = None,
+                    cancel=None, limits: Optional[dict] = None) -> Iterator[str]:
         url = f"{self.base_url}/chat/completions"
         msgs: List[Dict[str, str]] = []
         if system_prompt:
             msgs.append({"role": "system", "content": system_prompt})
         msgs.extend(messages)
         payload = {"model": self.model, "messages": msgs, "stream": True}
+        self._pin_slot(payload, stream=True)
+        for key in ("max_tokens", "stop"):
+            if limits and limits.get(key):
+                payload[key] = limits[key]
+        if cancel is not None and cancel.cancelled:
+            return
+        unregister = None
         try:
             with requests.post(url, json=payload, timeout=self.timeout, stream=True) as r:
+                if cancel is not None:
+                    # Fires immediately if the turn was cancelled while we
+                    # waited for the response headers.
+                    unregister = cancel.on_cancel(lambda: _abort_response(r))
                 r.raise_for_status()
-                for line in r.iter_lines(decode_unicode=True):
-                    if not line or not line.startswith("data: "):
-                        continue
-                    data = line[len("data: "):]
-                    if data.strip() == "[DONE]":
+                # Raw bytes as they arrive; DeltaParser (backend/clients/sse.py)
+                # splits SSE lines and pulls out only delta.content.
+                # reasoning_content (the chat() fallback) is intentionally
+                # NOT surfaced mid-stream — Gemma's thinking tokens would
+                # stream as visible noise.
+                parser = DeltaParser()
+                # Chunked responses (Ollama, llama-server) are read one HTTP
+                # chunk at a time as it lands; a non-chunked body keeps
+                # iter_lines' 512-byte reads instead of blocking until EOF.
+                size = None if getattr(r.raw, "chunked", False) else 512
+                for data in r.iter_content(chunk_size=size):
+                    if cancel is not None and cancel.cancelled:
+                        break
+                    for content in parser.feed(data):
+                        yield content
+                    if parser.done:
                         break
-                    try:
-                        chunk = json.loads(data)
-                    except ValueError:
-                        continue
-                    delta = (chunk.get("choices") or [{}])[0].get("delta") or {}
-                    content = delta.get("content")
-                    # reasoning_content (the chat() fallback) is intentionally
-                    # NOT surfaced mid-stream — Gemma's thinking tokens would
-                    # stream as visible noise.
-                    if content:
+                else:
+                    # EOF without [DONE]: the last line may lack its newline.
+                    for content in parser.close():
                         yield content
         except requests.RequestException as e:
+            if cancel is not None and cancel.cancelled:
+                # The abort above surfaces as a read error — expected, not a failure.
+                logger.info("LLM stream at %s cancelled (%s)", url, cancel.reason)
+                return
             logger.error("Error streaming from LLM at %s: %s", url, e)
             raise LLMError(f"LLM stream failed: {e}") from e
+        finally:
+            if unregister is not None:
+                unregister()
+
+    # ── llama-server slot save/restore ───────────────────────────────────
+    def _slot_action(self, action: str, name: str) -> bool:
+        if self.slot_id is None:
+            return False
+        # The slots API lives at the server root, not under /v1.
+        root = self.base_url[:-3] if self.base_url.endswith("/v1") else self.base_url
+        url = f"{root}/slots/{self.slot_id}?action={action}"
+        filename = "".join(c if c.isalnum() or c in "-_" else "_" for c in name) + ".bin"
+        try:
+            r = requests.post(url, json={"filename": filename}, timeout=self.timeout)
+            r.raise_for_status()
+        except requests.RequestException as e:
+            # A restore with nothing saved yet lands here too (llama-server
+            # answers 400): the turn just prefills from scratch.
+            logger.info("LLM slot %s of %r at %s failed: %s", action, name, url, e)
+            return False
+        return True
+
+    def save_context(self, name: str) -> bool:
+        with self._slot_lock:
+            owner = self._slot_owner
+        if self.slot_id is not None and owner != name:
+            # The slot holds someone else's prompt (or an unknown one):
+            # saving it under *name* would restore the wrong KV later.
+            logger.info("LLM slot save of %r skipped: slot last used by %r", name, owner)
+            return False
+        return self._slot_action("save", name)
+
+    def restore_context(self, name: str) -> bool:
+        ok = self._slot_action("restore", name)
+        if ok:
+            with self._slot_lock:
+                self._slot_owner = name
+        return ok
 
 
 class MockLLM(LLMInterface):
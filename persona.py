@@ -80,3 +80,5 @@ class Persona(BaseModel):
     triggers: List[Trigger] = []
     rephrase_ha_response: bool = False
     ha_agent_id: Optional[str] = None
+    model_tier: Optional[str] = None      # "small" | "large" pins the LLM cascade; None = per turn
+    latency_budget: Optional[dict] = None # overrides the channel's LatencyBudget fields (max_sentences, ttft_s, filler…)
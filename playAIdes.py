@@ -1,15 +1,19 @@
 from persona import Persona, Voice
 from pydantic import BaseModel,ConfigDict, field_validator
-from model_interfaces import LLMInterface, OpenAICompatLLM
+from model_interfaces import LLMInterface, OpenAICompatLLM, llm_slot
 from typing import Optional, List, Dict
 from backend.clients.tts import TTSClient, PersonaTTS
+from backend.services.runtime import PersonaRuntime
 from backend.services.persona import (
     PersonaActive, PersonaExists, PersonaNotFound, PersonaService,
 )
+from backend.stores.archive import HistoryArchive
 from backend.stores.history import HistoryStore
+from backend.stores.search_index import HistorySearchIndex
 from backend.stores.personas import PersonaStore
 import json
 import logging
+import threading
 from incarnation_server import IncarnationServer
 import os
 
@@ -21,9 +25,14 @@ logger = logging.getLogger(__name__)
 DEFAULT_IDLE_ANIMATION = "model_pose"
 
 # Cap chat_histories at the most recent N messages on load. Older entries
-# are trimmed in-place so the LLM context window stays bounded. Configurable
-# later via env / persona-level override.
-CHAT_HISTORY_CAP = 80
+# are trimmed in-place so the history file stays bounded. What the LLM sees
+# is bounded by tokens instead (backend/services/context.py), so this is
+# sized well past any model's window.
+CHAT_HISTORY_CAP = 400
+
+# How long a turn waits for a persona swap's LLM slot save/restore before
+# going ahead (and re-prefilling) anyway.
+LLM_CONTEXT_SWAP_WAIT_S = 5.0
 
 
 def find_default_persona_id(personas_dir) -> Optional[str]:
@@ -69,6 +78,36 @@ def find_default_persona_id(personas_dir) -> Optional[str]:
     return fallback
 
 
+def _default_llm() -> LLMInterface:
+    """LLM_URLS (comma-separated) → RouterLLM over several endpoints; otherwise
+    the single-endpoint OpenAICompatLLM on LLM_URL (Ollama by default)."""
+    if os.environ.get("LLM_URLS", "").strip():
+        from backend.clients.llm_router import RouterLLM
+        return RouterLLM()
+    return OpenAICompatLLM()
+
+
+def _small_llm() -> Optional[LLMInterface]:
+    """LLM_SMALL_MODEL (served at LLM_SMALL_URL, default LLM_URL) → the fast
+    tier of the small/large cascade; unset = every turn uses the main LLM."""
+    model = os.environ.get("LLM_SMALL_MODEL", "").strip()
+    if not model:
+        return None
+    return OpenAICompatLLM(base_url=os.environ.get("LLM_SMALL_URL") or None, model=model)
+
+
+def _small_tier(small: LLMInterface, scheduler) -> LLMInterface:
+    """The small tier behind an admission limit. On a server the main LLM
+    also uses (LLM_SMALL_URL defaults to LLM_URL) it shares the main
+    scheduler's LLM_PARALLEL slots and priorities; elsewhere it gets its own."""
+    from backend.clients.llm_scheduler import LLMScheduler
+    backend = scheduler.backend
+    main_urls = set(getattr(backend, "base_urls", None) or [getattr(backend, "base_url", None)])
+    if getattr(small, "base_url", None) in main_urls:
+        return scheduler.admit(small)
+    return LLMScheduler(small)
+
+
 class PersonaLoadError(RuntimeError):
     """Raised when a persona file cannot be loaded or parsed."""
 
@@ -103,27 +142,34 @@ class PlayAIdesArgs(BaseModel):
 
 class PlayAIdes:
     def __init__(self, args: PlayAIdesArgs):
-        self.llm: Optional[LLMInterface] = args.llm if args.llm else OpenAICompatLLM() # Default to LLM_URL (Ollama by default)
+        from backend.clients.llm_scheduler import LLMScheduler
+        from backend.clients.llm_warm import LLMWarmKeeper
+        # Every LLM call is admitted by the scheduler: voice turns first, REST
+        # turns (tagged in backend/api/conversation.py) next, warm-ups last.
+        self.llm: Optional[LLMInterface] = LLMScheduler(args.llm if args.llm else _default_llm())
+        # Idle until main() starts it; warm() is a no-op before then.
+        self.llm_warm = LLMWarmKeeper(self.llm.bind("background"),
+                                      prompt_provider=self._active_prefill_prompt)
+        # Cleared while a persona swap parks/restores LLM context; turns wait
+        # on it so they never race the slot restore.
+        self._llm_context_ready = threading.Event()
+        self._llm_context_ready.set()
         self.tts: Optional[PersonaTTS] = args.tts if args.tts is not None else TTSClient()  # default: VOICEBOX_URL / TTS_URL
         # The persona domain owner (spec 2026-06-10). Stores default to the
         # relative "personas" dir, same as the methods they replace.
         self.personas = PersonaService(
             persona_store=PersonaStore(),
-            history_store=HistoryStore(),
-            active_persona_id=lambda: (
-                self.current_persona.name.strip().lower().replace(" ", "_")
-                if self.current_persona else None
-            ),
+            history_store=HistoryStore(archive=HistoryArchive()),
+            active_persona_id=lambda: self.active_id,
             history_cap=CHAT_HISTORY_CAP,
+            search_index=HistorySearchIndex(),
+            on_delete=self._forget_persona,
         )
         self.incarnation_server: Optional[IncarnationServer] = IncarnationServer(
             on_message_callback=self._handle_incarnation_message,
             event_handler=self.handle_event,
             state_provider=lambda: {
-                "active_persona_id": (
-                    self.current_persona.name.strip().lower().replace(" ", "_")
-                    if self.current_persona else None
-                ),
+                "active_persona_id": self.active_id,
             },
         ) if args.use_avatar else None
         self.current_persona: Optional[Persona] = None
@@ -144,6 +190,9 @@ class PlayAIdes:
         self.skill_registry = SkillRegistry()
         self.skill_registry.register(ShowPipSkill())
         self.skill_registry.register(DismissPipSkill())
+        from skills.recall import RecallSkill
+        self.recall = RecallSkill(self.personas.search_history)
+        self.skill_registry.register(self.recall)
 
         from skills.loader import load_skill_packs
         # Declarative (bash/http) skills from the global pack dir. Fail-fast:
@@ -163,24 +212,66 @@ class PlayAIdes:
 
         from incarnation_server import WebSocketDisplayChannel
         from backend.services.conversation import ConversationService
+        from backend.services.context import ContextBuilder
+        from backend.clients.llm_cache import ResponseCache
+        from backend.services.cascade import ModelCascade
+        from backend.services.latency import LatencyBudgets
+        from backend.services.speech_text import SpeechSanitizer
+        from backend.services.dedup import UtteranceDedup
+        from backend.services.summary import HistorySummarizer
+        from backend.stores.summary import SummaryStore
+        from backend.services.memory import PersonaMemory
+        from backend.stores.memory import VectorMemoryStore
+        from backend.clients.embeddings import EmbeddingClient
+        self.llm_cache = ResponseCache()
+        self.utterance_dedup = UtteranceDedup()
+        self.llm_budgets = LatencyBudgets()
+        small = _small_llm()
+        self.llm_cascade = (ModelCascade(_small_tier(small, self.llm), self.llm)
+                            if small else None)
+        # History the cap trims off is folded into a per-persona summary at
+        # background priority.
+        self.summaries = HistorySummarizer(self.llm.bind("background"), SummaryStore())
+        # Turns send the memory entries relevant to the utterance, not the
+        # whole memories string (needs numpy and an embeddings endpoint).
+        self.memory = PersonaMemory(EmbeddingClient(), VectorMemoryStore())
         self.display = (
             WebSocketDisplayChannel(self.incarnation_server)
             if self.incarnation_server is not None else None
         )
         self.conversation = ConversationService(
             get_persona=self._conversation_persona,
+            get_runtime=self._conversation_runtime,
             history_load=self.personas.load_history,
             history_save=self.personas.save_history,
+            history_pin=self.personas.pin_history,
             dispatch=self._dispatch_skill,
             llm=self.llm,
             ha=self.ha_client,
             speak=self.speak_as_persona,
             ha_default_agent_id=self.args.ha_default_agent_id,
             history_cap=CHAT_HISTORY_CAP,
+            stop_speech=self.stop_speaking,
+            on_ttft=lambda pid, seconds: self.llm_warm.observe_ttft(seconds),
+            context=ContextBuilder(),
+            response_cache=self.llm_cache,
+            cascade=self.llm_cascade,
+            budgets=self.llm_budgets,
+            speech_sanitizer=SpeechSanitizer,
+            summaries=self.summaries,
+            recall=self.recall.context,
+            memory=self.memory,
         )
         if self.incarnation_server is not None:
             self.incarnation_server.app.state.conversation_service = self.conversation
             self.incarnation_server.app.state.persona_service = self.personas
+            self.incarnation_server.app.state.persona_memory = self.memory
+            self.incarnation_server.app.state.llm_stats = self.llm_stats
+            self.incarnation_server.app.state.llm_concurrency = self.llm.concurrency
+        from backend.services.prewarm import PersonaPrewarmer
+        # Cross-persona wake: the target persona loads while the swap is
+        # being confirmed (prewarm_persona frame).
+        self.prewarmer = PersonaPrewarmer(self._prewarm_steps())
 
         for persona in args.persona:
             self._load_persona_from_file(persona)
@@ -206,17 +297,41 @@ class PlayAIdes:
             logger.error("Persona file %s contains invalid JSON: %s", filepath, e)
             raise PersonaLoadError(f"Invalid JSON in persona file {filepath}: {e}") from e
         try:
-            self.current_persona = Persona(**data)
+            persona = Persona(**data)
         except Exception as e:
             logger.error("Persona file %s failed schema validation: %s", filepath, e)
             raise PersonaLoadError(f"Persona file {filepath} failed validation: {e}") from e
+        self._activate_persona(persona)
+
+    def _activate_persona(self, persona: Persona) -> None:
+        self.current_persona = persona
         logger.info("Loaded persona: %s", self.current_persona.name)
         self._validate_persona(self.current_persona)
+        # Derived after _validate_persona, which may design the voice.
+        self._runtime = PersonaRuntime.build(persona)
         # Keep the legacy chat_history alias pointing at the active
         # persona's history (so any caller that reads self.chat_history
         # directly still works during the transition).
-        active_id = self.current_persona.name.strip().lower().replace(" ", "_")
-        self.chat_history = self._load_history(active_id)
+        self.chat_history = self._load_history(self._runtime.persona_id)
+
+    @property
+    def runtime(self) -> Optional[PersonaRuntime]:
+        """The active persona's PersonaRuntime (routing id, voice, wake
+        words, animation plan), built once at activation. Rebuilt only if
+        current_persona was replaced without _activate_persona."""
+        persona = getattr(self, "current_persona", None)
+        if persona is None:
+            return None
+        runtime = getattr(self, "_runtime", None)
+        if runtime is None or runtime.persona is not persona:
+            runtime = self._runtime = PersonaRuntime.build(persona)
+        return runtime
+
+    @property
+    def active_id(self) -> Optional[str]:
+        runtime = self.runtime
+        return runtime.persona_id if runtime is not None else None
+
     def _update_persona_file(self,p:Persona):
         with open(f"personas/{p.name.lower()}/persona.json", 'w') as f:
             json.dump(p.model_dump(), f, indent=2)
@@ -246,6 +361,14 @@ class PlayAIdes:
             return False
         return True
 
+    def _forget_persona(self, persona_id: str) -> None:
+        """PersonaService on_delete: a persona re-created under the same id
+        starts without the old one's summary or memories."""
+        if getattr(self, "summaries", None) is not None:
+            self.summaries.forget(persona_id)
+        if getattr(self, "memory", None) is not None:
+            self.memory.forget(persona_id)
+
     def _validate_persona(self,p:Persona):
         
         # validate voice
@@ -298,18 +421,18 @@ class PlayAIdes:
         # We send set_background when the client connects and sends model_loaded,
         # ensuring the client is actually ready to receive it. Multi-TV: route
         # to clients bound to this persona id only.
-        if not self.current_persona:
+        runtime = self.runtime
+        if runtime is None:
             return
-        active_id = self.current_persona.name.strip().lower().replace(" ", "_")
-        if self.current_persona.avatar:
-            bg_url = self.current_persona.avatar.background_url
-            if bg_url:
-                logger.info(f"Sending set_background for avatar: {bg_url}")
-                self.incarnation_server.broadcast_to_persona(
-                    active_id, "set_background", {"url": bg_url},
-                )
+        active_id = runtime.persona_id
+        bg_url = runtime.animation.background_url
+        if bg_url:
+            logger.info(f"Sending set_background for avatar: {bg_url}")
+            self.incarnation_server.broadcast_to_persona(
+                active_id, "set_background", {"url": bg_url},
+            )
 
-        if self.current_persona.avatar.model_url.lower().endswith('.vrm'):
+        if runtime.animation.is_vrm:
             animation_dir = "incarnation/public/vrma/animations"
             if os.path.exists(animation_dir):
                 logger.info("Loading VRMA animations...")
@@ -359,6 +482,8 @@ class PlayAIdes:
 
     def delete_history(self, persona_id: str):
         self.personas.delete_history(persona_id)
+        if getattr(self, "summaries", None) is not None:
+            self.summaries.forget(persona_id)
 
     def set_persona(self, persona_id: str) -> Optional[Persona]:
         """Reload the active persona at runtime.
@@ -376,22 +501,28 @@ class PlayAIdes:
             raise PersonaLoadError(f"Suspicious persona_id: {persona_id!r}")
 
         # Idempotency: same id as the currently-active persona → no-op.
-        if (self.current_persona and
-                self.current_persona.name.strip().lower().replace(" ", "_") == persona_id):
+        if self.active_id == persona_id:
             # Still ensure history is loaded.
             self._load_history(persona_id)
             return self.current_persona
 
-        path = os.path.join("personas", persona_id, "persona.json")
-        if not os.path.exists(path):
-            raise PersonaLoadError(f"Persona not found: {persona_id}")
+        # The validated model comes from PersonaService's cache (re-read only
+        # when persona.json changed since it was last parsed). The cached
+        # model is shared with every later turn, so the active persona is a
+        # deep copy: _setup_voice mutates it in place.
+        try:
+            persona = self.personas.get_model(persona_id)
+        except PersonaNotFound as e:
+            raise PersonaLoadError(f"Persona not found: {persona_id}") from e
+        except Exception as e:
+            logger.error("Persona %s failed to load: %s", persona_id, e)
+            raise PersonaLoadError(f"Persona {persona_id} failed to load: {e}") from e
 
         # Reset HA conversation context on every persona change so the next
         # session starts a fresh HA context.
         self.conversation.clear_ha_context(persona_id)
 
-        # Re-use the existing loader (raises PersonaLoadError on bad input).
-        self._load_persona_from_file(path)
+        self._activate_persona(persona.model_copy(deep=True))
         self._load_history(persona_id)
         return self.current_persona
 
@@ -413,24 +544,43 @@ class PlayAIdes:
             if not text:
                 return
             persona_id = (payload.get("persona_id") or "").strip() or None
-            target_id = persona_id or (
-                self.current_persona.name.strip().lower().replace(" ", "_")
-                if self.current_persona else None
-            )
+            target_id = persona_id or self.active_id
             if not target_id:
                 return
+            # The browser mic and an ESP32 in the same room both transcribe
+            # one command: the second arrival rides the first turn instead
+            # of barging in on it. Its viewers already get the leader's frames.
+            turn = self.utterance_dedup.attach(
+                target_id, text, lambda: self._run_user_turn(target_id, text))
             try:
-                for ev in self.conversation.run_turn(target_id, text):
-                    if self.display is not None:
+                for ev in turn:
+                    if turn.leader and self.display is not None:
                         self.display.push(target_id, ev.type, ev.payload)
             except Exception as e:
                 logger.exception(f"user_input run_turn failed: {e}")
             return
 
+        if msg_type == "wake_word":
+            # The viewer heard speech start (VAD); the utterance's
+            # user_input is STT + the rest of the sentence away. Load the
+            # model meanwhile.
+            self.llm_warm.warm("wake_word")
+            return
+
+        if msg_type == "prewarm_persona":
+            # The viewer matched another persona's wake word; its
+            # set_active_persona follows. Load what the swap reads meanwhile.
+            persona_id = (payload.get("persona_id") or "").strip()
+            if persona_id and persona_id != self.active_id:
+                self.prewarmer.swap_started(persona_id)
+                self.prewarmer.prewarm(persona_id)
+            return
+
         if msg_type == "set_active_persona":
             requested_id = (payload.get("id") or "").strip()
-            prev_id = (self.current_persona.name.strip().lower().replace(" ", "_")
-                       if self.current_persona else None)
+            prev_id = self.active_id
+            if requested_id and requested_id != prev_id:
+                self.prewarmer.swap_started(requested_id)
             try:
                 persona = self.set_persona(requested_id)
             except (PersonaLoadError, ValueError) as e:
@@ -450,6 +600,7 @@ class PlayAIdes:
                 requested_id, "persona_changed",
                 {"ok": True, "persona": persona.model_dump()},
             )
+            self._swap_llm_context(prev_id, requested_id)
 
             # If we actually swapped, tell the browser to unload the old VRM
             # and load the new one. Same persona → skip (model is still loaded).
@@ -500,9 +651,14 @@ class PlayAIdes:
 
         if msg_type == "dismiss_persona":
             # The WS endpoint already cleared this client's binding registry
-            # entry; PlayAIdes itself has no further action — chat history
-            # is preserved on disk per spec §2 dismiss subsection.
+            # entry; chat history is preserved on disk per spec §2 dismiss
+            # subsection. A turn still generating/speaking is aborted.
             logger.info("Persona dismissed (binding cleared by WS layer)")
+            self._cancel_turn(payload.get("id"), "dismissed")
+            return
+
+        if msg_type == "cancel_turn":
+            self._cancel_turn(payload.get("persona_id"), "cancel_turn")
             return
 
         if msg_type == "model_uploaded":
@@ -579,6 +735,7 @@ class PlayAIdes:
             payload = msg['payload']
             logger.info(f"Incarnation state: {state}")
             if state == "ready":
+                self.llm_warm.warm("ready")
                 if self.current_persona and self.args.use_avatar:
                     logger.info("Incarnation client ready, sending avatar setup")
                     self._setup_avatar(self.current_persona)
@@ -597,30 +754,28 @@ class PlayAIdes:
                     if anim_name in self.expected_animations:
                         self.expected_animations.remove(anim_name)
 
-                if not self.expected_animations:
-                    intro = (self.current_persona.avatar.intro_animation
-                             if (self.current_persona and self.current_persona.avatar)
-                             else None)
-                    fallback_idle = (self.current_persona.avatar.idle_animation
-                                     if (self.current_persona and self.current_persona.avatar)
-                                     else None)
+                runtime = self.runtime
+                if not self.expected_animations and runtime is not None:
+                    intro = runtime.animation.intro
+                    fallback_idle = runtime.animation.idle
                     clip_name = self._resolve_clip_name(intro or fallback_idle)
                     # Loop only when we did NOT successfully play the configured
                     # intro (intros are one-shot greetings; idles loop).
                     is_intro = bool(intro) and clip_name == intro
                     logger.info(f"All auto-loaded animations finished loading. Playing clip: {clip_name}")
-                    active_id = self.current_persona.name.strip().lower().replace(" ", "_")
                     self.incarnation_server.broadcast_to_persona(
-                        active_id, "play_animation",
+                        runtime.persona_id, "play_animation",
                         {"name": clip_name, "loop": False if is_intro else True},
                     )
             if state == "animation_finished":
                 anim_name = payload.get("name")
                 logger.info(f"Animation {anim_name} finished playing.")
-                avatar = self.current_persona.avatar if self.current_persona else None
-                configured_idle = avatar.idle_animation if avatar else None
-                intro = avatar.intro_animation if avatar else None
-                active_id = self.current_persona.name.strip().lower().replace(" ", "_")
+                runtime = self.runtime
+                if runtime is None:
+                    return
+                configured_idle = runtime.animation.idle
+                intro = runtime.animation.intro
+                active_id = runtime.persona_id
                 # A one-shot intro with no configured idle must NOT re-loop: with
                 # no explicit idle, _resolve_clip_name falls back to the first
                 # loaded clip (often the intro itself), turning a "play once"
@@ -642,34 +797,42 @@ class PlayAIdes:
                 # Push the active persona's matching config to clients bound
                 # to this persona — TVs showing OTHER personas should keep
                 # their own activePersona state. Spec §3 multi-TV memory.
-                if self.current_persona:
-                    active_id = self.current_persona.name.strip().lower().replace(" ", "_")
+                runtime = self.runtime
+                if runtime is not None:
                     self.incarnation_server.broadcast_to_persona(
-                        active_id, "persona_active",
+                        runtime.persona_id, "persona_active",
                         {
-                            "name": self.current_persona.name,
-                            "wake_words": list(self.current_persona.wake_words or []),
-                            "dismiss_words": list(self.current_persona.dismiss_words or []),
+                            "name": runtime.name,
+                            "wake_words": list(runtime.wake_words),
+                            "dismiss_words": list(runtime.dismiss_words),
                         },
                     )
                 self.load_default_animations()
 
-    def speak_as_persona(self, target_id: str, text: str) -> None:
+    def speak_as_persona(self, target_id: str, text: str,
+                         spoken_text: Optional[str] = None) -> None:
         """Broadcast `text` as the persona's reply (subtitle) and trigger TTS
         lip-sync on the persona's bound displays. Extracted from chat() so
         skills can reuse it via SkillContext.speak. No-op pieces degrade
-        gracefully in CLI-only mode."""
+        gracefully in CLI-only mode. `spoken_text` is what TTS says when it
+        differs from the subtitle (markdown/emoji stripped); "" = nothing
+        speakable."""
         if self.display is not None:
             self.display.push(
                 target_id, "assistant_message", {"text": text, "persona_id": target_id},
             )
         if not self.args.use_voice:
             return
-        voice = getattr(self.current_persona, "persona_voice", None)
-        if not (voice and voice.voice):
+        if spoken_text is not None:
+            if not spoken_text:
+                return
+            text = spoken_text
+        runtime = self.runtime
+        voice_id = runtime.voice_id if runtime is not None else None
+        if not voice_id:
             logger.warning(
                 "Persona %s has no voice config; skipping lip_sync",
-                getattr(self.current_persona, "name", "<unknown>"),
+                runtime.name if runtime is not None else "<unknown>",
             )
             return
         # The browser/avatar is the only audio sink; with no display there is
@@ -679,13 +842,162 @@ class PlayAIdes:
             safe_text = urllib.parse.quote(text)
             proxy_url = (
                 f"http://localhost:8765/api/tts/proxy?text={safe_text}"
-                f"&voice={urllib.parse.quote(voice.voice, safe='')}"
+                f"&voice={urllib.parse.quote(voice_id, safe='')}"
             )
             logger.info(f"Sending start_lip_sync: {proxy_url}")
             self.display.push(target_id, "start_lip_sync", {"url": proxy_url})
         elif self.args.use_avatar:
             logger.debug("use_avatar set but no display channel; skipping lip_sync")
 
+    def _active_prefill_prompt(self):
+        """The active persona's prompt prefix, for warm-ups (None = ping)."""
+        if not self.current_persona:
+            return None
+        return self.conversation.prefill_prompt(self.active_id)
+
+    def _swap_llm_context(self, prev_id: Optional[str], new_id: str) -> None:
+        """Persona activation on the LLM server: park the previous persona's
+        KV under its id, bring back the new one's (llama.cpp slots; no-ops on
+        backends without them), then prefill whatever is still missing so the
+        first turn hits the prompt cache. Runs off the WS loop — slot files
+        can take a few hundred ms — while user_input waits for it."""
+        prompt = self.conversation.prefill_prompt(new_id)
+        if prev_id == new_id:
+            with llm_slot(new_id):
+                self.llm_warm.warm("set_active_persona", prompt=prompt)
+            return
+        self._llm_context_ready.clear()
+
+        def run() -> None:
+            try:
+                if prev_id:
+                    self.llm.save_context(prev_id)
+                self.llm.restore_context(new_id)
+            except Exception:
+                logger.exception("LLM context swap %s -> %s failed", prev_id, new_id)
+            finally:
+                self._llm_context_ready.set()
+            if self._prewarmed(new_id, "llm_prefix"):
+                return                      # the wake already sent this prefix
+            with llm_slot(new_id):
+                self.llm_warm.warm("set_active_persona", prompt=prompt)
+
+        threading.Thread(target=run, name="llm-context-swap", daemon=True).start()
+
+    def _run_user_turn(self, target_id: str, text: str):
+        if not self._llm_context_ready.wait(LLM_CONTEXT_SWAP_WAIT_S):
+            logger.warning("LLM context swap still running; starting turn anyway")
+        # A warm-up still loading the model would hold the LLM slot this
+        # turn needs; the turn's own request loads it just the same.
+        self.llm_warm.preempt()
+        # Barge-in: a new utterance for this persona aborts its live turn.
+        cancel = self.conversation.start_turn(target_id)
+        # Voice turns are the ones pinned to the persona's KV slot.
+        prewarmer = getattr(self, "prewarmer", None)
+        with llm_slot(target_id):
+            for ev in self.conversation.run_turn(target_id, text, cancel=cancel):
+                if prewarmer is not None and ev.type in ("reply_delta", "reply_done"):
+                    prewarmer.first_word(target_id)     # swap-to-first-word
+                    prewarmer = None
+                yield ev
+
+    def _prewarm_steps(self) -> dict:
+        """PersonaPrewarmer steps: what a swap to a persona reads, each
+        loaded into the cache the swap reads it from."""
+        steps = {
+            # Validated model + PersonaRuntime (prompt, compiled phrase triggers).
+            "runtime": self.personas.get_runtime,
+            "history": self.personas.load_history,
+        }
+        if getattr(self, "memory", None) is not None and self.memory.enabled:
+            # Imports the memories string into the vector store (embedding).
+            steps["memory"] = self._prewarm_memory
+        # With KV slots the swap's restore brings the prefix back; an unpinned
+        # prefill would also leave the previous persona's slot unsaveable.
+        if getattr(getattr(self.llm, "backend", None), "slot_id", None) is None:
+            steps["llm_prefix"] = self._prewarm_llm_prefix
+        if self.args.use_voice and self.tts is not None:
+            steps["tts_voice"] = self._prewarm_tts_voice
+        return steps
+
+    def _prewarm_llm_prefix(self, persona_id: str) -> None:
+        prompt = self.conversation.prefill_prompt(persona_id)
+        if not self.llm_warm.warm("prewarm_persona", prompt=prompt):
+            raise RuntimeError("LLM warm-keeper not running")
+
+    def _prewarm_memory(self, persona_id: str) -> None:
+        if not self.memory.active(persona_id, self.personas.get_runtime(persona_id).persona):
+            logger.debug("No retrievable memories for %s", persona_id)
+
+    def _prewarm_tts_voice(self, persona_id: str) -> None:
+        """Load the persona's voice prompt on the rig by synthesizing its
+        latency-budget filler, and keep that audio: a late first token then
+        plays the filler from the proxy's cache instead of waiting on TTS."""
+        from backend.services.latency import DEFAULT_FILLER
+        runtime = self.personas.get_runtime(persona_id)
+        if not runtime.voice_id:
+            return
+        budgets = getattr(self, "llm_budgets", None)
+        budget = budgets.budget_for(runtime.persona, "voice") if budgets is not None else None
+        filler = budget.filler if budget is not None else DEFAULT_FILLER
+        wav = self.tts.synth(filler, runtime.voice_id)
+        server = getattr(self, "incarnation_server", None)
+        if server is not None and server.phrase_audio is not None:
+            server.phrase_audio.put(runtime.voice_id, filler, wav)
+
+    def _prewarmed(self, persona_id: str, step: str) -> bool:
+        prewarmer = getattr(self, "prewarmer", None)
+        return prewarmer is not None and prewarmer.fresh(persona_id, step)
+
+    def llm_stats(self) -> dict:
+        """GET /api/v1/llm/stats: warm-keeper counters (cold starts
+        absorbed vs hit), response-cache hit rates per call site, scheduler
+        queue depth and wait histograms, latency budgets met/missed per
+        channel, small/large cascade routing when LLM_SMALL_MODEL is set,
+        utterances deduplicated across mics (turns not run), the per-turn
+        persona model cache, the bounded history cache and the persona
+        library index, cross-persona prewarms and swap-to-first-word, the
+        background history summaries, the history search index, memory
+        retrieval, plus per-endpoint routing state under RouterLLM."""
+        out = {"warm": self.llm_warm.stats(), "cache": self.llm_cache.stats(),
+               "scheduler": self.llm.stats()}
+        if getattr(self, "llm_budgets", None) is not None:
+            out["budget"] = self.llm_budgets.stats()
+        if getattr(self, "llm_cascade", None) is not None:
+            out["cascade"] = self.llm_cascade.stats()
+        if getattr(self, "utterance_dedup", None) is not None:
+            out["dedup"] = self.utterance_dedup.stats()
+        if getattr(self, "personas", None) is not None:
+            out["persona_cache"] = self.personas.model_cache_stats()
+            out["history_cache"] = self.personas.history_cache_stats()
+            out["persona_catalog"] = self.personas.catalog.stats()
+            search = self.personas.search_stats()
+            if search is not None:
+                out["history_search"] = search
+        if getattr(self, "prewarmer", None) is not None:
+            out["prewarm"] = self.prewarmer.stats()
+        if getattr(self, "summaries", None) is not None:
+            out["summary"] = self.summaries.stats()
+        if getattr(self, "memory", None) is not None:
+            out["memory"] = self.memory.stats()
+        backend = getattr(self.llm, "backend", None)
+        if callable(getattr(backend, "stats", None)):
+            out["router"] = backend.stats()
+        return out
+
+    def stop_speaking(self, target_id: str) -> None:
+        """Silence the persona's displays mid-reply (barge-in). The viewer
+        drops the /api/tts/proxy audio, which closes the proxy stream and, with
+        it, the upstream synthesis request."""
+        if self.display is not None:
+            self.display.push(target_id, "stop_lip_sync", {})
+
+    def _cancel_turn(self, persona_id: Optional[str], reason: str) -> None:
+        """Cancel *persona_id*'s live turn (the active persona when omitted)."""
+        target_id = (persona_id or "").strip() or self.active_id
+        if target_id and self.conversation.cancel_turn(target_id, reason):
+            logger.info("Cancelled live turn for %s (%s)", target_id, reason)
+
     def _skill_send(self, persona_id: str, cmd_type: str, payload: dict) -> None:
         """SkillContext.send backing — push a WS frame to the persona's displays."""
         if self.display is not None:
@@ -698,7 +1010,8 @@ class PlayAIdes:
             return None
         return self.ha_client.camera_url(entity_id, stream=live)
 
-    def _dispatch_skill(self, target_id: str, skill_name: str, raw_params: dict) -> None:
+    def _dispatch_skill(self, target_id: str, skill_name: str, raw_params: dict,
+                        cancel=None) -> None:
         """Validate params and run a skill. Never raises into the caller.
 
         Gating contract: the CALLER must enforce the persona enable-list before
@@ -724,6 +1037,7 @@ class PlayAIdes:
             send=self._skill_send,
             speak_fn=self.speak_as_persona,
             resolve_camera=self._resolve_camera_url,
+            cancel=cancel,
         )
         try:
             skill.execute(params, ctx)
@@ -738,7 +1052,7 @@ class PlayAIdes:
         try:
             if not getattr(self, "current_persona", None):
                 return {"matched": False}
-            target_id = self.current_persona.name.strip().lower().replace(" ", "_")
+            target_id = self.active_id
             from skills.router import match_event_trigger
             matched = match_event_trigger(name, payload or {}, self.current_persona.triggers)
             if matched is None:
@@ -771,12 +1085,21 @@ class PlayAIdes:
         except (PersonaNotFound, ValueError):
             return None
 
+    def _conversation_runtime(self, persona_id: str) -> Optional[PersonaRuntime]:
+        """Per-turn PersonaRuntime of the TARGETED persona, cached with its
+        validated model by PersonaService."""
+        try:
+            return self.personas.get_runtime(persona_id)
+        except (PersonaNotFound, ValueError):
+            return None
+
     def chat(self, user_input: str, persona_id: Optional[str] = None) -> str:
         if not self.current_persona:
             return "No persona loaded."
-        target_id = persona_id or self.current_persona.name.strip().lower().replace(" ", "_")
+        target_id = persona_id or self.active_id
         reply = ""
-        for ev in self.conversation.run_turn(target_id, user_input):
+        # The console REPL: no spoken-reply budget.
+        for ev in self.conversation.run_turn(target_id, user_input, channel="text"):
             if ev.type == "reply_done":
                 reply = ev.payload.get("text", "")
         return reply
@@ -27,11 +27,20 @@ class SkillContext:
     send: Callable[[str, str, dict], None]        # (persona_id, cmd_type, payload) -> WS push
     speak_fn: Callable[[str, str], None]          # (persona_id, text) -> subtitle + TTS
     resolve_camera: Optional[Callable[[str, bool], Optional[str]]] = None  # (entity_id, live) -> url | None
+    cancel: Any = None                            # CancelToken of the dispatching turn, if any
+
+    @property
+    def cancelled(self) -> bool:
+        """True once the turn that dispatched this skill was barged-in on.
+        Long-running skills should check it (or register cancel.on_cancel)."""
+        return self.cancel is not None and self.cancel.cancelled
 
     def send_display(self, cmd_type: str, payload: Optional[dict] = None) -> None:
         self.send(self.target_id, cmd_type, payload or {})
 
     def speak(self, text: str) -> None:
+        if self.cancelled:
+            return
         self.speak_fn(self.target_id, text)
 
     def resolve_camera_url(self, entity_id: str, live: bool = False) -> Optional[str]:
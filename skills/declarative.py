@@ -68,23 +68,35 @@ class BashSkill(Skill):
             logger.warning("bash skill %r: template references unknown param: %s", self.name, e)
             return SkillResult(ok=False, error=f"bad template: {e}")
         try:
-            proc = subprocess.run(
-                argv, capture_output=True, text=True,
-                timeout=self.timeout_s, shell=False,
+            proc = subprocess.Popen(
+                argv, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                text=True, shell=False,
             )
-        except subprocess.TimeoutExpired:
-            logger.warning("bash skill %r timed out after %ss", self.name, self.timeout_s)
-            return SkillResult(ok=False, error="timeout")
         except Exception as e:
             logger.exception("bash skill %r failed to run", self.name)
             return SkillResult(ok=False, error=str(e))
-        out = (proc.stdout or "").strip()
+        # A barged-in turn kills the child rather than waiting out timeout_s.
+        unregister = ctx.cancel.on_cancel(proc.kill) if ctx.cancel is not None else None
+        try:
+            stdout, stderr = proc.communicate(timeout=self.timeout_s)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            logger.warning("bash skill %r timed out after %ss", self.name, self.timeout_s)
+            return SkillResult(ok=False, error="timeout")
+        finally:
+            if unregister is not None:
+                unregister()
+        if ctx.cancelled:
+            logger.info("bash skill %r cancelled", self.name)
+            return SkillResult(ok=False, error="cancelled")
+        out = (stdout or "").strip()
         if self.announce_output and out:
             ctx.speak(out)
         return SkillResult(
             ok=(proc.returncode == 0),
             output=out or None,
-            error=((proc.stderr or "").strip() or None) if proc.returncode != 0 else None,
+            error=((stderr or "").strip() or None) if proc.returncode != 0 else None,
         )
 
 
@@ -0,0 +1,66 @@
+"""Recall skill: earlier conversation, found in the history search index
+(backend/stores/search_index.py) rather than kept in the prompt.
+
+Two ways in:
+- at turn time: for a persona with "recall" in its skills, ConversationService
+  asks context() for the best matches to the utterance that are no longer in
+  the prompt window, and sends them with the user's message (not in the
+  system prompt, whose prefix the backend caches);
+- as a dispatched skill: a phrase or event trigger with a `query` param
+  speaks the best match.
+"""
+from __future__ import annotations
+
+import logging
+import os
+from typing import Callable, Iterable, List, Optional
+
+from pydantic import BaseModel
+
+from skills.base import Skill, SkillContext, SkillResult
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 3
+MAX_CHARS = 300                          # per recalled message
+RECALL_HEADER = "From earlier conversations (use only if relevant):\n"
+
+
+class RecallSkill(Skill):
+    name = "recall"
+    kind = "internal"
+
+    class Params(BaseModel):
+        query: str
+        limit: int = DEFAULT_LIMIT
+
+    def __init__(self, search: Callable[[str, Optional[str], int], List[dict]],
+                 limit: Optional[int] = None) -> None:
+        # search(q, persona_id, limit): PersonaService.search_history.
+        self._search = search
+        self.limit = int(limit if limit is not None
+                         else os.environ.get("RECALL_LIMIT", DEFAULT_LIMIT))
+
+    def execute(self, params: "RecallSkill.Params", ctx: SkillContext) -> SkillResult:
+        hits = self._search(params.query, ctx.target_id, params.limit)
+        if not hits:
+            return SkillResult(ok=False, error="nothing recalled")
+        ctx.speak(hits[0]["content"])
+        return SkillResult(output="\n".join(f"{h['role']}: {h['content']}" for h in hits))
+
+    def context(self, persona_id: str, text: str,
+                window: Iterable[dict] = ()) -> Optional[str]:
+        """A note of up to `limit` recalled messages for this turn, skipping
+        ones still in the prompt *window*; None if nothing matched."""
+        if self.limit <= 0:
+            return None
+        seen = {m.get("content") for m in window}
+        try:
+            # Recent matches are often still in the window: over-fetch a little.
+            hits = self._search(text, persona_id, self.limit * 4)
+        except Exception:
+            logger.exception("Recall search for %s failed", persona_id)
+            return None
+        lines = [f"- {h['role']}: {h['content'][:MAX_CHARS]}"
+                 for h in hits if h["content"] not in seen][:self.limit]
+        return RECALL_HEADER + "\n".join(lines) if lines else None
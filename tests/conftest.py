@@ -59,6 +59,13 @@ def persona_file(tmp_personas_dir: Path) -> Path:
     return tmp_personas_dir / "testbot" / "persona.json"
 
 
+@pytest.fixture(autouse=True)
+def _history_index_in_memory(monkeypatch: pytest.MonkeyPatch) -> None:
+    """PlayAIdes always builds a HistorySearchIndex; keep its SQLite file
+    out of the checkout (tests that need a file pass a tmp path)."""
+    monkeypatch.setenv("HISTORY_INDEX_PATH", ":memory:")
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 # LLM / TTS fakes
 # ──────────────────────────────────────────────────────────────────────────────
@@ -88,6 +95,16 @@ def fake_tts() -> FakeTTS:
     return FakeTTS()
 
 
+@pytest.fixture
+def standin_llm():
+    """A started local OpenAI-compatible SSE server (tests/standin_llm.py).
+    Tune .chunks / .ttft / .token_delay before the call under test."""
+    from tests.standin_llm import StandInLLM
+    srv = StandInLLM().start()
+    yield srv
+    srv.stop()
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 # IncarnationServer stub — prevents threads/ports during PlayAIdes tests.
 # ──────────────────────────────────────────────────────────────────────────────
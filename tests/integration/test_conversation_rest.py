@@ -3,14 +3,22 @@
 Builds a standalone FastAPI app with the router + a fake conversation service
 on app.state. Does NOT import playAIdes; safe to run via bin/test.
 """
+import asyncio
+import json
+import threading
+import time
+
+import pytest
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
-from backend.api.conversation import router
+from backend.api.conversation import _sse_events, router
+from backend.services.cancellation import CancelToken
 from backend.services.conversation import TurnEvent
+from model_interfaces import LLMError
 
 
 class _FakeConv:
-    def run_turn(self, persona_id, text):
+    def run_turn(self, persona_id, text, channel="voice"):
         yield TurnEvent("reply_started", {"persona_id": persona_id})
         yield TurnEvent("reply_delta", {"persona_id": persona_id, "text": "Hi "})
         yield TurnEvent("reply_delta", {"persona_id": persona_id, "text": text})
@@ -48,3 +56,231 @@ def test_post_message_503_when_service_missing(with_api_key):
                        json={"text": "x"},
                        headers={"Authorization": f"Bearer {with_api_key}"})
     assert resp.status_code == 503
+
+
+class _StreamConv:
+    """Emits its deltas on a timer and records how the turn ended."""
+
+    def __init__(self, deltas=("Hi ", "there"), delay=0.0):
+        self.deltas, self.delay = deltas, delay
+        self.cancelled = threading.Event()
+        self.channels = []
+
+    def run_turn(self, persona_id, text, channel="voice", cancel=None):
+        self.channels.append(channel)
+        yield TurnEvent("reply_started", {"persona_id": persona_id})
+        for d in self.deltas:
+            if cancel is not None and cancel.wait(self.delay):
+                self.cancelled.set()
+                yield TurnEvent("reply_cancelled", {"persona_id": persona_id})
+                return
+            yield TurnEvent("reply_delta", {"persona_id": persona_id, "text": d})
+        yield TurnEvent("reply_done", {"persona_id": persona_id, "text": "".join(self.deltas)})
+
+
+def _sse(body):
+    frames = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        frames.append((fields["event"], json.loads(fields["data"])))
+    return frames
+
+
+def test_stream_true_forwards_turn_events_as_sse(with_api_key):
+    app = FastAPI()
+    app.state.conversation_service = conv = _StreamConv()
+    app.include_router(router)
+    resp = TestClient(app).post("/api/v1/personas/silver/messages",
+                                json={"text": "x", "stream": True},
+                                headers={"Authorization": f"Bearer {with_api_key}"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    assert _sse(resp.text) == [
+        ("reply_started", {"persona_id": "silver"}),
+        ("reply_delta", {"persona_id": "silver", "text": "Hi "}),
+        ("reply_delta", {"persona_id": "silver", "text": "there"}),
+        ("reply_done", {"persona_id": "silver", "text": "Hi there"}),
+    ]
+    assert conv.channels == ["api"]
+
+
+def test_failed_turn_ends_the_stream_with_an_error_frame(with_api_key):
+    class _FailingConv:
+        def run_turn(self, persona_id, text, channel="voice", cancel=None):
+            yield TurnEvent("reply_started", {"persona_id": persona_id})
+            raise LLMError("LLM stream failed: connection refused")
+
+    app = FastAPI()
+    app.state.conversation_service = _FailingConv()
+    app.include_router(router)
+    resp = TestClient(app).post("/api/v1/personas/silver/messages",
+                                json={"text": "x", "stream": True},
+                                headers={"Authorization": f"Bearer {with_api_key}"})
+    assert _sse(resp.text) == [
+        ("reply_started", {"persona_id": "silver"}),
+        ("error", {"persona_id": "silver", "error": "LLM stream failed: connection refused"}),
+    ]
+
+
+def test_client_disconnect_cancels_the_turn():
+    conv = _StreamConv(deltas=["a"] * 50, delay=0.02)
+
+    async def read_two_then_leave():
+        gen = _sse_events(conv, "silver", "x", CancelToken())
+        frames = [await gen.__anext__(), await gen.__anext__()]
+        await gen.aclose()
+        return frames
+
+    frames = asyncio.run(read_two_then_leave())
+    assert frames[0].startswith("event: reply_started") and "reply_delta" in frames[1]
+    assert conv.cancelled.wait(1)
+
+
+def test_stream_first_delta_arrives_before_the_turn_ends():
+    conv = _StreamConv(deltas=["w "] * 10, delay=0.03)
+
+    async def timings():
+        t0 = time.monotonic()
+        seen = []
+        async for frame in _sse_events(conv, "silver", "x", CancelToken()):
+            seen.append((frame.split("\n", 1)[0], time.monotonic() - t0))
+        return seen, time.monotonic() - t0
+
+    seen, total = asyncio.run(timings())
+    first_delta = next(t for kind, t in seen if kind == "event: reply_delta")
+    assert first_delta < total / 3
+    assert seen[-1][0] == "event: reply_done"
+
+
+class _BatchConv:
+    """Stateless turns that take `delay` each; tracks peak parallelism."""
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.live = self.peak = 0
+        self.calls = []
+
+    def run_turn(self, persona_id, text, channel="voice", cancel=None, history=None):
+        with self.lock:
+            self.live += 1
+            self.peak = max(self.peak, self.live)
+            self.calls.append((text, channel, history))
+        try:
+            yield TurnEvent("reply_started", {"persona_id": persona_id})
+            if cancel.wait(self.delay):
+                yield TurnEvent("reply_cancelled", {"persona_id": persona_id,
+                                                    "reason": cancel.reason})
+                return
+            yield TurnEvent("reply_done", {"persona_id": persona_id, "text": text.upper()})
+        finally:
+            with self.lock:
+                self.live -= 1
+
+
+def _batch_client(conv):
+    app = FastAPI()
+    app.state.conversation_service = conv
+    app.include_router(router)
+    return TestClient(app)
+
+
+def test_batch_runs_stateless_turns_with_bounded_concurrency(with_api_key):
+    conv = _BatchConv()
+    messages = [{"text": f"q{i}", "id": f"m{i}"} for i in range(12)]
+    messages[0]["history"] = [{"role": "user", "content": "a"},
+                              {"role": "assistant", "content": "b"}]
+    resp = _batch_client(conv).post(
+        "/api/v1/personas/silver/messages/batch",
+        json={"messages": messages, "concurrency": 3},
+        headers={"Authorization": f"Bearer {with_api_key}"})
+    assert resp.status_code == 200
+    frames = _sse(resp.text)
+    results = {p["id"]: p for kind, p in frames if kind == "result"}
+    assert len(results) == 12 and results["m5"]["reply"] == "Q5" and results["m5"]["ok"]
+    kind, summary = frames[-1]
+    assert kind == "summary" and summary["count"] == 12 and summary["ok"] == 12
+    assert summary["turns_per_s"] > 0
+    assert conv.peak == 3
+    assert ("q0", "batch", [{"role": "user", "content": "a"},
+                            {"role": "assistant", "content": "b"}]) in conv.calls
+    assert all(h == [] for t, _, h in conv.calls if t != "q0")
+
+
+def test_batch_pool_is_capped_at_the_llm_concurrency(with_api_key):
+    conv = _BatchConv()
+    client = _batch_client(conv)
+    client.app.state.llm_concurrency = 2
+    resp = client.post("/api/v1/personas/silver/messages/batch",
+                       json={"messages": [{"text": f"q{i}"} for i in range(8)],
+                             "concurrency": 8},
+                       headers={"Authorization": f"Bearer {with_api_key}"})
+    kind, summary = _sse(resp.text)[-1]
+    assert summary["ok"] == 8 and summary["concurrency"] == 2
+    assert conv.peak == 2
+
+
+def test_batch_validation(with_api_key):
+    client = _batch_client(_BatchConv())
+    headers = {"Authorization": f"Bearer {with_api_key}"}
+    url = "/api/v1/personas/silver/messages/batch"
+    assert client.post(url, json={"messages": []}, headers=headers).status_code == 422
+    assert client.post(url, json={"messages": [{"text": "x"}], "concurrency": 0},
+                       headers=headers).status_code == 422
+    assert client.post(url, json={"messages": [{"text": "x", "history": [
+        {"role": "system", "content": "x"}]}]}, headers=headers).status_code == 422
+
+
+def test_batch_disconnect_cancels_remaining_turns():
+    from backend.api.conversation import BatchIn, _batch_events
+    conv = _BatchConv(delay=5)
+    body = BatchIn(messages=[{"text": f"q{i}"} for i in range(8)], concurrency=2)
+    cancel = CancelToken()
+
+    async def leave_early():
+        gen = _batch_events(conv, "silver", body, cancel)
+        task = asyncio.ensure_future(gen.__anext__())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        await gen.aclose()
+
+    t0 = time.monotonic()
+    asyncio.run(leave_early())
+    assert cancel.cancelled
+    time.sleep(0.1)
+    assert len(conv.calls) == 2 and conv.live == 0
+    assert time.monotonic() - t0 < 2
+
+
+def _batch_throughput(standin, concurrency, n=16):
+    from backend.api.conversation import BatchIn, _batch_events
+    from backend.services.conversation import ConversationService
+    from model_interfaces import OpenAICompatLLM
+    from persona import Persona
+    persona = Persona(name="Silver", back_ground="bg", psyche={"traits": []},
+                      gender="Female", language="English")
+    conv = ConversationService(
+        get_persona=lambda pid: persona, history_load=lambda pid: [],
+        history_save=lambda pid: None, dispatch=lambda *a: None,
+        llm=OpenAICompatLLM(base_url=standin.base_url, model="m"), speak=lambda *a, **k: None)
+    body = BatchIn(messages=[{"text": f"prompt {i}"} for i in range(n)], concurrency=concurrency)
+
+    async def drain():
+        return [f async for f in _batch_events(conv, "silver", body, CancelToken())]
+
+    kind, summary = _sse("".join(asyncio.run(drain())))[-1]
+    assert kind == "summary" and summary["ok"] == n
+    return summary["turns_per_s"]
+
+
+@pytest.mark.slow
+def test_benchmark_batch_throughput(standin_llm):
+    standin_llm.ttft = 0.05
+    sequential = _batch_throughput(standin_llm, 1)
+    parallel = _batch_throughput(standin_llm, 4)
+    print(f"\nbatch of 16: {sequential:.1f} turns/s sequential, {parallel:.1f} turns/s at 4")
+    assert parallel > sequential * 2
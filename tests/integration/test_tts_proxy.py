@@ -37,6 +37,32 @@ def test_tts_proxy_wraps_pcm_in_wav_with_header_rate(proxy_client):
     assert sent["response_format"] == "pcm" and sent["voice"] == "v1" and sent["input"] == "hi"
 
 
+@respx.mock
+def test_tts_proxy_serves_a_prewarmed_phrase_without_the_rig(monkeypatch):
+    monkeypatch.setenv("VOICEBOX_URL", "http://rig.test")
+    from incarnation_server import IncarnationServer
+    server = IncarnationServer()
+    server.phrase_audio.put("v1", "One moment.", b"RIFFfiller")
+    rig = respx.post("http://rig.test/v1/audio/speech").mock(
+        return_value=httpx.Response(200, content=b"\x01\x02",
+                                    headers={"content-type": "audio/l16; rate=24000"}))
+    client = TestClient(server.app)
+    r = client.get("/api/tts/proxy", params={"text": "One moment.", "voice": "v1"})
+    assert r.status_code == 200 and r.content == b"RIFFfiller" and not rig.called
+    r = client.get("/api/tts/proxy", params={"text": "One moment.", "voice": "v2"})
+    assert r.content.startswith(b"RIFF") and r.content.endswith(b"\x01\x02") and rig.called
+
+
+def test_phrase_cache_drops_the_least_recently_used():
+    from backend.clients.tts import PhraseAudioCache
+    cache = PhraseAudioCache(max_entries=2)
+    cache.put("v1", "a", b"A")
+    cache.put("v1", "b", b"B")
+    assert cache.get("v1", "a") == b"A"
+    cache.put("v2", "a", b"C")
+    assert cache.get("v1", "b") is None and cache.get("v1", "a") == b"A"
+
+
 @respx.mock
 def test_ref_audio_proxy_hits_registry(proxy_client):
     respx.get("http://reg.test/v1/voices/v1/ref_audio").mock(
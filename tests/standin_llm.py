@@ -0,0 +1,306 @@
+"""A local stand-in for an OpenAI-compatible LLM server (llama.cpp / Ollama).
+
+Real sockets, real SSE: used where `responses` mocking cannot observe what a
+test cares about — whether the client actually closed its upstream
+connection, time-to-first-token, concurrent streams. Runs a
+ThreadingHTTPServer on an ephemeral localhost port.
+
+    srv = StandInLLM(chunks=["He", "llo"], ttft=0.05, token_delay=0.01).start()
+    llm = OpenAICompatLLM(base_url=srv.base_url, model="m")
+    ...
+    srv.stop()
+
+Every request is recorded in `srv.requests` (parsed JSON body); every
+client disconnect seen mid-stream is recorded in `srv.disconnects` with a
+monotonic timestamp.
+"""
+from __future__ import annotations
+
+import json
+import re
+import select
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+
+class _ClientGone(Exception):
+    pass
+
+
+class StandInLLM:
+    def __init__(self, chunks: Optional[List[str]] = None, *, ttft: float = 0.0,
+                 token_delay: float = 0.0, status: int = 200):
+        self.chunks = list(chunks if chunks is not None else ["Hello", " there"])
+        self.ttft = ttft
+        self.token_delay = token_delay
+        self.status = status
+        self.requests: list[dict] = []
+        self.disconnects: list[float] = []
+        self.disconnected = threading.Event()
+        self.completed = 0
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    # ── lifecycle ────────────────────────────────────────────────────────
+    def start(self) -> "StandInLLM":
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):  # keep pytest output quiet
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                try:
+                    body = json.loads(raw or b"{}")
+                except ValueError:
+                    body = {}
+                with standin._lock:
+                    standin.requests.append(body)
+                standin.handle(self, body)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    # ── request handling (override points for richer stand-ins) ──────────
+    def handle(self, h: BaseHTTPRequestHandler, body: dict) -> None:
+        if h.path.rstrip("/").endswith("/chat/completions"):
+            self._chat(h, body)
+        else:
+            h.send_response(404)
+            h.send_header("Content-Length", "0")
+            h.end_headers()
+
+    def reply_chunks(self, body: dict) -> List[str]:
+        return self.chunks
+
+    def ttft_for(self, body: dict) -> float:
+        """Delay before the first token — e.g. scaled by prompt size to
+        emulate prefill cost."""
+        return self.ttft
+
+    def final_events(self, body: dict) -> List[dict]:
+        """Extra SSE events sent after the last content chunk (llama-server
+        puts `timings` there)."""
+        return []
+
+    def _chat(self, h: BaseHTTPRequestHandler, body: dict) -> None:
+        if self.status != 200:
+            h.send_response(self.status)
+            h.send_header("Content-Length", "0")
+            h.end_headers()
+            return
+        chunks = self.reply_chunks(body)
+        ttft = self.ttft_for(body)
+        if not body.get("stream"):
+            self._pause(h, ttft)
+            payload = json.dumps({"choices": [{"message": {
+                "role": "assistant", "content": "".join(chunks)}}]}).encode()
+            h.send_response(200)
+            h.send_header("Content-Type", "application/json")
+            h.send_header("Content-Length", str(len(payload)))
+            h.end_headers()
+            h.wfile.write(payload)
+            with self._lock:
+                self.completed += 1
+            return
+        # Chunked transfer-encoding, like llama-server and Ollama: the client
+        # sees each SSE event as soon as it is written.
+        h.send_response(200)
+        h.send_header("Content-Type", "text/event-stream")
+        h.send_header("Transfer-Encoding", "chunked")
+        h.send_header("Connection", "close")
+        h.end_headers()
+        h.close_connection = True
+
+        def write(data: bytes) -> None:
+            h.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            h.wfile.flush()
+
+        try:
+            self._pause(h, ttft)
+            for i, chunk in enumerate(chunks):
+                if i:
+                    self._pause(h, self.token_delay)
+                event = {"choices": [{"delta": {"content": chunk}}]}
+                write(f"data: {json.dumps(event)}\n\n".encode())
+            for event in self.final_events(body):
+                write(f"data: {json.dumps(event)}\n\n".encode())
+            write(b"data: [DONE]\n\n")
+            h.wfile.write(b"0\r\n\r\n")
+            h.wfile.flush()
+            with self._lock:
+                self.completed += 1
+        except (_ClientGone, BrokenPipeError, ConnectionResetError):
+            with self._lock:
+                self.disconnects.append(time.monotonic())
+            self.disconnected.set()
+
+    def _pause(self, h: BaseHTTPRequestHandler, seconds: float) -> None:
+        """Sleep, but notice a client FIN while we do (the request body is
+        fully read, so a readable socket means EOF)."""
+        deadline = time.monotonic() + seconds
+        while True:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                return
+            readable, _, _ = select.select([h.connection], [], [], min(left, 0.02))
+            if readable:
+                try:
+                    data = h.connection.recv(1, 0)
+                except OSError:
+                    data = b""
+                if not data:
+                    raise _ClientGone()
+
+
+_PIECE = re.compile(r"\w+|[^\w\s]|\s+")
+
+
+class PromptCacheLLM(StandInLLM):
+    """Emulates llama-server's prompt cache (`cache_prompt`): the KV of the
+    previous prompt is kept, and a new prompt re-uses it up to the first
+    token that differs. Only the rest is prefilled, at `seconds_per_token`.
+
+    Each request's figures land in `prefills` as {"prompt_n", "cache_n"}
+    and are reported to the client like llama-server does, as a `timings`
+    event after the last content chunk.
+    """
+
+    def __init__(self, *args, seconds_per_token: float = 0.0, **kw):
+        super().__init__(*args, **kw)
+        self.seconds_per_token = seconds_per_token
+        self.prefills: list[dict] = []
+        self._cached: List[str] = []
+
+    @staticmethod
+    def render(body: dict) -> List[str]:
+        """A chat template, tokenized: role markers + word/punct pieces."""
+        tokens: List[str] = []
+        for m in body.get("messages") or []:
+            tokens.append(f"<|{m.get('role')}|>")
+            tokens.extend(_PIECE.findall(m.get("content") or ""))
+            tokens.append("<|end|>")
+        return tokens
+
+    def cache_lookup(self, body: dict, tokens: List[str]) -> List[str]:
+        """The cached token sequence this request is matched against."""
+        return self._cached
+
+    def cache_store(self, body: dict, tokens: List[str]) -> None:
+        self._cached = tokens
+
+    def ttft_for(self, body: dict) -> float:
+        tokens = self.render(body)
+        with self._lock:
+            cached = self.cache_lookup(body, tokens)
+            n = 0
+            for a, b in zip(cached, tokens):
+                if a != b:
+                    break
+                n += 1
+            timings = {"prompt_n": len(tokens) - n, "cache_n": n}
+            self.prefills.append(timings)
+            self.cache_store(body, tokens)
+        body["_timings"] = timings
+        return self.ttft + timings["prompt_n"] * self.seconds_per_token
+
+    def final_events(self, body: dict) -> List[dict]:
+        return [{"choices": [{"delta": {}, "finish_reason": "stop"}],
+                 "timings": body.get("_timings", {})}]
+
+
+class SlotCacheLLM(PromptCacheLLM):
+    """PromptCacheLLM plus llama-server's slot API: POST
+    /slots/{id}?action=save|restore|erase with {"filename": ...}. Saved
+    slots live in `saved` (filename → cached tokens); each call is recorded
+    in `slot_calls` as (action, filename). Restoring an unknown file answers
+    400, like llama-server. `slot_io_s` is the time a save/restore takes."""
+
+    def __init__(self, *args, slot_io_s: float = 0.0, **kw):
+        super().__init__(*args, **kw)
+        self.slot_io_s = slot_io_s
+        self.saved: dict[str, List[str]] = {}
+        self.slot_calls: list[tuple] = []
+
+    def handle(self, h: BaseHTTPRequestHandler, body: dict) -> None:
+        if not h.path.startswith("/slots/"):
+            return super().handle(h, body)
+        action = h.path.partition("action=")[2]
+        filename = body.get("filename", "")
+        with self._lock:
+            self.slot_calls.append((action, filename))
+            status = 200
+            if action == "save":
+                self.saved[filename] = list(self._cached)
+            elif action == "restore" and filename in self.saved:
+                self._cached = list(self.saved[filename])
+            elif action == "erase":
+                self._cached = []
+            else:
+                status = 400
+        time.sleep(self.slot_io_s)
+        payload = json.dumps({"id_slot": 0, "filename": filename}).encode()
+        h.send_response(status)
+        h.send_header("Content-Type", "application/json")
+        h.send_header("Content-Length", str(len(payload)))
+        h.end_headers()
+        h.wfile.write(payload)
+
+
+class EmbeddingStandIn(StandInLLM):
+    """Also serves /embeddings: a hashed bag of words per input, so texts
+    sharing words are close under cosine similarity. `fail` answers 500;
+    `embed_delay` is the time each embedding request takes."""
+
+    def __init__(self, *args, dim: int = 512, **kw):
+        super().__init__(*args, **kw)
+        self.dim = dim
+        self.fail = False
+        self.embed_delay = 0.0
+        self.embedded: list[str] = []
+
+    def vector(self, text: str) -> List[float]:
+        v = [0.0] * self.dim
+        for word in re.findall(r"[a-z]+", text.lower()):
+            v[zlib.crc32(word.encode()) % self.dim] += 1.0
+        return v
+
+    def handle(self, h: BaseHTTPRequestHandler, body: dict) -> None:
+        if not h.path.rstrip("/").endswith("/embeddings"):
+            return super().handle(h, body)
+        if self.fail:
+            h.send_response(500)
+            h.send_header("Content-Length", "0")
+            h.end_headers()
+            return
+        inputs = body.get("input") or []
+        time.sleep(self.embed_delay)
+        with self._lock:
+            self.embedded.extend(inputs)
+        payload = json.dumps({"data": [{"index": i, "embedding": self.vector(t)}
+                                       for i, t in enumerate(inputs)]}).encode()
+        h.send_response(200)
+        h.send_header("Content-Type", "application/json")
+        h.send_header("Content-Length", str(len(payload)))
+        h.end_headers()
+        h.wfile.write(payload)
@@ -52,15 +52,16 @@ class TestChatHistoryPersistence:
     def test_load_history_caps_at_N_messages(self, play, tmp_personas_dir):
         pid = "testbot"
         history_file = tmp_personas_dir / pid / "chat_history.json"
-        # Seed 200 messages — should be trimmed to the most recent N.
-        big = [{"role": "user", "content": f"msg-{i}"} for i in range(200)]
+        # Seed more than N messages — should be trimmed to the most recent N.
+        seeded = CHAT_HISTORY_CAP + 120
+        big = [{"role": "user", "content": f"msg-{i}"} for i in range(seeded)]
         history_file.write_text(json.dumps(big))
         # Same eager-load consideration as above.
         play.chat_histories.pop(pid, None)
         loaded = play._load_history(pid)
         assert len(loaded) == CHAT_HISTORY_CAP
         # Most-recent retention: last message is preserved.
-        assert loaded[-1] == {"role": "user", "content": "msg-199"}
+        assert loaded[-1] == {"role": "user", "content": f"msg-{seeded - 1}"}
 
     def test_save_history_round_trip(self, play, tmp_personas_dir):
         pid = "testbot"
@@ -69,9 +70,9 @@ class TestChatHistoryPersistence:
             {"role": "assistant", "content": "pong"},
         ]
         play._save_history(pid)
-        history_file = tmp_personas_dir / pid / "chat_history.json"
+        history_file = tmp_personas_dir / pid / "chat_history.jsonl"
         assert history_file.exists()
-        on_disk = json.loads(history_file.read_text())
+        on_disk = [json.loads(line) for line in history_file.read_text().splitlines()]
         assert on_disk == play.chat_histories[pid]
 
     def test_save_history_is_atomic(self, play, tmp_personas_dir, monkeypatch):
@@ -97,16 +98,16 @@ class TestChatHistoryPersistence:
         on_disk = json.loads(history_file.read_text())
         assert on_disk == [{"role": "user", "content": "before"}]
 
-        # Tempfile cleanup: no orphan .chat_history.*.json.tmp left behind
+        # Tempfile cleanup: no orphan .chat_history.*.tmp left behind
         # in the persona dir after the failed write.
-        leftovers = list((tmp_personas_dir / pid).glob(".chat_history.*.json.tmp"))
+        leftovers = list((tmp_personas_dir / pid).glob(".chat_history.*.tmp"))
         assert leftovers == [], f"orphan tempfile(s): {leftovers}"
 
     def test_delete_history_clears_memory_and_disk(self, play, tmp_personas_dir):
         pid = "testbot"
         play.chat_histories[pid] = [{"role": "user", "content": "x"}]
         play._save_history(pid)
-        history_file = tmp_personas_dir / pid / "chat_history.json"
+        history_file = tmp_personas_dir / pid / "chat_history.jsonl"
         assert history_file.exists()
 
         play.delete_history(pid)
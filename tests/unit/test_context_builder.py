@@ -0,0 +1,216 @@
+"""Token-budgeted context: the estimator, the per-message cache, newest-first
+filling, per-model budgets, the ConversationService wiring, and a prefill
+benchmark against the old count-based cap."""
+from __future__ import annotations
+
+import statistics
+import time
+
+import pytest
+
+from backend.services.context import (
+    MESSAGE_OVERHEAD_TOKENS, ContextBuilder, TokenCounter, estimate_tokens,
+)
+from backend.services.conversation import ConversationService
+from model_interfaces import OpenAICompatLLM
+from persona import Persona
+from tests.standin_llm import StandInLLM
+
+_PERSONA = {
+    "name": "TestBot", "back_ground": "bg",
+    "psyche": {"traits": []}, "gender": "Female", "language": "English",
+}
+
+
+def _msg(role, words):
+    return {"role": role, "content": " ".join(["word"] * words)}
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("Hello there, friend!") == 5
+    assert estimate_tokens("internationalization") == 4     # long words split
+    assert estimate_tokens("2026") == 4                      # digit by digit
+
+
+def test_counter_caches_per_message_text():
+    calls = []
+    counter = TokenCounter(tokenize=lambda s: calls.append(s) or s.split())
+    assert counter.count("a b c") == 3
+    assert counter.count("a b c") == 3
+    assert calls == ["a b c"]
+    assert (counter.hits, counter.misses) == (1, 1)
+
+
+def test_counter_cache_is_bounded():
+    counter = TokenCounter(cache_size=2)
+    for text in ("a", "b", "c"):
+        counter.count(text)
+    counter.count("a")
+    assert counter.misses == 4
+
+
+def test_fills_newest_first_within_budget():
+    builder = ContextBuilder(context_tokens=100, reply_tokens=0, budgets={},
+                             refill_ratio=1.0)
+    history = [_msg("user", 30), _msg("assistant", 30), _msg("user", 30)]
+    user = _msg("user", 10)
+    built = builder.build(None, history, user)
+    # 10+4 for the new message, then 34 per history message: two fit.
+    assert built.messages == [*history[1:], user]
+    assert built.dropped == 1
+    assert built.prompt_tokens == 14 + 2 * 34
+    assert built.history_tokens == [34, 34]
+
+
+def test_whole_history_sent_while_it_fits():
+    builder = ContextBuilder(context_tokens=100, reply_tokens=0, budgets={})
+    history = [_msg("user", 30), _msg("assistant", 30)]
+    built = builder.build(None, history, _msg("user", 10))
+    assert built.start == 0 and not built.trimmed
+    assert len(built.messages) == 3
+
+
+def test_stops_at_first_message_that_does_not_fit():
+    # Context stays contiguous: an old short message is not pulled in past a
+    # long one that was dropped.
+    builder = ContextBuilder(context_tokens=60, reply_tokens=0, budgets={},
+                             refill_ratio=1.0)
+    history = [_msg("user", 1), _msg("assistant", 80), _msg("user", 10)]
+    built = builder.build(None, history, _msg("user", 1))
+    assert built.messages[0] is history[2] and built.dropped == 2
+
+
+def test_system_prompt_and_user_message_always_sent():
+    builder = ContextBuilder(context_tokens=10, reply_tokens=0, budgets={})
+    built = builder.build("word " * 50, [_msg("user", 1)], _msg("user", 50))
+    assert built.messages == [_msg("user", 50)]
+    assert built.prompt_tokens == 50 + 50 + 2 * MESSAGE_OVERHEAD_TOKENS
+
+
+def test_per_model_budgets_from_env(monkeypatch):
+    monkeypatch.setenv("LLM_CONTEXT_TOKENS", "4096")
+    monkeypatch.setenv("LLM_CONTEXT_BUDGETS", "gemma3:4b=8192, bad, big=32768")
+    builder = ContextBuilder(reply_tokens=1000)
+    assert builder.budget_for("gemma3:4b") == 7192
+    assert builder.budget_for("big") == 31768
+    assert builder.budget_for("other") == 3096
+    assert builder.budget_for(None) == 3096
+
+
+def _service(llm, history, context):
+    persona = Persona(**_PERSONA)
+    return ConversationService(
+        get_persona=lambda pid: persona,
+        history_load=lambda pid: history,
+        history_save=lambda pid: None,
+        dispatch=lambda *a: None,
+        llm=llm,
+        speak=lambda *a: None,
+        context=context,
+    )
+
+
+def test_conversation_sends_budgeted_context_and_reports_tokens(standin_llm):
+    standin_llm.chunks = ["ok"]
+    history = [_msg("user", 400), _msg("assistant", 400), _msg("user", 5), _msg("assistant", 5)]
+    builder = ContextBuilder(context_tokens=400, reply_tokens=100, budgets={})
+    llm = OpenAICompatLLM(base_url=standin_llm.base_url, model="m")
+    events = list(_service(llm, history, builder).run_turn("testbot", "hi"))
+
+    sent = standin_llm.requests[0]["messages"]
+    assert sent[0]["role"] == "system"
+    assert [m["content"] for m in sent[1:]] == [
+        "word word word word word", "word word word word word", "hi"]
+    done = events[-1]
+    assert done.type == "reply_done" and done.payload["prompt_tokens"] <= 300
+    # The stored history is untouched by what the prompt left out.
+    assert len(history) == 6
+
+
+def test_recall_note_is_built_into_the_budget(standin_llm):
+    standin_llm.chunks = ["ok"]
+    history = [_msg("user", 30), _msg("assistant", 30)] * 3
+    builder = ContextBuilder(context_tokens=300, reply_tokens=100, budgets={})
+    persona = Persona(**_PERSONA, skills=["recall"])
+    note = "From earlier conversations:\n- user: " + " ".join(["older"] * 80)
+    conv = ConversationService(
+        get_persona=lambda pid: persona, history_load=lambda pid: history,
+        history_save=lambda pid: None, dispatch=lambda *a: None,
+        llm=OpenAICompatLLM(base_url=standin_llm.base_url, model="m"),
+        speak=lambda *a: None, context=builder,
+        recall=lambda pid, text, window: note)
+    done = list(conv.run_turn("testbot", "hi"))[-1]
+
+    sent = standin_llm.requests[0]["messages"]
+    assert sent[-1]["content"] == f"{note}\n\nhi"
+    counted = (builder.counter.count(sent[0]["content"]) + MESSAGE_OVERHEAD_TOKENS
+               + sum(builder.counter.message(m) for m in sent[1:]))
+    assert done.payload["prompt_tokens"] == counted <= builder.budget_for("m")
+    assert len(sent) < len(history) + 2                  # history trimmed to make room
+
+
+def test_without_builder_sends_whole_history(standin_llm):
+    history = [_msg("user", 400), _msg("assistant", 400)]
+    llm = OpenAICompatLLM(base_url=standin_llm.base_url, model="m")
+    events = list(_service(llm, history, None).run_turn("testbot", "hi"))
+    assert len(standin_llm.requests[0]["messages"]) == 4
+    assert "prompt_tokens" not in events[-1].payload
+
+
+class _PrefillLLM(StandInLLM):
+    """Time to first token proportional to the prompt, like a real prefill
+    (no KV reuse)."""
+    SECONDS_PER_TOKEN = 20e-6
+
+    def ttft_for(self, body):
+        tokens = sum(estimate_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS
+                     for m in body["messages"])
+        body["_prompt_tokens"] = tokens
+        return tokens * self.SECONDS_PER_TOKEN
+
+
+def _bench(llm, srv, history, context, turns=5):
+    ttfts, tokens = [], []
+    for i in range(turns):
+        hist = list(history)
+        msgs = hist[-80:] if context is None else None    # the old cap
+        svc = _service(llm, msgs if msgs is not None else hist, context)
+        t0 = time.monotonic()
+        for ev in svc.run_turn("testbot", f"question {i}"):
+            if ev.type == "reply_delta":
+                ttfts.append(time.monotonic() - t0)
+                break
+        tokens.append(srv.requests[-1]["_prompt_tokens"])
+    return statistics.mean(ttfts), max(tokens)
+
+
+@pytest.mark.slow
+def test_benchmark_prefill_vs_count_cap():
+    window = 4096
+    builder = ContextBuilder(context_tokens=window, reply_tokens=512, budgets={})
+    srv = _PrefillLLM(chunks=["ok"]).start()
+    try:
+        llm = OpenAICompatLLM(base_url=srv.base_url, model="m")
+        # Long replies: 80 messages blow far past a 4k window.
+        long_history = [_msg("user", 20) if i % 2 == 0 else _msg("assistant", 300)
+                        for i in range(80)]
+        cap_ttft, cap_tokens = _bench(llm, srv, long_history, None)
+        tok_ttft, tok_tokens = _bench(llm, srv, long_history, builder)
+        # Short exchanges: the cap leaves most of the window unused.
+        short_history = [_msg("user", 6) for _ in range(400)]
+        short_cap = builder.build(None, short_history[-80:], _msg("user", 2))
+        short_tok = builder.build(None, short_history, _msg("user", 2))
+    finally:
+        srv.stop()
+
+    print(f"\nlong replies: count cap {cap_tokens} tok / {cap_ttft * 1000:.1f} ms TTFT; "
+          f"token budget {tok_tokens} tok / {tok_ttft * 1000:.1f} ms TTFT")
+    print(f"short exchanges: count cap {len(short_cap.messages)} msgs / "
+          f"{short_cap.prompt_tokens} tok; token budget {len(short_tok.messages)} msgs / "
+          f"{short_tok.prompt_tokens} tok")
+    assert cap_tokens > window                    # the cap overflowed the model
+    assert tok_tokens <= window - 512
+    assert tok_ttft < cap_ttft
+    assert len(short_tok.messages) > len(short_cap.messages)
+    assert short_tok.prompt_tokens <= window - 512
@@ -94,6 +94,38 @@ def test_llm_path_streams_deltas_speaks_and_persists():
     ]
 
 
+class _RecordingLLM(_StreamLLM):
+    def chat_stream(self, messages, system_prompt=None):
+        self.messages = messages
+        yield from super().chat_stream(messages, system_prompt)
+
+
+def test_stateless_turn_uses_given_history_and_persists_nothing(mock_ha_client):
+    persona = _persona(persona_voice={"voice": "v-1"}, house_words=["house"])
+    stored = {"testbot": [{"role": "user", "content": "stored"}]}
+    llm = _RecordingLLM(["Hel", "lo"])
+    svc = _service(persona, llm=llm, ha=mock_ha_client, history=stored)
+    given = [{"role": "user", "content": "earlier"}, {"role": "assistant", "content": "ok"}]
+    events = list(svc.run_turn("testbot", "house lights?", history=given))
+
+    assert events[-1].payload["text"] == "Hello"
+    assert llm.messages == [*given, {"role": "user", "content": "house lights?"}]
+    assert len(given) == 2 and stored["testbot"] == [{"role": "user", "content": "stored"}]
+    assert svc._spoken == [] and mock_ha_client.calls == []
+
+
+def test_stateless_turn_reports_phrase_trigger_without_dispatching():
+    persona = _persona(
+        triggers=[{"on": {"phrase": "show camera"},
+                   "do": {"skill": "show_pip", "params": {"source": "cam.1"}}}],
+        skills=["show_pip"],
+    )
+    svc = _service(persona)
+    events = list(svc.run_turn("testbot", "show camera now", history=[]))
+    assert events[-1].payload == {"persona_id": "testbot", "text": "", "skill": "show_pip"}
+    assert svc._dispatched == []
+
+
 def test_house_word_delegates_to_ha_single_delta(mock_ha_client):
     persona = _persona(house_words=["house"])
     ha = mock_ha_client
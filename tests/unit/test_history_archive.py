@@ -0,0 +1,100 @@
+"""HistoryArchive: gzip segments + index, month buckets, paging across
+segments, crash orphans — and HistoryStore compaction archiving what it cuts,
+paged together with the live journal."""
+from __future__ import annotations
+
+import gzip
+import json
+
+import pytest
+
+from backend.services.persona import PersonaNotFound, PersonaService
+from backend.stores.archive import HistoryArchive
+from backend.stores.history import HistoryStore
+from backend.stores.personas import PersonaStore
+
+JAN = 1767225600.0                     # 2026-01-01T00:00:00Z
+FEB = JAN + 31 * 86400
+
+
+def _msgs(lo, hi):
+    return [{"role": "user", "content": f"m{i}"} for i in range(lo, hi)]
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return HistoryArchive(base_dir=tmp_path / "personas")
+
+
+def _append(archive, pid, messages, now):
+    from backend.stores.archive import pack
+    return archive.add_segment(pid, pack(messages), len(messages), now=now)
+
+
+def test_segments_are_indexed_by_month(archive, tmp_path):
+    _append(archive, "nova", _msgs(0, 10), JAN)
+    _append(archive, "nova", _msgs(10, 15), FEB)
+    index = archive.segments("nova")
+    assert [(e["segment"], e["first"], e["count"]) for e in index] == [
+        ("2026-01-00000.jsonl.gz", 0, 10), ("2026-02-00001.jsonl.gz", 10, 5)]
+    assert archive.count("nova") == 15
+    assert archive.stats("nova")["buckets"] == ["2026-01", "2026-02"]
+    raw = gzip.decompress((tmp_path / "personas" / "nova" / "archive" /
+                           index[1]["segment"]).read_bytes())
+    assert [json.loads(line) for line in raw.splitlines()] == _msgs(10, 15)
+
+
+def test_pages_span_segment_boundaries(archive):
+    for lo in range(0, 30, 10):
+        archive.append("nova", _msgs(lo, lo + 10))
+    assert archive.page("nova", 8, 5) == (30, _msgs(8, 13))
+    assert archive.page("nova", 25, 100) == (30, _msgs(25, 30))
+    assert archive.page("nova", 30, 5) == (30, [])
+    assert archive.page("silver", 0, 5) == (0, [])
+
+
+def test_orphan_segment_is_ignored_and_not_overwritten(archive, tmp_path):
+    d = tmp_path / "personas" / "nova" / "archive"
+    d.mkdir(parents=True)
+    (d / "2026-01-00000.jsonl.gz").write_bytes(b"crashed before the index")
+    entry = _append(archive, "nova", _msgs(0, 3), JAN)
+    assert entry["segment"] == "2026-01-00001.jsonl.gz"
+    assert archive.page("nova", 0, 10) == (3, _msgs(0, 3))
+
+
+def test_archive_is_compressed(archive):
+    chatty = [{"role": "assistant", "content": "Of course! I'd be happy to help. " * 8}
+              for _ in range(500)]
+    entry = archive.append("nova", chatty)
+    raw = sum(len(json.dumps(m)) + 1 for m in chatty)
+    assert entry["bytes"] * 5 < raw
+
+
+def test_compaction_archives_what_it_cuts(tmp_path):
+    store = HistoryStore(base_dir=tmp_path / "personas", compact_bytes=0, keep=4,
+                         archive=HistoryArchive(base_dir=tmp_path / "personas"))
+    history = _msgs(0, 10)
+    store.write("nova", history)
+    assert store.compact("nova") == 6
+    history.extend(_msgs(10, 12))
+    store.write("nova", history)
+    assert store.compact("nova") == 2
+    assert store.archive.count("nova") == 8
+    assert store.page("nova", 0, 100) == (12, _msgs(0, 12))
+    assert store.page("nova", 6, 4) == (12, _msgs(6, 10))      # archive → journal
+    assert store.page("nova", 10, 4) == (12, _msgs(10, 12))
+    store.delete("nova")
+    assert store.page("nova", 0, 10) == (0, [])
+
+
+def test_service_pages_known_personas_only(tmp_path):
+    base = tmp_path / "personas"
+    (base / "nova").mkdir(parents=True)
+    (base / "nova" / "persona.json").write_text("{}")
+    store = HistoryStore(base_dir=base, archive=HistoryArchive(base_dir=base))
+    store.write("nova", _msgs(0, 3))
+    svc = PersonaService(persona_store=PersonaStore(base_dir=base),
+                         history_store=store, active_persona_id=lambda: None)
+    assert svc.history_page("nova", 1, 10) == (3, _msgs(1, 3))
+    with pytest.raises(PersonaNotFound):
+        svc.history_page("ghost")
@@ -0,0 +1,157 @@
+"""HistoryCache: LRU order under entry and byte budgets, flush-on-evict of
+changed histories only, pins (and the MRU entry) never evicted, stats — and
+PersonaService / ConversationService holding a turn's history pinned."""
+from __future__ import annotations
+
+import json
+import types
+
+import pytest
+
+from backend.services.conversation import ConversationService
+from backend.services.history_cache import HistoryCache, history_bytes
+from backend.services.persona import PersonaService
+from backend.stores.history import HistoryStore
+from backend.stores.personas import PersonaStore
+
+
+def _msgs(n, text="hello"):
+    return [{"role": "user", "content": f"{text} {i}"} for i in range(n)]
+
+
+class _Flushes:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, pid, history):
+        self.calls.append((pid, list(history)))
+
+
+def _cache(**kw):
+    kw.setdefault("max_bytes", 0)
+    flush = _Flushes()
+    return HistoryCache(flush, **kw), flush
+
+
+def test_entry_budget_evicts_least_recently_used():
+    cache, flush = _cache(max_entries=2)
+    for pid in ("a", "b"):
+        cache.get_or_load(pid, lambda p: _msgs(2))
+    cache.get_or_load("a", lambda p: pytest.fail("hit expected"))   # a is MRU
+    cache.get_or_load("c", lambda p: _msgs(2))
+    assert sorted(cache) == ["a", "c"]
+    assert flush.calls == []                                       # b was clean
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 3, 1)
+
+
+def test_byte_budget_counts_growth_on_save():
+    cache, _ = _cache(max_entries=0, max_bytes=history_bytes(_msgs(10)))
+    a = cache.get_or_load("a", lambda p: _msgs(4))
+    cache.get_or_load("b", lambda p: _msgs(4))
+    assert len(cache) == 2
+    cache["a"]                                                     # a is MRU
+    a.extend(_msgs(4, "more"))
+    cache.saved("a")
+    assert list(cache) == ["a"] and cache.stats()["bytes"] == history_bytes(a)
+
+
+def test_changed_history_is_flushed_before_eviction():
+    cache, flush = _cache(max_entries=1)
+    a = cache.get_or_load("a", lambda p: _msgs(2))
+    a.append({"role": "assistant", "content": "unsaved"})
+    cache.get_or_load("b", lambda p: [])
+    assert flush.calls == [("a", a)] and "a" not in cache
+    assert cache.stats()["flushes"] == 1
+
+
+def test_assigned_history_counts_as_unsaved():
+    cache, flush = _cache(max_entries=1)
+    cache["a"] = _msgs(1)
+    cache["b"] = []
+    assert [pid for pid, _ in flush.calls] == ["a"]
+
+
+def test_failed_flush_keeps_the_history():
+    def boom(pid, history):
+        raise OSError("disk full")
+    cache = HistoryCache(boom, max_entries=1, max_bytes=0)
+    cache["a"] = _msgs(1)
+    cache["b"] = []
+    assert "a" in cache and cache.stats()["evictions"] == 0
+
+
+def test_pinned_history_waits_for_its_turn_to_end():
+    cache, _ = _cache(max_entries=1)
+    with cache.pin("a"):
+        a = cache.get_or_load("a", lambda p: _msgs(1))
+        cache.get_or_load("b", lambda p: [])
+        cache.get_or_load("c", lambda p: [])
+        assert "a" in cache and cache.stats()["pinned"] == 1
+    assert list(cache) == ["c"] and cache.stats()["pinned"] == 0      # back in budget
+
+
+def test_a_single_oversized_history_stays_while_most_recent():
+    cache, _ = _cache(max_entries=0, max_bytes=10)
+    big = cache.get_or_load("a", lambda p: _msgs(50))
+    assert cache["a"] is big
+
+
+def test_behaves_like_the_dict_it_replaced():
+    cache, flush = _cache()
+    cache["a"] = []
+    assert cache == {"a": []} and cache.get("nobody") is None
+    assert cache.pop("a") == [] and cache.pop("a", None) is None
+    assert flush.calls == []                                       # pop: no flush
+
+
+@pytest.fixture
+def base(tmp_path, monkeypatch):
+    monkeypatch.setenv("HISTORY_CACHE_MAX_ENTRIES", "1")
+    base = tmp_path / "personas"
+    for pid in ("p0", "p1", "p2"):
+        (base / pid).mkdir(parents=True)
+        (base / pid / "chat_history.json").write_text(json.dumps(_msgs(3, pid)))
+    return base
+
+
+def _service(base):
+    return PersonaService(persona_store=PersonaStore(base_dir=base),
+                          history_store=HistoryStore(base_dir=base),
+                          active_persona_id=lambda: None)
+
+
+def test_service_evicts_and_reloads_from_disk(base):
+    svc = _service(base)
+    p0 = svc.load_history("p0")
+    p0.append({"role": "user", "content": "unsaved"})
+    svc.load_history("p1")                                         # evicts p0
+    assert "p0" not in svc.histories
+    on_disk = HistoryStore(base_dir=base).read("p0")
+    assert on_disk[-1]["content"] == "unsaved"                     # flushed
+    assert svc.load_history("p0") == p0
+    assert svc.history_cache_stats()["evictions"] == 2
+
+
+def test_turn_keeps_its_history_pinned_until_saved(base):
+    personas = _service(base)
+
+    def stream(messages, system_prompt=None, **kw):
+        # Other personas' histories load while this turn is generating.
+        personas.load_history("p1")
+        personas.load_history("p2")
+        yield "fine, thanks"
+
+    runtime = types.SimpleNamespace(
+        persona=types.SimpleNamespace(house_words=[]), system_prompt="sp",
+        match_trigger=lambda text: None)
+    conv = ConversationService(
+        get_persona=lambda pid: None, get_runtime=lambda pid: runtime,
+        history_load=personas.load_history, history_save=personas.save_history,
+        history_pin=personas.pin_history, dispatch=lambda *a: None,
+        llm=types.SimpleNamespace(chat_stream=stream), speak=lambda *a, **k: None)
+    list(conv.run_turn("p0", "how are you"))
+    on_disk = HistoryStore(base_dir=base).read("p0")
+    assert [m["content"] for m in on_disk[-2:]] == ["how are you", "fine, thanks"]
+    personas.load_history("p1")
+    assert "p0" not in personas.histories                          # unpinned now
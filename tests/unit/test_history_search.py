@@ -0,0 +1,197 @@
+"""HistorySearchIndex (FTS5): ranking, snippets, free-text queries, one-time
+backfill — PersonaService indexing only what each write appended, the recall
+skill, recall at turn time, and query latency at 100k messages."""
+from __future__ import annotations
+
+import json
+import random
+import statistics
+import time
+import types
+
+import pytest
+
+from backend.services.conversation import ConversationService
+from backend.services.persona import PersonaNotFound, PersonaService
+from backend.stores.history import HistoryStore
+from backend.stores.personas import PersonaStore
+from backend.stores.search_index import HistorySearchIndex, match_query
+from skills.recall import RECALL_HEADER, RecallSkill
+
+
+def _m(role, content):
+    return {"role": role, "content": content}
+
+
+@pytest.fixture
+def index():
+    idx = HistorySearchIndex(":memory:")
+    yield idx
+    idx.close()
+
+
+def test_ranked_matches_with_snippets(index):
+    index.add("silver", [_m("user", "My dentist appointment is on Tuesday at nine"),
+                         _m("assistant", "I'll remind you about the dentist"),
+                         _m("user", "Let's talk about gardening")])
+    index.add("nova", [_m("user", "The dentist said my teeth are fine")])
+    hits = index.search("what did I tell Silver about the dentist appointment")
+    assert hits[0]["content"].startswith("My dentist appointment")
+    assert "[dentist]" in hits[0]["snippet"] and "[appointment]" in hits[0]["snippet"]
+    assert {h["persona_id"] for h in hits} == {"silver", "nova"}
+    assert [h["persona_id"] for h in index.search("dentist", "nova")] == ["nova"]
+    assert index.search("gardens")[0]["content"] == "Let's talk about gardening"  # stemmed
+
+
+def test_free_text_never_reaches_the_fts_parser(index):
+    index.add("silver", [_m("user", 'she said "hi" AND left (early)')])
+    assert match_query("what did you do?") is None                 # all stop words
+    assert index.search("???") == []
+    assert index.search('"hi" AND (early') != []                   # no syntax error
+    assert match_query("Dentist dentist NEAR") == '"dentist" OR "near"'
+
+
+def test_backfill_runs_once_per_persona(index):
+    calls = []
+
+    def load():
+        calls.append(1)
+        return [_m("user", "the lighthouse keeper")]
+    assert index.backfill("silver", load) == 1
+    assert index.backfill("silver", load) == 0
+    assert calls == [1]
+    index.delete("silver")
+    assert index.search("lighthouse") == []
+    assert index.backfill("silver", load) == 0                     # deleted, not re-read
+
+
+def test_database_is_opened_on_first_use(tmp_path):
+    path = tmp_path / "config" / "history_index.db"
+    idx = HistorySearchIndex(str(path))
+    assert not path.parent.exists()                                # constructing is free
+    idx.add("silver", [_m("user", "the lighthouse keeper")])
+    assert path.exists() and idx.search("lighthouse")[0]["persona_id"] == "silver"
+    idx.close()
+
+
+@pytest.fixture
+def base(tmp_path):
+    base = tmp_path / "personas"
+    for pid in ("silver", "nova"):
+        (base / pid).mkdir(parents=True)
+        (base / pid / "persona.json").write_text("{}")
+    (base / "silver" / "chat_history.json").write_text(json.dumps(
+        [_m("user", "my dentist is Dr. Okafor"), _m("assistant", "Noted.")]))
+    return base
+
+
+def _service(base, index, **kw):
+    return PersonaService(persona_store=PersonaStore(base_dir=base),
+                          history_store=HistoryStore(base_dir=base),
+                          active_persona_id=lambda: None, search_index=index, **kw)
+
+
+def test_service_backfills_then_indexes_each_turn(base, index):
+    svc = _service(base, index)
+    history = svc.load_history("silver")
+    assert index.stats()["messages"] == 2                          # backfilled
+    history.extend([_m("user", "book the dentist"), _m("assistant", "Done.")])
+    svc.save_history("silver")
+    svc.save_history("silver")                                     # nothing new
+    assert index.stats()["messages"] == 4
+    assert {h["content"] for h in svc.search_history("dentist", "silver")} == \
+        {"book the dentist", "my dentist is Dr. Okafor"}
+    svc.delete_history("silver")
+    assert svc.search_history("dentist") == []
+    with pytest.raises(PersonaNotFound):
+        svc.search_history("dentist", "ghost")
+
+
+def test_evicted_history_is_indexed_when_flushed(base, index, monkeypatch):
+    monkeypatch.setenv("HISTORY_CACHE_MAX_ENTRIES", "1")
+    svc = _service(base, index)
+    svc.load_history("silver").append(_m("user", "unsaved orchid"))
+    svc.load_history("nova")                                       # evicts silver
+    assert [h["content"] for h in svc.search_history("orchid")] == ["unsaved orchid"]
+
+
+class _Ctx:
+    target_id = "silver"
+
+    def __init__(self):
+        self.spoken = []
+
+    def speak(self, text):
+        self.spoken.append(text)
+
+
+def test_recall_skill_speaks_and_skips_the_window(index):
+    index.add("silver", [_m("user", "my dentist is Dr. Okafor"),
+                         _m("user", "the dentist moved to Friday")])
+    skill = RecallSkill(lambda q, pid, limit: index.search(q, pid, limit), limit=3)
+    ctx = _Ctx()
+    result = skill.execute(RecallSkill.Params(query="dentist Okafor"), ctx)
+    assert result.ok and ctx.spoken == ["my dentist is Dr. Okafor"]
+    note = skill.context("silver", "when is the dentist",
+                         window=[_m("user", "the dentist moved to Friday")])
+    assert note == RECALL_HEADER + "- user: my dentist is Dr. Okafor"
+    assert skill.context("silver", "gardening") is None
+
+
+def test_turn_sends_recalled_messages_with_the_utterance():
+    sent = []
+
+    def stream(messages, system_prompt=None, **kw):
+        sent.append(messages)
+        yield "Dr. Okafor."
+    history = []
+
+    def runtime(skills):
+        return types.SimpleNamespace(
+            persona=types.SimpleNamespace(house_words=[], skills=skills),
+            system_prompt="sp", match_trigger=lambda text: None)
+    runtimes = {"silver": runtime(["recall"]), "nova": runtime([])}
+    conv = ConversationService(
+        get_persona=lambda pid: None, get_runtime=runtimes.get,
+        history_load=lambda pid: history, history_save=lambda pid: None,
+        dispatch=lambda *a: None, llm=types.SimpleNamespace(chat_stream=stream),
+        speak=lambda *a, **k: None,
+        recall=lambda pid, text, window: f"{RECALL_HEADER}- user: my dentist is Dr. Okafor")
+    list(conv.run_turn("silver", "who is my dentist"))
+    assert sent[-1][-1]["content"] == \
+        f"{RECALL_HEADER}- user: my dentist is Dr. Okafor\n\nwho is my dentist"
+    assert history[0] == _m("user", "who is my dentist")           # stored as said
+    list(conv.run_turn("nova", "who is my dentist"))
+    assert sent[-1][-1]["content"] == "who is my dentist"          # recall not enabled
+
+
+# ── query latency at 100k messages ───────────────────────────────────────
+
+@pytest.mark.slow
+def test_benchmark_search_latency_100k(tmp_path):
+    rng = random.Random(7)
+    vocab = [f"word{i}" for i in range(5000)]
+    idx = HistorySearchIndex(str(tmp_path / "index.db"))
+    t0 = time.perf_counter()
+    for p in range(10):
+        batch = [_m("user" if i % 2 else "assistant",
+                    " ".join(rng.choices(vocab, k=25))) for i in range(10_000)]
+        idx.add(f"p{p}", batch)
+    build_s = time.perf_counter() - t0
+    queries = [" ".join(rng.choices(vocab, k=3)) for _ in range(50)]
+    timings = {"all": [], "persona": []}
+    for q in queries:
+        t0 = time.perf_counter()
+        idx.search(q, limit=10)
+        timings["all"].append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        idx.search(q, "p3", limit=5)
+        timings["persona"].append(time.perf_counter() - t0)
+    print(f"\nindexed 100k messages in {build_s:.1f}s")
+    for name, ts in timings.items():
+        ts.sort()
+        print(f"search ({name}): p50 {statistics.median(ts) * 1000:.2f} ms, "
+              f"p95 {ts[int(len(ts) * 0.95)] * 1000:.2f} ms")
+    assert idx.stats()["messages"] == 100_000
+    assert statistics.median(timings["all"]) < 0.25
+    idx.close()
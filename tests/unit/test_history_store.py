@@ -10,6 +10,15 @@ import pytest
 from backend.stores.history import HistoryStore
 
 
+def _journal(tmp_path, pid):
+    path = tmp_path / "personas" / pid / "chat_history.jsonl"
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def _msgs(n, text="m"):
+    return [{"role": "user", "content": f"{text}{i}"} for i in range(n)]
+
+
 @pytest.fixture
 def store(tmp_path):
     return HistoryStore(base_dir=tmp_path / "personas")
@@ -45,16 +54,15 @@ def test_write_is_atomic_and_cleans_up_tempfile(store, tmp_path, monkeypatch):
     with pytest.raises(OSError):
         store.write("alpha", [{"role": "user", "content": "after"}])
 
-    path = tmp_path / "personas" / "alpha" / "chat_history.json"
-    assert json.loads(path.read_text()) == [{"role": "user", "content": "before"}]
-    leftovers = list((tmp_path / "personas" / "alpha").glob(".chat_history.*.json.tmp"))
+    assert _journal(tmp_path, "alpha") == [{"role": "user", "content": "before"}]
+    leftovers = list((tmp_path / "personas" / "alpha").glob(".chat_history.*.tmp"))
     assert leftovers == [], f"orphan tempfile(s): {leftovers}"
 
 
 def test_delete_removes_file_and_tolerates_missing(store, tmp_path):
     store.write("alpha", [{"role": "user", "content": "x"}])
     store.delete("alpha")
-    assert not (tmp_path / "personas" / "alpha" / "chat_history.json").exists()
+    assert not (tmp_path / "personas" / "alpha" / "chat_history.jsonl").exists()
     assert (tmp_path / "personas" / "alpha").is_dir()  # dir preserved, only file removed
     store.delete("alpha")  # second delete is a no-op
 
@@ -67,3 +75,147 @@ def test_traversal_guard_rejects(store, bad_id):
         store.write(bad_id, [])
     with pytest.raises(ValueError):
         store.delete(bad_id)
+
+
+# ── journal ──────────────────────────────────────────────────────────────
+
+def test_turn_appends_only_its_messages(store, tmp_path, monkeypatch):
+    history = store.read("alpha")
+    history.extend(_msgs(2))
+    store.write("alpha", history)                # first write: the whole file
+    monkeypatch.setattr(os, "replace", lambda *a: pytest.fail("rewrote"))
+    size = (tmp_path / "personas" / "alpha" / "chat_history.jsonl").stat().st_size
+    history.extend(_msgs(2, "turn"))
+    store.write("alpha", history)
+    path = tmp_path / "personas" / "alpha" / "chat_history.jsonl"
+    assert path.read_bytes()[size:].count(b"\n") == 2
+    assert _journal(tmp_path, "alpha") == history
+
+
+def test_trimmed_history_still_appends(store, tmp_path):
+    history = _msgs(4)
+    store.write("alpha", history)
+    del history[:2]                               # _finish_turn's cap trim
+    history.append({"role": "assistant", "content": "new"})
+    store.write("alpha", history)
+    assert [m["content"] for m in _journal(tmp_path, "alpha")] == \
+        ["m0", "m1", "m2", "m3", "new"]
+    assert store.read("alpha", limit=3) == history
+
+
+def test_replaced_history_is_rewritten(store, tmp_path):
+    store.write("alpha", _msgs(3))
+    store.write("alpha", _msgs(1, "x"))
+    assert _journal(tmp_path, "alpha") == _msgs(1, "x")
+
+
+def test_tail_read_spans_blocks(store, monkeypatch):
+    monkeypatch.setattr("backend.stores.history._BLOCK", 64)
+    store.write("alpha", _msgs(200))
+    assert store.read("alpha", limit=7) == _msgs(200)[-7:]
+    assert store.read("alpha", limit=500) == _msgs(200)
+    assert store.read("alpha", limit=0) == []
+
+
+def test_torn_append_is_skipped_and_the_next_starts_a_new_line(store, tmp_path, caplog):
+    history = _msgs(2)
+    store.write("alpha", history)
+    path = tmp_path / "personas" / "alpha" / "chat_history.jsonl"
+    with open(path, "ab") as f:
+        f.write(b'{"role": "user", "cont')        # crash mid-append
+    with caplog.at_level(logging.WARNING, logger="backend.stores.history"):
+        assert store.read("alpha", limit=10) == history
+    assert "Skipping unreadable line" in caplog.text
+    history = store.read("alpha")
+    history.append({"role": "user", "content": "after"})
+    store.write("alpha", history)
+    assert store.read("alpha") == history
+
+
+def test_legacy_json_is_migrated(store, tmp_path):
+    d = tmp_path / "personas" / "alpha"
+    d.mkdir(parents=True)
+    (d / "chat_history.json").write_text(json.dumps(_msgs(3)))
+    assert store.read("alpha", limit=2) == _msgs(3)[-2:]
+    assert not (d / "chat_history.json").exists()
+    assert _journal(tmp_path, "alpha") == _msgs(3)
+
+
+def test_compact_keeps_the_last_messages(tmp_path):
+    store = HistoryStore(base_dir=tmp_path / "personas", compact_bytes=0, keep=3)
+    store.write("alpha", _msgs(10))
+    assert store.compact("alpha") == 7
+    assert _journal(tmp_path, "alpha") == _msgs(10)[-3:]
+    assert store.compact("alpha") == 0
+
+
+def test_compact_carries_over_a_racing_append(tmp_path, monkeypatch):
+    import backend.stores.history as mod
+    store = HistoryStore(base_dir=tmp_path / "personas", compact_bytes=0, keep=2)
+    history = _msgs(5)
+    store.write("alpha", history)
+    parse = mod._parse_lines
+
+    def racing_parse(data, path):
+        # A turn saves between the compaction's read and its swap.
+        monkeypatch.setattr(mod, "_parse_lines", parse)
+        history.append({"role": "assistant", "content": "raced"})
+        store.write("alpha", history)
+        return parse(data, path)
+    monkeypatch.setattr(mod, "_parse_lines", racing_parse)
+    assert store.compact("alpha") == 3
+    assert [m["content"] for m in _journal(tmp_path, "alpha")] == ["m3", "m4", "raced"]
+
+
+def test_compaction_runs_in_the_background_past_the_threshold(tmp_path):
+    store = HistoryStore(base_dir=tmp_path / "personas", compact_bytes=400, keep=4)
+    history = []
+    for i in range(20):
+        history.append({"role": "user", "content": f"message {i}"})
+        store.write("alpha", history)
+    store._compactor.submit(lambda: None).result(timeout=5)   # drain
+    path = tmp_path / "personas" / "alpha" / "chat_history.jsonl"
+    assert path.stat().st_size <= 400
+    assert store.read("alpha")[-1] == history[-1]
+
+
+# ── per-turn write cost benchmark ────────────────────────────────────────
+
+def _legacy_write(path, history):
+    """The pre-journal store: indent=2 JSON, tempfile, fsync, rename."""
+    tmp = path.with_name(".chat_history.bench.tmp")
+    with open(tmp, "w") as f:
+        json.dump(history, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+@pytest.mark.slow
+def test_benchmark_per_turn_write_cost(tmp_path):
+    import time
+    store = HistoryStore(base_dir=tmp_path / "personas", compact_bytes=0)
+    legacy = tmp_path / "legacy.json"
+    history = []
+    rows = []
+    for size in (100, 1000, 5000):
+        while len(history) < size:
+            history.append({"role": "user" if len(history) % 2 == 0 else "assistant",
+                            "content": "word " * 40})
+        store.write("alpha", history)
+        timings = {"rewrite": [], "append": []}
+        for _ in range(10):
+            history.extend([{"role": "user", "content": "hi " * 20},
+                            {"role": "assistant", "content": "hello " * 40}])
+            t0 = time.perf_counter()
+            _legacy_write(legacy, history)
+            timings["rewrite"].append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            store.write("alpha", history)
+            timings["append"].append(time.perf_counter() - t0)
+        med = {k: sorted(v)[len(v) // 2] * 1000 for k, v in timings.items()}
+        rows.append((size, med["rewrite"], med["append"]))
+    print()
+    for size, rewrite, append in rows:
+        print(f"history {size:>5}: rewrite {rewrite:7.2f} ms/turn, append {append:6.2f} ms/turn")
+    assert rows[-1][2] < rows[-1][1]
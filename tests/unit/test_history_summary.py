@@ -0,0 +1,131 @@
+"""HistorySummarizer: folds off the turn path, coalescing, failures kept
+queued, forget() during a fold, persistence — and ConversationService
+folding what the cap trims and sending the summary in the system prompt."""
+from __future__ import annotations
+
+import threading
+import types
+
+from backend.services.conversation import ConversationService
+from backend.services.summary import SUMMARY_HEADER, HistorySummarizer
+from backend.stores.summary import SummaryStore
+
+
+class _SummaryLLM:
+    """Replies with a summary naming every message it was shown."""
+
+    def __init__(self, gate=None):
+        self.prompts = []
+        self.gate = gate
+        self.fail = False
+
+    def chat(self, messages, system_prompt=None):
+        if self.gate is not None:
+            self.gate.wait(2)
+        if self.fail:
+            raise RuntimeError("backend down")
+        prompt = messages[-1]["content"]
+        self.prompts.append(prompt)
+        lines = prompt.split("Conversation that followed:\n")[1].split("\n\n")[0]
+        return "knows " + " ".join(line.split(": ", 1)[1] for line in lines.splitlines())
+
+
+def _msgs(*contents):
+    return [{"role": "user", "content": c} for c in contents]
+
+
+def _summarizer(tmp_path, llm, **kw):
+    return HistorySummarizer(llm, SummaryStore(base_dir=tmp_path), **kw)
+
+
+def test_fold_runs_in_the_background_and_persists(tmp_path):
+    llm = _SummaryLLM()
+    s = _summarizer(tmp_path, llm)
+    s.fold("nova", _msgs("dentist", "tuesday"))
+    s.drain(2)
+    assert s.get("nova") == "knows dentist tuesday"
+    assert s.system_prompt("nova", "You are Nova.") == \
+        f"You are Nova. {SUMMARY_HEADER}knows dentist tuesday"
+    assert s.system_prompt("silver", "You are Silver.") == "You are Silver."
+    fresh = _summarizer(tmp_path, _SummaryLLM())
+    assert fresh.get("nova") == "knows dentist tuesday"
+    s.fold("nova", _msgs("cat"))
+    s.drain(2)
+    assert "knows dentist tuesday" in llm.prompts[-1]           # previous summary
+    assert SummaryStore(base_dir=tmp_path).read("nova")["messages"] == 3
+
+
+def test_blocks_queued_behind_a_fold_share_one_call(tmp_path):
+    gate = threading.Event()
+    llm = _SummaryLLM(gate)
+    s = _summarizer(tmp_path, llm)
+    s.fold("silver", _msgs("first"))                            # holds the worker
+    s.fold("nova", _msgs("a"))
+    s.fold("nova", _msgs("b"))
+    gate.set()
+    s.drain(2)
+    assert s.get("nova") == "knows a b"
+    assert s.stats()["folds"] == 2
+
+
+def test_failed_fold_keeps_its_messages_for_the_next(tmp_path):
+    llm = _SummaryLLM()
+    llm.fail = True
+    s = _summarizer(tmp_path, llm)
+    s.fold("nova", _msgs("a"))
+    s.drain(2)
+    assert s.get("nova") is None
+    assert s.stats()["failed"] == 1 and s.stats()["pending"] == 1
+    llm.fail = False
+    s.fold("nova", _msgs("b"))
+    s.drain(2)
+    assert s.get("nova") == "knows a b"
+
+
+def test_forget_discards_a_fold_in_flight(tmp_path):
+    gate = threading.Event()
+    s = _summarizer(tmp_path, _SummaryLLM(gate))
+    s.fold("nova", _msgs("secret"))
+    s.forget("nova")
+    gate.set()
+    s.drain(2)
+    assert s.get("nova") is None
+    assert SummaryStore(base_dir=tmp_path).read("nova") is None
+
+
+def test_summary_is_clipped_and_zero_words_disables(tmp_path):
+    s = _summarizer(tmp_path, _SummaryLLM(), max_words=3)
+    s.fold("nova", _msgs("one", "two", "three", "four"))
+    s.drain(2)
+    assert s.get("nova") == "knows one two"
+    off = _summarizer(tmp_path, _SummaryLLM(), max_words=0)
+    off.fold("silver", _msgs("x"))
+    off.drain(2)
+    assert off.get("silver") is None and off.stats()["enabled"] is False
+
+
+def test_turns_fold_what_the_cap_trims(tmp_path):
+    summaries = _summarizer(tmp_path, _SummaryLLM())
+    history = []
+    prompts = []
+
+    def stream(messages, system_prompt=None, **kw):
+        prompts.append(system_prompt)
+        yield "ok"
+    runtime = types.SimpleNamespace(
+        persona=types.SimpleNamespace(house_words=[]), system_prompt="sp",
+        match_trigger=lambda text: None)
+    conv = ConversationService(
+        get_persona=lambda pid: None, get_runtime=lambda pid: runtime,
+        history_load=lambda pid: history, history_save=lambda pid: None,
+        dispatch=lambda *a: None, llm=types.SimpleNamespace(chat_stream=stream),
+        speak=lambda *a, **k: None, history_cap=8, summaries=summaries)
+    for i in range(5):
+        list(conv.run_turn("nova", f"turn{i}"))
+    summaries.drain(2)
+    assert len(history) == 6                                    # 10 - (10 - 8 + 2)
+    assert summaries.get("nova") == "knows turn0 ok turn1 ok"
+    list(conv.run_turn("nova", "again"))
+    assert prompts[0] == "sp"
+    assert prompts[-1] == f"sp {SUMMARY_HEADER}knows turn0 ok turn1 ok"
+    assert conv.prefill_prompt("nova")[1] == prompts[-1]
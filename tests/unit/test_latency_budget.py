@@ -0,0 +1,170 @@
+"""Latency budgets: spec parsing, persona overrides, generation limits on
+the wire, the N-sentence cutoff (which aborts the upstream stream), the
+first-token filler, per-turn reports — plus spoken-reply time with and
+without a voice budget against a stand-in server."""
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from backend.clients.llm_router import RouterLLM
+from backend.clients.llm_scheduler import LLMScheduler
+from backend.services.cancellation import CancelToken
+from backend.services.conversation import ConversationService
+from backend.services.latency import (
+    LatencyBudget, LatencyBudgets, cut_sentences, parse_budget)
+from model_interfaces import OpenAICompatLLM
+from persona import Persona
+from tests.standin_llm import StandInLLM
+
+SENTENCES = ["It is sunny. ", "Highs of twenty. ", "Light wind from the west. ",
+             "Rain later on? ", "No, not today! ", "Enjoy it."]
+
+
+def _persona(**kw):
+    return Persona(name="Silver", back_ground="bg", psyche={"traits": []},
+                   gender="Female", language="English", **kw)
+
+
+def _service(llm, budgets, persona=None, spoken=None):
+    persona = persona or _persona()
+    return ConversationService(
+        get_persona=lambda pid: persona, history_load=lambda pid: [],
+        history_save=lambda pid: None, dispatch=lambda *a: None,
+        llm=llm, speak=lambda pid, text: (spoken if spoken is not None else []).append(text),
+        budgets=budgets)
+
+
+def _done(events):
+    return next(ev.payload for ev in events if ev.type == "reply_done")
+
+
+def test_parse_budget():
+    assert parse_budget("ttft=2.5,max_tokens=120,sentences=3") == LatencyBudget(
+        ttft_s=2.5, max_tokens=120, max_sentences=3)
+    assert parse_budget("") is None
+    assert parse_budget("ttft=x,bogus=1,sentences=2") == LatencyBudget(max_sentences=2)
+
+
+@pytest.mark.parametrize("text,n,expected", [
+    ("One. Two. Three.", 2, "One. Two."),
+    ("Really?! Yes. ", 1, "Really?!"),
+    ('He said "hi." Then left.', 1, 'He said "hi."'),
+    ("No end yet", 1, None),
+    ("Ends at the chunk edge.", 1, None),      # may still be "edge.5"
+])
+def test_cut_sentences(text, n, expected):
+    assert cut_sentences(text, n) == expected
+
+
+def test_channel_budgets_and_persona_override(monkeypatch):
+    monkeypatch.setenv("LLM_BUDGET_VOICE", "sentences=3,max_tokens=100")
+    monkeypatch.delenv("LLM_BUDGET_API", raising=False)
+    budgets = LatencyBudgets()
+    assert budgets.budget_for(_persona(), "voice") == LatencyBudget(max_tokens=100, max_sentences=3)
+    assert budgets.budget_for(_persona(), "api") is None
+    assert budgets.budget_for(_persona(), "text") is None
+    terse = _persona(latency_budget={"max_sentences": 1, "filler": "Hmm.", "stop": ["\n\n"],
+                                     "nonsense": 1})
+    assert budgets.budget_for(terse, "voice") == LatencyBudget(
+        max_tokens=100, max_sentences=1, filler="Hmm.", stop=("\n\n",))
+    assert budgets.budget_for(terse, "api").max_sentences == 1
+
+
+def test_limits_reach_the_server(standin_llm):
+    llm = OpenAICompatLLM(base_url=standin_llm.base_url, model="m")
+    list(llm.chat_stream([{"role": "user", "content": "hi"}],
+                         limits={"max_tokens": 64, "stop": ["\n\n"]}))
+    list(llm.chat_stream([{"role": "user", "content": "hi"}]))
+    assert standin_llm.requests[0]["max_tokens"] == 64
+    assert standin_llm.requests[0]["stop"] == ["\n\n"]
+    assert "max_tokens" not in standin_llm.requests[1]
+
+
+def test_wrappers_forward_limits(standin_llm):
+    router = RouterLLM([standin_llm.base_url], model="m")
+    llm = LLMScheduler(router, concurrency=1).bind("interactive")
+    list(llm.chat_stream([{"role": "user", "content": "hi"}], limits={"max_tokens": 32}))
+    assert standin_llm.requests[0]["max_tokens"] == 32
+
+
+def test_sentence_cutoff_stops_the_stream():
+    srv = StandInLLM(chunks=SENTENCES, token_delay=0.05).start()
+    try:
+        llm = OpenAICompatLLM(base_url=srv.base_url, model="m")
+        budgets = LatencyBudgets({"voice": LatencyBudget(max_sentences=2, max_tokens=50)})
+        spoken = []
+        events = list(_service(llm, budgets, spoken=spoken).run_turn("silver", "weather?"))
+        assert srv.disconnected.wait(2)               # upstream aborted, not drained
+    finally:
+        srv.stop()
+    done = _done(events)
+    assert done["text"] == "It is sunny. Highs of twenty."
+    assert spoken == ["It is sunny. Highs of twenty."]
+    assert done["budget"]["cut"] == "sentences" and done["budget"]["met"]
+    assert srv.requests[0]["max_tokens"] == 50
+    assert budgets.stats() == {"voice": {"met": 1, "missed": 0}}
+
+
+def test_late_first_token_says_filler_and_shortens_reply():
+    srv = StandInLLM(chunks=SENTENCES, ttft=0.2).start()
+    try:
+        llm = OpenAICompatLLM(base_url=srv.base_url, model="m")
+        budgets = LatencyBudgets({"voice": LatencyBudget(ttft_s=0.05, max_sentences=4)})
+        spoken = []
+        events = list(_service(llm, budgets, spoken=spoken).run_turn("silver", "weather?"))
+    finally:
+        srv.stop()
+    types = [ev.type for ev in events]
+    assert types.index("reply_filler") < types.index("reply_delta")
+    assert spoken == ["One moment.", "It is sunny."]
+    report = _done(events)["budget"]
+    assert report["filler"] and not report["met"] and report["ttft_s"] >= 0.15
+    assert budgets.stats() == {"voice": {"met": 0, "missed": 1}}
+
+
+def test_cancel_mid_budgeted_turn():
+    srv = StandInLLM(chunks=SENTENCES, token_delay=0.05).start()
+    try:
+        llm = OpenAICompatLLM(base_url=srv.base_url, model="m")
+        budgets = LatencyBudgets({"voice": LatencyBudget(ttft_s=5, max_sentences=10)})
+        svc = _service(llm, budgets)
+        token = CancelToken()
+        events = []
+        for ev in svc.run_turn("silver", "weather?", cancel=token):
+            events.append(ev)
+            if ev.type == "reply_delta":
+                token.cancel("barge-in")
+        assert srv.disconnected.wait(2)
+    finally:
+        srv.stop()
+    assert events[-1].type == "reply_cancelled"
+
+
+def test_unbudgeted_channel_reports_nothing(standin_llm):
+    llm = OpenAICompatLLM(base_url=standin_llm.base_url, model="m")
+    budgets = LatencyBudgets({"voice": LatencyBudget(max_sentences=1)})
+    done = _done(list(_service(llm, budgets).run_turn("silver", "hi", channel="api")))
+    assert "budget" not in done and "max_tokens" not in standin_llm.requests[0]
+
+
+def _spoken_reply_s(budget):
+    srv = StandInLLM(chunks=SENTENCES * 4, token_delay=0.01).start()
+    try:
+        llm = OpenAICompatLLM(base_url=srv.base_url, model="m")
+        budgets = LatencyBudgets({"voice": budget})
+        t0 = time.monotonic()
+        list(_service(llm, budgets).run_turn("silver", "tell me about the weather"))
+        return time.monotonic() - t0
+    finally:
+        srv.stop()
+
+
+@pytest.mark.slow
+def test_benchmark_turn_time_with_voice_budget():
+    unbounded = _spoken_reply_s(None)
+    budgeted = _spoken_reply_s(parse_budget("ttft=4,max_tokens=256,sentences=3"))
+    print(f"\nlong spoken reply: unbounded {unbounded * 1000:.0f} ms, "
+          f"3-sentence budget {budgeted * 1000:.0f} ms")
+    assert budgeted < unbounded / 3
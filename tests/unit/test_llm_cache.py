@@ -0,0 +1,170 @@
+"""ResponseCache / CachedLLM: keying, LRU + TTL, persistence across
+restarts, stream caching, per-site hit rates, and the HA-rephrase opt-in."""
+from __future__ import annotations
+
+import json
+from types import SimpleNamespace
+
+from backend.clients.llm_cache import ResponseCache
+from backend.services.cancellation import CancelToken
+from backend.services.conversation import ConversationService
+from persona import Persona
+
+
+class CountingLLM:
+    model = "m"
+
+    def __init__(self, reply="Lights are off, dear."):
+        self.reply = reply
+        self.calls = 0
+
+    def chat(self, messages, system_prompt=None):
+        self.calls += 1
+        return self.reply
+
+    def chat_stream(self, messages, system_prompt=None, cancel=None):
+        self.calls += 1
+        for word in self.reply.split(" "):
+            if cancel is not None and cancel.cancelled:
+                return
+            yield word + " "
+
+
+MSG = [{"role": "user", "content": "Rephrase: Lights are off."}]
+
+
+def _cache(tmp_path, **kw):
+    return ResponseCache(str(tmp_path / "cache.json"), **kw)
+
+
+def test_repeat_call_is_served_from_cache(tmp_path):
+    llm = CountingLLM()
+    cached = _cache(tmp_path).wrap(llm, site="ha_rephrase")
+    assert cached.chat(MSG) == cached.chat(MSG) == "Lights are off, dear."
+    assert llm.calls == 1
+
+
+def test_key_covers_model_system_prompt_messages_and_params():
+    k = ResponseCache.key
+    base = k("m", "sys", MSG, {"temperature": 0.7})
+    assert base == k("m", "sys", [dict(MSG[0])], {"temperature": 0.7})
+    assert base != k("other", "sys", MSG, {"temperature": 0.7})
+    assert base != k("m", "sys2", MSG, {"temperature": 0.7})
+    assert base != k("m", "sys", [{"role": "user", "content": "x"}], {"temperature": 0.7})
+    assert base != k("m", "sys", MSG, {"temperature": 0.2})
+
+
+def test_lru_bound_evicts_least_recently_used(tmp_path):
+    cache = _cache(tmp_path, max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"          # a is now most recent
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+
+
+def test_ttl_expiry(tmp_path):
+    now = [1000.0]
+    cache = _cache(tmp_path, ttl_s=60, clock=lambda: now[0])
+    cache.put("k", "v")
+    now[0] += 59
+    assert cache.get("k") == "v"
+    now[0] += 2
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_persists_across_restarts(tmp_path):
+    llm = CountingLLM()
+    _cache(tmp_path).wrap(llm, site="s").chat(MSG)
+    restarted = _cache(tmp_path).wrap(llm, site="s")
+    assert restarted.chat(MSG) == "Lights are off, dear."
+    assert llm.calls == 1
+
+
+def test_expired_entries_are_not_reloaded(tmp_path):
+    now = [1000.0]
+    _cache(tmp_path, ttl_s=10, clock=lambda: now[0]).put("k", "v")
+    now[0] += 11
+    assert _cache(tmp_path, ttl_s=10, clock=lambda: now[0]).get("k") is None
+
+
+def test_corrupt_file_starts_empty(tmp_path):
+    (tmp_path / "cache.json").write_text("{nope")
+    cache = _cache(tmp_path)
+    assert cache.get("k") is None
+    cache.put("k", "v")
+    assert json.loads((tmp_path / "cache.json").read_text())[0][0] == "k"
+
+
+def test_empty_replies_and_errors_are_not_cached(tmp_path):
+    cache = _cache(tmp_path)
+    llm = CountingLLM(reply="")
+    cached = cache.wrap(llm, site="s")
+    cached.chat(MSG)
+    cached.chat(MSG)
+    assert llm.calls == 2
+
+    class Boom(CountingLLM):
+        def chat(self, messages, system_prompt=None):
+            self.calls += 1
+            raise RuntimeError("down")
+
+    boom = Boom()
+    for _ in range(2):
+        try:
+            cache.wrap(boom, site="s").chat(MSG)
+        except RuntimeError:
+            pass
+    assert boom.calls == 2
+
+
+def test_stream_is_recorded_and_replayed(tmp_path):
+    llm = CountingLLM()
+    cached = _cache(tmp_path).wrap(llm, site="s")
+    assert "".join(cached.chat_stream(MSG)) == "Lights are off, dear. "
+    assert list(cached.chat_stream(MSG)) == ["Lights are off, dear. "]
+    assert llm.calls == 1
+
+
+def test_cancelled_stream_is_not_recorded(tmp_path):
+    llm = CountingLLM()
+    cached = _cache(tmp_path).wrap(llm, site="s")
+    token = CancelToken()
+    for _ in cached.chat_stream(MSG, cancel=token):
+        token.cancel()
+    assert cached._cache.stats()["entries"] == 0
+
+
+def test_hit_rate_per_site(tmp_path):
+    cache = _cache(tmp_path)
+    a = cache.wrap(CountingLLM(), site="ha_rephrase")
+    for _ in range(4):
+        a.chat(MSG)
+    cache.wrap(CountingLLM(), site="other").chat(MSG)
+    stats = cache.stats()
+    assert stats["sites"]["ha_rephrase"] == {"hits": 3, "misses": 1, "hit_rate": 0.75}
+    assert stats["sites"]["other"]["hits"] == 1     # same key, shared table
+
+
+def test_ha_rephrase_uses_cache_but_turns_do_not(tmp_path):
+    llm = CountingLLM()
+    persona = Persona(name="Silver", back_ground="bg", psyche={"traits": []},
+                      gender="Female", language="English",
+                      house_words=["house"], rephrase_ha_response=True)
+    ha = SimpleNamespace(converse=lambda text, agent_id=None, conversation_id=None:
+                         SimpleNamespace(success=True, speech_text="Lights are off.",
+                                         conversation_id=None))
+    cache = _cache(tmp_path)
+    svc = ConversationService(
+        get_persona=lambda pid: persona, history_load=lambda pid: [],
+        history_save=lambda pid: None, dispatch=lambda *a: None,
+        llm=llm, speak=lambda *a: None, ha=ha, response_cache=cache)
+    for _ in range(3):
+        list(svc.run_turn("silver", "house lights off"))
+    assert llm.calls == 1
+    for _ in range(2):
+        list(svc.run_turn("silver", "how are you"))
+    assert llm.calls == 3
+    assert cache.stats()["sites"] == {"ha_rephrase": {"hits": 2, "misses": 1, "hit_rate": 0.667}}
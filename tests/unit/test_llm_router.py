@@ -0,0 +1,185 @@
+"""RouterLLM against local stand-in SSE servers (tests/standin_llm.py)."""
+from __future__ import annotations
+
+import socket
+import threading
+import time
+
+import pytest
+
+from backend.clients.llm_router import RouterLLM
+from backend.services.cancellation import CancelToken
+from model_interfaces import LLMError, OpenAICompatLLM, llm_slot
+from tests.standin_llm import SlotCacheLLM, StandInLLM
+
+MSG = [{"role": "user", "content": "hi"}]
+
+
+@pytest.fixture
+def servers():
+    started: list = []
+
+    def make(**kw):
+        srv = StandInLLM(**kw).start()
+        started.append(srv)
+        return srv
+    yield make
+    for srv in started:
+        srv.stop()
+
+
+def _dead_url() -> str:
+    """A localhost URL nothing listens on (connection refused)."""
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return f"http://127.0.0.1:{port}/v1"
+
+
+def test_requires_a_url(monkeypatch):
+    monkeypatch.delenv("LLM_URLS", raising=False)
+    with pytest.raises(ValueError):
+        RouterLLM()
+
+
+def test_reads_urls_from_env(monkeypatch):
+    monkeypatch.setenv("LLM_URLS", "http://a:1/v1, http://b:2/v1/")
+    router = RouterLLM(model="m")
+    assert list(router.stats()) == ["http://a:1/v1", "http://b:2/v1"]
+
+
+def test_exposes_the_served_model():
+    from backend.clients.llm_scheduler import LLMScheduler
+    router = RouterLLM(["http://a:1/v1", "http://b:2/v1"], model="qwen")
+    assert router.model == "qwen"
+    assert LLMScheduler(router).model == "qwen"      # turn telemetry reads it here
+    assert RouterLLM(backends=[OpenAICompatLLM(base_url="http://a:1/v1", model="m")]).model == "m"
+
+
+def test_learns_and_prefers_lower_ttft_endpoint(servers):
+    slow = servers(chunks=["slow"], ttft=0.15)
+    fast = servers(chunks=["fast"], ttft=0.0)
+    router = RouterLLM([slow.base_url, fast.base_url], model="m")
+    # Unmeasured endpoints are explored first: one turn each.
+    assert {"".join(router.chat_stream(MSG)) for _ in range(2)} == {"slow", "fast"}
+    for _ in range(3):
+        assert "".join(router.chat_stream(MSG)) == "fast"
+    stats = router.stats()
+    assert stats[fast.base_url]["ewma_ttft_s"] < stats[slow.base_url]["ewma_ttft_s"]
+
+
+def test_stream_fails_over_on_connection_error(servers):
+    live = servers(chunks=["ok"])
+    dead = _dead_url()
+    router = RouterLLM([dead, live.base_url], model="m", cooldown_s=60)
+    assert "".join(router.chat_stream(MSG)) == "ok"
+    stats = router.stats()
+    assert stats[dead]["down"] is True and stats[dead]["failures"] == 1
+    # The down endpoint is ranked last until its cooldown expires.
+    assert "".join(router.chat_stream(MSG)) == "ok"
+    assert router.stats()[dead]["failures"] == 1
+
+
+def test_chat_fails_over_on_connection_error(servers):
+    live = servers(chunks=["o", "k"])
+    router = RouterLLM([_dead_url(), live.base_url], model="m")
+    assert router.chat(MSG) == "ok"
+
+
+def test_http_error_is_not_failed_over(servers):
+    broken = servers(status=400)
+    live = servers(chunks=["ok"])
+    router = RouterLLM([broken.base_url, live.base_url], model="m")
+    with pytest.raises(LLMError):
+        list(router.chat_stream(MSG))
+    assert live.requests == []
+
+
+def test_all_endpoints_down_raises():
+    router = RouterLLM([_dead_url(), _dead_url()], model="m")
+    with pytest.raises(LLMError):
+        list(router.chat_stream(MSG))
+    with pytest.raises(LLMError):
+        router.chat(MSG)
+
+
+def test_hedge_keeps_first_streamer_and_cancels_the_other(servers):
+    stalled = servers(chunks=["late"], ttft=30.0)
+    quick = servers(chunks=["qu", "ick"])
+    router = RouterLLM([stalled.base_url, quick.base_url], model="m",
+                       hedge=True, hedge_default_s=0.1, hedge_min_s=0.05)
+    t0 = time.monotonic()
+    assert "".join(router.chat_stream(MSG)) == "quick"
+    assert time.monotonic() - t0 < 2.0
+    # The loser's upstream is closed, not left generating.
+    assert stalled.disconnected.wait(1.0)
+    assert router.stats()[quick.base_url]["hedges_won"] == 1
+
+
+def test_no_hedge_when_primary_is_on_time(servers):
+    a = servers(chunks=["a"])
+    b = servers(chunks=["b"])
+    router = RouterLLM([a.base_url, b.base_url], model="m", hedge=True,
+                       hedge_default_s=1.0)
+    "".join(router.chat_stream(MSG))
+    assert len(a.requests) + len(b.requests) == 1
+
+
+def test_hedge_threshold_tracks_endpoint_percentile(servers):
+    a = servers(chunks=["a"])
+    router = RouterLLM([a.base_url], model="m", hedge=True,
+                       hedge_default_s=5.0, hedge_min_s=0.01)
+    ep = router._endpoints[0]
+    assert router._hedge_after(ep) == 5.0          # too few samples yet
+    for s in (0.1, 0.1, 0.2, 0.2, 0.3, 0.3, 0.4, 0.4, 0.5, 2.0):
+        ep.record_ttft(s)
+    assert router._hedge_after(ep) == 2.0          # p95 of the samples
+
+
+def test_outer_cancel_closes_every_attempt(servers):
+    a = servers(chunks=["x"], ttft=30.0)
+    b = servers(chunks=["y"], ttft=30.0)
+    router = RouterLLM([a.base_url, b.base_url], model="m", hedge=True,
+                       hedge_default_s=0.05, hedge_min_s=0.01)
+    token = CancelToken()
+    threading.Timer(0.3, token.cancel).start()
+    t0 = time.monotonic()
+    assert list(router.chat_stream(MSG, cancel=token)) == []
+    assert time.monotonic() - t0 < 1.5
+    assert a.disconnected.wait(1.0) and b.disconnected.wait(1.0)
+
+
+def test_slot_pinning_follows_the_attempt_and_its_endpoint():
+    a, b = SlotCacheLLM(chunks=["a"]).start(), SlotCacheLLM(chunks=["b"]).start()
+    try:
+        router = RouterLLM(backends=[OpenAICompatLLM(base_url=s.base_url, model="m", slot_id=0)
+                                     for s in (a, b)])
+        assert router.save_context("silver") is False          # never served
+        with llm_slot("silver"):
+            "".join(router.chat_stream(MSG))
+        home, other = (a, b) if a.requests else (b, a)
+        assert home.requests[-1].get("id_slot") == 0           # pinned on the attempt thread
+        with llm_slot("silver"):
+            "".join(router.chat_stream(MSG))
+        assert len(home.requests) == 2 and not other.requests  # stays on its KV
+        assert router.save_context("silver") and router.restore_context("silver")
+        assert [c[0] for c in home.slot_calls] == ["save", "restore"]
+        assert other.slot_calls == []
+    finally:
+        a.stop()
+        b.stop()
+
+
+def test_hedge_loser_never_lowers_its_ttft_estimate(servers):
+    stalled = servers(chunks=["late"], ttft=30.0)
+    quick = servers(chunks=["quick"])
+    router = RouterLLM([stalled.base_url, quick.base_url], model="m",
+                       hedge=True, hedge_default_s=0.1, hedge_min_s=0.05)
+    slow = router._endpoints[0]
+    slow.record_ttft(5.0)                          # known slow, but ranked first
+    router._endpoints[1].record_ttft(10.0)
+    assert "".join(router.chat_stream(MSG)) == "quick"
+    assert stalled.disconnected.wait(1.0)
+    time.sleep(0.1)                                # the loser's thread winds down
+    assert slow.ewma_ttft == 5.0 and list(slow.samples) == [5.0]
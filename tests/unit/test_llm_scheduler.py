@@ -0,0 +1,309 @@
+"""LLMScheduler: concurrency limit, strict priority, round-robin fairness
+across personas, queue-wait deadlines, cancel while queued, stats and the
+REST handler's `api` tag — plus interactive wait under an API burst."""
+from __future__ import annotations
+
+import statistics
+import threading
+import time
+from collections import deque
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.api.conversation import router as conversation_router
+from backend.api.deps import require_api_key
+from backend.clients.llm_scheduler import (
+    LLMQueueTimeout, LLMScheduler, _flow, _parse_deadlines, _priority, llm_priority)
+from backend.services.cancellation import CancelToken
+
+
+class GateLLM:
+    """Each call blocks until released; records the order calls started."""
+    model = "m"
+
+    def __init__(self):
+        self.started = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+        self._gates = {}
+
+    def _run(self, tag):
+        gate = threading.Event()
+        with self._lock:
+            self.started.append(tag)
+            self._gates[tag] = gate
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        gate.wait(5)
+        with self._lock:
+            self.active -= 1
+        return tag
+
+    def release(self, tag):
+        _wait_for(lambda: tag in self._gates)
+        self._gates[tag].set()
+
+    def chat(self, messages, system_prompt=None):
+        return self._run(messages[0]["content"])
+
+    def chat_stream(self, messages, system_prompt=None, cancel=None):
+        yield self._run(messages[0]["content"])
+
+
+def _wait_for(pred, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if pred():
+            return True
+        time.sleep(0.002)
+    return False
+
+
+def _call(sched, tag, priority="interactive", flow="", results=None):
+    def run():
+        with llm_priority(priority, flow=flow):
+            try:
+                out = sched.chat([{"role": "user", "content": tag}])
+            except LLMQueueTimeout as e:
+                out = e
+        if results is not None:
+            results[tag] = out
+    t = threading.Thread(target=run, daemon=True)
+    t.start()
+    return t
+
+
+def _queued(sched, n):
+    assert _wait_for(lambda: sum(sched.stats()["queued"].values()) == n)
+
+
+def test_concurrency_limit_is_respected():
+    llm = GateLLM()
+    sched = LLMScheduler(llm, concurrency=2)
+    threads = [_call(sched, f"t{i}") for i in range(5)]
+    _queued(sched, 3)
+    assert llm.active == 2
+    for i in range(5):
+        _wait_for(lambda: len(llm.started) > i)
+        llm.release(llm.started[i])
+    for t in threads:
+        t.join(2)
+    assert llm.peak == 2 and sched.stats()["in_flight"] == 0
+
+
+def test_strict_priority_between_classes():
+    llm = GateLLM()
+    sched = LLMScheduler(llm, concurrency=1)
+    threads = [_call(sched, "hold")]
+    assert _wait_for(lambda: llm.started == ["hold"])
+    threads.append(_call(sched, "bg", "background"))
+    _queued(sched, 1)
+    threads.append(_call(sched, "api", "api"))
+    _queued(sched, 2)
+    threads.append(_call(sched, "voice", "interactive"))
+    _queued(sched, 3)
+    for tag in ("hold", "voice", "api", "bg"):
+        llm.release(tag)
+    for t in threads:
+        t.join(2)
+    assert llm.started == ["hold", "voice", "api", "bg"]
+
+
+def test_round_robin_across_flows_within_a_class():
+    llm = GateLLM()
+    sched = LLMScheduler(llm, concurrency=1)
+    threads = [_call(sched, "hold")]
+    assert _wait_for(lambda: llm.started == ["hold"])
+    for i, tag in enumerate(["s1", "s2", "s3", "n1"]):
+        threads.append(_call(sched, tag, "api", flow=tag[0]))
+        _queued(sched, i + 1)
+    for tag in ("hold", "s1", "n1", "s2", "s3"):
+        llm.release(tag)
+    for t in threads:
+        t.join(2)
+    # nova's single request is not stuck behind silver's burst.
+    assert llm.started == ["hold", "s1", "n1", "s2", "s3"]
+
+
+def test_queue_wait_deadline_raises():
+    llm = GateLLM()
+    sched = LLMScheduler(llm, concurrency=1, deadlines={"api": 0.05})
+    results = {}
+    hold = _call(sched, "hold")
+    assert _wait_for(lambda: llm.started == ["hold"])
+    _call(sched, "late", "api", results=results).join(2)
+    assert isinstance(results["late"], LLMQueueTimeout)
+    llm.release("hold")
+    hold.join(2)
+    stats = sched.stats()
+    assert stats["timeouts"]["api"] == 1
+    assert stats["queued"]["api"] == 0 and "late" not in llm.started
+
+
+def test_cancel_while_queued_ends_the_stream_quietly():
+    llm = GateLLM()
+    sched = LLMScheduler(llm, concurrency=1)
+    hold = _call(sched, "hold")
+    assert _wait_for(lambda: llm.started == ["hold"])
+    token = CancelToken()
+    out = []
+    t = threading.Thread(target=lambda: out.extend(
+        sched.chat_stream([{"role": "user", "content": "x"}], cancel=token)), daemon=True)
+    t.start()
+    _queued(sched, 1)
+    token.cancel()
+    t.join(2)
+    assert out == [] and sched.stats()["queued"]["interactive"] == 0
+    llm.release("hold")
+    hold.join(2)
+    assert sched.stats()["in_flight"] == 0 and llm.started == ["hold"]
+
+
+def test_stream_holds_its_slot_until_closed():
+    class Streaming:
+        def chat_stream(self, messages, system_prompt=None):
+            yield "a"
+            yield "b"
+    sched = LLMScheduler(Streaming(), concurrency=1)
+    stream = sched.chat_stream([])
+    assert next(stream) == "a"
+    assert sched.stats()["in_flight"] == 1
+    stream.close()
+    assert sched.stats()["in_flight"] == 0
+
+
+def test_bind_pins_priority_and_stats_histogram():
+    llm = GateLLM()
+    sched = LLMScheduler(llm, concurrency=1)
+    hold = _call(sched, "hold")
+    assert _wait_for(lambda: llm.started == ["hold"])
+    bg = sched.bind("background")
+    t = threading.Thread(target=lambda: bg.chat([{"role": "user", "content": "w"}]),
+                         daemon=True)
+    t.start()
+    assert _wait_for(lambda: sched.stats()["queued"]["background"] == 1)
+    time.sleep(0.06)
+    llm.release("hold")
+    llm.release("w")
+    t.join(2)
+    hold.join(2)
+    stats = sched.stats()
+    assert stats["max_queued"]["background"] == 1
+    assert stats["admitted"] == {"interactive": 1, "api": 0, "background": 1}
+    waits = stats["wait_s"]["background"]
+    assert waits["count"] == 1 and waits["sum"] >= 0.05
+    assert waits["buckets"]["0.05"] == 0 and waits["buckets"]["+Inf"] == 1
+    assert bg.model == "m"
+
+
+def test_admitted_backend_shares_the_slots():
+    main, small = GateLLM(), GateLLM()
+    small.model = "tiny"
+    sched = LLMScheduler(main, concurrency=1)
+    tier = sched.admit(small)
+    assert tier.model == "tiny"
+    hold = _call(sched, "hold")
+    assert _wait_for(lambda: main.started == ["hold"])
+    t = threading.Thread(target=lambda: list(tier.chat_stream([{"role": "user", "content": "s"}])),
+                         daemon=True)
+    t.start()
+    _queued(sched, 1)                                  # waits for the one slot
+    assert small.started == []
+    main.release("hold")
+    small.release("s")
+    t.join(2)
+    hold.join(2)
+    assert small.started == ["s"] and sched.stats()["admitted"]["interactive"] == 2
+
+
+def test_cascade_small_tier_shares_the_scheduler_of_its_server(monkeypatch):
+    from backend.clients.llm_scheduler import AdmittedLLM
+    from model_interfaces import OpenAICompatLLM
+    from playAIdes import _small_tier
+    sched = LLMScheduler(OpenAICompatLLM(base_url="http://box:8080/v1", model="big"))
+    same = _small_tier(OpenAICompatLLM(base_url="http://box:8080/v1/", model="small"), sched)
+    other = _small_tier(OpenAICompatLLM(base_url="http://other:8080/v1", model="small"), sched)
+    assert isinstance(same, AdmittedLLM) and same.backend.model == "small"
+    assert isinstance(other, LLMScheduler)
+
+
+def test_parse_deadlines():
+    d = _parse_deadlines("api=5, background=bad,nope=1")
+    assert d == {"interactive": 30.0, "api": 5.0, "background": 20.0}
+
+
+def test_unknown_priority_rejected():
+    with pytest.raises(ValueError):
+        with llm_priority("urgent"):
+            pass
+
+
+def test_rest_messages_are_tagged_api():
+    seen = []
+
+    class Conv:
+        def run_turn(self, persona_id, text, channel="voice"):
+            seen.append((_priority.get(), _flow.get()))
+            return iter(())
+
+    app = FastAPI()
+    app.include_router(conversation_router)
+    app.state.conversation_service = Conv()
+    app.dependency_overrides[require_api_key] = lambda: None
+    client = TestClient(app)
+    assert client.post("/api/v1/personas/silver/messages", json={"text": "hi"}).status_code == 200
+    assert seen == [("api", "silver")]
+
+
+class FifoServer:
+    """A single-slot server serving requests in arrival order, 10 ms each."""
+    model = "m"
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._queue = deque()
+
+    def chat(self, messages, system_prompt=None):
+        me = object()
+        with self._cond:
+            self._queue.append(me)
+            self._cond.wait_for(lambda: self._queue[0] is me)
+        time.sleep(0.01)
+        with self._cond:
+            self._queue.popleft()
+            self._cond.notify_all()
+        return "ok"
+
+
+def _tagged(llm, priority):
+    with llm_priority(priority):
+        llm.chat([{"role": "user", "content": priority}])
+
+
+def _voice_wait(llm) -> float:
+    """Median latency of a voice turn issued just after an 8-request API burst."""
+    waits = []
+    for _ in range(3):
+        burst = [threading.Thread(target=_tagged, args=(llm, "api"), daemon=True)
+                 for _ in range(8)]
+        for t in burst:
+            t.start()
+        time.sleep(0.005)
+        t0 = time.monotonic()
+        _tagged(llm, "interactive")
+        waits.append(time.monotonic() - t0)
+        for t in burst:
+            t.join(5)
+    return statistics.median(waits)
+
+
+@pytest.mark.slow
+def test_benchmark_voice_wait_under_api_burst():
+    unscheduled = _voice_wait(FifoServer())
+    scheduled = _voice_wait(LLMScheduler(FifoServer(), concurrency=1))
+    print(f"\nvoice turn latency behind an 8-request API burst: "
+          f"unscheduled {unscheduled * 1000:.0f} ms, scheduled {scheduled * 1000:.0f} ms")
+    assert scheduled < unscheduled / 2
@@ -0,0 +1,187 @@
+"""Per-persona KV slot save/restore: OpenAICompatLLM against a stand-in
+emulating llama-server's /slots API, the PlayAIdes swap wiring, and
+swap-back time-to-first-token with and without slots."""
+from __future__ import annotations
+
+import statistics
+import threading
+import time
+import types
+
+import pytest
+
+from backend.services.context import ContextBuilder
+from backend.services.conversation import ConversationService
+from model_interfaces import MockLLM, OpenAICompatLLM, llm_slot
+from persona import Persona
+from tests.standin_llm import SlotCacheLLM
+
+
+@pytest.fixture
+def slots():
+    srv = SlotCacheLLM(chunks=["ok"]).start()
+    yield srv
+    srv.stop()
+
+
+def test_slots_disabled_by_default(slots, monkeypatch):
+    monkeypatch.delenv("LLM_SLOT_ID", raising=False)
+    llm = OpenAICompatLLM(base_url=slots.base_url, model="m")
+    assert llm.save_context("silver") is False
+    assert llm.restore_context("silver") is False
+    list(llm.chat_stream([{"role": "user", "content": "hi"}]))
+    assert slots.slot_calls == []
+    assert "id_slot" not in slots.requests[0]
+
+
+def test_slot_id_from_env_pins_only_tagged_streams(slots, monkeypatch):
+    monkeypatch.setenv("LLM_SLOT_ID", "2")
+    llm = OpenAICompatLLM(base_url=slots.base_url, model="m")
+    assert llm.slot_id == 2
+    with llm_slot("silver"):
+        list(llm.chat_stream([{"role": "user", "content": "hi"}]))
+        llm.chat([{"role": "user", "content": "rephrase this"}])   # HA rephrase
+    list(llm.chat_stream([{"role": "user", "content": "a REST turn"}]))
+    assert [r.get("id_slot") for r in slots.requests] == [2, None, None]
+
+
+def test_save_then_restore_round_trips_the_cache(slots):
+    llm = OpenAICompatLLM(base_url=slots.base_url, model="m", slot_id=0)
+    with llm_slot("silver"):
+        list(llm.chat_stream([{"role": "user", "content": "hello silver"}]))
+    assert llm.save_context("silver") is True
+    with llm_slot("nova"):
+        list(llm.chat_stream([{"role": "user", "content": "something else"}]))
+    assert llm.restore_context("silver") is True
+    with llm_slot("silver"):
+        list(llm.chat_stream([{"role": "user", "content": "hello silver"}]))
+    assert slots.prefills[-1]["prompt_n"] == 0
+    assert slots.slot_calls == [("save", "silver.bin"), ("restore", "silver.bin")]
+
+
+def test_save_is_skipped_when_the_slot_holds_another_prompt(slots):
+    llm = OpenAICompatLLM(base_url=slots.base_url, model="m", slot_id=0)
+    with llm_slot("silver"):
+        list(llm.chat_stream([{"role": "user", "content": "hello silver"}]))
+    list(llm.chat_stream([{"role": "user", "content": "REST turn for nova"}]))
+    assert llm.save_context("silver") is False
+    with llm_slot("nova"):
+        list(llm.chat_stream([{"role": "user", "content": "hi nova"}]))
+    assert llm.save_context("silver") is False
+    assert llm.save_context("nova") is True
+    assert slots.slot_calls == [("save", "nova.bin")]
+
+
+def test_restore_without_save_is_false(slots):
+    llm = OpenAICompatLLM(base_url=slots.base_url, model="m", slot_id=0)
+    assert llm.restore_context("nova") is False
+
+
+def test_slot_filename_is_sanitised(slots):
+    llm = OpenAICompatLLM(base_url=slots.base_url, model="m", slot_id=0)
+    with llm_slot("../etc/x y"):
+        list(llm.chat_stream([{"role": "user", "content": "hi"}]))
+    llm.save_context("../etc/x y")
+    assert slots.slot_calls == [("save", "___etc_x_y.bin")]
+
+
+def test_mock_llm_has_no_slots():
+    assert MockLLM().save_context("a") is False
+    assert MockLLM().restore_context("a") is False
+
+
+class TestPlayAIdesSwap:
+    def _ai(self, llm):
+        from playAIdes import PlayAIdes
+        ai = PlayAIdes.__new__(PlayAIdes)
+        ai.llm = llm
+        ai.conversation = types.SimpleNamespace(prefill_prompt=lambda pid: ([], pid))
+        ai.llm_warm = types.SimpleNamespace(warmed=[])
+        ai.llm_warm.warm = lambda reason, prompt=None: ai.llm_warm.warmed.append(prompt)
+        ai._llm_context_ready = threading.Event()
+        ai._llm_context_ready.set()
+        return ai
+
+    def _recording_llm(self, calls):
+        return types.SimpleNamespace(
+            save_context=lambda name: calls.append(("save", name)) or True,
+            restore_context=lambda name: calls.append(("restore", name)) or True,
+        )
+
+    def test_swap_saves_previous_restores_new_then_prefills(self):
+        calls = []
+        ai = self._ai(self._recording_llm(calls))
+        ai._swap_llm_context("silver", "nova")
+        assert ai._llm_context_ready.wait(1.0)
+        time.sleep(0.05)
+        assert calls == [("save", "silver"), ("restore", "nova")]
+        assert ai.llm_warm.warmed == [([], "nova")]
+
+    def test_first_activation_only_restores(self):
+        calls = []
+        ai = self._ai(self._recording_llm(calls))
+        ai._swap_llm_context(None, "nova")
+        assert ai._llm_context_ready.wait(1.0)
+        assert calls == [("restore", "nova")]
+
+    def test_same_persona_only_prefills(self):
+        calls = []
+        ai = self._ai(self._recording_llm(calls))
+        ai._swap_llm_context("nova", "nova")
+        assert calls == [] and ai.llm_warm.warmed == [([], "nova")]
+
+    def test_failed_swap_still_releases_turns(self):
+        def boom(name):
+            raise RuntimeError("down")
+        ai = self._ai(types.SimpleNamespace(save_context=boom, restore_context=boom))
+        ai._swap_llm_context("silver", "nova")
+        assert ai._llm_context_ready.wait(1.0)
+
+
+def _persona(name):
+    return Persona(name=name, back_ground=f"{name} lives in a lighthouse. " * 20,
+                   psyche={"traits": ["wry"]}, gender="Female", language="English")
+
+
+def _swap_back_ttft(use_slots: bool) -> float:
+    """silver talks, nova takes over, silver comes back: TTFT of silver's
+    return turn."""
+    srv = SlotCacheLLM(chunks=["Sure thing. " * 20], seconds_per_token=100e-6,
+                       slot_io_s=0.002).start()
+    try:
+        llm = OpenAICompatLLM(base_url=srv.base_url, model="m",
+                              slot_id=0 if use_slots else None)
+        personas = {"silver": _persona("Silver"), "nova": _persona("Nova")}
+        histories = {pid: [{"role": "user" if i % 2 == 0 else "assistant",
+                            "content": f"{pid} message {i} " + "word " * 60}
+                           for i in range(20)] for pid in personas}
+        svc = ConversationService(
+            get_persona=personas.get, history_load=histories.__getitem__,
+            history_save=lambda pid: None, dispatch=lambda *a: None,
+            llm=llm, speak=lambda *a: None,
+            context=ContextBuilder(budgets={}))
+        with llm_slot("silver"):
+            list(svc.run_turn("silver", "hello"))
+        llm.save_context("silver")
+        llm.restore_context("nova")
+        with llm_slot("nova"):
+            list(svc.run_turn("nova", "hi nova"))
+        llm.save_context("nova")
+        llm.restore_context("silver")
+        t0 = time.monotonic()
+        with llm_slot("silver"):
+            for ev in svc.run_turn("silver", "I'm back"):
+                if ev.type == "reply_delta":
+                    return time.monotonic() - t0
+    finally:
+        srv.stop()
+    raise AssertionError("no reply")
+
+
+@pytest.mark.slow
+def test_benchmark_swap_back_ttft():
+    without = statistics.median(_swap_back_ttft(False) for _ in range(3))
+    with_slots = statistics.median(_swap_back_ttft(True) for _ in range(3))
+    print(f"\nswap-back TTFT: re-prefill {without * 1000:.1f} ms, "
+          f"slot restore {with_slots * 1000:.1f} ms")
+    assert with_slots < without / 2
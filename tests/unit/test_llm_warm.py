@@ -0,0 +1,214 @@
+"""LLMWarmKeeper: one-token warm-ups against the local stand-in server, the
+keep-alive loop and its active hours, cold-start counting, and the
+PlayAIdes / REST wiring."""
+from __future__ import annotations
+
+import threading
+import time
+import types
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+from backend.api.llm import router
+from backend.clients.llm_warm import LLMWarmKeeper, parse_active_hours
+from backend.services.conversation import ConversationService
+from model_interfaces import OpenAICompatLLM
+from persona import Persona
+
+
+def _wait_for(pred, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if pred():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def _keeper(standin, **kw):
+    kw.setdefault("keepalive_s", 0)
+    kw.setdefault("active_hours", "")
+    kw.setdefault("cold_start_s", 5)
+    return LLMWarmKeeper(OpenAICompatLLM(base_url=standin.base_url, model="m"), **kw)
+
+
+def test_parse_active_hours():
+    assert parse_active_hours("") is None
+    assert parse_active_hours("7-23") == (7, 23)
+    with pytest.raises(ValueError):
+        parse_active_hours("seven")
+    with pytest.raises(ValueError):
+        parse_active_hours("7-25")
+
+
+@pytest.mark.parametrize("spec,hour,active", [
+    ("7-23", 6, False), ("7-23", 7, True), ("7-23", 23, False),
+    ("22-6", 23, True), ("22-6", 3, True), ("22-6", 12, False),
+])
+def test_active_hours_window(standin_llm, spec, hour, active):
+    keeper = _keeper(standin_llm, active_hours=spec,
+                     now=lambda: datetime(2026, 1, 1, hour))
+    assert keeper.in_active_hours() is active
+
+
+def test_warm_is_noop_until_started(standin_llm):
+    keeper = _keeper(standin_llm)
+    assert keeper.warm("ready") is False
+    assert standin_llm.requests == []
+
+
+def test_warm_sends_one_token_completion_and_hangs_up(standin_llm):
+    standin_llm.chunks = ["ok", " and", " more"]
+    standin_llm.token_delay = 30.0
+    keeper = _keeper(standin_llm).start()
+    try:
+        assert keeper.warm("wake_word") is True
+        # The stream is cut after its first token, not generated in full.
+        assert standin_llm.disconnected.wait(1.0)
+        assert _wait_for(lambda: keeper.stats()["warmups"] == 1)
+    finally:
+        keeper.stop()
+    stats = keeper.stats()
+    assert stats["by_reason"] == {"wake_word": 1}
+    assert stats["cold_starts_absorbed"] == 0
+    assert standin_llm.requests[0]["stream"] is True
+
+
+def test_slow_warmup_counts_as_absorbed_cold_start(standin_llm):
+    standin_llm.ttft = 0.2
+    keeper = _keeper(standin_llm, cold_start_s=0.1).start()
+    try:
+        keeper.warm("set_active_persona")
+        assert _wait_for(lambda: keeper.stats()["warmups"] == 1)
+    finally:
+        keeper.stop()
+    assert keeper.stats()["cold_starts_absorbed"] == 1
+
+
+def test_recent_use_or_inflight_warmup_skips(standin_llm):
+    standin_llm.ttft = 0.3
+    keeper = _keeper(standin_llm).start()
+    try:
+        assert keeper.warm("ready") is True
+        assert keeper.warm("set_active_persona") is False      # one in flight
+        assert _wait_for(lambda: keeper.stats()["warmups"] == 1)
+        assert keeper.warm("wake_word") is False               # just warmed
+    finally:
+        keeper.stop()
+    assert len(standin_llm.requests) == 1
+    assert keeper.stats()["skipped"] == 2
+
+
+def test_turn_preempts_a_warmup_still_loading_the_model(standin_llm):
+    from backend.clients.llm_scheduler import LLMScheduler
+    standin_llm.ttft = 30.0                                     # cold load
+    sched = LLMScheduler(OpenAICompatLLM(base_url=standin_llm.base_url, model="m"),
+                         concurrency=1)
+    keeper = LLMWarmKeeper(sched, keepalive_s=0, active_hours="").start()
+    try:
+        assert keeper.warm("wake_word") is True
+        assert _wait_for(lambda: sched.stats()["in_flight"] == 1)
+        assert keeper.preempt() is True
+        # The slot is free for the turn, not held until the load finishes.
+        assert standin_llm.disconnected.wait(1.0)
+        assert _wait_for(lambda: sched.stats()["in_flight"] == 0)
+        assert _wait_for(lambda: keeper.stats()["preempted"] == 1)
+    finally:
+        keeper.stop()
+    assert keeper.stats()["warmups"] == 0 and keeper.stats()["failures"] == 0
+    assert keeper.preempt() is False                            # nothing in flight
+
+
+def test_failed_warmup_is_counted_not_raised():
+    keeper = LLMWarmKeeper(OpenAICompatLLM(base_url="http://127.0.0.1:9/v1", model="m"),
+                           keepalive_s=0, active_hours="").start()
+    try:
+        keeper.warm("ready")
+        assert _wait_for(lambda: keeper.stats()["failures"] == 1)
+        assert keeper.warm("ready") is True    # a failure does not mark it warm
+    finally:
+        keeper.stop()
+
+
+def test_keepalive_pings_when_idle_in_active_hours(standin_llm):
+    keeper = _keeper(standin_llm, keepalive_s=0.05).start()
+    try:
+        assert _wait_for(lambda: keeper.stats()["keepalives"] >= 2)
+    finally:
+        keeper.stop()
+
+
+def test_keepalive_sleeps_outside_active_hours(standin_llm):
+    keeper = _keeper(standin_llm, keepalive_s=0.02, active_hours="7-8",
+                     now=lambda: datetime(2026, 1, 1, 3)).start()
+    time.sleep(0.15)
+    keeper.stop()
+    assert standin_llm.requests == []
+
+
+def test_slow_first_token_on_a_turn_counts_as_cold_start_hit(standin_llm):
+    keeper = _keeper(standin_llm, cold_start_s=0.1)
+    standin_llm.ttft = 0.15
+    persona = Persona(name="TestBot", back_ground="bg", psyche={"traits": []},
+                      gender="Female", language="English")
+    svc = ConversationService(
+        get_persona=lambda pid: persona, history_load=lambda pid: [],
+        history_save=lambda pid: None, dispatch=lambda *a: None,
+        llm=OpenAICompatLLM(base_url=standin_llm.base_url, model="m"),
+        speak=lambda *a: None,
+        on_ttft=lambda pid, s: keeper.observe_ttft(s),
+    )
+    list(svc.run_turn("testbot", "hi"))
+    stats = keeper.stats()
+    assert stats["cold_starts_hit"] == 1 and stats["idle_s"] is not None
+
+
+def test_llm_stats_endpoint():
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+    assert client.get("/api/v1/llm/stats").status_code == 503
+    app.state.llm_stats = lambda: {"warm": {"warmups": 3}}
+    assert client.get("/api/v1/llm/stats").json() == {"warm": {"warmups": 3}}
+
+
+class TestPlayAIdesWiring:
+    def _ai(self):
+        from playAIdes import PlayAIdes
+        ai = PlayAIdes.__new__(PlayAIdes)
+        ai.llm_warm = types.SimpleNamespace(reasons=[])
+        ai.llm_warm.warm = ai.llm_warm.reasons.append
+        ai.current_persona = None
+        ai.args = types.SimpleNamespace(use_avatar=False)
+        return ai
+
+    def test_wake_word_and_ready_frames_warm(self):
+        ai = self._ai()
+        ai._handle_incarnation_message({"type": "wake_word", "payload": {"persona_id": "nova"}})
+        ai._handle_incarnation_message({"type": "status", "payload": {"state": "ready"}})
+        assert ai.llm_warm.reasons == ["wake_word", "ready"]
+
+    def test_user_turn_preempts_an_inflight_warmup(self):
+        ai = self._ai()
+        ai.llm_warm.preempt = lambda: ai.llm_warm.reasons.append("preempt")
+        ai._llm_context_ready = threading.Event()
+        ai._llm_context_ready.set()
+        ai.conversation = types.SimpleNamespace(
+            start_turn=lambda pid: None,
+            run_turn=lambda pid, text, cancel=None: iter(["reply"]))
+        assert list(ai._run_user_turn("nova", "hi")) == ["reply"]
+        assert ai.llm_warm.reasons == ["preempt"]
+
+    def test_llm_stats_includes_router_when_present(self):
+        ai = self._ai()
+        ai.llm_warm.stats = lambda: {"warmups": 0}
+        ai.llm_cache = types.SimpleNamespace(stats=lambda: {"entries": 0})
+        ai.llm = types.SimpleNamespace(
+            stats=lambda: {"in_flight": 0},
+            backend=types.SimpleNamespace(stats=lambda: {"http://a/v1": {}}))
+        assert ai.llm_stats() == {"warm": {"warmups": 0}, "cache": {"entries": 0},
+                                  "scheduler": {"in_flight": 0},
+                                  "router": {"http://a/v1": {}}}
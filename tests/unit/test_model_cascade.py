@@ -0,0 +1,192 @@
+"""ModelCascade: the turn-complexity heuristic, persona pinning, escalation
+from the small tier, ConversationService routing and stats — plus mean turn
+time on a mixed workload, cascade vs large-only, against stand-in servers."""
+from __future__ import annotations
+
+import statistics
+import time
+
+import pytest
+
+from backend.services.cascade import ModelCascade
+from backend.services.context import ContextBuilder
+from backend.services.conversation import ConversationService
+from model_interfaces import LLMError, OpenAICompatLLM
+from persona import Persona
+from tests.standin_llm import StandInLLM
+
+
+class TierLLM:
+    def __init__(self, model, reply="ok", fail=False):
+        self.model = model
+        self.reply = reply
+        self.fail = fail
+        self.calls = 0
+
+    def chat(self, messages, system_prompt=None):
+        return "".join(self.chat_stream(messages, system_prompt))
+
+    def chat_stream(self, messages, system_prompt=None, cancel=None):
+        self.calls += 1
+        if self.fail:
+            raise LLMError("small model down")
+        for word in self.reply.split():
+            yield word + " "
+
+
+def _persona(**kw):
+    return Persona(name="Silver", back_ground="bg", psyche={"traits": []},
+                   gender="Female", language="English", **kw)
+
+
+def _cascade(small=None, large=None, **kw):
+    return ModelCascade(small or TierLLM("small"), large or TierLLM("large"),
+                        threshold=2, **kw)
+
+
+class TestClassify:
+    @pytest.mark.parametrize("text", ["thanks!", "good night", "hey", "how are you",
+                                      "turn it up a bit"])
+    def test_small_talk_goes_small(self, text):
+        assert _cascade().classify(text, []).tier == "small"
+
+    @pytest.mark.parametrize("text", [
+        "why is the sky blue",
+        "can you explain how tides work",
+        "what's the difference between a crocodile and an alligator",
+        "I was thinking about the trip next month and whether we should drive "
+        "or take the train given the weather and the kids and the budget",
+    ])
+    def test_hard_or_long_goes_large(self, text):
+        assert _cascade().classify(text, []).tier == "large"
+
+    def test_deep_history_and_several_questions_add_up(self):
+        route = _cascade(deep_history=4).classify("where? when?", [{}] * 4)
+        assert route.tier == "large"
+        assert route.reasons == ["multi_question", "deep_history"]
+
+    def test_persona_pins_tier(self):
+        c = _cascade()
+        assert c.classify("thanks", [], _persona(model_tier="large")).tier == "large"
+        assert c.classify("why " * 40, [], _persona(model_tier="small")).tier == "small"
+        assert c.classify("thanks", [], _persona(model_tier="bogus")).tier == "small"
+
+
+def test_small_failure_escalates_to_large():
+    small, large = TierLLM("small", fail=True), TierLLM("large", reply="big answer")
+    c = _cascade(small, large)
+    route = c.classify("thanks", [])
+    assert "".join(c.stream(route, [])) == "big answer "
+    assert route.tier == "large" and route.escalated
+    stats = c.stats()
+    assert stats["escalations"] == 1
+    assert stats["tiers"]["small"]["turns"] == 1 and stats["tiers"]["large"]["turns"] == 1
+
+
+def test_empty_small_reply_escalates():
+    c = _cascade(TierLLM("small", reply=""), TierLLM("large", reply="there"))
+    assert "".join(c.stream(c.classify("hi", []), [])) == "there "
+
+
+def test_failure_after_first_token_is_not_escalated():
+    class Flaky(TierLLM):
+        def chat_stream(self, messages, system_prompt=None, cancel=None):
+            yield "partial "
+            raise LLMError("dropped")
+    large = TierLLM("large")
+    c = _cascade(Flaky("small"), large)
+    out = []
+    with pytest.raises(LLMError):
+        for chunk in c.stream(c.classify("hi", []), []):
+            out.append(chunk)
+    assert out == ["partial "] and large.calls == 0
+
+
+def test_conversation_routes_turns_and_reports_tier():
+    small, large = TierLLM("small", reply="hi back"), TierLLM("large", reply="long answer")
+    persona = _persona()
+    budgets = []
+
+    class Builder(ContextBuilder):
+        def build(self, system_prompt, history, user_msg, model=None, start=None):
+            budgets.append(model)
+            return super().build(system_prompt, history, user_msg, model=model, start=start)
+
+    cascade = _cascade(small, large)
+    svc = ConversationService(
+        get_persona=lambda pid: persona, history_load=lambda pid: [],
+        history_save=lambda pid: None, dispatch=lambda *a: None,
+        llm=large, speak=lambda *a: None, context=Builder(budgets={}),
+        cascade=cascade)
+    done = [ev.payload for ev in svc.run_turn("silver", "thanks!") if ev.type == "reply_done"]
+    assert done[0]["text"] == "hi back " and done[0]["model_tier"] == "small"
+    done = [ev.payload for ev in svc.run_turn("silver", "why do cats purr")
+            if ev.type == "reply_done"]
+    assert done[0]["model_tier"] == "large"
+    assert budgets == ["small", "large"]           # context budget follows the tier
+    stats = cascade.stats()
+    assert stats["tiers"]["small"]["turns"] == stats["tiers"]["large"]["turns"] == 1
+    assert stats["reasons"]["hard_question"] == 1
+
+
+def test_house_word_turn_is_not_classified(mock_ha_client):
+    mock_ha_client.script(speech_text="Lights on.", conversation_id="c-1")
+    small, large = TierLLM("small"), TierLLM("large")
+    cascade = _cascade(small, large)
+    svc = ConversationService(
+        get_persona=lambda pid: _persona(house_words=["house"]),
+        history_load=lambda pid: [], history_save=lambda pid: None,
+        dispatch=lambda *a: None, llm=large, speak=lambda *a: None,
+        ha=mock_ha_client, cascade=cascade)
+    done = [ev.payload for ev in svc.run_turn("silver", "house lights on")
+            if ev.type == "reply_done"]
+    assert done[0]["text"] == "Lights on." and "model_tier" not in done[0]
+    assert small.calls == large.calls == 0
+    assert all(t["turns"] == 0 for t in cascade.stats()["tiers"].values())
+
+
+def test_without_cascade_every_turn_uses_llm():
+    llm = TierLLM("large")
+    svc = ConversationService(
+        get_persona=lambda pid: _persona(), history_load=lambda pid: [],
+        history_save=lambda pid: None, dispatch=lambda *a: None,
+        llm=llm, speak=lambda *a: None)
+    done = [ev.payload for ev in svc.run_turn("silver", "thanks") if ev.type == "reply_done"]
+    assert "model_tier" not in done[0] and llm.calls == 1
+
+
+WORKLOAD = ["thanks!", "good morning", "ok", "hey there", "nice", "good night",
+            "why does bread go stale", "explain how a heat pump works",
+            "sure", "bye", "how do magnets work", "cool"]
+
+
+def _mean_turn_s(use_cascade: bool) -> float:
+    small_srv = StandInLLM(chunks=["Sure"] * 10, ttft=0.005, token_delay=0.001).start()
+    large_srv = StandInLLM(chunks=["Sure"] * 10, ttft=0.03, token_delay=0.005).start()
+    try:
+        large = OpenAICompatLLM(base_url=large_srv.base_url, model="large")
+        cascade = (ModelCascade(OpenAICompatLLM(base_url=small_srv.base_url, model="small"),
+                                large, threshold=2) if use_cascade else None)
+        persona = _persona()
+        svc = ConversationService(
+            get_persona=lambda pid: persona, history_load=lambda pid: [],
+            history_save=lambda pid: None, dispatch=lambda *a: None,
+            llm=large, speak=lambda *a: None, cascade=cascade)
+        times = []
+        for text in WORKLOAD:
+            t0 = time.monotonic()
+            list(svc.run_turn("silver", text))
+            times.append(time.monotonic() - t0)
+    finally:
+        small_srv.stop()
+        large_srv.stop()
+    return statistics.mean(times)
+
+
+@pytest.mark.slow
+def test_benchmark_mean_turn_time_cascade_vs_large_only():
+    large_only = _mean_turn_s(False)
+    cascade = _mean_turn_s(True)
+    print(f"\nmean turn time on a mixed workload: large-only {large_only * 1000:.0f} ms, "
+          f"cascade {cascade * 1000:.0f} ms")
+    assert cascade < large_only * 0.75
@@ -0,0 +1,163 @@
+"""PersonaCatalog: search / filter / paging from memory, service writes and
+out-of-band edits kept in the index (polling and, when installed,
+watchfiles), corrupt docs — plus list latency, catalog vs parse-per-call."""
+from __future__ import annotations
+
+import json
+import time
+
+import pytest
+
+from backend.services import catalog as catalog_mod
+from backend.services.catalog import PersonaCatalog
+from backend.services.persona import PersonaService
+from backend.stores.history import HistoryStore
+from backend.stores.personas import PersonaStore
+
+
+def _doc(name, traits=(), gender="Female", language="English"):
+    return {"name": name, "back_ground": "bg", "psyche": {"traits": list(traits)},
+            "gender": gender, "language": language}
+
+
+def _seed(base, pid, doc):
+    d = base / pid
+    d.mkdir(parents=True, exist_ok=True)
+    (d / "persona.json").write_text(json.dumps(doc))
+
+
+def _wait_for(pred, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if pred():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def base(tmp_path):
+    base = tmp_path / "personas"
+    _seed(base, "silver", _doc("Silver", ["wry", "Curious"]))
+    _seed(base, "nova", _doc("Nova", ["cheerful"], language="French"))
+    _seed(base, "rin", _doc("Rin", ["wry"], gender="Male"))
+    return base
+
+
+@pytest.fixture
+def polling(monkeypatch):
+    monkeypatch.setattr(catalog_mod, "watchfiles", None)
+
+
+def _ids(result):
+    return [d["id"] for d in result[1]]
+
+
+def test_search_filter_and_page(base):
+    cat = PersonaCatalog(PersonaStore(base_dir=base))
+    assert _ids(cat.query()) == ["nova", "rin", "silver"]
+    assert _ids(cat.query("SIL")) == ["silver"]
+    assert _ids(cat.query("curi")) == ["silver"]              # trait substring
+    assert _ids(cat.query("silver wry")) == ["silver"]        # every word
+    assert _ids(cat.query(trait="WRY")) == ["rin", "silver"]
+    assert _ids(cat.query(gender="male")) == ["rin"]
+    assert _ids(cat.query(language="french")) == ["nova"]
+    total, page = cat.query(offset=1, limit=1)
+    assert total == 3 and [d["id"] for d in page] == ["rin"]
+    assert cat.query("nobody") == (0, [])
+
+
+def test_results_are_copies(base):
+    cat = PersonaCatalog(PersonaStore(base_dir=base))
+    cat.query("silver")[1][0]["psyche"]["traits"].append("mutated")
+    assert cat.query("silver")[1][0]["psyche"]["traits"] == ["wry", "Curious"]
+
+
+def test_corrupt_doc_is_skipped_and_parsed_once(base):
+    (base / "bad").mkdir()
+    (base / "bad" / "persona.json").write_text("{nope")
+    cat = PersonaCatalog(PersonaStore(base_dir=base))
+    assert _ids(cat.query()) == ["nova", "rin", "silver"]
+    parses = cat.stats()["parses"]
+    cat.query()
+    assert cat.stats()["parses"] == parses == 4
+
+
+def test_service_writes_update_a_running_catalog(base, polling):
+    store = PersonaStore(base_dir=base)
+    svc = PersonaService(persona_store=store, history_store=HistoryStore(base_dir=base),
+                         active_persona_id=lambda: None,
+                         catalog=PersonaCatalog(store, poll_s=60).start())
+    try:
+        scans = svc.catalog.stats()["scans"]
+        svc.create("Ada Lovelace", "mathematician")
+        svc.update("nova", _doc("Nova", ["stoic"]))
+        svc.delete("rin")
+        assert [d["id"] for d in svc.list()] == ["ada_lovelace", "nova", "silver"]
+        assert svc.query(trait="stoic")[0] == 1
+        assert svc.catalog.stats()["scans"] == scans             # no re-scan
+    finally:
+        svc.catalog.stop()
+
+
+def test_polling_picks_up_edits_made_outside_the_service(base, polling):
+    cat = PersonaCatalog(PersonaStore(base_dir=base), poll_s=0.02).start()
+    try:
+        assert cat.stats()["mode"] == "poll"
+        _seed(base, "zed", _doc("Zed"))
+        assert _wait_for(lambda: "zed" in _ids(cat.query()))
+        (base / "zed" / "persona.json").unlink()
+        assert _wait_for(lambda: "zed" not in _ids(cat.query()))
+    finally:
+        cat.stop()
+
+
+@pytest.mark.skipif(catalog_mod.watchfiles is None, reason="watchfiles not installed")
+def test_watchfiles_picks_up_edits(base):
+    cat = PersonaCatalog(PersonaStore(base_dir=base), poll_s=0.05).start()
+    try:
+        _seed(base, "zed", _doc("Zed"))
+        assert _wait_for(lambda: "zed" in _ids(cat.query()), timeout=5)
+    finally:
+        cat.stop()
+
+
+def test_without_a_watcher_every_query_rescans(base):
+    cat = PersonaCatalog(PersonaStore(base_dir=base), poll_s=0)
+    assert cat.start().watching is False
+    _seed(base, "zed", _doc("Zed"))
+    assert "zed" in _ids(cat.query())
+
+
+def _parse_every_doc(store):
+    out = []
+    for pid in store.list_ids():
+        doc = store.read(pid)
+        doc["id"] = pid
+        out.append(doc)
+    return out
+
+
+@pytest.mark.slow
+def test_benchmark_list_catalog_vs_parse_per_call(tmp_path, polling):
+    base = tmp_path / "personas"
+    for i in range(300):
+        _seed(base, f"p{i:03d}", _doc(f"Persona {i}", ["wry", f"trait{i % 7}"]))
+    store = PersonaStore(base_dir=base)
+    cat = PersonaCatalog(store, poll_s=60).start()
+    try:
+        def best(fn, n=5):
+            times = []
+            for _ in range(n):
+                t0 = time.perf_counter()
+                fn()
+                times.append(time.perf_counter() - t0)
+            return min(times)
+        parse = best(lambda: _parse_every_doc(store))
+        page = best(lambda: cat.query("persona 1", limit=20))
+        listing = best(lambda: cat.query())
+    finally:
+        cat.stop()
+    print(f"\n300 personas: parse-per-call {parse * 1000:.1f} ms, catalog list "
+          f"{listing * 1000:.1f} ms, search page {page * 1000:.2f} ms")
+    assert page < parse / 5
@@ -0,0 +1,204 @@
+"""PersonaMemory: the memories string imported into a per-persona vector
+store, re-imported when it changes, added entries surviving that, top-k
+retrieval sent with the user's message instead of the whole string in the
+system prompt, turns never waiting on an import or a slow embedder, the
+fallback when embedding fails, and search latency at 50k entries."""
+from __future__ import annotations
+
+import statistics
+import time
+import types
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from backend.clients.embeddings import EmbeddingClient  # noqa: E402
+from backend.services.conversation import ConversationService  # noqa: E402
+from backend.services.memory import MEMORY_HEADER, PersonaMemory, split_memories  # noqa: E402
+from backend.services.runtime import build_system_prompt  # noqa: E402
+from backend.stores.memory import ENTRIES, VECTORS, VectorMemoryStore  # noqa: E402
+from tests.standin_llm import EmbeddingStandIn  # noqa: E402
+
+MEMORIES = ("I grew up in a lighthouse on the coast.\n"
+            "My sister Maya bakes sourdough bread.\n"
+            "I am afraid of thunderstorms.\n"
+            "My first dog was called Biscuit.")
+
+
+def _persona(memories=MEMORIES):
+    return types.SimpleNamespace(
+        name="Silver", back_ground="a retired sailor", psyche=None,
+        memories=types.SimpleNamespace(memories=memories),
+        persona_voice=None, house_words=[], skills=[])
+
+
+@pytest.fixture
+def server():
+    srv = EmbeddingStandIn(chunks=["Aye."]).start()
+    yield srv
+    srv.stop()
+
+
+@pytest.fixture
+def memory(server, tmp_path):
+    return PersonaMemory(EmbeddingClient(base_url=server.base_url, model="e"),
+                         VectorMemoryStore(tmp_path), top_k=2, retry_s=0)
+
+
+def test_split_memories():
+    assert split_memories("- likes tea\n\n* hates mornings\n") == ["likes tea", "hates mornings"]
+    assert split_memories("Likes tea. Hates mornings! Sails?") == \
+        ["Likes tea.", "Hates mornings!", "Sails?"]
+
+
+def test_store_search_and_torn_tail(tmp_path):
+    store = VectorMemoryStore(tmp_path)
+    store.add("silver", ["a", "b", "c"], [[1, 0], [0, 1], [1, 1]], model="e")
+    assert [t for _, t in store.search("silver", [1, 0.1], 2)] == ["a", "c"]
+    # Crash between the two appends: a vector row with no entry line.
+    with open(tmp_path / "silver" / "memory" / VECTORS, "ab") as f:
+        f.write(np.ones(2, dtype=np.float32).tobytes())
+    fresh = VectorMemoryStore(tmp_path)
+    assert fresh.count("silver") == 3
+    assert fresh.add("silver", ["d"], [[0, -1]]) == 4
+    assert fresh.search("silver", [0, -1], 1) == [(pytest.approx(1.0), "d")]
+    with pytest.raises(ValueError):
+        fresh.add("silver", ["e"], [[1, 0, 0]])                    # size changed
+    assert VectorMemoryStore(tmp_path).texts("silver") == ["a", "b", "c", "d"]
+    store.delete("silver")
+    assert store.count("silver") == 0 and store.search("silver", [1, 0], 2) == []
+
+
+def test_import_reimport_and_added_entries(memory, server, tmp_path):
+    persona = _persona()
+    assert memory.active("silver", persona)
+    assert memory.relevant("silver", persona, "tell me about your dog")[0] == \
+        "My first dog was called Biscuit."
+    embedded = len(server.embedded)
+    assert memory.active("silver", persona) and len(server.embedded) == embedded  # once
+    assert memory.add("silver", ["Maya's bread won a prize at the fair."]) == 5
+    # The string changes: rebuilt from it, the added entry kept.
+    edited = _persona(MEMORIES.replace("Biscuit", "Pepper"))
+    assert memory.active("silver", edited)
+    texts = VectorMemoryStore(tmp_path).texts("silver")
+    assert texts[3] == "My first dog was called Pepper."
+    assert texts[-1] == "Maya's bread won a prize at the fair."
+    assert memory.relevant("silver", edited, "Maya bread prize")[0] == texts[-1]
+    # A new process finds it imported and embeds nothing.
+    again = PersonaMemory(EmbeddingClient(base_url=server.base_url, model="e"),
+                          VectorMemoryStore(tmp_path), top_k=2)
+    embedded = len(server.embedded)
+    assert again.active("silver", edited) and len(server.embedded) == embedded
+
+
+def test_persona_without_memories_is_not_active(memory):
+    assert not memory.active("nova", _persona(""))
+    assert memory.relevant("nova", _persona(""), "hello") is None
+
+
+def test_embedding_failure_falls_back(memory, server):
+    server.fail = True
+    assert not memory.active("silver", _persona())                 # import
+    server.fail = False
+    assert memory.active("silver", _persona())
+    server.fail = True
+    assert memory.relevant("silver", _persona(), "your dog") is None  # query embed
+    assert memory.stats()["failures"] == 2
+    memory.retry_s = 60
+    server.fail = False
+    sent = len(server.requests)
+    assert memory.relevant("silver", _persona(), "your dog") is None  # backing off
+    assert len(server.requests) == sent
+
+
+def test_turns_never_wait_on_the_import_or_a_slow_embedder(memory, server):
+    server.embed_delay = 0.3
+    t0 = time.monotonic()
+    assert memory.relevant("silver", _persona(), "your dog") is None
+    assert time.monotonic() - t0 < 0.1                             # import went to the background
+    deadline = time.monotonic() + 5
+    while not memory.ready("silver", _persona()) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert memory.ready("silver", _persona())
+    memory._embedder.query_timeout = 0.05
+    t0 = time.monotonic()
+    assert memory.relevant("silver", _persona(), "your dog") is None
+    assert time.monotonic() - t0 < 0.25
+
+
+def test_embedder_defaults_to_the_chat_server_only_for_its_model(monkeypatch):
+    monkeypatch.delenv("EMBEDDING_URL", raising=False)
+    monkeypatch.setenv("LLM_URL", "http://chat:8080/v1")
+    monkeypatch.setenv("LLM_MODEL", "qwen")
+    unset = EmbeddingClient(model="nomic-embed-text")
+    assert not unset.available
+    assert not PersonaMemory(unset, VectorMemoryStore("unused")).enabled
+    assert EmbeddingClient(model="qwen").base_url == "http://chat:8080/v1"
+    monkeypatch.setenv("EMBEDDING_URL", "http://embed:9000/v1/")
+    assert EmbeddingClient(model="nomic-embed-text").base_url == "http://embed:9000/v1"
+
+
+def test_forget_drops_the_entries(memory, tmp_path):
+    assert memory.active("silver", _persona())
+    memory.forget("silver")
+    assert not (tmp_path / "silver" / "memory" / ENTRIES).exists()
+    assert memory.active("silver", _persona())                     # imported again
+
+
+def test_memoryless_prompt_leaves_only_the_memories_out():
+    persona = _persona()
+    assert "lighthouse" in build_system_prompt(persona)
+    assert build_system_prompt(persona, memories=False) == \
+        build_system_prompt(_persona(""))
+
+
+def test_turn_sends_relevant_memories_with_the_utterance(memory, server):
+    from backend.services.runtime import PersonaRuntime
+    from model_interfaces import OpenAICompatLLM
+    persona = _persona()
+    history = []
+    conv = ConversationService(
+        get_persona=lambda pid: persona, history_load=lambda pid: history,
+        history_save=lambda pid: None, dispatch=lambda *a: None,
+        llm=OpenAICompatLLM(base_url=server.base_url, model="m"),
+        speak=lambda *a, **k: None, memory=memory,
+        get_runtime=lambda pid: PersonaRuntime.build(persona, pid))
+    assert memory.active("silver", persona)                        # the prewarm's import
+    list(conv.run_turn("silver", "do you like thunderstorms"))
+    sent = server.requests[-1]["messages"]
+    assert "lighthouse" not in sent[0]["content"]                  # memoryless prompt
+    assert sent[-1]["content"].startswith(
+        MEMORY_HEADER + "- I am afraid of thunderstorms.\n")
+    assert sent[-1]["content"].endswith("\n\ndo you like thunderstorms")
+    assert history[0] == {"role": "user", "content": "do you like thunderstorms"}
+    messages, system_prompt = conv.prefill_prompt("silver")
+    assert system_prompt == sent[0]["content"]                     # same cached prefix
+    server.fail = True                                             # embedder down
+    list(conv.run_turn("silver", "and storms"))
+    sent = server.requests[-1]["messages"]
+    assert "lighthouse" in sent[0]["content"] and sent[-1]["content"] == "and storms"
+
+
+# ── search latency at 50k entries ────────────────────────────────────────
+
+@pytest.mark.slow
+def test_benchmark_search_latency_50k(tmp_path):
+    rng = np.random.default_rng(7)
+    dim = 384
+    store = VectorMemoryStore(tmp_path)
+    for start in range(0, 50_000, 10_000):
+        store.add("silver", [f"entry {i}" for i in range(start, start + 10_000)],
+                  rng.standard_normal((10_000, dim), dtype=np.float32))
+    target = store.search("silver", rng.standard_normal(dim), 1)
+    queries = rng.standard_normal((50, dim), dtype=np.float32)
+    timings = []
+    for q in queries:
+        t0 = time.perf_counter()
+        store.search("silver", q, 5)
+        timings.append(time.perf_counter() - t0)
+    timings.sort()
+    print(f"\nsearch over 50k x {dim}: p50 {statistics.median(timings) * 1000:.2f} ms, "
+          f"p95 {timings[int(len(timings) * 0.95)] * 1000:.2f} ms")
+    assert store.count("silver") == 50_000 and len(target) == 1
+    assert statistics.median(timings) < 0.25
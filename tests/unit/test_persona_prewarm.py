@@ -0,0 +1,300 @@
+"""PersonaPrewarmer: parallel steps, failures, in-flight dedup, the swap's
+one-shot fresh() claim, swap-to-first-word — the PlayAIdes prewarm_persona
+wiring, and swap-to-first-word with and without the prewarm."""
+from __future__ import annotations
+
+import json
+import statistics
+import threading
+import time
+import types
+
+import pytest
+
+from backend.services.persona import PersonaService
+from backend.services.prewarm import FIRST_WORD_WINDOW_S, PersonaPrewarmer
+from backend.services.conversation import TurnEvent
+from backend.stores.history import HistoryStore
+from backend.stores.personas import PersonaStore
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def _sleep(seconds, seen=None):
+    def step(pid):
+        if seen is not None:
+            seen.append(pid)
+        time.sleep(seconds)
+    return step
+
+
+def test_steps_run_in_parallel():
+    seen = []
+    pw = PersonaPrewarmer({name: _sleep(0.1, seen) for name in ("a", "b", "c")}, ttl_s=10)
+    t0 = time.monotonic()
+    assert pw.prewarm("nova") is True
+    assert pw.wait("nova", timeout=2)
+    assert time.monotonic() - t0 < 0.25
+    assert seen == ["nova"] * 3
+    assert set(pw.stats()["step_ms"]) == {"a", "b", "c"}
+
+
+def test_failing_step_is_counted_and_others_still_land():
+    def boom(pid):
+        raise RuntimeError("down")
+    pw = PersonaPrewarmer({"ok": lambda pid: None, "bad": boom}, ttl_s=10)
+    pw.prewarm("nova")
+    assert pw.wait("nova", timeout=2)
+    assert pw.stats()["failed"] == {"bad": 1}
+    assert pw.fresh("nova", "ok") is True and pw.fresh("nova", "bad") is False
+
+
+def test_prewarm_in_flight_is_not_repeated():
+    release = threading.Event()
+    pw = PersonaPrewarmer({"slow": lambda pid: release.wait(2)}, ttl_s=10)
+    assert pw.prewarm("nova") is True
+    assert pw.prewarm("nova") is False
+    release.set()
+    assert pw.wait("nova", timeout=2)
+    assert pw.prewarm("nova") is True
+    assert pw.stats()["skipped"] == 1 and pw.stats()["prewarms"] == 2
+
+
+def test_fresh_is_one_shot_and_expires():
+    clock = _Clock()
+    pw = PersonaPrewarmer({"llm_prefix": lambda pid: None}, ttl_s=10, clock=clock)
+    assert pw.fresh("nova", "llm_prefix") is False             # never prewarmed
+    pw.prewarm("nova")
+    pw.wait("nova", timeout=2)
+    assert pw.fresh("nova", "llm_prefix") is True
+    assert pw.fresh("nova", "llm_prefix") is False             # claimed
+    pw.prewarm("nova")
+    pw.wait("nova", timeout=2)
+    clock.now += 11
+    assert pw.fresh("nova", "llm_prefix") is False             # too old
+
+
+def test_ttl_zero_disables():
+    pw = PersonaPrewarmer({"a": lambda pid: None}, ttl_s=0)
+    assert pw.enabled is False and pw.prewarm("nova") is False
+
+
+def test_swap_to_first_word_keeps_the_wake_time():
+    clock = _Clock()
+    pw = PersonaPrewarmer({}, ttl_s=10, clock=clock)
+    assert pw.first_word("nova") is None                       # no swap pending
+    pw.swap_started("nova")                                    # the wake
+    clock.now += 0.1
+    pw.swap_started("nova")                                    # the swap itself
+    clock.now += 0.4
+    assert pw.first_word("nova") == pytest.approx(0.5)
+    assert pw.first_word("nova") is None                       # later turns
+    assert pw.stats()["swap_to_first_word_ms"] == {"p50": 500.0, "max": 500.0,
+                                                   "last": 500.0}
+
+
+def test_wake_without_a_turn_is_abandoned():
+    clock = _Clock()
+    pw = PersonaPrewarmer({}, ttl_s=10, clock=clock)
+    pw.swap_started("nova")
+    clock.now += FIRST_WORD_WINDOW_S + 1
+    assert pw.first_word("nova") is None
+    stats = pw.stats()
+    assert stats["swaps"] == 0 and stats["swaps_abandoned"] == 1
+    assert stats["swap_to_first_word_ms"] is None
+
+
+def test_concurrent_history_loads_share_one_list(tmp_path):
+    base = tmp_path / "personas"
+    (base / "nova").mkdir(parents=True)
+    (base / "nova" / "chat_history.json").write_text(
+        json.dumps([{"role": "user", "content": "hi"}]))
+    svc = PersonaService(persona_store=PersonaStore(base_dir=base),
+                         history_store=HistoryStore(base_dir=base),
+                         active_persona_id=lambda: None)
+    barrier = threading.Barrier(8)
+    lists = []
+
+    def load():
+        barrier.wait()
+        lists.append(svc.load_history("nova"))
+    threads = [threading.Thread(target=load) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert all(h is svc.load_history("nova") for h in lists)
+
+
+class TestPlayAIdesWiring:
+    def _ai(self):
+        from playAIdes import PlayAIdes
+        ai = PlayAIdes.__new__(PlayAIdes)
+        ai.current_persona = None
+        ai._runtime = None
+        ai.prewarmer = types.SimpleNamespace(calls=[])
+        for name in ("prewarm", "swap_started", "first_word"):
+            setattr(ai.prewarmer, name,
+                    lambda pid, name=name: ai.prewarmer.calls.append((name, pid)))
+        return ai
+
+    def test_prewarm_frame_starts_the_clock_and_the_prewarm(self):
+        ai = self._ai()
+        ai._handle_incarnation_message({"type": "prewarm_persona",
+                                        "payload": {"persona_id": "nova"}})
+        ai._handle_incarnation_message({"type": "prewarm_persona", "payload": {}})
+        assert ai.prewarmer.calls == [("swap_started", "nova"), ("prewarm", "nova")]
+
+    def test_prewarm_of_the_active_persona_is_ignored(self, monkeypatch):
+        from playAIdes import PlayAIdes
+        ai = self._ai()
+        monkeypatch.setattr(PlayAIdes, "active_id", property(lambda self: "nova"))
+        ai._handle_incarnation_message({"type": "prewarm_persona",
+                                        "payload": {"persona_id": "nova"}})
+        assert ai.prewarmer.calls == []
+
+    def test_first_reply_text_stops_the_clock_once(self):
+        ai = self._ai()
+        ai.llm_warm = types.SimpleNamespace(preempt=lambda: False)
+        ai._llm_context_ready = threading.Event()
+        ai._llm_context_ready.set()
+        events = [TurnEvent("reply_started", {}), TurnEvent("reply_delta", {"text": "Hi"}),
+                  TurnEvent("reply_delta", {"text": "!"}), TurnEvent("reply_done", {})]
+        ai.conversation = types.SimpleNamespace(
+            start_turn=lambda pid: None,
+            run_turn=lambda pid, text, cancel=None: iter(events))
+        assert list(ai._run_user_turn("nova", "hi")) == events
+        assert ai.prewarmer.calls == [("first_word", "nova")]
+
+    def test_swap_skips_a_prefill_the_wake_already_sent(self):
+        from playAIdes import PlayAIdes
+        ai = PlayAIdes.__new__(PlayAIdes)
+        ai.llm = types.SimpleNamespace(save_context=lambda name: True,
+                                       restore_context=lambda name: True)
+        ai.conversation = types.SimpleNamespace(prefill_prompt=lambda pid: ([], pid))
+        ai.llm_warm = types.SimpleNamespace(warmed=[])
+        ai.llm_warm.warm = lambda reason, prompt=None: ai.llm_warm.warmed.append(prompt)
+        ai._llm_context_ready = threading.Event()
+        ai.prewarmer = PersonaPrewarmer({"llm_prefix": lambda pid: None}, ttl_s=10)
+        ai.prewarmer.prewarm("nova")
+        ai.prewarmer.wait("nova", timeout=2)
+        ai._swap_llm_context("silver", "nova")
+        assert ai._llm_context_ready.wait(1.0)
+        ai._swap_llm_context("nova", "silver")
+        assert ai._llm_context_ready.wait(1.0)
+        time.sleep(0.05)
+        assert ai.llm_warm.warmed == [([], "silver")]
+
+    def test_steps_follow_slots_and_voice(self):
+        from playAIdes import PlayAIdes
+        ai = PlayAIdes.__new__(PlayAIdes)
+        ai.personas = types.SimpleNamespace(get_runtime=None, load_history=None)
+        ai.tts = object()
+        ai.args = types.SimpleNamespace(use_voice=True)
+        ai.llm = types.SimpleNamespace(backend=types.SimpleNamespace(slot_id=None))
+        assert set(ai._prewarm_steps()) == {"runtime", "history", "llm_prefix", "tts_voice"}
+        ai.llm.backend.slot_id = 0
+        ai.args.use_voice = False
+        assert set(ai._prewarm_steps()) == {"runtime", "history"}
+
+    def test_voice_step_caches_the_persona_filler(self):
+        from backend.clients.tts import PhraseAudioCache
+        from backend.services.latency import LatencyBudget, LatencyBudgets
+        from playAIdes import PlayAIdes
+        ai = PlayAIdes.__new__(PlayAIdes)
+        persona = types.SimpleNamespace(latency_budget={"filler": "Hmm, let me think."})
+        ai.personas = types.SimpleNamespace(get_runtime=lambda pid: types.SimpleNamespace(
+            voice_id="v-" + pid, persona=persona))
+        ai.tts = _RigTTS(load_s=0, synth_s=0)
+        ai.llm_budgets = LatencyBudgets({"voice": LatencyBudget(ttft_s=3)})
+        ai.incarnation_server = types.SimpleNamespace(phrase_audio=PhraseAudioCache())
+        ai._prewarm_tts_voice("nova")
+        assert ai.tts.loaded == {"v-nova"}
+        assert ai.incarnation_server.phrase_audio.get("v-nova", "Hmm, let me think.") == b"RIFF"
+        persona.latency_budget = None
+        ai._prewarm_tts_voice("nova")
+        assert ai.incarnation_server.phrase_audio.get("v-nova", "One moment.") == b"RIFF"
+
+
+# ── swap-to-first-word benchmark ─────────────────────────────────────────
+
+class _RigTTS:
+    """One synth at a time; a voice's first synth loads its voice prompt."""
+
+    def __init__(self, load_s=0.15, synth_s=0.02):
+        self.load_s, self.synth_s = load_s, synth_s
+        self.loaded = set()
+        self._lock = threading.Lock()
+
+    def synth(self, text, voice, *, tags=""):
+        with self._lock:
+            if voice not in self.loaded:
+                time.sleep(self.load_s)
+                self.loaded.add(voice)
+            time.sleep(self.synth_s)
+        return b"RIFF"
+
+    def design_voice(self, name, instruct, text, gender, language):
+        return "designed"
+
+
+def _seed(base, pid, name, voice):
+    (base / pid).mkdir(exist_ok=True)
+    (base / pid / "persona.json").write_text(json.dumps({
+        "name": name, "back_ground": f"{name} keeps the lighthouse. " * 10,
+        "psyche": {"traits": ["wry"]}, "gender": "Female", "language": "English",
+        "persona_voice": {"voice": voice}, "avatar": {"model_url": f"{pid}.vrm"}}))
+    (base / pid / "chat_history.json").write_text(json.dumps([
+        {"role": "user" if i % 2 == 0 else "assistant",
+         "content": f"{name} message {i} " + "word " * 30} for i in range(300)]))
+
+
+def _swap_to_first_word(tmp_personas_dir, prewarm: bool) -> float:
+    from model_interfaces import OpenAICompatLLM
+    from playAIdes import PlayAIdes, PlayAIdesArgs
+    from tests.standin_llm import PromptCacheLLM
+    srv = PromptCacheLLM(chunks=["Hello there. ", "Nice to see you."],
+                         seconds_per_token=40e-6).start()
+    tts = _RigTTS()
+    _seed(tmp_personas_dir, "silver", "Silver", "silver-voice")
+    _seed(tmp_personas_dir, "nova", "Nova", "nova-voice")
+    ai = PlayAIdes(PlayAIdesArgs(
+        persona=[str(tmp_personas_dir / "silver" / "persona.json")],
+        generate_voice=False, use_voice=True, use_avatar=True, generate_avatar=False,
+        llm=OpenAICompatLLM(base_url=srv.base_url, model="m"), tts=tts))
+    ai.llm_warm.start()
+    try:
+        list(ai._run_user_turn("silver", "hello"))              # silver is warm
+        t0 = time.monotonic()
+        if prewarm:
+            ai._handle_incarnation_message({"type": "prewarm_persona",
+                                            "payload": {"persona_id": "nova"}})
+        ai._handle_incarnation_message({"type": "set_active_persona",
+                                        "payload": {"id": "nova"}})
+        for ev in ai._run_user_turn("nova", "what's new"):
+            if ev.type == "reply_delta":
+                # The viewer fetches the first sentence's audio: the first word.
+                tts.synth(ev.payload["text"], "nova-voice")
+                elapsed = time.monotonic() - t0
+                assert ai.prewarmer.stats()["swaps"] == 1
+                return elapsed
+    finally:
+        ai.llm_warm.stop()
+        srv.stop()
+    raise AssertionError("no reply")
+
+
+@pytest.mark.slow
+def test_benchmark_swap_to_first_word(tmp_personas_dir, no_incarnation, monkeypatch):
+    monkeypatch.setenv("LLM_KEEPALIVE_S", "0")
+    cold = statistics.median(_swap_to_first_word(tmp_personas_dir, False) for _ in range(3))
+    warm = statistics.median(_swap_to_first_word(tmp_personas_dir, True) for _ in range(3))
+    print(f"\nswap-to-first-word: serial {cold * 1000:.0f} ms, "
+          f"prewarmed {warm * 1000:.0f} ms")
+    assert warm < cold
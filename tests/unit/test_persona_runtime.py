@@ -0,0 +1,137 @@
+"""PersonaRuntime: the compiled phrase matcher against match_phrase_trigger,
+the derived fields, the PersonaService cache and the PlayAIdes active
+runtime — plus per-turn persona overhead, derived per turn vs prebuilt."""
+from __future__ import annotations
+
+import json
+import time
+
+import pytest
+
+from backend.services.persona import PersonaService
+from backend.services.runtime import PersonaRuntime, build_system_prompt
+from backend.stores.history import HistoryStore
+from backend.stores.personas import PersonaStore
+from persona import Persona
+from skills.router import match_phrase_trigger
+
+
+def _persona(**kw):
+    kw.setdefault("triggers", [
+        {"on": {"phrase": "show the front door"}, "do": {"skill": "show_pip",
+                                                         "params": {"url": "u"}}},
+        {"on": {"phrase": "show"}, "do": {"skill": "disabled_skill"}},
+        {"on": {"event": "motion"}, "do": {"skill": "show_pip"}},
+        {"on": {"phrase": "Dismiss"}, "do": {"skill": "dismiss_pip"}},
+    ])
+    kw.setdefault("skills", ["show_pip", "dismiss_pip"])
+    return Persona(name="Silver Fox", back_ground="bg", psyche={"traits": ["wry"]},
+                   gender="Female", **kw)
+
+
+@pytest.mark.parametrize("text", [
+    "Show the front door", "  show the front door, please", "show the front doorway",
+    "showcase", "show", "DISMISS", "dismissed", "dismiss!", "", "what time is it",
+])
+def test_compiled_matcher_agrees_with_match_phrase_trigger(text):
+    persona = _persona()
+    assert (PersonaRuntime.build(persona).match_trigger(text)
+            == match_phrase_trigger(text, persona.triggers, persona.skills))
+
+
+def test_matched_params_are_a_fresh_dict():
+    runtime = PersonaRuntime.build(_persona())
+    runtime.match_trigger("show the front door")[1]["url"] = "mutated"
+    assert runtime.match_trigger("show the front door")[1] == {"url": "u"}
+
+
+def test_derived_fields():
+    persona = _persona(persona_voice={"voice": "v-1"}, wake_words=["hey silver"],
+                       avatar={"model_url": "m/Silver.VRM", "intro_animation": "wave",
+                               "background_url": "bg.jpg"})
+    runtime = PersonaRuntime.build(persona)
+    assert runtime.persona_id == "silver_fox"
+    assert runtime.system_prompt == build_system_prompt(persona)
+    assert "TTS service" in runtime.system_prompt
+    assert runtime.voice_id == "v-1" and runtime.wake_words == ("hey silver",)
+    assert runtime.animation.is_vrm and runtime.animation.intro == "wave"
+    assert runtime.animation.idle == "idle" and runtime.animation.background_url == "bg.jpg"
+    with pytest.raises(AttributeError):
+        runtime.voice_id = "other"                       # frozen
+
+
+@pytest.fixture
+def svc(tmp_path):
+    base = tmp_path / "personas"
+    (base / "silver").mkdir(parents=True)
+    (base / "silver" / "persona.json").write_text(json.dumps(_persona().model_dump()))
+    return PersonaService(persona_store=PersonaStore(base_dir=base),
+                          history_store=HistoryStore(base_dir=base),
+                          active_persona_id=lambda: None)
+
+
+def test_service_caches_runtime_with_the_model(svc):
+    runtime = svc.get_runtime("silver")
+    assert svc.get_runtime("silver") is runtime and runtime.persona_id == "silver"
+    doc = svc.get("silver")
+    doc["back_ground"] = "a new background"
+    svc.update("silver", doc)
+    rebuilt = svc.get_runtime("silver")
+    assert rebuilt is not runtime and "a new background" in rebuilt.system_prompt
+
+
+def test_playaides_active_runtime_follows_the_active_persona():
+    from playAIdes import PlayAIdes
+    ai = PlayAIdes.__new__(PlayAIdes)
+    ai.current_persona = None
+    assert ai.runtime is None and ai.active_id is None
+    ai.current_persona = _persona()
+    first = ai.runtime
+    assert ai.active_id == "silver_fox" and ai.runtime is first
+    ai.current_persona = Persona(name="Nova", back_ground="bg", psyche={"traits": []},
+                                 gender="Female")
+    assert ai.active_id == "nova"
+
+
+def _per_turn_before(svc, text):
+    """What a turn derived from the model before PersonaRuntime."""
+    persona = svc.get_model("silver")
+    persona.name.strip().lower().replace(" ", "_")
+    match_phrase_trigger(text, persona.triggers, persona.skills)
+    return build_system_prompt(persona)
+
+
+def _per_turn_after(svc, text):
+    runtime = svc.get_runtime("silver")
+    runtime.persona_id
+    runtime.match_trigger(text)
+    return runtime.system_prompt
+
+
+@pytest.mark.slow
+def test_benchmark_per_turn_persona_overhead(tmp_path):
+    base = tmp_path / "personas"
+    (base / "silver").mkdir(parents=True)
+    persona = _persona(
+        triggers=[{"on": {"phrase": f"run routine number {i}"},
+                   "do": {"skill": "show_pip", "params": {"n": i}}} for i in range(40)],
+        memories={"memories": "She remembers the lighthouse. " * 40})
+    (base / "silver" / "persona.json").write_text(json.dumps(persona.model_dump()))
+    svc = PersonaService(persona_store=PersonaStore(base_dir=base),
+                         history_store=HistoryStore(base_dir=base),
+                         active_persona_id=lambda: None)
+
+    def per_turn(fn, n=2000):
+        best = float("inf")
+        for _ in range(3):
+            t0 = time.perf_counter()
+            for _ in range(n):
+                fn(svc, "what is the weather like today")
+            best = min(best, (time.perf_counter() - t0) / n)
+        return best
+
+    assert _per_turn_before(svc, "x") == _per_turn_after(svc, "x")
+    before, after = per_turn(_per_turn_before), per_turn(_per_turn_after)
+    print(f"\nper-turn persona overhead: derived {before * 1e6:.1f} us, "
+          f"prebuilt runtime {after * 1e6:.1f} us")
+    assert after < before
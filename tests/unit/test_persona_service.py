@@ -145,8 +145,8 @@ class TestHistory:
     def test_save_persists_cache_and_delete_clears_both(self, svc, base):
         svc.load_history("alpha").append({"role": "user", "content": "ping"})
         svc.save_history("alpha")
-        path = base / "alpha" / "chat_history.json"
-        assert json.loads(path.read_text()) == [{"role": "user", "content": "ping"}]
+        path = base / "alpha" / "chat_history.jsonl"
+        assert HistoryStore(base_dir=base).read("alpha") == [{"role": "user", "content": "ping"}]
         svc.delete_history("alpha")
         assert "alpha" not in svc.histories
         assert not path.exists()
@@ -157,7 +157,7 @@ class TestHistory:
         on_disk = [{"role": "user", "content": "precious"}]
         (d / "chat_history.json").write_text(json.dumps(on_disk))
         svc.save_history("alpha")                    # never loaded: must not wipe
-        assert json.loads((d / "chat_history.json").read_text()) == on_disk
+        assert HistoryStore(base_dir=base).read("alpha") == on_disk
 
 
 class TestTriggers:
@@ -187,3 +187,81 @@ class TestTriggers:
     def test_replace_missing_persona_raises(self, svc):
         with pytest.raises(PersonaNotFound):
             svc.replace_triggers("ghost", [])
+
+
+class TestModelCache:
+    def test_repeat_lookups_hit_the_same_model(self, svc, base):
+        _seed(base, "testbot")
+        first = svc.get_model("testbot")
+        assert svc.get_model("testbot") is first
+        stats = svc.model_cache_stats()
+        assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+    def test_service_writes_invalidate(self, svc, base):
+        _seed(base, "testbot")
+        svc.get_model("testbot")
+        svc.update("testbot", {**VALID, "back_ground": "new bg"})
+        assert svc.get_model("testbot").back_ground == "new bg"
+        trig = [{"on": {"phrase": "lights"}, "do": {"skill": "show_pip"}}]
+        svc.replace_triggers("testbot", trig)
+        assert svc.get_model("testbot").triggers[0].on.phrase == "lights"
+        assert svc.model_cache_stats()["invalidations"] == 2
+
+    def test_delete_invalidates(self, svc, base):
+        _seed(base, "doomed")
+        svc.get_model("doomed")
+        svc.delete("doomed")
+        with pytest.raises(PersonaNotFound):
+            svc.get_model("doomed")
+        assert svc.model_cache_stats()["size"] == 0
+
+    def test_outside_edit_is_picked_up_by_stamp(self, svc, base):
+        import os
+        _seed(base, "testbot")
+        assert svc.get_model("testbot").name == "TestBot"
+        path = base / "testbot" / "persona.json"
+        path.write_text(json.dumps({**VALID, "name": "Renamed"}))
+        st = path.stat()
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+        assert svc.get_model("testbot").name == "Renamed"
+
+    def test_outside_removal_raises_not_found(self, svc, base):
+        import shutil
+        _seed(base, "testbot")
+        svc.get_model("testbot")
+        shutil.rmtree(base / "testbot")
+        with pytest.raises(PersonaNotFound):
+            svc.get_model("testbot")
+
+
+RICH = {
+    **VALID,
+    "psyche": {"traits": ["warm", "curious", "dry humour"]},
+    "memories": {"memories": "Grew up by the sea. " * 20},
+    "house_words": ["house", "home"],
+    "skills": ["show_pip", "dismiss_pip"],
+    "triggers": [{"on": {"phrase": f"show camera {i}"},
+                  "do": {"skill": "show_pip", "params": {"source": f"cam.{i}"}}}
+                 for i in range(20)],
+}
+
+
+@pytest.mark.slow
+def test_benchmark_per_turn_persona_lookup(svc, base):
+    import time
+    _seed(base, "testbot", RICH)
+    n = 300
+
+    def per_call_us(fn):
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        return (time.perf_counter() - t0) / n * 1e6
+
+    from persona import Persona
+    uncached = per_call_us(lambda: Persona(**svc._personas.read("testbot")))
+    cached = per_call_us(lambda: svc.get_model("testbot"))
+    print(f"\npersona lookup per turn: {uncached:.0f} µs read+validate -> "
+          f"{cached:.0f} µs cached (stat only), hit rate "
+          f"{svc.model_cache_stats()['hit_rate']:.3f}")
+    assert cached < uncached / 2
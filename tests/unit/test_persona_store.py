@@ -67,3 +67,11 @@ def test_write_pretty_prints(store, tmp_path):
     store.write("alpha", {"name": "A"})
     text = (tmp_path / "personas" / "alpha" / "persona.json").read_text()
     assert text == json.dumps({"name": "A"}, indent=2)
+
+
+def test_stat_tracks_writes(store):
+    assert store.stat("alpha") is None
+    store.write("alpha", {"name": "A"})
+    first = store.stat("alpha")
+    store.write("alpha", {"name": "Alpha, longer"})
+    assert store.stat("alpha") != first and store.stat("alpha")[1] > first[1]
@@ -9,6 +9,7 @@ from starlette.testclient import TestClient
 
 from backend.api.personas import router
 from backend.services.persona import PersonaActive, PersonaExists, PersonaNotFound
+from model_interfaces import LLMError
 from persona import Persona
 
 
@@ -35,6 +36,9 @@ class FakePersonaService:
         return default if b is None else b
 
     def list(self): return self._do("list", [{"id": "a"}])
+    def query(self, q=None, **kw):
+        page = self._do("query", [{"id": "a"}], q, kw)
+        return len(page), page
     def get(self, pid): return self._do("get", {"id": pid}, pid)
     def create(self, name, description):
         return self._do("create", {"id": "x", "name": name}, name, description)
@@ -44,6 +48,12 @@ class FakePersonaService:
     def get_triggers(self, pid): return self._do("get_triggers", [], pid)
     def replace_triggers(self, pid, triggers):
         return self._do("replace_triggers", triggers, pid, triggers)
+    def search_history(self, q, pid=None, limit=10):
+        return self._do("search_history", [{"id": 1, "snippet": "[hi]"}], q, pid, limit)
+    def history_page(self, pid, offset, limit):
+        page = self._do("history_page", [{"role": "user", "content": "hi"}],
+                        pid, offset, limit)
+        return 250, page
 
 
 @pytest.fixture
@@ -62,6 +72,17 @@ def client(fake_svc):
 def test_list_ok(client):
     r = client.get("/api/v1/personas")
     assert r.status_code == 200 and r.json() == [{"id": "a"}]
+    assert r.headers["X-Total-Count"] == "1"
+
+
+def test_list_passes_search_filters_and_paging(client, fake_svc):
+    r = client.get("/api/v1/personas",
+                   params={"q": "sil", "trait": "wry", "offset": 20, "limit": 10})
+    assert r.status_code == 200
+    assert fake_svc.calls[-1] == ("query", ("sil", {
+        "trait": "wry", "gender": None, "language": None, "offset": 20, "limit": 10}))
+    assert client.get("/api/v1/personas", params={"limit": 0}).status_code == 422
+    assert client.get("/api/v1/personas", params={"offset": -1}).status_code == 422
 
 
 def test_create_201_409_and_422_bad_name(client, fake_svc):
@@ -119,6 +140,51 @@ def test_triggers_get_and_put(client, fake_svc):
     assert client.put("/api/v1/personas/a/triggers", json=trig).status_code == 422
 
 
+def test_history_pages_with_total_and_404(client, fake_svc):
+    r = client.get("/api/v1/personas/a/history?offset=200&limit=50")
+    assert r.status_code == 200 and r.headers["X-Total-Count"] == "250"
+    assert fake_svc.calls[-1] == ("history_page", ("a", 200, 50))
+    assert client.get("/api/v1/personas/a/history?limit=0").status_code == 422
+    fake_svc.behavior["history_page"] = PersonaNotFound("ghost")
+    assert client.get("/api/v1/personas/ghost/history").status_code == 404
+
+
+def test_history_search_passes_query_and_404(client, fake_svc):
+    r = client.get("/api/v1/history/search?q=dentist&persona_id=a&limit=5")
+    assert r.status_code == 200 and r.json()[0]["snippet"] == "[hi]"
+    assert fake_svc.calls[-1] == ("search_history", ("dentist", "a", 5))
+    assert client.get("/api/v1/history/search").status_code == 422   # q required
+    fake_svc.behavior["search_history"] = PersonaNotFound("ghost")
+    assert client.get("/api/v1/history/search?q=x&persona_id=ghost").status_code == 404
+
+
+class FakeMemory:
+    enabled = True
+
+    def __init__(self):
+        self.added = []
+        self.error = None
+
+    def add(self, pid, texts):
+        if self.error is not None:
+            raise self.error
+        self.added.append((pid, texts))
+        return len(texts)
+
+
+def test_add_memories_503_404_502(client, fake_svc):
+    assert client.post("/api/v1/personas/a/memories", json=["x"]).status_code == 503
+    memory = client.app.state.persona_memory = FakeMemory()
+    r = client.post("/api/v1/personas/a/memories", json=["likes tea", "hates mornings"])
+    assert r.status_code == 200 and r.json() == {"count": 2}
+    assert memory.added == [("a", ["likes tea", "hates mornings"])]
+    fake_svc.behavior["get"] = PersonaNotFound("ghost")
+    assert client.post("/api/v1/personas/ghost/memories", json=["x"]).status_code == 404
+    fake_svc.behavior["get"] = None
+    memory.error = LLMError("down")
+    assert client.post("/api/v1/personas/a/memories", json=["x"]).status_code == 502
+
+
 def test_503_when_service_absent():
     app = FastAPI()
     app.include_router(router)
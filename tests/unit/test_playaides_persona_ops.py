@@ -162,6 +162,20 @@ class TestDeletePersona:
         assert play.delete_persona("doomed") is True
         assert not target_dir.exists()
 
+    @pytest.mark.parametrize("via_service", [False, True])
+    def test_recreated_persona_starts_without_the_old_summary(self, play: PlayAIdes,
+                                                               via_service):
+        play.create_persona("Doomed", "to be deleted")
+        play.summaries.fold("doomed", [{"role": "user", "content": "my dentist is Dr. Okafor"}])
+        play.summaries.drain(5)
+        assert play.summaries.get("doomed")
+        if via_service:                      # the REST DELETE path
+            play.personas.delete("doomed")
+        else:
+            assert play.delete_persona("doomed") is True
+        play.create_persona("Doomed", "a new one")
+        assert play.summaries.get("doomed") is None
+
     def test_returns_false_for_missing(self, play: PlayAIdes):
         assert play.delete_persona("never_existed") is False
 
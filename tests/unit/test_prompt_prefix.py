@@ -0,0 +1,158 @@
+"""Prefix-stable prompts: the sticky, block-trimmed context window, block
+trimming of stored history, the activation prefill, and prefill tokens per
+turn measured against a stand-in that emulates llama-server's prompt cache."""
+from __future__ import annotations
+
+import statistics
+import time
+
+import pytest
+
+from backend.clients.llm_warm import LLMWarmKeeper
+from backend.services.context import ContextBuilder
+from backend.services.conversation import ConversationService
+from model_interfaces import OpenAICompatLLM
+from persona import Persona
+from tests.standin_llm import PromptCacheLLM
+
+_PERSONA = {
+    "name": "TestBot", "back_ground": "A lighthouse keeper on a stormy coast.",
+    "psyche": {"traits": ["wry", "patient"]}, "gender": "Female", "language": "English",
+}
+
+
+def _msg(role, words, tag=""):
+    return {"role": role, "content": tag + " ".join(["word"] * words)}
+
+
+def _service(llm, histories, context, cap=400):
+    persona = Persona(**_PERSONA)
+    return ConversationService(
+        get_persona=lambda pid: persona,
+        history_load=lambda pid: histories.setdefault(pid, []),
+        history_save=lambda pid: None,
+        dispatch=lambda *a: None,
+        llm=llm,
+        speak=lambda *a: None,
+        history_cap=cap,
+        context=context,
+    )
+
+
+def _wait_for(pred, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if pred():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+class TestStickyWindow:
+    def test_start_is_kept_while_the_window_fits(self):
+        builder = ContextBuilder(context_tokens=200, reply_tokens=0, budgets={},
+                                 refill_ratio=0.5)
+        history = [_msg("user", 16) for _ in range(10)]      # 20 tokens each
+        first = builder.build(None, history, _msg("user", 6))
+        assert first.trimmed and first.start > 0
+        # Appending keeps the same first message until the budget is hit.
+        history.append(_msg("assistant", 16))
+        second = builder.build(None, history, _msg("user", 6), start=first.start)
+        assert second.start == first.start and not second.trimmed
+        assert second.messages[0] is first.messages[0]
+
+    def test_overflow_trims_one_block_down_to_refill_ratio(self):
+        builder = ContextBuilder(context_tokens=200, reply_tokens=0, budgets={},
+                                 refill_ratio=0.5)
+        history = [_msg("user", 16) for _ in range(10)]
+        built = builder.build(None, history, _msg("user", 6), start=0)
+        assert built.trimmed
+        assert built.prompt_tokens <= 100                  # refill_ratio of budget
+        assert built.dropped >= 5
+
+    def test_stale_start_is_recomputed(self):
+        builder = ContextBuilder(context_tokens=200, reply_tokens=0, budgets={})
+        built = builder.build(None, [_msg("user", 1)], _msg("user", 1), start=40)
+        assert built.start == 0 and len(built.messages) == 2
+
+
+def test_stored_history_trims_in_blocks(standin_llm):
+    histories = {"testbot": [_msg("user", 1, f"m{i} ") for i in range(8)]}
+    svc = _service(OpenAICompatLLM(base_url=standin_llm.base_url, model="m"),
+                   histories, None, cap=8)
+    list(svc.run_turn("testbot", "hi"))
+    # 10 > 8: trimmed to 3/4 of the cap in one go, not to exactly 8.
+    assert len(histories["testbot"]) == 6
+    list(svc.run_turn("testbot", "again"))
+    assert len(histories["testbot"]) == 8               # no trim this turn
+
+
+def test_prefill_prompt_is_the_next_turns_prefix(standin_llm):
+    histories = {"testbot": [_msg("user", 3), _msg("assistant", 3)]}
+    builder = ContextBuilder(context_tokens=4096, reply_tokens=0, budgets={})
+    svc = _service(OpenAICompatLLM(base_url=standin_llm.base_url, model="m"),
+                   histories, builder)
+    messages, system_prompt = svc.prefill_prompt("testbot")
+    list(svc.run_turn("testbot", "hi"))
+    sent = standin_llm.requests[0]["messages"]
+    assert sent[0] == {"role": "system", "content": system_prompt}
+    assert sent[1:1 + len(messages)] == messages
+
+
+def test_prefill_prompt_unknown_persona():
+    svc = ConversationService(
+        get_persona=lambda pid: None, history_load=lambda pid: [],
+        history_save=lambda pid: None, dispatch=lambda *a: None,
+        llm=None, speak=lambda *a: None)
+    assert svc.prefill_prompt("nobody") is None
+
+
+def test_activation_prefill_makes_first_turn_a_cache_hit():
+    srv = PromptCacheLLM(chunks=["ok"]).start()
+    try:
+        llm = OpenAICompatLLM(base_url=srv.base_url, model="m")
+        histories = {"testbot": [_msg("user", 30), _msg("assistant", 60)]}
+        svc = _service(llm, histories, ContextBuilder(budgets={}))
+        keeper = LLMWarmKeeper(llm, keepalive_s=0, active_hours="").start()
+        try:
+            assert keeper.warm("set_active_persona", prompt=svc.prefill_prompt("testbot"))
+            assert _wait_for(lambda: keeper.stats()["warmups"] == 1)
+        finally:
+            keeper.stop()
+        list(svc.run_turn("testbot", "hello"))
+    finally:
+        srv.stop()
+    prefill, turn = srv.prefills
+    # Everything but the new user message (and the prefill's empty
+    # placeholder turn) came from the cache.
+    assert turn["cache_n"] >= prefill["prompt_n"] - 2
+    assert turn["prompt_n"] <= 4
+
+
+def _run_turns(refill_ratio, turns):
+    srv = PromptCacheLLM(chunks=["Sure, " + "word " * 40]).start()
+    try:
+        llm = OpenAICompatLLM(base_url=srv.base_url, model="m")
+        builder = ContextBuilder(context_tokens=1200, reply_tokens=0, budgets={},
+                                 refill_ratio=refill_ratio)
+        svc = _service(llm, {}, builder)
+        for i in range(turns):
+            list(svc.run_turn("testbot", f"question number {i} " + "word " * 10))
+    finally:
+        srv.stop()
+    return [p["prompt_n"] for p in srv.prefills]
+
+
+@pytest.mark.slow
+def test_benchmark_prefill_tokens_block_vs_sliding_trim():
+    turns = 60
+    # refill_ratio=1.0 re-cuts to the full budget on every overflow: once the
+    # window is full it slides one exchange per turn, like the old cap.
+    sliding = _run_turns(1.0, turns)
+    block = _run_turns(0.6, turns)
+    steady = slice(turns // 2, None)             # after the window first fills
+    s_mean = statistics.mean(sliding[steady])
+    b_mean = statistics.mean(block[steady])
+    print(f"\nprefill tokens/turn once full: sliding {s_mean:.0f}, block {b_mean:.0f} "
+          f"(total {sum(sliding)} vs {sum(block)})")
+    assert b_mean < s_mean / 2
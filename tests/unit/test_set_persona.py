@@ -104,7 +104,15 @@ class TestChatPerPersonaRouting:
     def test_chat_persists_after_each_turn(self, play, tmp_personas_dir):
         play.chat("first thing")
         active_id = play.current_persona.name.strip().lower().replace(" ", "_")
-        history_file = tmp_personas_dir / active_id / "chat_history.json"
+        history_file = tmp_personas_dir / active_id / "chat_history.jsonl"
         assert history_file.exists()
-        on_disk = json.loads(history_file.read_text())
+        on_disk = [json.loads(line) for line in history_file.read_text().splitlines()]
         assert on_disk == play.chat_histories[active_id]
+
+
+def test_activated_persona_is_not_the_cached_model(play, tmp_personas_dir):
+    _seed_persona(tmp_personas_dir, "rin")
+    active = play.set_persona("rin")
+    assert active is not play.personas.get_model("rin")
+    active.back_ground = "mutated by voice setup"
+    assert play._conversation_persona("rin").back_ground != "mutated by voice setup"
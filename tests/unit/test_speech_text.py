@@ -0,0 +1,156 @@
+"""Speech sanitizer: the rules, chunk-boundary safety (streamed output equals
+the whole-text result at any chunking), the hold-back cap, the subtitle /
+spoken split through ConversationService and speak_as_persona — plus
+per-chunk overhead and synthesized characters saved."""
+from __future__ import annotations
+
+import time
+import types
+import urllib.parse
+
+import pytest
+
+from backend.services import speech_text
+from backend.services.conversation import ConversationService
+from backend.services.speech_text import SpeechSanitizer, sanitize_for_speech
+from persona import Persona
+
+
+def _stream(text, step):
+    s = SpeechSanitizer()
+    out = "".join(s.feed(text[i:i + step]) for i in range(0, len(text), step))
+    return out + s.flush()
+
+
+@pytest.mark.parametrize("raw,spoken", [
+    ("**Sure!** Happy to help.", "Sure! Happy to help."),
+    ("*smiles warmly* Hello there.", "Hello there."),
+    ("Good night 🌙✨ sleep well 👋🏽", "Good night sleep well"),
+    ("Family 👨‍👩‍👧 time!", "Family time!"),
+    ("Read [the guide](https://example.com/guide) first.", "Read the guide first."),
+    ("See https://www.example.com/a?b=1 for details.", "See example.com for details."),
+    ("# Plan\n- milk\n- eggs\n> quoted", "Plan milk eggs quoted"),
+    ("Run `ls` now.", "Run ls now."),
+    ("Code:\n```python\nprint('hi')\n```\nDone.", "Code: Done."),
+    ("2 * 3 = 6, and my_var stays.", "2 * 3 = 6, and my_var stays."),
+    ("That's _so_ good 😀!", "That's so good!"),
+])
+def test_rules(raw, spoken):
+    assert sanitize_for_speech(raw).strip() == spoken
+
+
+REPLY = ("**Of course!** *tilts head thoughtfully* Here's what I'd do 😊:\n\n"
+         "## Morning\n1. Coffee ☕ first\n- Check [the weather](https://wttr.in/London)\n"
+         "- Skim https://news.example.org/today?ref=x\n\n"
+         "Then `relax`. *waves* See you soon! 👋🏽")
+
+
+@pytest.mark.parametrize("step", [1, 2, 3, 5, 8, 13, 40])
+def test_streamed_equals_whole_text(step):
+    assert _stream(REPLY, step) == sanitize_for_speech(REPLY).strip()
+
+
+def test_open_stage_direction_is_held_across_chunks():
+    s = SpeechSanitizer()
+    assert s.feed("Okay. *lau") == "Okay."
+    assert s.feed("ghs softly* ") == ""  # closed: dropped whole
+    assert s.feed("Fine. ") == " Fine."
+    assert s.flush() == ""
+
+
+def test_unclosed_construct_is_released_after_the_cap(monkeypatch):
+    monkeypatch.setattr(speech_text, "MAX_HOLD_CHARS", 40)
+    s = SpeechSanitizer()
+    out = s.feed("Note *this ")
+    out += s.feed("is a long reply that never closes the asterisk ")
+    assert "long reply" in out
+
+
+def _service(llm_reply, spoken, sanitizer=SpeechSanitizer):
+    persona = Persona(name="Silver", back_ground="bg", psyche={"traits": []},
+                      gender="Female", language="English")
+
+    class LLM:
+        model = "m"
+
+        def chat_stream(self, messages, system_prompt=None):
+            for i in range(0, len(llm_reply), 7):
+                yield llm_reply[i:i + 7]
+
+    return ConversationService(
+        get_persona=lambda pid: persona, history_load=lambda pid: [],
+        history_save=lambda pid: None, dispatch=lambda *a: None, llm=LLM(),
+        speak=lambda pid, text, **kw: spoken.append((text, kw)),
+        speech_sanitizer=sanitizer)
+
+
+def test_subtitle_keeps_raw_text_speech_gets_sanitized():
+    spoken = []
+    events = list(_service("*grins* Sure thing! 😀", spoken).run_turn("silver", "hi"))
+    done = next(ev.payload for ev in events if ev.type == "reply_done")
+    assert done["text"] == "*grins* Sure thing! 😀"
+    assert spoken == [("*grins* Sure thing! 😀", {"spoken_text": "Sure thing!"})]
+
+
+def test_clean_reply_and_no_sanitizer_speak_plainly():
+    spoken = []
+    list(_service("Sure thing!", spoken).run_turn("silver", "hi"))
+    list(_service("*grins*", spoken, sanitizer=None).run_turn("silver", "hi"))
+    assert spoken == [("Sure thing!", {}), ("*grins*", {})]
+
+
+class TestSpeakAsPersona:
+    def _ai(self):
+        from playAIdes import PlayAIdes
+        ai = PlayAIdes.__new__(PlayAIdes)
+        ai.args = types.SimpleNamespace(use_voice=True, use_avatar=True)
+        ai.current_persona = types.SimpleNamespace(
+            name="Silver", persona_voice=types.SimpleNamespace(voice="v1"))
+        ai.display = types.SimpleNamespace(pushed=[])
+        ai.display.push = lambda pid, kind, payload: ai.display.pushed.append((kind, payload))
+        return ai
+
+    def test_tts_gets_spoken_text_subtitle_gets_raw(self):
+        ai = self._ai()
+        ai.speak_as_persona("silver", "*grins* Hi! 😀", spoken_text="Hi!")
+        (kind1, sub), (kind2, lip) = ai.display.pushed
+        assert kind1 == "assistant_message" and sub["text"] == "*grins* Hi! 😀"
+        assert kind2 == "start_lip_sync" and "text=" + urllib.parse.quote("Hi!") in lip["url"]
+
+    def test_nothing_speakable_skips_tts(self):
+        ai = self._ai()
+        ai.speak_as_persona("silver", "😀👍", spoken_text="")
+        assert [k for k, _ in ai.display.pushed] == ["assistant_message"]
+
+
+CORPUS = [
+    REPLY,
+    "*smiles* Of course! I'd love to help with that. 😊",
+    "Here are three ideas:\n\n1. **Walk** in the park 🌳\n2. **Read** a book 📚\n"
+    "3. **Call** a friend ☎️\n\nLet me know! ✨",
+    "The forecast is on https://weather.example.com/forecast/london?units=metric — "
+    "looks like rain 🌧️ later.",
+    "Sure, the lights are off now.",
+    "Hmm... *thinks for a moment* I believe it was 1969. 🚀 "
+    "You can read more at [NASA](https://www.nasa.gov/mission_pages/apollo/index.html).",
+]
+
+
+@pytest.mark.slow
+def test_benchmark_sanitizer_overhead_and_savings():
+    chunks = [c[i:i + 4] for c in CORPUS * 50 for i in range(0, len(c), 4)]
+    t0 = time.perf_counter()
+    raw = spoken = 0
+    for reply in CORPUS * 50:
+        s = SpeechSanitizer()
+        for i in range(0, len(reply), 4):
+            s.feed(reply[i:i + 4])
+        s.flush()
+        raw += s.raw_chars
+        spoken += s.spoken_chars
+    per_chunk_us = (time.perf_counter() - t0) / len(chunks) * 1e6
+    saved = 1 - spoken / raw
+    print(f"\nsanitizer: {per_chunk_us:.1f} µs/chunk, synthesized chars "
+          f"{raw} -> {spoken} ({saved:.0%} saved)")
+    assert per_chunk_us < 500
+    assert saved > 0.15
@@ -0,0 +1,168 @@
+"""Byte-level SSE parser: delta extraction on Ollama / llama-server framing,
+escapes and split UTF-8, line framing, the full-decode fallback, and the
+chat_stream integration — plus parsing throughput against the old
+iter_lines + json.loads path on streams in each server's wire format."""
+from __future__ import annotations
+
+import io
+import json
+import time
+
+import pytest
+import requests
+
+from backend.clients import sse
+from backend.clients.sse import DeltaParser, delta_content
+from model_interfaces import OpenAICompatLLM
+
+
+def _ollama(content):
+    return json.dumps({
+        "id": "chatcmpl-42", "object": "chat.completion.chunk", "created": 1718000000,
+        "model": "llama3.1:8b", "system_fingerprint": "fp_ollama",
+        "choices": [{"index": 0, "delta": {"role": "assistant", "content": content},
+                     "finish_reason": None}]}, ensure_ascii=False)
+
+
+def _llamacpp(content):
+    return json.dumps({
+        "choices": [{"finish_reason": None, "index": 0, "delta": {"content": content}}],
+        "created": 1718000000, "id": "chatcmpl-abc", "model": "gpt-3.5-turbo",
+        "system_fingerprint": "b3600-1d1ccce6", "object": "chat.completion.chunk"},
+        separators=(",", ":"), ensure_ascii=False)
+
+
+def _parse(raw, step):
+    p = DeltaParser()
+    out = []
+    for i in range(0, len(raw), step):
+        out += p.feed(raw[i:i + step])
+    return out, p
+
+
+@pytest.mark.parametrize("payload,expected", [
+    (_ollama("Hello"), "Hello"),
+    (_llamacpp(" world"), " world"),
+    (_ollama('say "hi"\n'), 'say "hi"\n'),
+    (_llamacpp("café \U0001F600"), "café \U0001F600"),            # raw utf-8
+    (json.dumps({"choices": [{"delta": {"content": "naïve \U0001F600"}}]}),
+     "naïve \U0001F600"),                                           # \u escapes
+    (_ollama("back\\slash\\"), "back\\slash\\"),
+    (json.dumps({"choices": [{"delta": {"role": "assistant"}}]}), None),
+    (json.dumps({"choices": [{"delta": {"role": "assistant", "content": None}}]}), None),
+    (json.dumps({"choices": [{"delta": {}, "finish_reason": "stop"}],
+                 "timings": {"predicted_n": 12}}), None),
+    (_llamacpp(""), None),
+    (json.dumps({"choices": [{"delta": {"content": "a"}}, {"delta": {"content": "b"}}]}), "a"),
+    (json.dumps({"choices": [{"delta": {"reasoning_content": {"x": 1}, "content": "ok"}}]}), "ok"),
+    ("not json", None),
+])
+def test_delta_content(payload, expected):
+    assert delta_content(payload.encode()) == expected
+
+
+def test_fallback_without_orjson(monkeypatch):
+    monkeypatch.setattr(sse, "_loads", json.loads)
+    payload = json.dumps({"choices": [{"delta": {"content": "a"}}, {"delta": {"content": "b"}}]})
+    assert delta_content(payload.encode()) == "a"
+
+
+TOKENS = ["Hel", "lo", ",", " café", " \U0001F600", ' "quoted"', "\n", " done."]
+
+
+@pytest.mark.parametrize("step", [1, 2, 3, 7, 64, 4096])
+def test_any_read_boundary(step):
+    raw = (b": keep-alive\n\n"
+           + b"".join(b"data: " + _ollama(t).encode() + b"\n\n" for t in TOKENS)
+           + b"data: [DONE]\n\n" + b"data: " + _ollama("late").encode() + b"\n\n")
+    out, p = _parse(raw, step)
+    assert out == TOKENS and p.done and p.events == len(TOKENS)
+
+
+def test_crlf_and_no_space_after_data():
+    raw = b"".join(b"event: message\r\ndata:" + _llamacpp(t).encode() + b"\r\n\r\n"
+                   for t in TOKENS)
+    out, p = _parse(raw + b"data:[DONE]\r\n", 5)
+    assert out == TOKENS and p.done
+
+
+def test_final_line_without_newline_is_flushed_at_eof():
+    raw = b"data: " + _ollama("Hel").encode() + b"\n\ndata: " + _llamacpp("lo").encode()
+    out, p = _parse(raw, 7)
+    assert out == ["Hel"]
+    assert p.close() == ["lo"] and p.events == 2
+    assert p.close() == []
+    out, p = _parse(raw + b"\n\ndata: [DONE]", 4096)
+    assert out == ["Hel", "lo"] and p.close() == [] and p.done
+
+
+def test_lines_are_parsed_in_the_read_buffer(monkeypatch):
+    """No copy of the buffer per read: fast-path lines reach delta_content as
+    offsets into it, fallback lines as a memoryview."""
+    seen = []
+    monkeypatch.setattr(sse, "_loads", lambda view: seen.append(type(view)) or json.loads(bytes(view)))
+    fallback = json.dumps({"choices": [{"delta": {"content": "a"}}, {"delta": {"content": "b"}}]})
+    raw = b"data: " + _ollama("x").encode() + b"\n\ndata: " + fallback.encode() + b"\n\n"
+    out, p = _parse(raw, 64)
+    assert out == ["x", "a"] and seen == [memoryview]
+    assert not p._buf
+
+
+def test_chat_stream_through_parser(standin_llm):
+    llm = OpenAICompatLLM(base_url=standin_llm.base_url, model="m")
+    text = "".join(llm.chat_stream([{"role": "user", "content": "hi"}]))
+    assert text == "".join(standin_llm.chunks)
+
+
+def _old_parse(raw):
+    """The pre-parser path: requests' iter_lines(decode_unicode) + json.loads."""
+    r = requests.Response()
+    r.raw = io.BytesIO(raw)
+    r.encoding = "utf-8"
+    out = []
+    for line in r.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+        chunk = json.loads(data)
+        content = (chunk.get("choices") or [{}])[0].get("delta", {}).get("content")
+        if content:
+            out.append(content)
+    return out
+
+
+def _new_parse(raw):
+    p = DeltaParser()
+    return [c for i in range(0, len(raw), 512) for c in p.feed(raw[i:i + 512])]
+
+
+def _best_of(fns, raw, n=7):
+    """Best time of each parser, the rounds interleaved so a busy machine
+    (the full suite's background threads) slows both alike."""
+    best = [float("inf")] * len(fns)
+    outs = [None] * len(fns)
+    for _ in range(n):
+        for i, fn in enumerate(fns):
+            t0 = time.perf_counter()
+            outs[i] = fn(raw)
+            best[i] = min(best[i], time.perf_counter() - t0)
+    return list(zip(outs, best))
+
+
+WORDS = ("The quick brown fox jumps over the lazy dog while the kettle boils and "
+         "it is “nearly” time for tea.\n").split(" ")
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("server,frame", [("ollama", _ollama), ("llama.cpp", _llamacpp)])
+def test_benchmark_parse_overhead(server, frame):
+    tokens = [" " + w for w in WORDS] * 200
+    raw = b"".join(b"data: " + frame(t).encode() + b"\n\n" for t in tokens) + b"data: [DONE]\n\n"
+    (old, old_s), (new, new_s) = _best_of((_old_parse, _new_parse), raw)
+    assert new == old == tokens
+    print(f"\n{server}: parse {len(tokens) / old_s / 1000:.0f}k tok/s (iter_lines+json) -> "
+          f"{len(tokens) / new_s / 1000:.0f}k tok/s (byte parser), "
+          f"{old_s / len(tokens) * 1e6:.1f} -> {new_s / len(tokens) * 1e6:.1f} µs/token")
+    assert new_s < old_s
@@ -0,0 +1,247 @@
+"""Turn cancellation / barge-in: the token, the LLM stream abort (against a
+real local SSE server so a closed upstream is observable), the
+ConversationService turn registry, and the skill + PlayAIdes wiring."""
+from __future__ import annotations
+
+import threading
+import time
+import types
+
+from backend.services.cancellation import CancelToken
+from backend.services.conversation import ConversationService
+from model_interfaces import OpenAICompatLLM
+from persona import Persona
+from skills.base import SkillContext
+from skills.declarative import BashSkill
+
+# Upper bound for "cancel → upstream socket closed". Generous for CI; the
+# observed figure is a few ms.
+CLOSE_BOUND_S = 1.0
+
+_PERSONA = {
+    "name": "TestBot", "back_ground": "bg",
+    "psyche": {"traits": []}, "gender": "Female", "language": "English",
+}
+
+
+def _drain_in_thread(gen):
+    out: list = []
+    errors: list = []
+
+    def run():
+        try:
+            for item in gen:
+                out.append(item)
+        except Exception as e:  # surfaced to the test
+            errors.append(e)
+
+    t = threading.Thread(target=run, daemon=True)
+    t.start()
+    return t, out, errors
+
+
+def _wait_for(pred, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if pred():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+class TestCancelToken:
+    def test_cancel_runs_callbacks_once(self):
+        token, calls = CancelToken(), []
+        token.on_cancel(lambda: calls.append(1))
+        assert token.cancel("x") is True
+        assert token.cancel("y") is False
+        assert calls == [1]
+        assert token.cancelled and token.reason == "x"
+
+    def test_on_cancel_after_fire_runs_immediately(self):
+        token, calls = CancelToken(), []
+        token.cancel()
+        token.on_cancel(lambda: calls.append(1))
+        assert calls == [1]
+
+    def test_unregister_and_failing_callback(self):
+        token, calls = CancelToken(), []
+        remove = token.on_cancel(lambda: calls.append("removed"))
+        token.on_cancel(lambda: 1 / 0)
+        token.on_cancel(lambda: calls.append("kept"))
+        remove()
+        token.cancel()
+        assert calls == ["kept"]
+
+
+class TestLLMStreamAbort:
+    def test_cancel_mid_stream_closes_upstream(self, standin_llm):
+        standin_llm.chunks = ["first", "never"]
+        standin_llm.token_delay = 30.0
+        llm = OpenAICompatLLM(base_url=standin_llm.base_url, model="m")
+        token = CancelToken()
+        t, out, errors = _drain_in_thread(
+            llm.chat_stream([{"role": "user", "content": "hi"}], cancel=token))
+        assert _wait_for(lambda: out == ["first"])
+
+        t0 = time.monotonic()
+        token.cancel("test")
+        assert standin_llm.disconnected.wait(CLOSE_BOUND_S)
+        assert standin_llm.disconnects[0] - t0 < CLOSE_BOUND_S
+        t.join(CLOSE_BOUND_S)
+        assert not t.is_alive()
+        assert out == ["first"] and errors == []
+
+    def test_cancel_during_prefill_stall_closes_upstream(self, standin_llm):
+        standin_llm.ttft = 30.0           # headers sent, first token never comes
+        llm = OpenAICompatLLM(base_url=standin_llm.base_url, model="m")
+        token = CancelToken()
+        t, out, errors = _drain_in_thread(
+            llm.chat_stream([{"role": "user", "content": "hi"}], cancel=token))
+        assert _wait_for(lambda: len(standin_llm.requests) == 1)
+        time.sleep(0.1)
+
+        token.cancel("test")
+        assert standin_llm.disconnected.wait(CLOSE_BOUND_S)
+        t.join(CLOSE_BOUND_S)
+        assert not t.is_alive()
+        assert out == [] and errors == []
+
+    def test_precancelled_token_never_connects(self, standin_llm):
+        token = CancelToken()
+        token.cancel()
+        llm = OpenAICompatLLM(base_url=standin_llm.base_url, model="m")
+        assert list(llm.chat_stream([{"role": "user", "content": "hi"}], cancel=token)) == []
+        assert standin_llm.requests == []
+
+
+def _service(llm, history, spoken, stopped=None):
+    persona = Persona(**_PERSONA)
+    return ConversationService(
+        get_persona=lambda pid: persona,
+        history_load=lambda pid: history.setdefault(pid, []),
+        history_save=lambda pid: None,
+        dispatch=lambda *a, **kw: None,
+        llm=llm,
+        speak=lambda tid, text: spoken.append((tid, text)),
+        stop_speech=(lambda tid: stopped.append(tid)) if stopped is not None else None,
+    )
+
+
+class _GatedLLM:
+    """Yields one chunk, then blocks until the turn is cancelled."""
+    def chat(self, messages, system_prompt=None):
+        return "unused"
+
+    def chat_stream(self, messages, system_prompt=None, cancel=None):
+        yield "partial"
+        cancel.wait(5)
+        yield "late"
+
+
+class TestConversationCancel:
+    def test_cancelled_turn_skips_speech_and_history(self):
+        history, spoken = {}, []
+        svc = _service(_GatedLLM(), history, spoken)
+        token = svc.start_turn("testbot")
+        events = []
+        t = threading.Thread(
+            target=lambda: events.extend(svc.run_turn("testbot", "hi", cancel=token)))
+        t.start()
+        assert _wait_for(lambda: any(e.type == "reply_delta" for e in events))
+        svc.cancel_turn("testbot")
+        t.join(CLOSE_BOUND_S)
+
+        assert [e.type for e in events] == ["reply_started", "reply_delta", "reply_cancelled"]
+        assert events[-1].payload["text"] == "partial"
+        assert spoken == []
+        assert history["testbot"] == []
+
+    def test_new_turn_supersedes_live_turn(self):
+        svc = _service(_GatedLLM(), {}, [])
+        first = svc.start_turn("testbot")
+        second = svc.start_turn("testbot")
+        assert first.cancelled and first.reason == "superseded"
+        assert not second.cancelled
+        # Other personas are independent.
+        other = svc.start_turn("nova")
+        assert not second.cancelled and not other.cancelled
+
+    def test_barge_in_after_reply_stops_speech(self):
+        class _Done:
+            def chat_stream(self, messages, system_prompt=None, cancel=None):
+                yield "done"
+
+        history, spoken, stopped = {}, [], []
+        svc = _service(_Done(), history, spoken, stopped)
+        token = svc.start_turn("testbot")
+        list(svc.run_turn("testbot", "hi", cancel=token))
+        assert spoken == [("testbot", "done")] and len(history["testbot"]) == 2
+        svc.start_turn("testbot")            # the user talks over the reply
+        assert stopped == ["testbot"]
+
+    def test_cancel_turn_without_live_turn_is_false(self):
+        svc = _service(_GatedLLM(), {}, [])
+        assert svc.cancel_turn("nobody") is False
+
+    def test_superseding_turn_closes_upstream_stream(self, standin_llm):
+        standin_llm.chunks = ["a", "b"]
+        standin_llm.token_delay = 30.0
+        history, spoken = {}, []
+        svc = _service(OpenAICompatLLM(base_url=standin_llm.base_url, model="m"),
+                       history, spoken)
+        token = svc.start_turn("testbot")
+        t, events, _ = _drain_in_thread(svc.run_turn("testbot", "hi", cancel=token))
+        assert _wait_for(lambda: any(e.type == "reply_delta" for e in events))
+
+        svc.start_turn("testbot")            # new user_input for the same persona
+        assert standin_llm.disconnected.wait(CLOSE_BOUND_S)
+        t.join(CLOSE_BOUND_S)
+        assert events[-1].type == "reply_cancelled"
+        assert history["testbot"] == [] and spoken == []
+
+
+def test_bash_skill_killed_on_cancel():
+    skill = BashSkill({"name": "slow", "kind": "bash", "command": ["sleep", "30"],
+                       "params": {}, "timeout_s": 30})
+    token = CancelToken()
+    ctx = SkillContext(persona=None, target_id="silver", send=lambda *a: None,
+                       speak_fn=lambda *a: None, cancel=token)
+    threading.Timer(0.1, token.cancel).start()
+    t0 = time.monotonic()
+    res = skill.execute(skill.Params(), ctx)
+    assert time.monotonic() - t0 < CLOSE_BOUND_S
+    assert res.ok is False and res.error == "cancelled"
+
+
+def test_cancelled_skill_context_does_not_speak():
+    spoken = []
+    token = CancelToken()
+    token.cancel()
+    ctx = SkillContext(persona=None, target_id="silver", send=lambda *a: None,
+                       speak_fn=lambda *a: spoken.append(a), cancel=token)
+    ctx.speak("too late")
+    assert spoken == []
+
+
+class TestPlayAIdesWiring:
+    def _ai(self):
+        from playAIdes import PlayAIdes
+        ai = PlayAIdes.__new__(PlayAIdes)
+        ai.current_persona = types.SimpleNamespace(name="Silver")
+        ai.conversation = types.SimpleNamespace(
+            cancelled=[],
+            cancel_turn=lambda pid, reason: ai.conversation.cancelled.append((pid, reason)) or True,
+        )
+        return ai
+
+    def test_cancel_turn_frame_cancels_named_or_active_persona(self):
+        ai = self._ai()
+        ai._handle_incarnation_message({"type": "cancel_turn", "payload": {"persona_id": "nova"}})
+        ai._handle_incarnation_message({"type": "cancel_turn", "payload": {}})
+        assert ai.conversation.cancelled == [("nova", "cancel_turn"), ("silver", "cancel_turn")]
+
+    def test_dismiss_cancels_active_turn(self):
+        ai = self._ai()
+        ai._handle_incarnation_message({"type": "dismiss_persona", "payload": {}})
+        assert ai.conversation.cancelled == [("silver", "dismissed")]
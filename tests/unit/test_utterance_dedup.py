@@ -0,0 +1,101 @@
+"""Cross-device utterance dedup: transcript matching, leader/follower event
+streams (replayed and live), the window, stats, and the user_input path
+running one LLM turn for two mics."""
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from backend.services.dedup import (
+    UtteranceDedup, normalize_utterance, utterance_distance)
+
+
+def test_normalize_and_distance():
+    assert normalize_utterance("  Turn ON the lights, please! ") == "turn on the lights please"
+    assert utterance_distance("turn on the lights", "turn on the lights") == 0.0
+    assert utterance_distance("turn on the lights", "turn on the light") < 0.1
+    assert utterance_distance("turn on the lights", "what time is it") > 0.5
+    assert utterance_distance("", "hi") == 1.0
+
+
+def _turn(events, gate=None):
+    def start():
+        for ev in events:
+            if gate is not None:
+                gate.wait(1)
+            yield ev
+    return start
+
+
+def test_second_arrival_follows_and_replays():
+    dedup = UtteranceDedup(window_s=5, max_distance=0.2)
+    ran = []
+    lead = dedup.attach("silver", "Turn on the lights.", lambda: ran.append(1) or iter("abc"))
+    assert lead.leader and list(lead) == ["a", "b", "c"]
+    follow = dedup.attach("silver", "turn on the light", lambda: ran.append(2) or iter("x"))
+    assert not follow.leader and list(follow) == ["a", "b", "c"]
+    assert ran == [1]
+    assert dedup.stats()["turns"] == 1 and dedup.stats()["by_persona"] == {"silver": 1}
+
+
+def test_follower_sees_live_events_until_the_turn_ends():
+    dedup = UtteranceDedup(window_s=5)
+    gate = threading.Event()
+    lead = dedup.attach("silver", "what's the weather", _turn(["started", "delta", "done"], gate))
+    got = []
+    leader = threading.Thread(target=lambda: list(lead))
+    leader.start()
+    follower = threading.Thread(target=lambda: got.extend(
+        dedup.attach("silver", "whats the weather", _turn(["nope"]))))
+    follower.start()
+    time.sleep(0.05)
+    assert got == []                      # waiting on the live turn
+    gate.set()
+    leader.join(1)
+    follower.join(1)
+    assert got == ["started", "delta", "done"]
+
+
+@pytest.mark.parametrize("persona,text,window", [
+    ("nova", "turn on the lights", 5),             # other persona
+    ("silver", "what time is it", 5),              # different command
+    ("silver", "turn on the lights", 0),           # dedup off
+])
+def test_new_turn_when_not_a_duplicate(persona, text, window):
+    dedup = UtteranceDedup(window_s=window)
+    list(dedup.attach("silver", "turn on the lights", _turn(["a"])))
+    assert dedup.attach(persona, text, _turn(["b"])).leader
+
+
+def test_window_expires():
+    dedup = UtteranceDedup(window_s=0.05)
+    list(dedup.attach("silver", "yes", _turn(["a"])))
+    time.sleep(0.1)
+    assert dedup.attach("silver", "yes", _turn(["b"])).leader
+    assert dedup.stats()["deduplicated"] == 0
+
+
+def test_env_configuration(monkeypatch):
+    monkeypatch.setenv("UTTERANCE_DEDUP_WINDOW_S", "1.5")
+    monkeypatch.setenv("UTTERANCE_DEDUP_DISTANCE", "0.3")
+    dedup = UtteranceDedup()
+    assert (dedup.window_s, dedup.max_distance) == (1.5, 0.3)
+
+
+@pytest.mark.integration
+def test_two_mics_run_one_llm_turn(persona_file, fake_tts, no_incarnation, standin_llm):
+    from model_interfaces import OpenAICompatLLM
+    from playAIdes import PlayAIdes, PlayAIdesArgs
+    play = PlayAIdes(PlayAIdesArgs(
+        persona=[str(persona_file)], generate_voice=False, use_voice=False,
+        use_avatar=True, generate_avatar=False,
+        llm=OpenAICompatLLM(base_url=standin_llm.base_url, model="m"), tts=fake_tts))
+    play._handle_incarnation_message({"type": "user_input",
+                                      "payload": {"text": "Turn on the lights."}})
+    play._handle_incarnation_message({"type": "user_input",
+                                      "payload": {"text": "turn on the light"}})
+    assert len(standin_llm.requests) == 1
+    assert [c for c, _ in play.incarnation_server.commands].count("assistant_message") == 1
+    assert play.llm_stats()["dedup"]["deduplicated"] == 1